@@ -10,16 +10,32 @@ Measures:
 Usage:
     python benchmark.py              # Run all benchmarks
     python benchmark.py --quick      # Quick benchmark (fewer iterations)
-    python benchmark.py --embedding  # Only embedding benchmarks
+    python benchmark.py --embedding  # Only embedding request benchmarks (local stub server, no index required)
     python benchmark.py --retrieval  # Only retrieval benchmarks
     python benchmark.py --e2e        # Only end-to-end benchmarks
+    python benchmark.py --bm25       # Only BM25 scaling + cold-start load benchmarks (no index required)
+    python benchmark.py --mmap       # Only embedding RSS-per-worker benchmark (copy vs mmap)
+    python benchmark.py --async-pipeline  # Only /v1/query concurrency: thread pool vs async pipeline (stub Ollama)
+    python benchmark.py --llm-gateway  # Only LLM gateway: overload burst vs a saturated stub Ollama, off vs on
+    python benchmark.py --rerank     # Only rerank latency + eval-set MRR@10 per backend (none / llm / cross_encoder)
+    python benchmark.py --features   # Only per-query chunk-feature work: Python loops vs precomputed arrays
+    python benchmark.py --mmr        # Only MMR: per-step recompute vs running max-similarity (single and batched)
+    python benchmark.py --packing    # Only pack_snippets token accounting at num_ctx=32768
+    python benchmark.py --expansion  # Only query expansion matching with 1k/50k-entry dictionaries
+    python benchmark.py --metrics    # Only metrics recording under 64-thread contention: global lock vs shards
+    python benchmark.py --batch      # Only batched retrieval throughput at batch sizes 1/16/128/1024
 """
 
 import argparse
+import contextlib
 import gc
 import json
 import os
+import re
+import subprocess
 import sys
+import tempfile
+import threading
 import time
 import tracemalloc
 from statistics import mean, median, stdev
@@ -33,9 +49,15 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # Import modules to allow monkey-patching for offline smoke tests
 import clockify_rag.retrieval
 import clockify_rag.embedding
+import clockify_rag.embeddings_client
 import clockify_rag.answer
+import clockify_rag.config
 
 from clockify_rag import (
+    build_bm25,
+    bm25_scores,
+    export_bm25_json,
+    save_bm25_binary,
     build_chunks,
     embed_texts,
     embed_query,
@@ -44,9 +66,12 @@ from clockify_rag import (
     load_index,
 )
 from clockify_rag.config import EMB_BACKEND, EMB_DIM
-from clockify_rag.utils import resolve_corpus_path
+from clockify_rag.utils import atomic_save_npy, resolve_corpus_path, tokenize
 from clockify_rag.retrieval import RETRIEVE_PROFILE_LAST
 
+# Keep a handle on the real remote path; BENCHMARK_FAKE_REMOTE replaces embed_texts below.
+_remote_embed_texts = clockify_rag.embedding.embed_texts
+
 # Allow CI smoke tests to bypass external services by providing deterministic
 # stubs when BENCHMARK_FAKE_REMOTE=1.
 if os.environ.get("BENCHMARK_FAKE_REMOTE") == "1":
@@ -255,6 +280,424 @@ def benchmark_embedding_large_batch(chunks, iterations=3):
     return result
 
 
+class _StubEmbedServer:
+    """Local Ollama stand-in that answers /api/embed and /api/embeddings.
+
+    Each request costs ``request_ms`` plus ``per_text_ms`` per input, which is
+    roughly how a GPU-backed Ollama behaves: fixed HTTP + scheduling overhead,
+    then cheap per-text compute once the batch is on the device.
+    """
+
+    def __init__(self, dim, request_ms=4.0, per_text_ms=0.25):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stub = self
+        self.dim = dim
+        self.requests = 0
+        self._lock = threading.Lock()
+        vector = [1.0] * dim
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                if self.path == "/api/embed":
+                    n = len(body["input"])
+                    payload = {"embeddings": [vector] * n}
+                else:
+                    n = 1
+                    payload = {"embedding": vector}
+                time.sleep((request_ms + per_text_ms * n) / 1000)
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def benchmark_embedding_request_batching(texts, iterations=3):
+    """Full-corpus embedding against a local stub: one request per text vs /api/embed batches."""
+    client = clockify_rag.embeddings_client
+    dim = client.EMB_DIM
+    saved = (client.RAG_OLLAMA_URL, client.EMB_BATCH_API)
+    results = []
+    try:
+        with _StubEmbedServer(dim) as stub:
+            client.RAG_OLLAMA_URL = stub.url
+            for mode, batch_api in (("per_text", False), ("batched", True)):
+                client.EMB_BATCH_API = batch_api
+                client.clear_cache()
+                stub.requests = 0
+
+                # Timed by hand: tracemalloc in benchmark() would also slow the
+                # in-process stub server and hide the request overhead.
+                result = BenchmarkResult(f"embed_corpus_{mode}")
+                _remote_embed_texts(texts, retries=0)  # warmup (also probes /api/embed)
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    _remote_embed_texts(texts, retries=0)
+                    result.add_latency((time.perf_counter() - start) * 1000)
+                result.set_metadata(
+                    texts=len(texts),
+                    batch_size=clockify_rag.config.EMB_BATCH_SIZE,
+                    workers=clockify_rag.config.EMB_MAX_WORKERS,
+                    requests_per_run=stub.requests // (iterations + 1),
+                )
+                results.append(result)
+    finally:
+        client.RAG_OLLAMA_URL, client.EMB_BATCH_API = saved
+        client.clear_cache()
+    per_text, batched = results
+    batched.set_metadata(
+        request_reduction=round(per_text.metadata["requests_per_run"] / batched.metadata["requests_per_run"], 1),
+        speedup=round(mean(per_text.latencies) / mean(batched.latencies), 2),
+    )
+    return results
+
+
+# ====== QUERY PIPELINE CONCURRENCY BENCHMARKS ======
+class _StubOllamaServer:
+    """Local Ollama stand-in with a slow /api/chat; records peak concurrent chat requests.
+
+    /api/embeddings answers at once; /api/chat sleeps ``chat_ms`` like a model
+    generating tokens. Rerank prompts get ``[]`` (keep the MMR order). With
+    ``parallel`` set, at most that many chats generate at once and the rest wait
+    inside the server, like a saturated Ollama (``OLLAMA_NUM_PARALLEL``).
+    """
+
+    def __init__(self, dim, chat_ms=500.0, parallel=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stub = self
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        generating = threading.BoundedSemaphore(parallel) if parallel else contextlib.nullcontext()
+        vector = [1.0] * dim
+        answer = json.dumps({"answer": "Use the timer button.", "confidence": 80})
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path == "/api/embeddings":
+                    payload = {"embedding": vector}
+                else:
+                    with stub._lock:
+                        stub.in_flight += 1
+                        stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    with generating:
+                        time.sleep(chat_ms / 1000)
+                    with stub._lock:
+                        stub.in_flight -= 1
+                    content = "[]" if "PASSAGES:" in body["messages"][-1]["content"] else answer
+                    payload = {"model": body["model"], "message": {"role": "assistant", "content": content}}
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# One burst of concurrent queries in a fresh interpreter (EMB_BACKEND=ollama,
+# RAG_OLLAMA_URL=stub): "thread" runs answer_once on the API's thread pool,
+# "async" gathers async_answer_once. Threads are sampled while the burst runs.
+_PIPELINE_CONCURRENCY_PROBE = """
+import asyncio, json, resource, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from clockify_rag.answer import answer_once
+from clockify_rag.api import _threadpool_workers
+from clockify_rag.async_support import async_answer_once
+from clockify_rag.config import EMB_DIM
+from clockify_rag.indexing import build_bm25
+
+mode, queries = sys.argv[1], int(sys.argv[2])
+words = "timer project report invoice rate approval kiosk team tag client export budget".split()
+chunks = [
+    {"id": f"c{i}", "title": f"Article {i % 40}", "section": "Help", "url": f"https://example.com/{i % 40}",
+     "text": " ".join(words[(i + j) % len(words)] for j in range(60))}
+    for i in range(400)
+]
+vecs = np.random.default_rng(0).standard_normal((len(chunks), EMB_DIM)).astype("float32")
+vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+bm = build_bm25(chunks)
+questions = [f"how do I approve {words[i % len(words)]} entries number {i}" for i in range(queries)]
+kwargs = dict(threshold=0.0, use_rerank=True, retries=0)
+
+peak_threads, done = [threading.active_count()], threading.Event()
+def sample():
+    while not done.is_set():
+        peak_threads[0] = max(peak_threads[0], threading.active_count())
+        time.sleep(0.005)
+threading.Thread(target=sample, daemon=True).start()
+
+t0 = time.perf_counter()
+if mode == "thread":
+    with ThreadPoolExecutor(_threadpool_workers()) as pool:
+        results = list(pool.map(lambda q: answer_once(q, chunks, vecs, bm, **kwargs), questions))
+else:
+    async def burst():
+        return await asyncio.gather(*[async_answer_once(q, chunks, vecs, bm, **kwargs) for q in questions])
+    results = asyncio.run(burst())
+wall_ms = (time.perf_counter() - t0) * 1000
+done.set()
+print(json.dumps({
+    "wall_ms": wall_ms,
+    "query_ms": [r["timing"]["total_ms"] for r in results],
+    "answered": sum(not r["refused"] for r in results),
+    "peak_threads": peak_threads[0],
+    "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+}))
+"""
+
+
+def benchmark_query_pipeline_concurrency(queries=200, chat_ms=500.0):
+    """Burst of concurrent queries against a slow stub Ollama: thread-pool vs async pipeline."""
+    results = []
+    repo_root = os.path.dirname(os.path.abspath(__file__))
+    dim = clockify_rag.config.EMB_DIM_OLLAMA
+    with _StubOllamaServer(dim, chat_ms=chat_ms) as stub:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])),
+            EMB_BACKEND="ollama",
+            RAG_OLLAMA_URL=stub.url,
+            RAG_LLM_CLIENT="ollama",
+            COALESCE_REQUESTS="0",
+            LLM_MAX_IN_FLIGHT="0",  # measures the pipelines, not the LLM gateway cap
+        )
+        for mode in ("thread", "async"):
+            stub.max_in_flight = 0
+            proc = subprocess.run(
+                [sys.executable, "-c", _PIPELINE_CONCURRENCY_PROBE, mode, str(queries)],
+                capture_output=True,
+                text=True,
+                check=True,
+                env=env,
+            )
+            sample = json.loads(proc.stdout.strip().splitlines()[-1])
+            result = BenchmarkResult(f"query_pipeline_{mode}")
+            for latency in sample["query_ms"]:
+                result.add_latency(latency)
+            result.set_memory(sample["peak_rss"], sample["peak_rss"])
+            result.set_metadata(
+                queries=queries,
+                chat_ms=chat_ms,
+                answered=sample["answered"],
+                max_in_flight_llm=stub.max_in_flight,
+                wall_ms=round(sample["wall_ms"], 1),
+                queries_per_sec=round(queries / (sample["wall_ms"] / 1000), 1),
+                peak_threads=sample["peak_threads"],
+                peak_rss_mb=round(sample["peak_rss"] / 1024 / 1024, 2),
+            )
+            results.append(result)
+    thread, async_ = results
+    async_.set_metadata(
+        in_flight_gain=round(async_.metadata["max_in_flight_llm"] / max(1, thread.metadata["max_in_flight_llm"]), 1),
+        speedup=round(thread.metadata["wall_ms"] / async_.metadata["wall_ms"], 2),
+    )
+    return results
+
+
+# ====== LLM GATEWAY BENCHMARKS ======
+def benchmark_llm_gateway(callers=64, chat_ms=200.0, parallel=4, queue_timeout=1.0):
+    """Overload burst of chat completions against a stub Ollama generating ``parallel`` at a time.
+
+    Without the gateway every call reaches Ollama and queues there, so latency
+    grows with the burst. With it (``LLM_MAX_IN_FLIGHT=parallel``) calls whose
+    expected wait exceeds ``queue_timeout`` are shed at once and the served ones
+    stay near the deadline.
+    """
+    from clockify_rag import api_client, llm_gateway
+    from clockify_rag.exceptions import LLMOverloadedError
+
+    cfg = clockify_rag.config
+    saved = (cfg.LLM_MAX_IN_FLIGHT, cfg.LLM_QUEUE_MAX, cfg.LLM_QUEUE_TIMEOUT)
+    results = []
+    with _StubOllamaServer(EMB_DIM, chat_ms=chat_ms, parallel=parallel) as stub:
+        api_client.set_llm_client(api_client.OllamaAPIClient(base_url=stub.url, retries=0))
+        try:
+            for label, max_in_flight in (("off", 0), ("on", parallel)):
+                cfg.LLM_MAX_IN_FLIGHT, cfg.LLM_QUEUE_MAX, cfg.LLM_QUEUE_TIMEOUT = max_in_flight, callers, queue_timeout
+                llm_gateway._GATEWAY = None
+                # One call first so the gateway knows the generation time
+                api_client.chat_completion([{"role": "user", "content": "warm up"}], model="bench")
+                stub.max_in_flight = 0
+                barrier = threading.Barrier(callers)
+                served, shed = [], []
+
+                def call(i, served=served, shed=shed, barrier=barrier):
+                    barrier.wait()
+                    t0 = time.perf_counter()
+                    try:
+                        api_client.chat_completion([{"role": "user", "content": f"q{i}"}], model="bench")
+                        served.append((time.perf_counter() - t0) * 1000)
+                    except LLMOverloadedError:
+                        shed.append((time.perf_counter() - t0) * 1000)
+
+                threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+                t0 = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                wall_ms = (time.perf_counter() - t0) * 1000
+
+                result = BenchmarkResult(f"llm_gateway_{label}")
+                for latency in served:
+                    result.add_latency(latency)
+                result.set_metadata(
+                    callers=callers,
+                    chat_ms=chat_ms,
+                    ollama_parallel=parallel,
+                    queue_timeout_s=queue_timeout,
+                    served=len(served),
+                    shed=len(shed),
+                    max_shed_ms=round(max(shed), 1) if shed else None,
+                    max_in_flight_llm=stub.max_in_flight,
+                    wall_ms=round(wall_ms, 1),
+                )
+                results.append(result)
+        finally:
+            cfg.LLM_MAX_IN_FLIGHT, cfg.LLM_QUEUE_MAX, cfg.LLM_QUEUE_TIMEOUT = saved
+            llm_gateway._GATEWAY = None
+            api_client.reset_llm_client()
+    return results
+
+
+# ====== RERANK BENCHMARKS ======
+class _LexicalCrossEncoder:
+    """Stand-in for a sentence-transformers CrossEncoder: scores pairs by query-term overlap."""
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        scores = []
+        for query, text in pairs:
+            q_terms, t_terms = set(tokenize(query)), tokenize(text)
+            scores.append(sum(term in q_terms for term in t_terms) / (1 + len(t_terms)) ** 0.5)
+        return np.asarray(scores, dtype=np.float32)
+
+
+def benchmark_rerank(chunks, dataset_path="eval_datasets/clockify_v1.jsonl", candidates=12, chat_ms=500.0):
+    """Rerank latency and MRR@10 per RERANK_BACKEND over the eval set.
+
+    Each eval question's first ``candidates`` BM25 hits stand in for the MMR
+    selection; relevance is article-level where the dataset's sections do not
+    resolve against ``chunks``. ``llm`` runs against the stub Ollama (``chat_ms`` per call, ``[]``
+    ranking, so its MRR is the MMR order's); ``cross_encoder`` uses the real model
+    when sentence-transformers is installed, else a lexical-overlap stub, and is
+    timed cold (empty score cache) and warm.
+    """
+    from clockify_rag import api_client, embedding, llm_gateway
+    from clockify_rag.answer import apply_reranking
+    from eval import _build_chunk_lookup, _resolve_relevant_indices, compute_mrr
+
+    bm = build_bm25(chunks)
+    lookups = _build_chunk_lookup(chunks)
+    by_article = {}
+    for idx, chunk in enumerate(chunks):
+        by_article.setdefault((chunk.get("title") or "").strip().lower(), set()).add(idx)
+    examples = []
+    with open(dataset_path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                example = json.loads(line)
+                relevant = _resolve_relevant_indices(example, *lookups)
+                for ref in example.get("relevant_chunks", []) if not relevant else []:
+                    # Dataset titles are "[ARTICLE] <title> - Clockify Help" and its sections
+                    # predate the current chunking: fall back to article-level relevance
+                    title = re.sub(r"^\[article\]\s*|\s*-\s*clockify help$", "", ref.get("title", "").lower())
+                    relevant |= by_article.get(title.strip(), set())
+                if relevant:
+                    selected = np.argsort(-bm25_scores(example["query"], bm), kind="stable")[:candidates]
+                    examples.append((example["query"], [int(i) for i in selected], relevant))
+
+    try:
+        import sentence_transformers  # noqa: F401
+
+        ce_model = "real"
+    except ImportError:
+        ce_model = "lexical_stub"
+
+    cfg = clockify_rag.config
+    saved = (cfg.RERANK_CACHE_MAX_ITEMS, cfg.RERANK_CE_MAX_CANDIDATES, cfg.LLM_MAX_IN_FLIGHT, embedding._CROSS_ENCODER)
+    cfg.RERANK_CACHE_MAX_ITEMS, cfg.RERANK_CE_MAX_CANDIDATES, cfg.LLM_MAX_IN_FLIGHT = 0, candidates, 0
+    llm_gateway._GATEWAY = None
+    if ce_model == "lexical_stub":
+        embedding._CROSS_ENCODER = _LexicalCrossEncoder()
+    embedding.clear_cross_encoder_cache()
+    results = []
+    with _StubOllamaServer(EMB_DIM, chat_ms=chat_ms) as stub:
+        api_client.set_llm_client(api_client.OllamaAPIClient(base_url=stub.url, retries=0))
+        try:
+            runs = [("none", "none"), ("llm", "llm"), ("cross_encoder_cold", "cross_encoder")]
+            runs.append(("cross_encoder_warm", "cross_encoder"))
+            for label, backend in runs:
+                result = BenchmarkResult(f"rerank_{label}")
+                mrrs, reasons = [], {}
+                for question, selected, relevant in examples:
+                    t0 = time.perf_counter()
+                    order, _scores, _applied, reason, _timing = apply_reranking(
+                        question, chunks, selected, {}, use_rerank=True, backend=backend
+                    )
+                    result.add_latency((time.perf_counter() - t0) * 1000)
+                    mrrs.append(compute_mrr(order[:10], relevant))
+                    reasons[reason or "applied"] = reasons.get(reason or "applied", 0) + 1
+                result.set_metadata(
+                    questions=len(examples),
+                    candidates=candidates,
+                    mrr_at_10=round(mean(mrrs), 4),
+                    reasons=reasons,
+                    **({"chat_ms": chat_ms} if backend == "llm" else {}),
+                    **({"model": ce_model} if backend == "cross_encoder" else {}),
+                )
+                results.append(result)
+        finally:
+            cfg.RERANK_CACHE_MAX_ITEMS, cfg.RERANK_CE_MAX_CANDIDATES, cfg.LLM_MAX_IN_FLIGHT = saved[:3]
+            embedding._CROSS_ENCODER = saved[3]
+            embedding.clear_cross_encoder_cache()
+            llm_gateway._GATEWAY = None
+            api_client.reset_llm_client()
+    return results
+
+
 # ====== RETRIEVAL BENCHMARKS ======
 def benchmark_retrieval_hybrid(chunks, vecs_n, bm, iterations=20):
     """Benchmark hybrid (BM25 + dense) retrieval (Rank 16: fixed misleading name)."""
@@ -323,6 +766,636 @@ def benchmark_e2e_complex(chunks, vecs_n, bm, iterations=5):
     return result
 
 
+# ====== CHUNK FEATURE BENCHMARKS ======
+def _legacy_static_feature_work(chunks, hybrid_full, hybrid, candidate_idx, top_idx, boost_keywords, hub_mult):
+    """Per-query chunk-dict walks retrieve() did before ChunkFeatures (baseline only)."""
+    from clockify_rag.chunk_features import _article_key
+
+    for i, chunk in enumerate(chunks):  # intent boost: keyword scan of every chunk
+        if any(kw in chunk.get("text", "").lower() or kw in chunk.get("title", "").lower() for kw in boost_keywords):
+            hybrid_full[i] *= 1.2
+    for scores, idx in ((hybrid, candidate_idx), (hybrid_full, np.arange(len(chunks)))):  # hub penalty
+        penalized = scores.copy()
+        for pos, chunk_idx in enumerate(idx):
+            if bool((chunks[chunk_idx].get("metadata", {}) or {}).get("is_hub")):
+                penalized[pos] *= hub_mult
+    seen, filtered = set(), []
+    for i in top_idx:  # dedup
+        key = (_article_key(chunks[i]), chunks[i].get("section"))
+        if key not in seen:
+            seen.add(key)
+            filtered.append(i)
+    return filtered
+
+
+def benchmark_chunk_features(chunks, factors=(1, 10, 100), iterations=5):
+    """Compare per-query chunk-dict loops against precomputed ChunkFeatures arrays."""
+    from clockify_rag.chunk_features import ChunkFeatures
+    from clockify_rag.intent_classification import INTENT_BOOST_KEYWORDS
+
+    hub_mult = 0.85
+    boost_keywords = INTENT_BOOST_KEYWORDS["pricing"]
+    rng = np.random.default_rng(0)
+    results = []
+    for factor in factors:
+        scaled = [
+            {**c, "id": f"{c['id']}-{rep}", "metadata": {**(c.get("metadata") or {}), "is_hub": i % 17 == 0}}
+            for rep in range(factor)
+            for i, c in enumerate(chunks)
+        ]
+        n = len(scaled)
+        hybrid_full = rng.standard_normal(n).astype(np.float32)
+        candidate_idx = np.arange(n, dtype=np.int32)
+        top_idx = np.argsort(hybrid_full)[::-1][:12]
+
+        build_start = time.perf_counter()
+        features = ChunkFeatures.from_chunks(scaled)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        def run_legacy():
+            _legacy_static_feature_work(
+                scaled, hybrid_full.copy(), hybrid_full, candidate_idx, top_idx, boost_keywords, hub_mult
+            )
+
+        def run_features():
+            boosted = hybrid_full.copy()
+            boosted[features.intent_mask("pricing")] *= 1.2
+            multipliers = features.hub_multipliers(hub_mult)
+            _ = hybrid_full * multipliers[candidate_idx]
+            _ = boosted * multipliers
+            features.dedup(top_idx)
+
+        legacy = benchmark(run_legacy, iterations=iterations, warmup=1)
+        legacy.name = f"chunk_features_python_loops_x{factor}"
+        legacy.set_metadata(chunks=n)
+        vectorised = benchmark(run_features, iterations=iterations, warmup=1)
+        vectorised.name = f"chunk_features_precomputed_x{factor}"
+        speedup = mean(legacy.latencies) / max(mean(vectorised.latencies), 1e-9)
+        vectorised.set_metadata(chunks=n, build_once_ms=round(build_ms, 2), speedup_vs_loops=round(speedup, 1))
+        results.extend([legacy, vectorised])
+    return results
+
+
+# ====== MMR BENCHMARKS ======
+def _legacy_mmr(selected, dense, vecs_n, pack_top, mmr_lambda=0.75):
+    """MMR that re-scores every pick on each step (baseline only)."""
+    mmr_selected = [max(selected, key=lambda j: dense[j])]
+    cand = [j for j in selected if j != mmr_selected[0]]
+    cand_array = np.array(cand, dtype=np.int32)
+    relevance = np.array([dense[j] for j in cand], dtype=np.float32)
+    cand_vecs = vecs_n[cand_array]
+    remaining = np.ones(len(cand_array), dtype=bool)
+    while remaining.any() and len(mmr_selected) < pack_top:
+        mmr_scores = mmr_lambda * relevance.copy()
+        mmr_scores -= (1 - mmr_lambda) * (cand_vecs @ vecs_n[mmr_selected].T).max(axis=1)
+        mmr_scores[~remaining] = -np.inf
+        best = int(mmr_scores.argmax())
+        mmr_selected.append(int(cand_array[best]))
+        remaining[best] = False
+    return mmr_selected
+
+
+def benchmark_mmr(pack_tops=(6, 12, 25, 50), pools=(50, 200, 500), dim=EMB_DIM, queries=32, iterations=5):
+    """Compare per-step similarity recomputation against running max-similarity MMR (single and batched)."""
+    from clockify_rag.answer import apply_mmr_diversification, apply_mmr_diversification_batch
+    from clockify_rag.config import MMR_LAMBDA
+    from clockify_rag.retrieval import DenseScoreStore
+
+    rng = np.random.default_rng(0)
+    n_chunks = max(pools) * 4
+    vecs_n = rng.standard_normal((n_chunks, dim)).astype(np.float32)
+    vecs_n /= np.linalg.norm(vecs_n, axis=1, keepdims=True)
+    results = []
+    for pool in pools:
+        qvs = vecs_n[rng.integers(0, n_chunks, queries)]
+        pools_idx = [np.argsort(vecs_n @ qv)[::-1][:pool].tolist() for qv in qvs]
+        for pack_top in pack_tops:
+            if pack_top > pool:
+                continue
+
+            def stores():
+                return [{"dense": DenseScoreStore(n_chunks, vecs=vecs_n, qv=qv)} for qv in qvs]
+
+            def run_legacy():
+                for sel, scores in zip(pools_idx, stores()):
+                    _legacy_mmr(sel, scores["dense"], vecs_n, pack_top, MMR_LAMBDA)
+
+            def run_incremental():
+                for sel, scores in zip(pools_idx, stores()):
+                    apply_mmr_diversification(sel, scores, vecs_n, pack_top)
+
+            def run_batch():
+                apply_mmr_diversification_batch(pools_idx, stores(), vecs_n, pack_top)
+
+            timed = []
+            for label, fn in (("recompute", run_legacy), ("incremental", run_incremental), ("batch", run_batch)):
+                result = benchmark(fn, iterations=iterations, warmup=1)
+                result.name = f"mmr_{label}_pool{pool}_top{pack_top}"
+                timed.append(result)
+            base = mean(timed[0].latencies)
+            for result in timed:
+                result.set_metadata(
+                    pool=pool,
+                    pack_top=pack_top,
+                    queries=queries,
+                    speedup_vs_recompute=round(base / max(mean(result.latencies), 1e-9), 1),
+                )
+            results.extend(timed)
+    return results
+
+
+# ====== CONTEXT PACKING BENCHMARKS ======
+def _legacy_pack_counting(article_texts, header, budget):
+    """Recount the growing block per chunk and binary-search truncation (baseline only)."""
+    import re as _re
+
+    def count(text):
+        cjk = len(_re.findall(r"[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uac00-\ud7af]", text))
+        return int(np.ceil(cjk / 1.5 + (len(text) - cjk) / 3.5))
+
+    used = 0
+    for texts in article_texts:
+        body = ""
+        for text in texts:
+            candidate = body + ("\n\n" if body else "") + text
+            if count(header + candidate) <= budget - used:
+                body = candidate
+                continue
+            left, right, target = 0, len(text), budget - used - count(header + body) - 1
+            while left < right:
+                mid = (left + right + 1) // 2
+                left, right = (mid, right) if count(text[:mid]) <= target else (left, mid - 1)
+            body += text[:left]
+            break
+        used += count(header + body)
+        if used >= budget:
+            break
+    return used
+
+
+def benchmark_packing(chunks, num_ctx=32768, chunks_per_article=(10, 40, 120), iterations=5):
+    """pack_snippets token accounting at num_ctx: per-chunk recounting vs additive precomputed units.
+
+    The recount baseline times only the token counting the old loop did; the
+    other two time all of pack_snippets (grouping and rendering included).
+    """
+    from clockify_rag import config
+    from clockify_rag.retrieval import pack_snippets
+    from clockify_rag.token_counting import annotate_token_counts
+
+    budget = int(num_ctx * 0.6)
+    texts = [c["text"] for c in chunks]
+    results = []
+    original_model = config.RAG_CHAT_MODEL
+    config.RAG_CHAT_MODEL = "qwen2.5:32b"
+    try:
+        for per_article in chunks_per_article:
+            n_articles = 16
+            packed_chunks = [
+                {
+                    "id": f"a{a}-{i}",
+                    "title": f"Article {a}",
+                    "url": f"#article-{a}",
+                    "section": f"s{i}",
+                    "text": texts[(a * per_article + i) % len(texts)],
+                }
+                for a in range(n_articles)
+                for i in range(per_article)
+            ]
+            plain = [dict(c) for c in packed_chunks]
+            annotate_token_counts(packed_chunks)
+            order = list(range(len(packed_chunks)))
+            article_texts = [
+                [c["text"] for c in plain[a * per_article : (a + 1) * per_article]] for a in range(n_articles)
+            ]
+
+            legacy = benchmark(
+                lambda: _legacy_pack_counting(article_texts, "### Article: Article 0\nURL: #article-0\n\n", budget),
+                iterations=iterations,
+                warmup=1,
+            )
+            legacy.name = f"pack_recount_tokens_only_{per_article}_per_article"
+            measured = benchmark(
+                lambda: pack_snippets(plain, order, pack_top=n_articles, budget_tokens=budget, num_ctx=num_ctx),
+                iterations=iterations,
+                warmup=1,
+            )
+            measured.name = f"pack_additive_{per_article}_per_article"
+            precomputed = benchmark(
+                lambda: pack_snippets(packed_chunks, order, pack_top=n_articles, budget_tokens=budget, num_ctx=num_ctx),
+                iterations=iterations,
+                warmup=1,
+            )
+            precomputed.name = f"pack_precomputed_{per_article}_per_article"
+            base = mean(legacy.latencies)
+            for r in (legacy, measured, precomputed):
+                r.set_metadata(
+                    num_ctx=num_ctx,
+                    budget_tokens=budget,
+                    chunks_per_article=per_article,
+                    speedup_vs_recount=round(base / max(mean(r.latencies), 1e-9), 1),
+                )
+            results.extend([legacy, measured, precomputed])
+    finally:
+        config.RAG_CHAT_MODEL = original_model
+    return results
+
+
+# ====== QUERY EXPANSION BENCHMARKS ======
+def _legacy_expansion_terms(expansions, text):
+    """One word-boundary regex search per dictionary term (baseline only)."""
+    terms = []
+    for term, synonyms in expansions.items():
+        if re.search(r"\b" + re.escape(term) + r"\b", text):
+            terms.extend(syn for syn in synonyms if syn not in terms)
+    return terms
+
+
+def benchmark_query_expansion(sizes=(1000, 50000), iterations=5):
+    """Per-query expansion matching: per-term regex loop vs the compiled matcher."""
+    from clockify_rag.retrieval import QueryExpansionMatcher, load_query_expansion_dict
+
+    base = load_query_expansion_dict()
+    queries = [q.lower() for q in BM25_QUERIES]
+    results = []
+    for size in sizes:
+        expansions = dict(base)
+        for i in range(size - len(expansions)):
+            expansions[f"feature{i} setting" if i % 3 == 0 else f"term{i}"] = [f"synonym{i}"]
+
+        build_start = time.perf_counter()
+        matcher = QueryExpansionMatcher(expansions)
+        build_ms = (time.perf_counter() - build_start) * 1000
+        assert all(matcher.expansion_terms(q) == _legacy_expansion_terms(expansions, q) for q in queries)
+
+        # The regex loop takes tens of seconds per run at 50k entries; one timed run is enough
+        slow = size > 10000
+        legacy = benchmark(
+            lambda: [_legacy_expansion_terms(expansions, q) for q in queries],
+            iterations=1 if slow else iterations,
+            warmup=0 if slow else 1,
+        )
+        legacy.name = f"query_expansion_regex_loop_{size}"
+        compiled = benchmark(lambda: [matcher.expansion_terms(q) for q in queries], iterations=iterations, warmup=1)
+        compiled.name = f"query_expansion_compiled_{size}"
+        for r in (legacy, compiled):
+            r.set_metadata(entries=len(expansions), queries_per_run=len(queries))
+        compiled.set_metadata(
+            build_once_ms=round(build_ms, 2),
+            speedup_vs_regex=round(mean(legacy.latencies) / max(mean(compiled.latencies), 1e-9), 1),
+        )
+        results.extend([legacy, compiled])
+    return results
+
+
+# ====== METRICS BENCHMARKS ======
+class _LegacyMetrics:
+    """Single RLock, raw sample lists trimmed to max_history, sort per read (baseline only)."""
+
+    def __init__(self, max_history=10000):
+        self._lock = threading.RLock()
+        self._max_history = max_history
+        self._counters = {}
+        self._histo = {}
+
+    def increment_counter(self, name, value=1.0, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + float(value)
+
+    def observe_histogram(self, name, value, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            bucket = self._histo.setdefault(key, [])
+            bucket.append(float(value))
+            if len(bucket) > self._max_history:
+                del bucket[0 : len(bucket) - self._max_history]
+
+    def get_snapshot(self):
+        with self._lock:
+            return {key: sorted(values) for key, values in self._histo.items()}
+
+
+def benchmark_metrics_contention(threads=64, queries_per_thread=500, scrape_interval=0.05, iterations=3):
+    """Per-query metric recording from many threads, with a concurrent scraper: global lock vs per-thread shards."""
+    from clockify_rag.metrics import MetricNames, MetricsCollector
+
+    histograms = (MetricNames.QUERY_LATENCY, MetricNames.RETRIEVAL_LATENCY, MetricNames.LLM_LATENCY)
+    rng = np.random.default_rng(0)
+    latencies = rng.lognormal(mean=5.0, sigma=1.0, size=4096).tolist()
+
+    def run(collector):
+        barrier = threading.Barrier(threads + 1)
+        done = threading.Event()
+        scrape_ms = []
+
+        def worker(t):
+            barrier.wait()
+            for i in range(queries_per_thread):
+                v = latencies[(t * queries_per_thread + i) % len(latencies)]
+                collector.increment_counter(MetricNames.QUERIES_TOTAL)
+                for name in histograms:
+                    collector.observe_histogram(name, v)
+                collector.increment_counter(MetricNames.CACHE_MISSES)
+
+        def scraper():
+            barrier.wait()
+            while not done.wait(scrape_interval):
+                start = time.perf_counter()
+                collector.get_snapshot()
+                scrape_ms.append((time.perf_counter() - start) * 1000)
+
+        pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        scrape_thread = threading.Thread(target=scraper)
+        for th in pool + [scrape_thread]:
+            th.start()
+        for th in pool:
+            th.join()
+        done.set()
+        scrape_thread.join()
+        return scrape_ms
+
+    def fresh(factory):
+        collector = factory()
+        for name in histograms:  # steady state: histories already at max_history
+            for v in latencies * 3:
+                collector.observe_histogram(name, v)
+        return collector
+
+    results = []
+    for label, factory in (("global_lock", _LegacyMetrics), ("sharded", MetricsCollector)):
+        collectors = [fresh(factory) for _ in range(iterations + 1)]
+        scrape_ms = []
+        result = benchmark(lambda: scrape_ms.extend(run(collectors.pop())), iterations=iterations, warmup=1)
+        result.name = f"metrics_contention_{label}_{threads}_threads"
+        ops = threads * queries_per_thread * (len(histograms) + 2)
+        result.set_metadata(
+            threads=threads,
+            metric_ops_per_run=ops,
+            ops_per_sec=round(ops / (mean(result.latencies) / 1000), 0),
+            scrapes=len(scrape_ms),
+            scrape_ms_median=round(median(scrape_ms), 2) if scrape_ms else None,
+        )
+        results.append(result)
+    return results
+
+
+# ====== BATCH RETRIEVAL BENCHMARKS ======
+def benchmark_retrieve_batch(chunks, batch_sizes=(1, 16, 128, 1024), factor=10, iterations=3):
+    """Compare a loop of retrieve() calls against one retrieve_batch() call per batch size.
+
+    Exact (linear) dense path over the corpus repeated ``factor`` times, with random
+    unit vectors for chunks and queries. Query vectors are passed in, so both sides
+    time retrieval only (the single batched embedding call is not measured here).
+    """
+    from clockify_rag.retrieval import retrieve_batch
+
+    scaled = [{**c, "id": f"{c['id']}-{rep}"} for rep in range(factor) for c in chunks]
+    rng = np.random.default_rng(0)
+    vecs_n = rng.standard_normal((len(scaled), EMB_DIM)).astype(np.float32)
+    vecs_n /= np.linalg.norm(vecs_n, axis=1, keepdims=True)
+    bm = build_bm25(scaled)
+    titles = [c.get("title") or "" for c in chunks]
+
+    results = []
+    original_ann = clockify_rag.config.USE_ANN
+    clockify_rag.config.USE_ANN = "none"
+    try:
+        for size in batch_sizes:
+            questions = [f"{BM25_QUERIES[i % len(BM25_QUERIES)]} {titles[i % len(titles)]}" for i in range(size)]
+            query_vecs = rng.standard_normal((size, EMB_DIM)).astype(np.float32)
+            query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True)
+
+            def run_loop():
+                for question, qv in zip(questions, query_vecs):
+                    retrieve(question, scaled, vecs_n, bm, top_k=12, query_vector=qv)
+
+            def run_batch():
+                retrieve_batch(questions, scaled, vecs_n, bm, top_k=12, query_vectors=query_vecs)
+
+            # Timed by hand: tracemalloc in benchmark() traces every per-query Python
+            # allocation and would dominate both sides.
+            loop, batch = BenchmarkResult(f"retrieve_loop_b{size}"), BenchmarkResult(f"retrieve_batch_b{size}")
+            for result, fn in ((loop, run_loop), (batch, run_batch)):
+                fn()  # warmup
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    fn()
+                    result.add_latency((time.perf_counter() - start) * 1000)
+            loop_qps = size / (mean(loop.latencies) / 1000)
+            loop.set_metadata(queries=size, chunks=len(scaled), queries_per_sec=round(loop_qps, 1))
+            batch_qps = size / (mean(batch.latencies) / 1000)
+            batch.set_metadata(
+                queries=size,
+                chunks=len(scaled),
+                queries_per_sec=round(batch_qps, 1),
+                speedup_vs_loop=round(batch_qps / max(loop_qps, 1e-9), 2),
+            )
+            results.extend([loop, batch])
+    finally:
+        clockify_rag.config.USE_ANN = original_ann
+    return results
+
+
+# ====== BM25 BENCHMARKS ======
+def _legacy_bm25_scores(query, bm, k1=1.2, b=0.65):
+    """Pre-inverted-index BM25: scan every per-document tf dict (baseline only)."""
+    q = tokenize(query)
+    idf, avgdl, doc_lens = bm["idf"], bm["avgdl"], bm["doc_lens"]
+    scores = np.zeros(len(doc_lens), dtype="float32")
+    for i, tf in enumerate(bm["doc_tfs"]):
+        dl = doc_lens[i]
+        s = 0.0
+        for w in q:
+            if w not in idf:
+                continue
+            f = tf.get(w, 0)
+            if f == 0:
+                continue
+            denom = f + k1 * (1 - b + b * dl / max(1.0, avgdl))
+            s += idf[w] * (f * (k1 + 1)) / denom
+        scores[i] = s
+    return scores
+
+
+BM25_QUERIES = [
+    "How do I track time in Clockify?",
+    "export detailed report as pdf",
+    "invite team members and assign workspace roles",
+    "lock timesheets approval",
+]
+
+
+def benchmark_bm25_scaling(chunks, factors=(1, 10, 100), iterations=5):
+    """Compare dict-scan BM25 against the inverted index at growing corpus sizes."""
+    results = []
+    for factor in factors:
+        scaled = [{"id": f"{c['id']}-{rep}", "text": c["text"]} for rep in range(factor) for c in chunks]
+        bm = build_bm25(scaled)
+
+        def run_legacy():
+            for q in BM25_QUERIES:
+                _legacy_bm25_scores(q, bm)
+
+        def run_postings():
+            for q in BM25_QUERIES:
+                bm25_scores(q, bm, k1=1.2, b=0.65)
+
+        legacy = benchmark(run_legacy, iterations=iterations, warmup=1)
+        legacy.name = f"bm25_dict_scan_x{factor}"
+        legacy.set_metadata(docs=len(scaled), queries=len(BM25_QUERIES))
+        postings = benchmark(run_postings, iterations=iterations, warmup=1)
+        postings.name = f"bm25_postings_x{factor}"
+        speedup = mean(legacy.latencies) / max(mean(postings.latencies), 1e-9)
+        postings.set_metadata(docs=len(scaled), queries=len(BM25_QUERIES), speedup_vs_dict_scan=round(speedup, 1))
+        results.extend([legacy, postings])
+    return results
+
+
+# Runs in a fresh interpreter so each sample is a true cold start. RSS is read
+# before and after loading; the first query shows the cost of faulting pages in.
+_BM25_LOAD_PROBE = """
+import json, sys, time
+from clockify_rag.indexing import BM25Index, bm25_scores, load_bm25_binary
+
+def rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+fmt, path, query = sys.argv[1:4]
+before = rss()
+t0 = time.perf_counter()
+if fmt == "json":
+    with open(path, encoding="utf-8") as f:
+        bm = BM25Index(json.load(f))
+else:
+    bm = load_bm25_binary(path)
+load_ms = (time.perf_counter() - t0) * 1000
+after_load = rss()
+t0 = time.perf_counter()
+bm25_scores(query, bm, top_k=36)
+query_ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({"load_ms": load_ms, "query_ms": query_ms,
+                  "rss_load": after_load - before, "rss_query": rss() - before}))
+"""
+
+
+def benchmark_bm25_load_formats(chunks, factors=(1, 10), iterations=3):
+    """Cold-start load time and RSS of bm25.json versus the memory-mapped artifact."""
+    results = []
+    repo_root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])))
+    for factor in factors:
+        scaled = [{"id": f"{c['id']}-{rep}", "text": c["text"]} for rep in range(factor) for c in chunks]
+        bm = build_bm25(scaled)
+        with tempfile.TemporaryDirectory(prefix="bm25-load-") as tmp:
+            paths = {"json": os.path.join(tmp, "bm25.json"), "npy_mmap": os.path.join(tmp, "bm25_index")}
+            export_bm25_json(bm, paths["json"])
+            save_bm25_binary(bm, paths["npy_mmap"])
+            for fmt, path in paths.items():
+                samples = []
+                for _ in range(iterations):
+                    proc = subprocess.run(
+                        [sys.executable, "-c", _BM25_LOAD_PROBE, "json" if fmt == "json" else "npy", path,
+                         BM25_QUERIES[0]],
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                        env=env,
+                    )
+                    samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+                result = BenchmarkResult(f"bm25_load_{fmt}_x{factor}")
+                for sample in samples:
+                    result.add_latency(sample["load_ms"])
+                rss_load = max(s["rss_load"] for s in samples)
+                result.set_memory(max(s["rss_query"] for s in samples), rss_load)
+                if os.path.isdir(path):
+                    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+                else:
+                    size = os.path.getsize(path)
+                result.set_metadata(
+                    docs=len(scaled),
+                    disk_mb=round(size / 1024 / 1024, 2),
+                    rss_after_load_mb=round(rss_load / 1024 / 1024, 2),
+                    first_query_ms=round(mean(s["query_ms"] for s in samples), 2),
+                )
+                results.append(result)
+    return results
+
+
+# Each worker loads the matrix, faults every page in, reports its memory and then
+# blocks on stdin so all workers are alive together (PSS/USS split shared pages).
+_EMB_WORKER_PROBE = """
+import json, sys, time
+import numpy as np
+from clockify_rag.indexing import load_embeddings
+
+path, mode = sys.argv[1:3]
+t0 = time.perf_counter()
+vecs = load_embeddings(path, mmap=(mode == "mmap"))
+load_ms = (time.perf_counter() - t0) * 1000
+float(np.asarray(vecs).sum())
+try:
+    import psutil
+    info = psutil.Process().memory_full_info()
+    report = {"rss": info.rss, "uss": getattr(info, "uss", info.rss), "pss": getattr(info, "pss", info.rss)}
+except ImportError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    report = {"rss": rss, "uss": rss, "pss": rss}
+report["load_ms"] = load_ms
+print(json.dumps(report), flush=True)
+sys.stdin.read()
+"""
+
+
+def benchmark_embedding_rss_per_worker(rows=50000, dim=768, workers=4):
+    """Per-worker memory with a private vecs_n copy versus a shared read-only memmap."""
+    results = []
+    repo_root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])))
+    vecs = np.random.default_rng(0).standard_normal((rows, dim)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    with tempfile.TemporaryDirectory(prefix="emb-mmap-") as tmp:
+        path = os.path.join(tmp, "vecs_n.npy")
+        atomic_save_npy(vecs, path)
+        for mode in ("copy", "mmap"):
+            procs = [
+                subprocess.Popen(
+                    [sys.executable, "-c", _EMB_WORKER_PROBE, path, mode],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                    env=env,
+                )
+                for _ in range(workers)
+            ]
+            try:
+                reports = [json.loads(proc.stdout.readline()) for proc in procs]
+            finally:
+                for proc in procs:
+                    proc.communicate()
+            result = BenchmarkResult(f"emb_rss_per_worker_{mode}")
+            for r in reports:
+                result.add_latency(r["load_ms"])
+            pss = [r["pss"] for r in reports]
+            result.set_memory(max(r["rss"] for r in reports), int(mean(pss)))
+            result.set_metadata(
+                workers=workers,
+                matrix_mb=round(vecs.nbytes / 1024 / 1024, 2),
+                rss_per_worker_mb=round(mean(r["rss"] for r in reports) / 1024 / 1024, 2),
+                pss_per_worker_mb=round(mean(pss) / 1024 / 1024, 2),
+                uss_per_worker_mb=round(mean(r["uss"] for r in reports) / 1024 / 1024, 2),
+                total_pss_mb=round(sum(pss) / 1024 / 1024, 2),
+            )
+            results.append(result)
+    return results
+
+
 def benchmark_chunking(md_path, iterations=5):
     """Benchmark chunking performance."""
 
@@ -338,9 +1411,60 @@ def benchmark_chunking(md_path, iterations=5):
 def main():
     parser = argparse.ArgumentParser(description="Benchmark Clockify RAG CLI")
     parser.add_argument("--quick", action="store_true", help="Quick benchmark (fewer iterations)")
-    parser.add_argument("--embedding", action="store_true", help="Only embedding benchmarks")
+    parser.add_argument(
+        "--embedding",
+        action="store_true",
+        help="Only embedding request benchmarks (per-text vs batched /api/embed against a local stub server)",
+    )
     parser.add_argument("--retrieval", action="store_true", help="Only retrieval benchmarks")
     parser.add_argument("--e2e", action="store_true", help="Only end-to-end benchmarks")
+    parser.add_argument("--bm25", action="store_true", help="Only BM25 scaling and cold-start load benchmarks (10x/100x corpus)")
+    parser.add_argument("--mmap", action="store_true", help="Only embedding RSS-per-worker benchmark (copy vs mmap)")
+    parser.add_argument(
+        "--async-pipeline",
+        action="store_true",
+        help="Only query concurrency benchmark: thread-pool vs async pipeline against a slow stub Ollama",
+    )
+    parser.add_argument(
+        "--llm-gateway",
+        action="store_true",
+        help="Only LLM gateway benchmark: overload burst against a saturated stub Ollama, gateway off vs on",
+    )
+    parser.add_argument(
+        "--rerank",
+        action="store_true",
+        help="Only rerank benchmark: latency and eval-set MRR@10 for the none / llm / cross_encoder backends",
+    )
+    parser.add_argument(
+        "--features",
+        action="store_true",
+        help="Only per-query chunk-feature benchmark: Python loops vs precomputed arrays (10x/100x corpus)",
+    )
+    parser.add_argument(
+        "--mmr",
+        action="store_true",
+        help="Only MMR benchmark: pack_top 6..50 over candidate pools up to 500 (synthetic vectors)",
+    )
+    parser.add_argument(
+        "--packing",
+        action="store_true",
+        help="Only context-packing benchmark: per-chunk recounting vs additive token units at num_ctx=32768",
+    )
+    parser.add_argument(
+        "--expansion",
+        action="store_true",
+        help="Only query expansion benchmark: per-term regex loop vs compiled matcher (1k/50k entries)",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Only metrics contention benchmark: global-lock sample lists vs sharded log histograms (64 threads)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Only batched retrieval benchmark: retrieve() loop vs retrieve_batch() at batch sizes 1..1024",
+    )
     parser.add_argument("--output", default="benchmark_results.json", help="Output JSON file")
     args = parser.parse_args()
 
@@ -354,6 +1478,60 @@ def main():
     print(f"Mode: {'Quick' if args.quick else 'Full'}")
     print()
 
+    if args.bm25:
+        run_bm25_only(args)
+        return
+
+    if args.embedding:
+        run_embedding_only(args)
+        return
+
+    if args.async_pipeline:
+        run_async_pipeline_only(args)
+        return
+
+    if args.llm_gateway:
+        run_llm_gateway_only(args)
+        return
+
+    if args.rerank:
+        run_rerank_only(args)
+        return
+
+    if args.features:
+        run_features_only(args)
+        return
+
+    if args.mmr:
+        run_mmr_only(args)
+        return
+
+    if args.packing:
+        run_packing_only(args)
+        return
+
+    if args.expansion:
+        run_expansion_only(args)
+        return
+
+    if args.metrics:
+        run_metrics_only(args)
+        return
+
+    if args.batch:
+        run_batch_only(args)
+        return
+
+    if args.mmap:
+        print("--- Embedding Memory Benchmarks (RSS per worker) ---")
+        rows = 10000 if args.quick else 50000
+        results = benchmark_embedding_rss_per_worker(rows=rows, dim=EMB_DIM)
+        for r in results:
+            print(f"✅ {r.name}: {r.metadata['pss_per_worker_mb']:.2f}MB PSS/worker")
+        print()
+        report_results(results, args)
+        return
+
     # Load index
     print("[1/2] Loading index...")
     result = load_index()
@@ -424,7 +1602,168 @@ def main():
             print(f"✅ {results[-1].name}: {results[-1].summary()['latency_ms']['mean']:.2f}ms")
             print()
 
-    # Summary
+    report_results(results, args)
+
+
+def run_bm25_only(args):
+    """Run BM25 scaling benchmarks straight from the corpus (no built index needed)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    chunks = build_chunks(kb_path)
+    print(f"--- BM25 Scaling Benchmarks ({len(chunks)} base chunks) ---")
+    factors = (1, 10) if args.quick else (1, 10, 100)
+    results = benchmark_bm25_scaling(chunks, factors=factors, iterations=3 if args.quick else 5)
+    results += benchmark_bm25_load_formats(chunks, factors=factors, iterations=3 if args.quick else 5)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.2f}ms")
+    print()
+    report_results(results, args)
+
+
+def run_embedding_only(args):
+    """Embed the whole corpus against a local stub server (no index or Ollama needed)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    texts = [c["text"] for c in build_chunks(kb_path)]
+    print(f"--- Embedding Request Benchmarks ({len(texts)} chunks, stub server) ---")
+    results = benchmark_embedding_request_batching(texts, iterations=2 if args.quick else 3)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.2f}ms ({r.metadata['requests_per_run']} requests)")
+    print()
+    report_results(results, args)
+
+
+def run_async_pipeline_only(args):
+    """Burst concurrent queries through both pipelines against a local stub Ollama."""
+    queries = 100 if args.quick else 200
+    print(f"--- Query Pipeline Concurrency ({queries} concurrent queries, stub Ollama) ---")
+    results = benchmark_query_pipeline_concurrency(queries=queries)
+    for r in results:
+        m = r.metadata
+        print(f"✅ {r.name}: {m['max_in_flight_llm']} in flight, {m['wall_ms']:.0f}ms, {m['peak_threads']} threads")
+    print()
+    report_results(results, args)
+
+
+def run_llm_gateway_only(args):
+    """Overload a stub Ollama with and without the LLM gateway in front of it."""
+    callers = 32 if args.quick else 64
+    print(f"--- LLM Gateway ({callers} concurrent chats, stub Ollama generating 4 at a time) ---")
+    results = benchmark_llm_gateway(callers=callers)
+    for r in results:
+        lat, m = r.summary()["latency_ms"], r.metadata
+        shed = f"shed {m['shed']}" + (f" within {m['max_shed_ms']}ms" if m["shed"] else "")
+        print(
+            f"✅ {r.name}: served {m['served']} (median {lat['median']:.0f}ms, max {lat['max']:.0f}ms), "
+            f"{shed}, {m['max_in_flight_llm']} in flight"
+        )
+    print()
+    report_results(results, args)
+
+
+def run_rerank_only(args):
+    """Rerank each eval question's BM25 candidates with every backend (corpus only, no built index)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    chunks = build_chunks(kb_path)
+    chat_ms = 200.0 if args.quick else 500.0
+    print(f"--- Rerank Benchmarks (eval set, 12 BM25 candidates, stub LLM {chat_ms:.0f}ms) ---")
+    results = benchmark_rerank(chunks, chat_ms=chat_ms)
+    for r in results:
+        lat, m = r.summary()["latency_ms"], r.metadata
+        print(f"✅ {r.name}: median {lat['median']:.2f}ms, p95 {lat['p95']:.2f}ms, MRR@10 {m['mrr_at_10']:.3f}")
+    print()
+    report_results(results, args)
+
+
+def run_features_only(args):
+    """Time the per-query chunk-feature work straight from the corpus (no built index needed)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    chunks = build_chunks(kb_path)
+    print(f"--- Chunk Feature Benchmarks ({len(chunks)} base chunks) ---")
+    factors = (1, 10) if args.quick else (1, 10, 100)
+    results = benchmark_chunk_features(chunks, factors=factors, iterations=3 if args.quick else 5)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.2f}ms")
+    print()
+    report_results(results, args)
+
+
+def run_mmr_only(args):
+    """Time MMR diversification on synthetic embeddings (no corpus or index needed)."""
+    queries = 8 if args.quick else 32
+    print(f"--- MMR Benchmarks ({queries} queries per run, dim={EMB_DIM}) ---")
+    results = benchmark_mmr(queries=queries, iterations=3 if args.quick else 5)
+    for r in results:
+        m = r.metadata
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.2f}ms ({m['speedup_vs_recompute']}x)")
+    print()
+    report_results(results, args)
+
+
+def run_packing_only(args):
+    """Time pack_snippets on corpus chunks grouped into long articles (no built index needed)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    chunks = build_chunks(kb_path)
+    print(f"--- Context Packing Benchmarks (num_ctx=32768, {len(chunks)} source chunks) ---")
+    results = benchmark_packing(chunks, iterations=3 if args.quick else 5)
+    for r in results:
+        m = r.metadata
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.2f}ms ({m['speedup_vs_recount']}x)")
+    print()
+    report_results(results, args)
+
+
+def run_expansion_only(args):
+    """Time query expansion matching against synthetic large dictionaries (no index needed)."""
+    print("--- Query Expansion Benchmarks (1k / 50k entries) ---")
+    results = benchmark_query_expansion(iterations=3 if args.quick else 5)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.3f}ms")
+    print()
+    report_results(results, args)
+
+
+def run_metrics_only(args):
+    """Time metric recording from 64 threads with a concurrent scraper (no index needed)."""
+    print("--- Metrics Contention Benchmarks (64 threads) ---")
+    results = benchmark_metrics_contention(queries_per_thread=250 if args.quick else 500)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.1f}ms ({r.metadata['ops_per_sec']:.0f} ops/s)")
+    print()
+    report_results(results, args)
+
+
+def run_batch_only(args):
+    """Time batched vs per-question retrieval on the corpus with synthetic vectors (no built index needed)."""
+    kb_path, exists, candidates = resolve_corpus_path()
+    if not exists:
+        print(f"❌ Corpus not found. Looked for: {', '.join(candidates)}")
+        sys.exit(1)
+    chunks = build_chunks(kb_path)
+    batch_sizes = (1, 16, 128) if args.quick else (1, 16, 128, 1024)
+    print(f"--- Batch Retrieval Benchmarks ({len(chunks)} base chunks x10) ---")
+    results = benchmark_retrieve_batch(chunks, batch_sizes=batch_sizes, iterations=2 if args.quick else 3)
+    for r in results:
+        print(f"✅ {r.name}: {r.summary()['latency_ms']['mean']:.1f}ms ({r.metadata['queries_per_sec']:.0f} q/s)")
+    print()
+    report_results(results, args)
+
+
+def report_results(results, args):
+    """Print a summary table and save results as JSON."""
     print("=" * 70)
     print("BENCHMARK RESULTS")
     print("=" * 70)
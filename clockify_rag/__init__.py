@@ -36,10 +36,30 @@ from .chunking import parse_articles, build_chunks, sliding_chunks
 from .embedding import embed_texts, embed_local_batch, validate_ollama_embeddings
 
 # Indexing
-from .indexing import build, load_index, build_bm25, bm25_scores, build_faiss_index
+from .indexing import (
+    build,
+    load_index,
+    build_bm25,
+    bm25_scores,
+    build_faiss_index,
+    save_bm25_binary,
+    load_bm25_binary,
+    export_bm25_json,
+)
+from .incremental import build_incremental
+from .generations import IndexSnapshot, active_files, current_generation
 
 # Caching
-from .caching import QueryCache, RateLimiter, get_query_cache, get_rate_limiter
+from .caching import (
+    QueryCache,
+    QueryEmbeddingCache,
+    RateLimiter,
+    SemanticAnswerCache,
+    get_query_cache,
+    get_query_embedding_cache,
+    get_rate_limiter,
+    get_semantic_answer_cache,
+)
 
 # Retrieval
 from .retrieval import (
@@ -47,8 +67,11 @@ from .retrieval import (
     embed_query,
     normalize_scores_zscore,
     DenseScoreStore,
+    SparseScores,
     retrieve,
+    retrieve_batch,
     rerank_with_llm,
+    rerank_with_cross_encoder,
     pack_snippets,
     derive_role_security_hints,
     coverage_ok,
@@ -63,6 +86,7 @@ from .metrics import (
     MetricsCollector,
     MetricSnapshot,
     AggregatedMetrics,
+    LogHistogram,
     get_metrics,
     increment_counter,
     set_gauge,
@@ -71,9 +95,19 @@ from .metrics import (
     MetricNames,
 )
 
+# LLM gateway (admission control for generations)
+from .llm_gateway import (
+    LLMGateway,
+    get_llm_gateway,
+    llm_priority,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND,
+)
+
 # Answer generation
 from .answer import (
     apply_mmr_diversification,
+    apply_mmr_diversification_batch,
     apply_reranking,
     extract_citations,
     validate_citations,
@@ -144,22 +178,36 @@ __all__ = [
     "validate_ollama_embeddings",
     # Indexing
     "build",
+    "build_incremental",
+    "IndexSnapshot",
+    "active_files",
+    "current_generation",
     "load_index",
     "build_bm25",
     "bm25_scores",
+    "save_bm25_binary",
+    "load_bm25_binary",
+    "export_bm25_json",
     "build_faiss_index",
     # Caching
     "QueryCache",
+    "QueryEmbeddingCache",
     "RateLimiter",
+    "SemanticAnswerCache",
     "get_query_cache",
+    "get_query_embedding_cache",
     "get_rate_limiter",
+    "get_semantic_answer_cache",
     # Retrieval
     "expand_query",
     "embed_query",
     "normalize_scores_zscore",
     "DenseScoreStore",
+    "SparseScores",
     "retrieve",
+    "retrieve_batch",
     "rerank_with_llm",
+    "rerank_with_cross_encoder",
     "pack_snippets",
     "derive_role_security_hints",
     "coverage_ok",
@@ -171,14 +219,22 @@ __all__ = [
     "MetricsCollector",
     "MetricSnapshot",
     "AggregatedMetrics",
+    "LogHistogram",
     "get_metrics",
     "increment_counter",
     "set_gauge",
     "observe_histogram",
     "time_operation",
     "MetricNames",
+    # LLM gateway
+    "LLMGateway",
+    "get_llm_gateway",
+    "llm_priority",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_BACKGROUND",
     # Answer generation
     "apply_mmr_diversification",
+    "apply_mmr_diversification_batch",
     "apply_reranking",
     "extract_citations",
     "validate_citations",
@@ -15,8 +15,10 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
+import re
 import time
-from typing import Dict, List, Tuple, Optional, Any
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple, Optional, Any
 
 import numpy as np
 
@@ -38,14 +40,18 @@ from .config import (
 from .retrieval import (
     retrieve,
     rerank_with_llm,
+    rerank_with_cross_encoder,
     pack_snippets,
     coverage_ok,
     ask_llm,
+    ask_llm_stream,
 )
-from .exceptions import LLMError, LLMUnavailableError
+from .exceptions import LLMError, LLMOverloadedError, LLMUnavailableError
+from . import config
 from .confidence_routing import get_routing_action
 from .metrics import MetricNames
 from . import metrics as metrics_module
+from .tracing import span, traced
 from .utils import sanitize_for_log
 
 logger = logging.getLogger(__name__)
@@ -153,6 +159,151 @@ def parse_qwen_json(raw_text: str) -> Dict[str, Any]:
     }
 
 
+class AnswerStreamFilter:
+    """Incrementally extract the ``answer`` string from streamed Qwen JSON output.
+
+    The structured prompt makes the LLM emit a JSON object; clients streaming
+    the reply only want the answer text. ``feed`` takes raw output pieces and
+    returns the newly decoded characters of the ``answer`` value (JSON escapes
+    resolved). Output that does not start like JSON (``{`` or a code fence) is
+    passed through unchanged. The final, authoritative answer still comes from
+    :func:`parse_qwen_json` once generation is complete.
+    """
+
+    _KEY = re.compile(r'"answer"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._mode = "detect"  # detect -> json -> answer -> done, or passthrough
+
+    def feed(self, piece: str) -> str:
+        if self._mode == "passthrough":
+            return piece
+        if self._mode == "done":
+            return ""
+        self._buf += piece
+        if self._mode == "detect":
+            head = self._buf.lstrip()
+            if not head:
+                return ""
+            if head[0] not in "{`":
+                self._mode = "passthrough"
+                out, self._buf = self._buf, ""
+                return out
+            self._mode = "json"
+        if self._mode == "json":
+            match = self._KEY.search(self._buf)
+            if not match:
+                return ""
+            self._buf = self._buf[match.end() :]
+            self._mode = "answer"
+        return self._decode()
+
+    def _decode(self) -> str:
+        out: List[str] = []
+        buf, i = self._buf, 0
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._mode = "done"
+                i = len(buf)
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break  # escape split across pieces
+            code = buf[i + 1]
+            if code != "u":
+                out.append(self._ESCAPES.get(code, code))
+                i += 2
+                continue
+            # \uXXXX, or a surrogate pair \uD83D\uDE00
+            end = i + 6
+            if end > len(buf):
+                break
+            if 0xD800 <= int(buf[i + 2 : end], 16) <= 0xDBFF:
+                end = i + 12
+                if end > len(buf):
+                    break
+            try:
+                out.append(json.loads(f'"{buf[i:end]}"'))
+            except ValueError:
+                pass
+            i = end
+        self._buf = buf[i:]
+        return "".join(out)
+
+
+def _gather_scores(scores: Any, idx: np.ndarray) -> np.ndarray:
+    """Scores at ``idx`` in one vectorised gather (ndarray, DenseScoreStore or SparseScores)."""
+    take = getattr(scores, "take", None)
+    if take is not None:
+        return np.asarray(take(idx), dtype=np.float32)
+    return np.asarray(scores, dtype=np.float32)[idx]
+
+
+def mmr_select_batch(
+    relevance: np.ndarray,
+    cand_vecs: np.ndarray,
+    pack_top: int,
+    valid: Optional[np.ndarray] = None,
+    mmr_lambda: float = MMR_LAMBDA,
+) -> List[List[int]]:
+    """Maximal Marginal Relevance over a batch of candidate pools.
+
+    The most relevant candidate of each pool is taken first; every later pick
+    maximises ``mmr_lambda * relevance - (1 - mmr_lambda) * max_sim``, where
+    ``max_sim`` (similarity to the closest pick so far) is kept as a running
+    maximum updated with one matrix-vector product per pick.
+
+    Args:
+        relevance: (Q, C) relevance score per candidate
+        cand_vecs: (Q, C, dim) normalized candidate embeddings
+        pack_top: Maximum number of picks per pool
+        valid: Optional (Q, C) mask of real candidates when pools are padded to C
+        mmr_lambda: Relevance/diversity trade-off
+
+    Returns:
+        Picked candidate positions per pool, in selection order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    cand_vecs = np.asarray(cand_vecs, dtype=np.float32)
+    n_pools, n_cand = relevance.shape
+    picks: List[List[int]] = [[] for _ in range(n_pools)]
+    if not n_cand:
+        return picks
+
+    remaining = np.ones((n_pools, n_cand), dtype=bool) if valid is None else np.array(valid, dtype=bool)
+    rows = np.arange(n_pools)
+    weighted = mmr_lambda * relevance
+    max_sim = np.empty_like(relevance)
+    mmr = relevance.copy()  # first pick: pure relevance
+    for step in range(min(max(pack_top, 1), n_cand)):
+        if step:
+            np.multiply(max_sim, 1 - mmr_lambda, out=mmr)
+            np.subtract(weighted, mmr, out=mmr)
+        mmr[~remaining] = -np.inf
+        best = mmr.argmax(axis=1)
+        live = remaining[rows, best]
+        if not live.any():
+            break
+        for pool, (pos, is_live) in enumerate(zip(best.tolist(), live.tolist())):
+            if is_live:
+                picks[pool].append(pos)
+        remaining[rows, best] = False
+
+        sims = np.matmul(cand_vecs, cand_vecs[rows, best][:, :, None])[..., 0]
+        if step:
+            np.maximum(max_sim, sims, out=max_sim)
+        else:
+            max_sim[:] = sims
+    return picks
+
+
+@traced("mmr")
 def apply_mmr_diversification(
     selected: List[int], scores: Dict[str, Any], vecs_n: np.ndarray, pack_top: int
 ) -> List[int]:
@@ -165,57 +316,38 @@ def apply_mmr_diversification(
         pack_top: Maximum number of chunks to select
 
     Returns:
-        List of diversified chunk indices
+        List of diversified chunk indices (the top dense score always comes first)
     """
-    mmr_selected = []
-    cand = list(selected)
-
-    # Always include the top dense score first for better recall
-    if cand:
-        top_dense_idx = max(cand, key=lambda j: scores["dense"][j])
-        mmr_selected.append(top_dense_idx)
-        cand.remove(top_dense_idx)
-
-    # Then diversify the rest using vectorized MMR
-    if cand and len(mmr_selected) < pack_top:
-        # Convert to numpy arrays for vectorized operations
-        cand_array = np.array(cand, dtype=np.int32)
-        relevance_scores = np.array([scores["dense"][j] for j in cand], dtype=np.float32)
-
-        # Get embedding vectors for candidates
-        cand_vecs = vecs_n[cand_array]  # [num_candidates, emb_dim]
-
-        # Iteratively select using MMR
-        remaining_mask = np.ones(len(cand_array), dtype=bool)
-
-        while np.any(remaining_mask) and len(mmr_selected) < pack_top:
-            # Compute MMR scores for remaining candidates
-            mmr_scores = MMR_LAMBDA * relevance_scores.copy()
-
-            if len(mmr_selected) > 0:  # Only apply diversity when we have prior selections
-                # Get vectors of all already-selected items
-                selected_vecs = vecs_n[mmr_selected]  # [num_selected, emb_dim]
-
-                # Compute similarity matrix: [num_candidates, num_selected]
-                similarity_matrix = cand_vecs @ selected_vecs.T
-
-                # Get max similarity for each candidate
-                max_similarities = similarity_matrix.max(axis=1)
-
-                # Update MMR scores with diversity penalty
-                mmr_scores -= (1 - MMR_LAMBDA) * max_similarities
+    if not len(selected):
+        return []
+    cand = np.asarray(selected, dtype=np.int64)
+    relevance = _gather_scores(scores["dense"], cand)
+    picks = mmr_select_batch(relevance[None, :], vecs_n[cand][None, :, :], pack_top)[0]
+    return cand[picks].tolist()
 
-            # Mask out already-selected candidates
-            mmr_scores[~remaining_mask] = -np.inf
 
-            # Select candidate with highest MMR score
-            best_idx = mmr_scores.argmax()
-            selected_chunk_idx = cand_array[best_idx]
+def apply_mmr_diversification_batch(
+    selected_lists: List[List[int]], scores_list: List[Dict[str, Any]], vecs_n: np.ndarray, pack_top: int
+) -> List[List[int]]:
+    """:func:`apply_mmr_diversification` for many queries at once.
 
-            mmr_selected.append(int(selected_chunk_idx))
-            remaining_mask[best_idx] = False
+    Candidate pools are padded to a common size and diversified together, so
+    each selection step is a single batched product across all queries.
+    """
+    if not selected_lists:
+        return []
+    width = max(len(sel) for sel in selected_lists)
+    cand = np.zeros((len(selected_lists), width), dtype=np.int64)
+    valid = np.zeros(cand.shape, dtype=bool)
+    relevance = np.zeros(cand.shape, dtype=np.float32)
+    for row, (sel, scores) in enumerate(zip(selected_lists, scores_list)):
+        if len(sel):
+            cand[row, : len(sel)] = sel
+            valid[row, : len(sel)] = True
+            relevance[row, : len(sel)] = _gather_scores(scores["dense"], cand[row, : len(sel)])
 
-    return mmr_selected
+    picks = mmr_select_batch(relevance, vecs_n[cand], pack_top, valid=valid)
+    return [cand[row, p].tolist() for row, p in enumerate(picks)]
 
 
 def _chunk_article_key(chunk: Dict[str, Any]) -> str:
@@ -275,8 +407,9 @@ def apply_reranking(
     num_ctx: int = DEFAULT_NUM_CTX,
     num_predict: int = DEFAULT_NUM_PREDICT,
     retries: int = DEFAULT_RETRIES,
+    backend: Optional[str] = None,
 ) -> Tuple[List[int], Dict, bool, str, float]:
-    """Apply optional LLM reranking to MMR-selected chunks.
+    """Apply optional reranking to MMR-selected chunks.
 
     Args:
         question: User question
@@ -285,6 +418,7 @@ def apply_reranking(
         scores: Dict with relevance scores
         use_rerank: Whether to apply reranking
         seed, num_ctx, num_predict, retries: LLM parameters
+        backend: "none", "llm" or "cross_encoder" (default: ``RERANK_BACKEND``)
 
     Returns:
         Tuple of (reranked_chunks, rerank_scores, rerank_applied, rerank_reason, timing)
@@ -293,13 +427,26 @@ def apply_reranking(
     rerank_applied = False
     rerank_reason = "disabled"
     timing = 0.0
+    backend = backend or config.RERANK_BACKEND
 
-    if use_rerank:
-        logger.debug(json.dumps({"event": "rerank_start", "candidates": len(mmr_selected)}))
+    if use_rerank and backend != "none":
+        logger.debug(json.dumps({"event": "rerank_start", "backend": backend, "candidates": len(mmr_selected)}))
         t0 = time.time()
-        mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_llm(
-            question, chunks, mmr_selected, scores, seed=seed, num_ctx=num_ctx, num_predict=num_predict, retries=retries
-        )
+        if backend == "cross_encoder":
+            mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_cross_encoder(
+                question, chunks, mmr_selected
+            )
+        else:
+            mmr_selected, rerank_scores, rerank_applied, rerank_reason = rerank_with_llm(
+                question,
+                chunks,
+                mmr_selected,
+                scores,
+                seed=seed,
+                num_ctx=num_ctx,
+                num_predict=num_predict,
+                retries=retries,
+            )
         timing = time.time() - t0
         logger.debug(json.dumps({"event": "rerank_done", "selected": len(mmr_selected), "scored": len(rerank_scores)}))
 
@@ -385,48 +532,36 @@ def validate_citations(answer: str, valid_chunk_ids: List) -> Tuple[bool, List[s
     return is_valid, valid_citations, invalid_citations
 
 
-def generate_llm_answer(
-    question: str,
-    context_block: str,
-    seed: int = DEFAULT_SEED,
-    num_ctx: int = DEFAULT_NUM_CTX,
-    num_predict: int = DEFAULT_NUM_PREDICT,
-    retries: int = DEFAULT_RETRIES,
-    packed_ids: Optional[List] = None,
-    all_chunks: Optional[List[Dict]] = None,
-    selected_indices: Optional[List[int]] = None,
-    scores_dict: Optional[Dict[str, Any]] = None,
-    article_blocks: Optional[List[Dict[str, Any]]] = None,
-) -> Tuple[str, float, Optional[int], Optional[str], Optional[List[str]], Dict[str, Any]]:
-    """Generate answer from LLM with production-grade Qwen prompts.
+def _normalize_url(url: str) -> str:
+    base = str(url).strip()
+    if not base:
+        return ""
+    base = base.split("#")[0].rstrip("/")
+    return base.lower()
 
-    BREAKING CHANGE (v6.0): Qwen now returns structured JSON with confidence, reasoning, and sources.
-    When using new prompts (packed_chunks provided), expects JSON output from LLM.
-    Legacy prompts (no chunks) still return plain text.
 
-    Args:
-        question: User question
-        context_block: Legacy packed context string (for backward compatibility)
-        seed, num_ctx, num_predict, retries: LLM parameters
-        packed_ids: List of chunk IDs included in context (for citation validation)
-        all_chunks: Full chunk list (for extracting packed chunks)
-        selected_indices: Selected chunk indices (for confidence computation)
-        scores_dict: Score arrays from retrieval (for confidence computation)
+def _normalize_chunk_ids(seq: Optional[List]) -> List:
+    if not seq:
+        return []
+    normalized: List = []
+    for item in seq:
+        if isinstance(item, np.generic):
+            normalized.append(item.item())
+        else:
+            normalized.append(item)
+    return normalized
 
-    Returns:
-        Tuple of (answer_text, timing, confidence, reasoning, sources_used, structured_meta)
-        - answer_text: The LLM's answer (customer-ready Markdown)
-        - timing: Time taken for LLM call
-        - confidence: 0-100 score from LLM (if provided) or computed from retrieval scores
-        - reasoning: Brief explanation from LLM (if provided)
-        - sources_used: List of URLs/IDs the LLM says it used
-        - structured_meta: Dict with intent, user_role_inferred, security_sensitivity, short_intent_summary,
-          needs_human_escalation, answer_style
-    """
-    from .retrieval import compute_confidence_from_scores
 
-    t0 = time.time()
+def _llm_answer_inputs(
+    packed_ids: Optional[List],
+    all_chunks: Optional[List[Dict]],
+    article_blocks: Optional[List[Dict[str, Any]]],
+) -> Tuple[Optional[List[Dict]], bool, Dict[str, str]]:
+    """Resolve packed chunks for the prompt and the URLs the answer may cite.
 
+    Returns:
+        Tuple of (packed_chunks, structured_prompt, valid_url_map)
+    """
     # Extract packed chunks if all data is provided (new code path)
     packed_chunks = None
     structured_prompt = False
@@ -436,13 +571,6 @@ def generate_llm_answer(
         packed_chunks = [chunk_id_to_chunk[cid] for cid in packed_ids if cid in chunk_id_to_chunk]
         structured_prompt = True
 
-    def _normalize_url(url: str) -> str:
-        base = str(url).strip()
-        if not base:
-            return ""
-        base = base.split("#")[0].rstrip("/")
-        return base.lower()
-
     # Build map of valid URLs present in the provided context for source verification
     valid_url_map: dict[str, str] = {}
     if article_blocks:
@@ -457,18 +585,21 @@ def generate_llm_answer(
             norm = _normalize_url(url_val) if url_val else ""
             if norm:
                 valid_url_map.setdefault(norm, str(url_val).strip())
+    return packed_chunks, structured_prompt, valid_url_map
 
-    # Call LLM with new or legacy prompts
-    raw_response = ask_llm(
-        question,
-        context_block,
-        seed=seed,
-        num_ctx=num_ctx,
-        num_predict=num_predict,
-        retries=retries,
-        chunks=article_blocks or packed_chunks,  # None for legacy, list of dicts for new
-    ).strip()
-    timing = time.time() - t0
+
+@traced("json_parse")
+def _parse_llm_answer(
+    raw_response: str,
+    timing: float,
+    structured_prompt: bool,
+    valid_url_map: Dict[str, str],
+    packed_ids: Optional[List] = None,
+    selected_indices: Optional[List[int]] = None,
+    scores_dict: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, float, Optional[int], Optional[str], Optional[List[str]], Dict[str, Any]]:
+    """Parse, verify and score a raw LLM reply (see :func:`generate_llm_answer` for the tuple)."""
+    from .retrieval import compute_confidence_from_scores
 
     # Parse response based on prompt type
     answer = raw_response
@@ -580,89 +711,137 @@ def generate_llm_answer(
     )
 
 
-def answer_once(
+def generate_llm_answer(
     question: str,
-    chunks: List[Dict],
-    vecs_n: np.ndarray,
-    bm: Dict,
-    hnsw=None,
-    top_k: int = DEFAULT_TOP_K,
-    pack_top: int = DEFAULT_PACK_TOP,
-    threshold: float = DEFAULT_THRESHOLD,
-    use_rerank: bool = False,
+    context_block: str,
     seed: int = DEFAULT_SEED,
     num_ctx: int = DEFAULT_NUM_CTX,
     num_predict: int = DEFAULT_NUM_PREDICT,
     retries: int = DEFAULT_RETRIES,
-    faiss_index_path: Optional[str] = None,
-) -> Dict[str, Any]:
-    """Complete answer generation pipeline.
+    packed_ids: Optional[List] = None,
+    all_chunks: Optional[List[Dict]] = None,
+    selected_indices: Optional[List[int]] = None,
+    scores_dict: Optional[Dict[str, Any]] = None,
+    article_blocks: Optional[List[Dict[str, Any]]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, float, Optional[int], Optional[str], Optional[List[str]], Dict[str, Any]]:
+    """Generate answer from LLM with production-grade Qwen prompts.
+
+    BREAKING CHANGE (v6.0): Qwen now returns structured JSON with confidence, reasoning, and sources.
+    When using new prompts (packed_chunks provided), expects JSON output from LLM.
+    Legacy prompts (no chunks) still return plain text.
 
     Args:
         question: User question
-        chunks: List of all chunks
-        vecs_n: Normalized embedding vectors
-        bm: BM25 index
-        hnsw: Optional HNSW index
-        top_k: Number of candidates to retrieve
-        pack_top: Number of chunks to pack in context
-        threshold: Minimum similarity threshold
-        use_rerank: Whether to apply LLM reranking
+        context_block: Legacy packed context string (for backward compatibility)
         seed, num_ctx, num_predict, retries: LLM parameters
-        faiss_index_path: Path to FAISS index file
+        packed_ids: List of chunk IDs included in context (for citation validation)
+        all_chunks: Full chunk list (for extracting packed chunks)
+        selected_indices: Selected chunk indices (for confidence computation)
+        scores_dict: Scores from retrieval (for confidence computation); 'hybrid' may be SparseScores
+        on_token: Stream the LLM reply and call this with answer text as it is generated
+            (JSON output is filtered down to the ``answer`` field)
 
     Returns:
-        Dict with answer and metadata
+        Tuple of (answer_text, timing, confidence, reasoning, sources_used, structured_meta)
+        - answer_text: The LLM's answer (customer-ready Markdown)
+        - timing: Time taken for LLM call
+        - confidence: 0-100 score from LLM (if provided) or computed from retrieval scores
+        - reasoning: Brief explanation from LLM (if provided)
+        - sources_used: List of URLs/IDs the LLM says it used
+        - structured_meta: Dict with intent, user_role_inferred, security_sensitivity, short_intent_summary,
+          needs_human_escalation, answer_style
     """
-    t_start = time.time()
-    metrics = metrics_module.get_metrics()
+    t0 = time.time()
+    packed_chunks, structured_prompt, valid_url_map = _llm_answer_inputs(packed_ids, all_chunks, article_blocks)
 
-    def _normalize_chunk_ids(seq: Optional[List]) -> List:
-        if not seq:
-            return []
-        normalized: List = []
-        for item in seq:
-            if isinstance(item, np.generic):
-                normalized.append(item.item())
-            else:
-                normalized.append(item)
-        return normalized
-
-    metrics.increment_counter(MetricNames.QUERIES_TOTAL)
-    question_preview = sanitize_for_log(question, max_length=200)
-    question_hash = hashlib.sha256(question.encode("utf-8")).hexdigest()[:12]
-    logger.info(
-        json.dumps(
-            {
-                "event": "rag.query.start",
-                "question_hash": question_hash,
-                "question_preview": question_preview,
-                "top_k": top_k,
-                "pack_top": pack_top,
-            }
-        )
+    # Call LLM with new or legacy prompts
+    llm_kwargs: Dict[str, Any] = dict(
+        seed=seed,
+        num_ctx=num_ctx,
+        num_predict=num_predict,
+        retries=retries,
+        chunks=article_blocks or packed_chunks,  # None for legacy, list of dicts for new
     )
-
-    # Retrieve
-    t0 = time.time()
-    selected, scores = retrieve(
-        question, chunks, vecs_n, bm, top_k=top_k, hnsw=hnsw, retries=retries, faiss_index_path=faiss_index_path
+    if on_token is None:
+        raw_response = ask_llm(question, context_block, **llm_kwargs).strip()
+    else:
+        stream_filter = AnswerStreamFilter()
+        pieces: List[str] = []
+        with span("llm_http", stream=True):
+            for piece in ask_llm_stream(question, context_block, **llm_kwargs):
+                pieces.append(piece)
+                text = stream_filter.feed(piece)
+                if text:
+                    on_token(text)
+        raw_response = "".join(pieces).strip()
+    timing = time.time() - t0
+    return _parse_llm_answer(
+        raw_response, timing, structured_prompt, valid_url_map, packed_ids, selected_indices, scores_dict
     )
-    retrieve_time = time.time() - t0
 
-    # Check coverage
-    if not coverage_ok(selected, scores["dense"], threshold):
+
+@dataclass
+class _PipelineRun:
+    """Bookkeeping for one answer pipeline run.
+
+    Shared by :func:`answer_once` and ``async_support.async_answer_once`` so both
+    emit the same logs and metrics and return the same result shape.
+    """
+
+    question_hash: str
+    t_start: float = field(default_factory=time.time)
+    selected: List = field(default_factory=list)
+    retrieve_time: float = 0.0
+    mmr_selected: List = field(default_factory=list)
+    mmr_time: float = 0.0
+    rerank_time: float = 0.0
+    rerank_applied: bool = False
+    rerank_reason: str = "disabled"
+    context_block: str = ""
+    packed_ids: List = field(default_factory=list)
+    used_tokens: int = 0
+    citation_details: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def start(cls, question: str, top_k: int, pack_top: int) -> "_PipelineRun":
+        metrics_module.get_metrics().increment_counter(MetricNames.QUERIES_TOTAL)
+        run = cls(question_hash=hashlib.sha256(question.encode("utf-8")).hexdigest()[:12])
+        logger.info(
+            json.dumps(
+                {
+                    "event": "rag.query.start",
+                    "question_hash": run.question_hash,
+                    "question_preview": sanitize_for_log(question, max_length=200),
+                    "top_k": top_k,
+                    "pack_top": pack_top,
+                }
+            )
+        )
+        return run
+
+    def _timing(self, total_time: float, llm_time: float = 0.0) -> Dict[str, float]:
+        return {
+            "total_ms": total_time * 1000,
+            "retrieve_ms": self.retrieve_time * 1000,
+            "mmr_ms": self.mmr_time * 1000,
+            "rerank_ms": self.rerank_time * 1000,
+            "llm_ms": llm_time * 1000,
+        }
+
+    def coverage_refusal(self, threshold: float) -> Dict[str, Any]:
+        metrics = metrics_module.get_metrics()
         metrics.increment_counter(MetricNames.ERRORS_TOTAL, labels={"type": "coverage"})
         metrics.increment_counter(MetricNames.REFUSALS_TOTAL, labels={"reason": "coverage"})
-        total_time = time.time() - t_start
+        total_time = time.time() - self.t_start
         metrics.observe_histogram(MetricNames.QUERY_LATENCY, total_time * 1000)
-        metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, retrieve_time * 1000)
+        metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, self.retrieve_time * 1000)
         logger.warning(
             json.dumps(
                 {
                     "event": "rag.query.coverage_failure",
-                    "question_hash": question_hash,
-                    "selected": len(selected),
+                    "question_hash": self.question_hash,
+                    "selected": len(self.selected),
                     "threshold": threshold,
                 }
             )
@@ -674,45 +853,37 @@ def answer_once(
             "selected_chunks": [],
             "packed_chunks": [],
             "context_block": "",
-            "timing": {
-                "total_ms": (time.time() - t_start) * 1000,
-                "retrieve_ms": retrieve_time * 1000,
-                "mmr_ms": 0,
-                "rerank_ms": 0,
-                "llm_ms": 0,
-            },
-            "metadata": {"retrieval_count": len(selected), "coverage_check": "failed"},
+            "timing": self._timing(time.time() - self.t_start),
+            "metadata": {"retrieval_count": len(self.selected), "coverage_check": "failed"},
             "routing": get_routing_action(None, refused=True, critical=False),
         }
 
-    # Apply MMR diversification
-    t0 = time.time()
-    mmr_selected = apply_mmr_diversification(selected, scores, vecs_n, pack_top)
-    mmr_time = time.time() - t0
-
-    # Optional reranking
-    mmr_selected, rerank_scores, rerank_applied, rerank_reason, rerank_time = apply_reranking(
-        question,
-        chunks,
-        mmr_selected,
-        scores,
-        use_rerank,
-        seed=seed,
-        num_ctx=num_ctx,
-        num_predict=num_predict,
-        retries=retries,
-    )
-
-    mmr_selected = apply_diversity_limits(mmr_selected, chunks)
+    def retrieval_info(self) -> Dict[str, Any]:
+        """Payload for ``on_retrieval``: packed chunk ids, citations and timings so far."""
+        return {
+            "selected_chunk_ids": _normalize_chunk_ids(self.packed_ids),
+            "citations": self.citation_details,
+            "retrieval_count": len(self.selected),
+            "timing": {
+                "retrieve_ms": self.retrieve_time * 1000,
+                "mmr_ms": self.mmr_time * 1000,
+                "rerank_ms": self.rerank_time * 1000,
+                "elapsed_ms": (time.time() - self.t_start) * 1000,
+            },
+        }
 
-    # Pack snippets grouped by article
-    context_block, packed_ids, used_tokens, article_blocks = pack_snippets(
-        chunks, mmr_selected, pack_top=pack_top, num_ctx=num_ctx
-    )
-    citation_details = build_citation_details(chunks, packed_ids)
+    def _metadata(self) -> Dict[str, Any]:
+        return {
+            "retrieval_count": len(self.selected),
+            "packed_count": len(self.packed_ids),
+            "used_tokens": self.used_tokens,
+            "rerank_applied": self.rerank_applied,
+            "rerank_reason": self.rerank_reason,
+        }
 
-    def _llm_failure(reason: str, error: Exception) -> Dict[str, Any]:
-        total_time = time.time() - t_start
+    def llm_failure(self, reason: str, error: Exception) -> Dict[str, Any]:
+        metrics = metrics_module.get_metrics()
+        total_time = time.time() - self.t_start
         metrics.increment_counter(MetricNames.ERRORS_TOTAL, labels={"type": reason})
         metrics.increment_counter(MetricNames.REFUSALS_TOTAL, labels={"reason": reason})
         logger.error(
@@ -720,127 +891,219 @@ def answer_once(
                 {
                     "event": "rag.query.failure",
                     "reason": reason,
-                    "question_hash": question_hash,
+                    "question_hash": self.question_hash,
                     "message": str(error),
                 }
             )
         )
         metrics.observe_histogram(MetricNames.QUERY_LATENCY, total_time * 1000)
-        metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, retrieve_time * 1000)
+        metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, self.retrieve_time * 1000)
         return {
             "answer": REFUSAL_STR,
             "refused": True,
             "confidence": None,
-            "selected_chunks": _normalize_chunk_ids(selected),
-            "packed_chunks": _normalize_chunk_ids(mmr_selected),
-            "context_block": context_block,
-            "timing": {
-                "total_ms": total_time * 1000,
-                "retrieve_ms": retrieve_time * 1000,
-                "mmr_ms": mmr_time * 1000,
-                "rerank_ms": rerank_time * 1000,
-                "llm_ms": 0,
-            },
+            "selected_chunks": _normalize_chunk_ids(self.selected),
+            "packed_chunks": _normalize_chunk_ids(self.mmr_selected),
+            "context_block": self.context_block,
+            "timing": self._timing(total_time),
             "metadata": {
-                "retrieval_count": len(selected),
-                "packed_count": len(packed_ids),
-                "used_tokens": used_tokens,
-                "rerank_applied": rerank_applied,
-                "rerank_reason": rerank_reason,
+                **self._metadata(),
                 "llm_error": reason,
                 "llm_error_msg": str(error),
-                "source_chunk_ids": _normalize_chunk_ids(packed_ids),
+                "source_chunk_ids": _normalize_chunk_ids(self.packed_ids),
             },
             "routing": get_routing_action(None, refused=True, critical=True),
         }
 
+    def result(
+        self,
+        answer: str,
+        llm_time: float,
+        confidence: Optional[int],
+        reasoning: Optional[str],
+        sources_used: Optional[List[str]],
+        structured_meta: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        metrics = metrics_module.get_metrics()
+        total_time = time.time() - self.t_start
+        metrics.observe_histogram(MetricNames.QUERY_LATENCY, total_time * 1000)
+        metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, self.retrieve_time * 1000)
+        metrics.observe_histogram(MetricNames.LLM_LATENCY, llm_time * 1000)
+
+        refused = answer == REFUSAL_STR
+        if refused:
+            metrics.increment_counter(MetricNames.ERRORS_TOTAL, labels={"type": "refused"})
+            metrics.increment_counter(MetricNames.REFUSALS_TOTAL, labels={"reason": "llm"})
+        logger.info(
+            json.dumps(
+                {
+                    "event": "rag.query.complete",
+                    "question_hash": self.question_hash,
+                    "refused": refused,
+                    "selected": len(self.selected),
+                    "packed": len(self.packed_ids),
+                    "confidence": confidence,
+                    "total_ms": round(total_time * 1000, 2),
+                    "llm_ms": round(llm_time * 1000, 2),
+                }
+            )
+        )
+
+        # OPTIMIZATION (Analysis Section 9.1 #4): Confidence-based routing
+        # Auto-escalate low-confidence queries to human review
+        routing = get_routing_action(confidence, refused=refused, critical=False)
+
+        return {
+            "answer": answer,
+            "refused": refused,
+            "confidence": confidence,
+            "intent": structured_meta.get("intent"),
+            "user_role_inferred": structured_meta.get("user_role_inferred"),
+            "security_sensitivity": structured_meta.get("security_sensitivity"),
+            "short_intent_summary": structured_meta.get("short_intent_summary"),
+            "answer_style": structured_meta.get("answer_style"),
+            "needs_human_escalation": structured_meta.get("needs_human_escalation"),
+            "sources_used": sources_used,
+            "citation_details": self.citation_details,
+            "selected_chunks": _normalize_chunk_ids(self.selected),
+            "packed_chunks": _normalize_chunk_ids(self.mmr_selected),
+            "selected_chunk_ids": _normalize_chunk_ids(self.packed_ids),
+            "context_block": self.context_block,
+            "timing": self._timing(total_time, llm_time),
+            "metadata": {
+                **self._metadata(),
+                "source_chunk_ids": _normalize_chunk_ids(self.packed_ids),
+                "citation_details": self.citation_details,
+                "reasoning": reasoning,  # LLM's explanation (new JSON format)
+                "sources_used": sources_used,  # LLM's cited sources (new JSON format)
+                **structured_meta,
+            },
+            "routing": routing,  # Add routing recommendation
+        }
+
+
+@traced("answer")
+def answer_once(
+    question: str,
+    chunks: List[Dict],
+    vecs_n: np.ndarray,
+    bm: Dict,
+    hnsw=None,
+    top_k: int = DEFAULT_TOP_K,
+    pack_top: int = DEFAULT_PACK_TOP,
+    threshold: float = DEFAULT_THRESHOLD,
+    use_rerank: bool = False,
+    seed: int = DEFAULT_SEED,
+    num_ctx: int = DEFAULT_NUM_CTX,
+    num_predict: int = DEFAULT_NUM_PREDICT,
+    retries: int = DEFAULT_RETRIES,
+    faiss_index_path: Optional[str] = None,
+    faiss_index=None,
+    on_retrieval: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    retrieved: Optional[Tuple[List[int], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Complete answer generation pipeline.
+
+    Args:
+        question: User question
+        chunks: List of all chunks
+        vecs_n: Normalized embedding vectors
+        bm: BM25 index
+        hnsw: Optional HNSW index
+        top_k: Number of candidates to retrieve
+        pack_top: Number of chunks to pack in context
+        threshold: Minimum similarity threshold
+        use_rerank: Whether to rerank (with the ``RERANK_BACKEND`` backend)
+        seed, num_ctx, num_predict, retries: LLM parameters
+        faiss_index_path: Path to FAISS index file
+        faiss_index: Loaded FAISS index to use instead of the process-wide one
+        on_retrieval: Called once the context is packed, before the LLM call, with the
+            packed chunk ids, citation details and retrieval timings
+        on_token: Stream the answer; called with answer text as the LLM generates it
+        retrieved: ``retrieve`` result for ``question`` computed by the caller (e.g. one
+            entry of ``retrieve_batch``); retrieval is skipped
+
+    Returns:
+        Dict with answer and metadata
+    """
+    run = _PipelineRun.start(question, top_k, pack_top)
+
+    # Retrieve
+    t0 = time.time()
+    if retrieved is None:
+        retrieved = retrieve(
+            question,
+            chunks,
+            vecs_n,
+            bm,
+            top_k=top_k,
+            hnsw=hnsw,
+            retries=retries,
+            faiss_index_path=faiss_index_path,
+            faiss_index=faiss_index,
+        )
+    run.selected, scores = retrieved
+    run.retrieve_time = time.time() - t0
+
+    # Check coverage
+    if not coverage_ok(run.selected, scores["dense"], threshold):
+        return run.coverage_refusal(threshold)
+
+    # Apply MMR diversification
+    t0 = time.time()
+    mmr_selected = apply_mmr_diversification(run.selected, scores, vecs_n, pack_top)
+    run.mmr_time = time.time() - t0
+
+    # Optional reranking
+    mmr_selected, _rerank_scores, run.rerank_applied, run.rerank_reason, run.rerank_time = apply_reranking(
+        question,
+        chunks,
+        mmr_selected,
+        scores,
+        use_rerank,
+        seed=seed,
+        num_ctx=num_ctx,
+        num_predict=num_predict,
+        retries=retries,
+    )
+
+    run.mmr_selected = apply_diversity_limits(mmr_selected, chunks)
+
+    # Pack snippets grouped by article
+    run.context_block, run.packed_ids, run.used_tokens, article_blocks = pack_snippets(
+        chunks, run.mmr_selected, pack_top=pack_top, num_ctx=num_ctx
+    )
+    run.citation_details = build_citation_details(chunks, run.packed_ids)
+    if on_retrieval is not None:
+        on_retrieval(run.retrieval_info())
+
     # Generate answer
     try:
-        answer, llm_time, confidence, reasoning, sources_used, structured_meta = generate_llm_answer(
+        llm_out = generate_llm_answer(
             question,
-            context_block,
+            run.context_block,
             seed=seed,
             num_ctx=num_ctx,
             num_predict=num_predict,
             retries=retries,
-            packed_ids=packed_ids,
+            packed_ids=run.packed_ids,
             all_chunks=chunks,
-            selected_indices=selected,
+            selected_indices=run.selected,
             scores_dict=scores,
             article_blocks=article_blocks,
+            on_token=on_token,
         )
+    except LLMOverloadedError:
+        raise  # shed by the LLM gateway: surfaced to the caller (429/503), not answered as a refusal
     except LLMUnavailableError as exc:
         logger.error(f"LLM unavailable during answer generation: {exc}")
-        return _llm_failure("llm_unavailable", exc)
+        return run.llm_failure("llm_unavailable", exc)
     except LLMError as exc:
         logger.error(f"LLM error during answer generation: {exc}")
-        return _llm_failure("llm_error", exc)
-
-    total_time = time.time() - t_start
-    metrics.observe_histogram(MetricNames.QUERY_LATENCY, total_time * 1000)
-    metrics.observe_histogram(MetricNames.RETRIEVAL_LATENCY, retrieve_time * 1000)
-    metrics.observe_histogram(MetricNames.LLM_LATENCY, llm_time * 1000)
-
-    refused = answer == REFUSAL_STR
-    if refused:
-        metrics.increment_counter(MetricNames.ERRORS_TOTAL, labels={"type": "refused"})
-        metrics.increment_counter(MetricNames.REFUSALS_TOTAL, labels={"reason": "llm"})
-    logger.info(
-        json.dumps(
-            {
-                "event": "rag.query.complete",
-                "question_hash": question_hash,
-                "refused": refused,
-                "selected": len(selected),
-                "packed": len(packed_ids),
-                "confidence": confidence,
-                "total_ms": round(total_time * 1000, 2),
-                "llm_ms": round(llm_time * 1000, 2),
-            }
-        )
-    )
-
-    # OPTIMIZATION (Analysis Section 9.1 #4): Confidence-based routing
-    # Auto-escalate low-confidence queries to human review
-    routing = get_routing_action(confidence, refused=refused, critical=False)
+        return run.llm_failure("llm_error", exc)
 
-    return {
-        "answer": answer,
-        "refused": refused,
-        "confidence": confidence,
-        "intent": structured_meta.get("intent"),
-        "user_role_inferred": structured_meta.get("user_role_inferred"),
-        "security_sensitivity": structured_meta.get("security_sensitivity"),
-        "short_intent_summary": structured_meta.get("short_intent_summary"),
-        "answer_style": structured_meta.get("answer_style"),
-        "needs_human_escalation": structured_meta.get("needs_human_escalation"),
-        "sources_used": sources_used,
-        "citation_details": citation_details,
-        "selected_chunks": _normalize_chunk_ids(selected),
-        "packed_chunks": _normalize_chunk_ids(mmr_selected),
-        "selected_chunk_ids": _normalize_chunk_ids(packed_ids),
-        "context_block": context_block,
-        "timing": {
-            "total_ms": total_time * 1000,
-            "retrieve_ms": retrieve_time * 1000,
-            "mmr_ms": mmr_time * 1000,
-            "rerank_ms": rerank_time * 1000,
-            "llm_ms": llm_time * 1000,
-        },
-        "metadata": {
-            "retrieval_count": len(selected),
-            "packed_count": len(packed_ids),
-            "used_tokens": used_tokens,
-            "rerank_applied": rerank_applied,
-            "rerank_reason": rerank_reason,
-            "source_chunk_ids": _normalize_chunk_ids(packed_ids),
-            "citation_details": citation_details,
-            "reasoning": reasoning,  # LLM's explanation (new JSON format)
-            "sources_used": sources_used,  # LLM's cited sources (new JSON format)
-            **structured_meta,
-        },
-        "routing": routing,  # Add routing recommendation
-    }
+    return run.result(*llm_out)
 
 
 def answer_to_json(
@@ -910,6 +1173,8 @@ def answer_to_json(
 __all__ = [
     "parse_qwen_json",
     "apply_mmr_diversification",
+    "apply_mmr_diversification_batch",
+    "mmr_select_batch",
     "apply_reranking",
     "extract_citations",
     "validate_citations",
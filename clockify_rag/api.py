@@ -4,33 +4,45 @@ Provides REST API endpoints:
 - GET /health: Health check
 - GET /v1/config: Current configuration
 - POST /v1/query: Submit a question
+- POST /v1/query/stream: Submit a question, streaming the answer as Server-Sent Events
+- POST /v1/query/batch: Submit several questions, retrieved together
 - POST /v1/ingest: Trigger index build
 - GET /v1/metrics: System metrics (JSON/Prometheus/CSV via format param)
 - GET /metrics: Standard Prometheus scraping endpoint
 """
 
 import asyncio
+import itertools
 import json
 import logging
+import math
 import os
 import platform
 import threading
 import time
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
 from functools import partial
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Dict, Any
+from typing import Annotated, Optional, Dict, Any
 
 from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
 from . import config
 from .answer import answer_once
-from .caching import get_rate_limiter as _get_rate_limiter
+from .api_client import get_llm_client
+from .async_support import async_answer_once, async_embed_query, shutdown_scoring_executor
+from .caching import (
+    get_query_cache,
+    get_query_embedding_cache,
+    get_rate_limiter as _get_rate_limiter,
+    get_semantic_answer_cache,
+)
 from .runtime import ensure_index_ready
+from .embed_batcher import shutdown_embedding_batcher
 from .correlation import (
     generate_correlation_id,
     get_correlation_id,
@@ -38,9 +50,22 @@ from .correlation import (
     clear_correlation_id,
     validate_correlation_id,
 )
-from .exceptions import ValidationError
-from .indexing import build, index_is_fresh
+from .exceptions import LLMOverloadedError, ValidationError
+from .generations import IndexSnapshot, active_files, pin, unpin
+from .incremental import build_incremental
+from .indexing import bm25_artifact_exists, build, index_is_fresh, index_signature
 from .metrics import MetricNames, get_metrics
+from .precomputed_cache import faq_entry_to_result, get_precomputed_cache, load_faq_list
+from .retrieval import (
+    embed_queries,
+    embed_query,
+    normalize_query,
+    retrieve_batch,
+    validate_query_length,
+    warm_query_embeddings,
+)
+from .singleflight import SingleFlight, request_key
+from .tracing import get_trace, propagate_context, span
 from .utils import ALLOWED_CORPUS_FILENAME, check_ollama_connectivity, resolve_corpus_path
 
 # Re-export for tests that monkeypatch api.get_rate_limiter
@@ -48,6 +73,13 @@ get_rate_limiter = _get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+# Bumped on every index (re)load so cached answers never outlive the index they came from
+_INDEX_GENERATION = itertools.count(1)
+
+# Requests traced as a root span (see clockify_rag.tracing); health checks and scrapes
+# would otherwise evict query traces from the ring buffer
+_TRACED_PATH_PREFIX = "/v1/query"
+
 
 def _threadpool_workers() -> int:
     """Compute a threadpool size that can handle small concurrent bursts."""
@@ -56,6 +88,212 @@ def _threadpool_workers() -> int:
     return max(4, min(32, cpu_count * 4))
 
 
+def _warm_query_embedding_cache() -> None:
+    """Reload the persisted query-embedding cache, then embed the warm-load questions.
+
+    Runs in the background at startup so a slow embedding backend never delays readiness.
+    """
+    if config.QUERY_EMBED_CACHE_PATH:
+        get_query_embedding_cache().load(config.QUERY_EMBED_CACHE_PATH)
+    warm_file = config.QUERY_EMBED_WARM_FILE
+    if not warm_file or not os.path.exists(warm_file):
+        return
+    try:
+        added = warm_query_embeddings(load_faq_list(warm_file))
+        logger.info("Query-embedding cache warmed: %d questions from %s", added, warm_file)
+    except Exception as exc:
+        logger.warning("Query-embedding warm-load from %s failed: %s", warm_file, exc)
+
+
+def _load_faq_cache():
+    """Return the precomputed FAQ cache if enabled and built for the current index."""
+    if not config.FAQ_CACHE_ENABLED or not os.path.exists(config.FAQ_CACHE_PATH):
+        return None
+    try:
+        faq_cache = get_precomputed_cache(config.FAQ_CACHE_PATH)
+    except Exception as exc:
+        logger.warning("Failed to load FAQ cache: %s", exc)
+        return None
+    if faq_cache.is_stale():
+        logger.warning("FAQ cache signature mismatch; ignoring stale cache at %s", config.FAQ_CACHE_PATH)
+        return None
+    logger.info("FAQ cache loaded: %d precomputed answers", faq_cache.size())
+    return faq_cache
+
+
+async def _lookup_cached_answers(questions: list[str], faq_cache, cache_params: Dict[str, Any], executor=None):
+    """:func:`_lookup_cached_answer_async` for a batch: the distinct questions that
+    miss the FAQ and query caches are embedded in one call for the semantic tier.
+
+    Returns ``(results, cache_types, query_vectors)``; ``query_vectors`` maps each
+    embedded question to its vector (empty when the tier is off or embedding failed).
+    """
+    exact = [_lookup_exact_answer(question, faq_cache, cache_params) for question in questions]
+    missing = list(dict.fromkeys(q for q, (result, _type) in zip(questions, exact) if result is None))
+    vectors = await _semantic_query_vectors(missing, executor)
+    query_vectors = dict(zip(missing, vectors)) if vectors is not None else {}
+    semantic = {q: _lookup_semantic_answer(vec, cache_params) for q, vec in query_vectors.items()}
+    results, cache_types = [], []
+    for question, (result, cache_type) in zip(questions, exact):
+        if result is None:
+            result, cache_type = semantic.get(question, (None, None))
+        if result is None:
+            get_metrics().increment_counter(MetricNames.RESPONSE_CACHE_MISSES)
+        results.append(result)
+        cache_types.append(cache_type)
+    return results, cache_types, query_vectors
+
+
+async def _lookup_cached_answer_async(question: str, faq_cache, cache_params: Dict[str, Any], executor=None):
+    """Look up ``question`` in the FAQ cache, then the query cache, then the semantic
+    answer cache; ``question`` is embedded for the semantic tier only when the
+    first two miss, so their hits never wait on Ollama.
+
+    Returns ``(result, cache_type, query_vector)``; ``query_vector`` (None when not
+    computed) is for storing the pipeline's answer in the semantic cache.
+    """
+    result, cache_type = _lookup_exact_answer(question, faq_cache, cache_params)
+    if result is not None:
+        return result, cache_type, None
+    query_vector = await _semantic_query_vector(question, executor)
+    if query_vector is not None:
+        result, cache_type = _lookup_semantic_answer(query_vector, cache_params)
+    if result is None:
+        get_metrics().increment_counter(MetricNames.RESPONSE_CACHE_MISSES)
+    return result, cache_type, query_vector
+
+
+def _lookup_exact_answer(question: str, faq_cache, cache_params: Dict[str, Any]):
+    """FAQ cache, then query cache; ``(None, None)`` on a miss (not counted)."""
+    metrics = get_metrics()
+    if faq_cache is not None:
+        entry = faq_cache.get(question, fuzzy=True)
+        if entry:
+            metrics.increment_counter(MetricNames.RESPONSE_CACHE_HITS, labels={"cache_type": "faq_precomputed"})
+            return faq_entry_to_result(entry), "faq_precomputed"
+
+    cached = get_query_cache().get(question, params=cache_params)
+    if cached is not None:
+        answer, payload = cached
+        result = {key: value for key, value in payload.items() if key != "timestamp"}
+        result["answer"] = answer
+        metrics.increment_counter(MetricNames.RESPONSE_CACHE_HITS, labels={"cache_type": "query_cache"})
+        return result, "query_cache"
+    return None, None
+
+
+def _lookup_semantic_answer(query_vector, cache_params: Dict[str, Any]):
+    """Semantic answer cache; ``(None, None)`` on a miss (not counted)."""
+    similar = get_semantic_answer_cache().get(query_vector, params=cache_params)
+    if similar is None:
+        return None, None
+    answer, payload, similarity, cached_question = similar
+    result = {key: value for key, value in payload.items() if key != "timestamp"}
+    result["answer"] = answer
+    result["metadata"] = {
+        **(result.get("metadata") or {}),
+        "semantic_similarity": round(similarity, 4),
+        "semantic_match": cached_question,
+    }
+    get_metrics().increment_counter(MetricNames.RESPONSE_CACHE_HITS, labels={"cache_type": "semantic_cache"})
+    return result, "semantic_cache"
+
+
+def _store_cached_answer(
+    question: str, result: Dict[str, Any], cache_params: Dict[str, Any], query_vector=None
+) -> None:
+    """Cache a pipeline result unless the LLM call failed."""
+    if (result.get("metadata") or {}).get("llm_error"):
+        return
+    payload = {key: value for key, value in result.items() if key not in ("answer", "context_block")}
+    get_query_cache().put(question, result["answer"], payload, params=cache_params)
+    if query_vector is not None:
+        get_semantic_answer_cache().put(question, query_vector, result["answer"], payload, params=cache_params)
+
+
+async def _semantic_query_vector(question: str, executor=None):
+    """Embed ``question`` for the semantic answer cache, or None when the tier is off.
+
+    Embeds the same normalised text as retrieval, so the pipeline's own embedding
+    is then a query-embedding cache hit.
+    """
+    if not get_semantic_answer_cache().enabled:
+        return None
+    text = validate_query_length(normalize_query(question))
+    try:
+        if config.API_PIPELINE == "async" and config.EMB_BACKEND != "local":
+            return await async_embed_query(text)
+        call = propagate_context(partial(embed_query, text))
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    except Exception as exc:
+        logger.warning("Semantic answer cache skipped: query embedding failed: %s", exc)
+        return None
+
+
+async def _semantic_query_vectors(questions: list[str], executor=None):
+    """:func:`_semantic_query_vector` for many questions in one batched embedding call."""
+    if not questions or not get_semantic_answer_cache().enabled:
+        return None
+    try:
+        texts = [validate_query_length(normalize_query(question)) for question in questions]
+        call = propagate_context(partial(embed_queries, texts))
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    except Exception as exc:
+        logger.warning("Semantic answer cache skipped: query embedding failed: %s", exc)
+        return None
+
+
+def _enforce_rate_limit() -> None:
+    """Raise 429 when the shared rate limiter rejects the request."""
+    metrics = get_metrics()
+    rate_limiter = get_rate_limiter()
+    if not rate_limiter:
+        return
+    if rate_limiter.allow_request():
+        metrics.increment_counter(MetricNames.RATE_LIMIT_ALLOWED)
+        return
+    metrics.increment_counter(MetricNames.RATE_LIMIT_BLOCKED)
+    wait_seconds = 0.0
+    if hasattr(rate_limiter, "wait_time"):
+        try:
+            wait_seconds = float(rate_limiter.wait_time())
+        except Exception:
+            wait_seconds = 0.0
+    raise HTTPException(
+        status_code=429,
+        detail=f"Rate limit exceeded. Retry after {wait_seconds:.2f} seconds.",
+    )
+
+
+def _overloaded(exc: LLMOverloadedError) -> HTTPException:
+    """429/503 with ``Retry-After`` for a query whose LLM call the gateway shed."""
+    return HTTPException(
+        status_code=exc.status_code,
+        detail=f"{exc}. Retry after {math.ceil(exc.retry_after)} seconds.",
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+def _batch_error(index: int, question: str, exc: BaseException) -> "BatchQueryError":
+    """Per-question error for a /v1/query/batch question whose pipeline raised ``exc``."""
+    retry_after = None
+    if isinstance(exc, LLMOverloadedError):
+        status_code, detail, retry_after = exc.status_code, str(exc), float(math.ceil(exc.retry_after))
+    elif isinstance(exc, ValidationError):
+        status_code, detail = 400, str(exc)
+    else:
+        logger.error(f"Batch query error for question {index}: {exc}", exc_info=exc)
+        status_code, detail = 500, "Internal server error"
+    return BatchQueryError(
+        index=index, question=question, status_code=status_code, detail=detail, retry_after=retry_after
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 # ============================================================================
 # Pydantic Models
 # ============================================================================
@@ -79,33 +317,38 @@ class QueryRequest(BaseModel):
 
         Prevents XSS, injection attacks, and other malicious input.
         """
-        # Strip excessive whitespace
-        v = " ".join(v.split())
+        return _sanitize_question(v)
+
+
+def _sanitize_question(v: str) -> str:
+    """Question validation shared by the query request models."""
+    # Strip excessive whitespace
+    v = " ".join(v.split())
 
-        if not v:
-            raise ValueError("Question cannot be empty after whitespace removal")
+    if not v:
+        raise ValueError("Question cannot be empty after whitespace removal")
 
-        # Check for suspicious patterns (basic XSS prevention)
-        suspicious_patterns = [
-            "<script",
-            "javascript:",
-            "onerror=",
-            "onload=",
-            "<iframe",
-            "eval(",
-            "expression(",
-        ]
+    # Check for suspicious patterns (basic XSS prevention)
+    suspicious_patterns = [
+        "<script",
+        "javascript:",
+        "onerror=",
+        "onload=",
+        "<iframe",
+        "eval(",
+        "expression(",
+    ]
 
-        v_lower = v.lower()
-        for pattern in suspicious_patterns:
-            if pattern in v_lower:
-                raise ValueError("Invalid content detected in question")
+    v_lower = v.lower()
+    for pattern in suspicious_patterns:
+        if pattern in v_lower:
+            raise ValueError("Invalid content detected in question")
 
-        # Ensure only printable characters (allow unicode for i18n)
-        if not all(c.isprintable() or c.isspace() for c in v):
-            raise ValueError("Question contains non-printable characters")
+    # Ensure only printable characters (allow unicode for i18n)
+    if not all(c.isprintable() or c.isspace() for c in v):
+        raise ValueError("Question contains non-printable characters")
 
-        return v
+    return v
 
 
 class Citation(BaseModel):
@@ -136,6 +379,46 @@ class QueryResponse(BaseModel):
     citations: Optional[list[Citation]] = Field(None, description="Rich citation details")
 
 
+class BatchQueryRequest(BaseModel):
+    """Request body for /v1/query/batch endpoint."""
+
+    questions: list[Annotated[str, Field(min_length=1, max_length=config.MAX_QUERY_LENGTH)]] = Field(
+        ..., min_length=1, max_length=config.API_BATCH_MAX_QUESTIONS, description="Questions to answer"
+    )
+    top_k: Optional[int] = Field(
+        config.DEFAULT_TOP_K, ge=1, le=config.MAX_TOP_K, description="Number of chunks to retrieve"
+    )
+    pack_top: Optional[int] = Field(config.DEFAULT_PACK_TOP, ge=1, le=50, description="Number of chunks in context")
+    threshold: Optional[float] = Field(config.DEFAULT_THRESHOLD, ge=0.0, le=1.0, description="Minimum similarity")
+    debug: Optional[bool] = Field(False, description="Include debug information")
+
+    @field_validator("questions")
+    @classmethod
+    def validate_questions(cls, v: list[str]) -> list[str]:
+        return [_sanitize_question(question) for question in v]
+
+
+class BatchQueryError(BaseModel):
+    """A /v1/query/batch question that could not be answered."""
+
+    index: int = Field(..., description="Position of the question in the request")
+    question: str
+    status_code: int = Field(..., description="Status /v1/query would have answered this question with")
+    detail: str
+    retry_after: Optional[float] = Field(None, description="Seconds to wait before retrying a shed question")
+
+
+class BatchQueryResponse(BaseModel):
+    """Response body for /v1/query/batch endpoint."""
+
+    results: list[Optional[QueryResponse]] = Field(
+        ..., description="One /v1/query response per question, in order; null where the question failed"
+    )
+    errors: list[BatchQueryError] = Field(default_factory=list, description="Questions that failed, by index")
+    processing_time_ms: float
+    correlation_id: Optional[str] = Field(None, description="Request correlation ID for tracing")
+
+
 class HealthResponse(BaseModel):
     """Response body for /v1/health endpoint."""
 
@@ -164,6 +447,10 @@ class IngestRequest(BaseModel):
 
     input_file: Optional[str] = Field(None, description="Input markdown file")
     force: Optional[bool] = Field(False, description="Force rebuild")
+    mode: str = Field(
+        "full",
+        description="full: rebuild in the background; incremental: re-index changed articles and wait for completion",
+    )
 
 
 class IngestResponse(BaseModel):
@@ -173,6 +460,78 @@ class IngestResponse(BaseModel):
     message: str
     timestamp: datetime
     index_ready: bool
+    mode: Optional[str] = None
+    timings_ms: Optional[Dict[str, float]] = None
+    stats: Optional[Dict[str, Any]] = None
+
+
+def _query_params(request: QueryRequest, index_sig: Optional[str]) -> Dict[str, Any]:
+    """Resolved retrieval parameters; also the cache key, where the index signature
+    makes a rebuild invalidate cached answers."""
+    return {
+        "top_k": int(request.top_k) if request.top_k is not None else config.DEFAULT_TOP_K,
+        "pack_top": int(request.pack_top) if request.pack_top is not None else config.DEFAULT_PACK_TOP,
+        "threshold": float(request.threshold) if request.threshold is not None else config.DEFAULT_THRESHOLD,
+        "use_rerank": config.RERANK_BACKEND != "none",
+        "rerank_backend": config.RERANK_BACKEND,
+        "index": index_sig,
+    }
+
+
+def _pipeline_call(question: str, snapshot: IndexSnapshot, params: Dict[str, Any], pipeline=None, **kwargs):
+    """Bind the answer pipeline to a captured snapshot.
+
+    ``pipeline`` defaults to ``answer_once`` (run the partial in an executor); pass
+    ``async_answer_once`` to get a partial that returns a coroutine.
+    """
+    if snapshot.faiss_index is not None:
+        kwargs["faiss_index"] = snapshot.faiss_index
+    return partial(
+        pipeline or answer_once,
+        question,
+        snapshot.chunks,
+        snapshot.vecs_n,
+        snapshot.bm,
+        top_k=params["top_k"],
+        pack_top=params["pack_top"],
+        threshold=params["threshold"],
+        use_rerank=params["use_rerank"],
+        hnsw=snapshot.hnsw,
+        **kwargs,
+    )
+
+
+def _query_response(
+    request: QueryRequest, result: Dict[str, Any], start_time: float, cache_type=None, coalesced=False
+) -> QueryResponse:
+    """Shape a pipeline or cached result into the /v1/query response."""
+    metadata = dict(result.get("metadata") or {})
+    metadata["cache_hit"] = cache_type is not None
+    metadata["cache_type"] = cache_type
+    metadata["coalesced"] = coalesced
+    selected_chunks = result.get("selected_chunks", [])
+    chunk_ids = result.get("selected_chunk_ids") or selected_chunks
+    sources_used = result.get("sources_used") or metadata.get("sources_used") or []
+    citation_details = result.get("citation_details") or metadata.get("citation_details")
+    if sources_used:
+        sources = [str(identifier) for identifier in sources_used][:5]
+    else:
+        sources = [str(identifier) for identifier in (chunk_ids or [])][:5]
+
+    return QueryResponse(
+        question=request.question,
+        answer=result["answer"],
+        confidence=result.get("confidence"),
+        sources=sources,
+        timestamp=datetime.now(),
+        processing_time_ms=(time.time() - start_time) * 1000,
+        refused=result.get("refused", False),
+        metadata=metadata or {},
+        routing=result.get("routing"),
+        timing=result.get("timing"),
+        correlation_id=get_correlation_id(),
+        citations=citation_details,
+    )
 
 
 # ============================================================================
@@ -186,29 +545,60 @@ def create_app() -> FastAPI:
     def _clear_index_state(target_app: FastAPI) -> None:
         """Clear index state with thread-safe locking."""
         with target_app.state.lock:
+            retired = getattr(target_app.state, "snapshot", None)
+            target_app.state.snapshot = None
             target_app.state.chunks = None
             target_app.state.vecs_n = None
             target_app.state.bm = None
             target_app.state.hnsw = None
             target_app.state.index_ready = False
+            target_app.state.index_signature = None
+            target_app.state.faq_cache = None
+        if retired is not None:
+            unpin(retired.generation)
 
     def _set_index_state(target_app: FastAPI, result) -> None:
-        """Set index state with thread-safe locking to prevent race conditions."""
-        with target_app.state.lock:
-            if not result:
-                # Must release lock before calling _clear_index_state since it acquires same lock
-                pass
-            else:
-                chunks, vecs_n, bm, hnsw = result
-                target_app.state.chunks = chunks
-                target_app.state.vecs_n = vecs_n
-                target_app.state.bm = bm
-                target_app.state.hnsw = hnsw
-                target_app.state.index_ready = True
-
-        # Call clear outside lock if needed (RLock is reentrant so this is safe, but clearer)
+        """Swap in a new index snapshot with thread-safe locking to prevent race conditions.
+
+        The app pins the generation it serves; the previous one is unpinned and
+        becomes collectable once queries that captured it have finished.
+        """
         if not result:
             _clear_index_state(target_app)
+            return
+
+        snapshot = IndexSnapshot.from_result(result)
+        pin(snapshot.generation)
+        with target_app.state.lock:
+            retired = getattr(target_app.state, "snapshot", None)
+            target_app.state.snapshot = snapshot
+            target_app.state.chunks = snapshot.chunks
+            target_app.state.vecs_n = snapshot.vecs_n
+            target_app.state.bm = snapshot.bm
+            target_app.state.hnsw = snapshot.hnsw
+            target_app.state.index_ready = True
+            target_app.state.index_signature = (
+                f"{index_signature(snapshot.meta or None) or 'unversioned'}:{next(_INDEX_GENERATION)}"
+            )
+            target_app.state.faq_cache = _load_faq_cache()
+        if retired is not None:
+            unpin(retired.generation)
+
+    def _capture_snapshot(target_app: FastAPI) -> IndexSnapshot:
+        """Return the snapshot queries should use; call with ``state.lock`` held.
+
+        State assigned attribute-by-attribute (tests, tooling) is wrapped in an
+        ad-hoc snapshot without a generation.
+        """
+        snapshot = getattr(target_app.state, "snapshot", None)
+        if snapshot is None or snapshot.chunks is not target_app.state.chunks:
+            snapshot = IndexSnapshot(
+                chunks=target_app.state.chunks,
+                vecs_n=target_app.state.vecs_n,
+                bm=target_app.state.bm,
+                hnsw=target_app.state.hnsw,
+            )
+        return snapshot
 
     @asynccontextmanager
     async def lifespan(_app: FastAPI):
@@ -228,10 +618,19 @@ def create_app() -> FastAPI:
             except Exception as exc:
                 logger.error("Failed to load index at startup: %s", exc)
                 _clear_index_state(_app)
+            asyncio.get_running_loop().run_in_executor(executor, _warm_query_embedding_cache)
             yield
         finally:
             logger.info("Initiating graceful shutdown...")
+            try:
+                await get_llm_client().aclose()
+            except Exception as exc:
+                logger.warning("Failed to close async LLM connections: %s", exc)
+            shutdown_scoring_executor(wait=True)
             executor.shutdown(wait=True)
+            shutdown_embedding_batcher()
+            if config.QUERY_EMBED_CACHE_PATH:
+                get_query_embedding_cache().save(config.QUERY_EMBED_CACHE_PATH)
             _clear_index_state(_app)
             logger.info("Graceful shutdown complete")
 
@@ -245,8 +644,15 @@ def create_app() -> FastAPI:
     # Initialize thread-safety lock on app.state (prevents race conditions during ingest)
     # Using RLock for reentrant locking support
     app.state.lock = threading.RLock()
+    # Immutable IndexSnapshot being served; chunks/vecs_n/bm/hnsw mirror its fields
+    app.state.snapshot = None
     # Serialize ingest builds without blocking query reads on app.state.lock
     app.state.ingest_lock = threading.Lock()
+    # Response caching inputs, refreshed whenever the index state changes
+    app.state.index_signature = None
+    app.state.faq_cache = None
+    # In-flight deduplication of identical concurrent /v1/query requests
+    app.state.query_flight = SingleFlight("api_query")
 
     # Add CORS middleware only when explicitly configured
     if config.ALLOWED_ORIGINS:
@@ -278,14 +684,20 @@ def create_app() -> FastAPI:
         raw_id = request.headers.get("x-correlation-id") or request.headers.get("x-request-id")
         correlation_id = validate_correlation_id(raw_id) or generate_correlation_id()
 
-        # Set in context for logging (propagates to thread pool via ContextVar)
+        # Set in context for logging and tracing (executor work gets it via propagate_context)
         set_correlation_id(correlation_id)
         # Also store on request.state so exception handlers can access it
         # after the ContextVar is cleared in finally
         request.state.correlation_id = correlation_id
 
+        # Query requests get a root tracing span; pipeline stages nest under it
+        path = request.url.path
+        root = span(f"{request.method} {path}") if path.startswith(_TRACED_PATH_PREFIX) else nullcontext()
         try:
-            response = await call_next(request)
+            with root as root_span:
+                response = await call_next(request)
+                if root_span is not None:
+                    root_span.set(status_code=response.status_code)
             # Add to response headers for client tracing
             response.headers["x-correlation-id"] = correlation_id
             return response
@@ -319,7 +731,7 @@ def create_app() -> FastAPI:
         return JSONResponse(
             status_code=exc.status_code,
             content={"detail": exc.detail},
-            headers={"x-correlation-id": correlation_id},
+            headers={**(exc.headers or {}), "x-correlation-id": correlation_id},
         )
 
     @app.exception_handler(Exception)
@@ -352,10 +764,11 @@ def create_app() -> FastAPI:
         - unavailable: Index not ready (cannot serve any queries)
         """
         from . import __version__
-        from pathlib import Path
 
         # Check index files exist (belt-and-suspenders with app.state)
-        index_files_exist = all(Path(f).exists() for f in ["chunks.jsonl", "vecs_n.npy", "meta.jsonl", "bm25.json"])
+        files = active_files()
+        index_files_exist = all(os.path.exists(files[key]) for key in ("chunks", "emb", "meta"))
+        index_files_exist = index_files_exist and bm25_artifact_exists(files)
 
         # Read index_ready atomically
         with app.state.lock:
@@ -440,83 +853,57 @@ def create_app() -> FastAPI:
                     status_code=503, detail="Index not ready. Run /v1/ingest first or wait for startup."
                 )
 
-            # Capture state references atomically to prevent mid-query state changes
-            chunks = app.state.chunks
-            vecs_n = app.state.vecs_n
-            bm = app.state.bm
-            hnsw = app.state.hnsw
+            # Capture the snapshot by reference; a concurrent swap does not affect this query.
+            # Pinning under the lock keeps its generation on disk until the query is done.
+            snapshot = _capture_snapshot(app)
+            pin(snapshot.generation)
+            index_sig = app.state.index_signature
+            faq_cache = app.state.faq_cache
 
         try:
             start_time = time.time()
-            metrics = get_metrics()
-            rate_limiter = get_rate_limiter()
-            if rate_limiter:
-                if rate_limiter.allow_request():
-                    metrics.increment_counter(MetricNames.RATE_LIMIT_ALLOWED)
-                else:
-                    metrics.increment_counter(MetricNames.RATE_LIMIT_BLOCKED)
-                    wait_seconds = 0.0
-                    if hasattr(rate_limiter, "wait_time"):
-                        try:
-                            wait_seconds = float(rate_limiter.wait_time())
-                        except Exception:
-                            wait_seconds = 0.0
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Rate limit exceeded. Retry after {wait_seconds:.2f} seconds.",
-                    )
+            _enforce_rate_limit()
 
             loop = asyncio.get_running_loop()
-            resolved_top_k = int(request.top_k) if request.top_k is not None else config.DEFAULT_TOP_K
-            resolved_pack_top = int(request.pack_top) if request.pack_top is not None else config.DEFAULT_PACK_TOP
-            resolved_threshold = float(request.threshold) if request.threshold is not None else config.DEFAULT_THRESHOLD
-
-            answer_future = partial(
-                answer_once,
-                request.question,
-                chunks,
-                vecs_n,
-                bm,
-                top_k=resolved_top_k,
-                pack_top=resolved_pack_top,
-                threshold=resolved_threshold,
-                use_rerank=True,
-                hnsw=hnsw,
-            )
             executor = getattr(app.state, "executor", None)
-            result = await loop.run_in_executor(executor, answer_future)
-
-            elapsed_ms = (time.time() - start_time) * 1000
-
-            metadata = result.get("metadata") or {}
-            selected_chunks = result.get("selected_chunks", [])
-            chunk_ids = result.get("selected_chunk_ids") or selected_chunks
-            sources_used = result.get("sources_used") or metadata.get("sources_used") or []
-            citation_details = result.get("citation_details") or metadata.get("citation_details")
-            if sources_used:
-                sources = [str(identifier) for identifier in sources_used][:5]
-            else:
-                sources = [str(identifier) for identifier in (chunk_ids or [])][:5]
-
-            return QueryResponse(
-                question=request.question,
-                answer=result["answer"],
-                confidence=result.get("confidence"),
-                sources=sources,
-                timestamp=datetime.now(),
-                processing_time_ms=elapsed_ms,
-                refused=result.get("refused", False),
-                metadata=metadata or {},
-                routing=result.get("routing"),
-                timing=result.get("timing"),
-                correlation_id=get_correlation_id(),
-                citations=citation_details,
-            )
+            # Lookup order: FAQ precomputed -> query cache (LRU/TTL) -> semantic cache -> full pipeline.
+            cache_params = _query_params(request, index_sig)
+            result, cache_type, coalesced, query_vector = None, None, False, None
+            if config.API_CACHE_ENABLED:
+                result, cache_type, query_vector = await _lookup_cached_answer_async(
+                    request.question, faq_cache, cache_params, executor
+                )
+
+            if result is None:
+
+                async def run_pipeline():
+                    # async: the query holds a socket, not a thread, while it waits on Ollama
+                    if config.API_PIPELINE == "async":
+                        call = _pipeline_call(request.question, snapshot, cache_params, pipeline=async_answer_once)
+                        pipeline_result = await call()
+                    else:
+                        call = _pipeline_call(request.question, snapshot, cache_params)
+                        pipeline_result = await loop.run_in_executor(executor, propagate_context(call))
+                    if config.API_CACHE_ENABLED:
+                        _store_cached_answer(request.question, pipeline_result, cache_params, query_vector)
+                    return pipeline_result
+
+                # Identical concurrent questions share one pipeline run (and one LLM call)
+                if config.COALESCE_REQUESTS:
+                    flight_key = request_key(request.question, **cache_params)
+                    result, coalesced = await app.state.query_flight.do_async(flight_key, run_pipeline)
+                else:
+                    result = await run_pipeline()
+
+            return _query_response(request, result, start_time, cache_type=cache_type, coalesced=coalesced)
 
         except ValidationError as e:
             logger.warning(f"Validation error: {e}")
             # ValidationError messages are safe user-facing messages
             raise HTTPException(status_code=400, detail=str(e))
+        except LLMOverloadedError as e:
+            logger.warning(f"Query shed by the LLM gateway: {e}")
+            raise _overloaded(e)
         except HTTPException:
             # Re-raise HTTP exceptions (like 429 rate limit) without modification
             raise
@@ -524,6 +911,259 @@ def create_app() -> FastAPI:
             # Generic exceptions may contain internal details - sanitize
             logger.error(f"Query error: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail="Internal server error")
+        finally:
+            unpin(snapshot.generation)
+
+    @app.post("/v1/query/stream")
+    async def stream_query(request: QueryRequest, raw_request: Request) -> StreamingResponse:
+        """Answer a question as a stream of Server-Sent Events.
+
+        Events, in order:
+        - ``retrieval``: packed chunk ids, citations and retrieval timings (before the LLM call)
+        - ``token``: answer text as the LLM generates it (``{"text": ...}``), repeated
+        - ``done``: the full /v1/query response body (parsed answer, confidence, metadata)
+
+        A failure after the stream has started is reported as an ``error`` event.
+        Cached answers are replayed as a single ``token`` event.
+        """
+        _require_api_key(raw_request)
+
+        with app.state.lock:
+            if not app.state.index_ready:
+                raise HTTPException(
+                    status_code=503, detail="Index not ready. Run /v1/ingest first or wait for startup."
+                )
+            snapshot = _capture_snapshot(app)
+            pin(snapshot.generation)
+            index_sig = app.state.index_signature
+            faq_cache = app.state.faq_cache
+
+        try:
+            start_time = time.time()
+            _enforce_rate_limit()
+            params = _query_params(request, index_sig)
+            cached, cache_type, query_vector = None, None, None
+            if config.API_CACHE_ENABLED:
+                cached, cache_type, query_vector = await _lookup_cached_answer_async(
+                    request.question, faq_cache, params, getattr(app.state, "executor", None)
+                )
+        except BaseException:
+            unpin(snapshot.generation)
+            raise
+
+        metrics = get_metrics()
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def emit(event: Optional[str], data: Optional[Dict[str, Any]] = None) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+        def first_token(source: str) -> None:
+            ttft_ms = (time.time() - start_time) * 1000
+            metrics.observe_histogram(MetricNames.TIME_TO_FIRST_TOKEN, ttft_ms, labels={"source": source})
+
+        async def replay_cached(answer: Dict[str, Any]):
+            yield _sse_event(
+                "retrieval",
+                {
+                    "selected_chunk_ids": answer.get("selected_chunk_ids") or [],
+                    "citations": answer.get("citation_details") or [],
+                    "cache_type": cache_type,
+                },
+            )
+            first_token("cache")
+            yield _sse_event("token", {"text": answer["answer"]})
+            response = _query_response(request, answer, start_time, cache_type=cache_type)
+            yield _sse_event("done", response.model_dump(mode="json"))
+
+        if cached is not None:
+            # A cached answer never touches the index
+            unpin(snapshot.generation)
+            return StreamingResponse(
+                replay_cached(cached),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        # Start the pipeline now; it keeps reading the snapshot (and keeps it pinned)
+        # until it finishes, even if the client disconnects mid-stream
+        call = _pipeline_call(
+            request.question,
+            snapshot,
+            params,
+            on_retrieval=lambda info: emit("retrieval", info),
+            on_token=lambda text: emit("token", {"text": text}),
+        )
+        future = loop.run_in_executor(getattr(app.state, "executor", None), propagate_context(call))
+
+        def pipeline_done(_future: "asyncio.Future[Any]") -> None:
+            unpin(snapshot.generation)
+            emit(None)  # ends run_streaming's event loop
+
+        future.add_done_callback(pipeline_done)
+
+        async def run_streaming():
+            seen_token = False
+            while True:
+                event, data = await events.get()
+                if event is None:
+                    break
+                if event == "token" and not seen_token:
+                    seen_token = True
+                    first_token("llm")
+                yield _sse_event(event, data)
+            try:
+                result = future.result()
+            except LLMOverloadedError as e:
+                logger.warning(f"Streaming query shed by the LLM gateway: {e}")
+                shed = _overloaded(e)
+                yield _sse_event(
+                    "error",
+                    {"detail": shed.detail, "status_code": shed.status_code, "retry_after": math.ceil(e.retry_after)},
+                )
+                return
+            except Exception as e:
+                logger.error(f"Streaming query error: {e}", exc_info=True)
+                yield _sse_event("error", {"detail": "Internal server error"})
+                return
+            if config.API_CACHE_ENABLED:
+                _store_cached_answer(request.question, result, params, query_vector)
+            yield _sse_event("done", _query_response(request, result, start_time).model_dump(mode="json"))
+
+        return StreamingResponse(
+            run_streaming(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/v1/query/batch", response_model=BatchQueryResponse)
+    async def submit_query_batch(request: BatchQueryRequest, raw_request: Request) -> BatchQueryResponse:
+        """Answer several questions in one request.
+
+        Cached answers are served as in /v1/query. The other questions are
+        retrieved together (``retrieve_batch``: one embedding call, one ANN search
+        or dense matrix product, BM25 over shared postings); their answers are then
+        generated at most ``API_BATCH_LLM_CONCURRENCY`` at a time. Results are in
+        question order; a question whose pipeline fails, or whose LLM call the
+        gateway sheds, gets a null result and an entry in ``errors`` (with
+        ``retry_after`` when shed). The request fails only when every question did,
+        with 429/503 and ``Retry-After`` only if every one of them was shed.
+        """
+        _require_api_key(raw_request)
+
+        with app.state.lock:
+            if not app.state.index_ready:
+                raise HTTPException(
+                    status_code=503, detail="Index not ready. Run /v1/ingest first or wait for startup."
+                )
+            snapshot = _capture_snapshot(app)
+            pin(snapshot.generation)
+            index_sig = app.state.index_signature
+            faq_cache = app.state.faq_cache
+
+        try:
+            start_time = time.time()
+            _enforce_rate_limit()
+
+            loop = asyncio.get_running_loop()
+            executor = getattr(app.state, "executor", None)
+            items = [
+                QueryRequest(
+                    question=question,
+                    top_k=request.top_k,
+                    pack_top=request.pack_top,
+                    threshold=request.threshold,
+                    debug=request.debug,
+                )
+                for question in request.questions
+            ]
+            cache_params = _query_params(items[0], index_sig)
+            results: list = [None] * len(items)
+            cache_types: list = [None] * len(items)
+            query_vectors: Dict[str, Any] = {}
+            if config.API_CACHE_ENABLED:
+                results, cache_types, query_vectors = await _lookup_cached_answers(
+                    [item.question for item in items], faq_cache, cache_params, executor
+                )
+
+            pending = list(dict.fromkeys(item.question for item, result in zip(items, results) if result is None))
+            if pending:
+                # Reuse the semantic tier's embeddings (one batched call) for retrieval
+                have_vectors = all(question in query_vectors for question in pending)
+                call = partial(
+                    retrieve_batch,
+                    pending,
+                    snapshot.chunks,
+                    snapshot.vecs_n,
+                    snapshot.bm,
+                    top_k=cache_params["top_k"],
+                    hnsw=snapshot.hnsw,
+                    retries=config.DEFAULT_RETRIES,
+                    faiss_index=snapshot.faiss_index,
+                    query_vectors=[query_vectors[q] for q in pending] if have_vectors else None,
+                )
+                retrieved = await loop.run_in_executor(executor, propagate_context(call))
+                llm_slots = asyncio.Semaphore(config.API_BATCH_LLM_CONCURRENCY)
+
+                async def answer(question: str, hit) -> Dict[str, Any]:
+                    async with llm_slots:
+                        if config.API_PIPELINE == "async":
+                            call = _pipeline_call(
+                                question, snapshot, cache_params, pipeline=async_answer_once, retrieved=hit
+                            )
+                            pipeline_result = await call()
+                        else:
+                            call = _pipeline_call(question, snapshot, cache_params, retrieved=hit)
+                            pipeline_result = await loop.run_in_executor(executor, propagate_context(call))
+                    if config.API_CACHE_ENABLED:
+                        _store_cached_answer(question, pipeline_result, cache_params, query_vectors.get(question))
+                    return pipeline_result
+
+                # A failed question becomes its own error entry; the others are still answered
+                answers = await asyncio.gather(
+                    *(answer(question, hit) for question, hit in zip(pending, retrieved)), return_exceptions=True
+                )
+                by_question = dict(zip(pending, answers))
+                results = [
+                    by_question[item.question] if result is None else result for item, result in zip(items, results)
+                ]
+
+            failed = [(i, result) for i, result in enumerate(results) if isinstance(result, BaseException)]
+            if len(failed) == len(items):
+                # Nothing to return: 429/503 (longest Retry-After) only if no question was
+                # admitted by the LLM gateway, otherwise the status of the first other failure
+                shed = [exc for _i, exc in failed if isinstance(exc, LLMOverloadedError)]
+                others = [exc for _i, exc in failed if not isinstance(exc, LLMOverloadedError)]
+                raise others[0] if others else max(shed, key=lambda exc: exc.retry_after)
+            errors = [_batch_error(i, items[i].question, exc) for i, exc in failed]
+
+            return BatchQueryResponse(
+                results=[
+                    (
+                        None
+                        if isinstance(result, BaseException)
+                        else _query_response(item, result, start_time, cache_type=cache_type)
+                    )
+                    for item, result, cache_type in zip(items, results, cache_types)
+                ],
+                errors=errors,
+                processing_time_ms=(time.time() - start_time) * 1000,
+                correlation_id=get_correlation_id(),
+            )
+
+        except ValidationError as e:
+            logger.warning(f"Validation error: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except LLMOverloadedError as e:
+            logger.warning(f"Batch query shed by the LLM gateway: {e}")
+            raise _overloaded(e)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Batch query error: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Internal server error")
+        finally:
+            unpin(snapshot.generation)
 
     # ========================================================================
     # Ingest Endpoint
@@ -545,9 +1185,13 @@ def create_app() -> FastAPI:
             IngestResponse with status
 
         Note:
-            Build happens asynchronously. Check /health to verify completion.
+            A full build happens asynchronously; check /health to verify completion.
+            ``mode="incremental"`` patches the index for changed articles and
+            responds once the new index is loaded, with per-stage timings.
         """
         _require_api_key(raw_request)
+        if request.mode not in ("full", "incremental"):
+            raise HTTPException(status_code=400, detail="mode must be 'full' or 'incremental'")
         if request.input_file and os.path.basename(request.input_file) != ALLOWED_CORPUS_FILENAME:
             raise HTTPException(
                 status_code=400,
@@ -566,22 +1210,27 @@ def create_app() -> FastAPI:
                 message=f"Index already up to date for {input_file}",
                 timestamp=datetime.now(),
                 index_ready=True,
+                mode=request.mode,
             )
 
-        def do_ingest():
-            """Background task to build index."""
+        def do_ingest(build_fn=build):
+            """Build the index and swap it into app state; returns build stats or None on failure."""
             started_at = time.time()
             with app.state.ingest_lock:
                 with app.state.lock:
                     prior_ready = app.state.index_ready
-                    prior_state = (app.state.chunks, app.state.vecs_n, app.state.bm, app.state.hnsw)
+                    prior_state = _capture_snapshot(app)
                 try:
-                    logger.info(f"Starting ingest from {input_file}")
-                    build(input_file, retries=2)
+                    logger.info(f"Starting {request.mode} ingest from {input_file}")
+                    stats = build_fn(input_file, retries=2) or {}
+                    reload_start = time.time()
                     result = ensure_index_ready(retries=2)
                     _set_index_state(app, result)
+                    if stats.get("timings_ms") is not None:
+                        stats["timings_ms"]["reload"] = round((time.time() - reload_start) * 1000, 2)
                     duration_ms = (time.time() - started_at) * 1000
                     logger.info(f"Ingest completed successfully in {duration_ms:.1f} ms")
+                    return stats
                 except Exception as e:
                     logger.error(f"Ingest failed: {e}", exc_info=True)
                     if prior_ready:
@@ -589,6 +1238,23 @@ def create_app() -> FastAPI:
                         _set_index_state(app, prior_state)
                     else:
                         _clear_index_state(app)
+                    return None
+
+        if request.mode == "incremental":
+            loop = asyncio.get_running_loop()
+            stats = await loop.run_in_executor(None, partial(do_ingest, build_incremental))
+            if stats is None:
+                raise HTTPException(status_code=500, detail="Incremental ingest failed; previous index kept")
+            timings = stats.pop("timings_ms", None)
+            return IngestResponse(
+                status="completed",
+                message=f"Index updated ({stats.get('mode', 'incremental')}) from {input_file}",
+                timestamp=datetime.now(),
+                index_ready=app.state.index_ready,
+                mode=stats.pop("mode", "incremental"),
+                timings_ms=timings,
+                stats=stats,
+            )
 
         background_tasks.add_task(do_ingest)
 
@@ -597,6 +1263,7 @@ def create_app() -> FastAPI:
             message=f"Index build started in background from {input_file}",
             timestamp=datetime.now(),
             index_ready=app.state.index_ready,
+            mode="full",
         )
 
     # ========================================================================
@@ -627,6 +1294,17 @@ def create_app() -> FastAPI:
 
         return JSONResponse(payload)
 
+    @app.get("/v1/debug/trace/{correlation_id}")
+    async def get_trace_endpoint(correlation_id: str, raw_request: Request) -> Dict[str, Any]:
+        """Span tree (per-stage timings) of a recent query, by its correlation ID."""
+        _require_api_key(raw_request)
+        if validate_correlation_id(correlation_id) is None:
+            raise HTTPException(status_code=400, detail="Invalid correlation ID")
+        spans = get_trace(correlation_id)
+        if spans is None:
+            raise HTTPException(status_code=404, detail="Trace not found (tracing off, or evicted from the buffer)")
+        return {"correlation_id": correlation_id, "spans": spans}
+
     @app.get("/metrics")
     async def prometheus_metrics() -> Response:
         """Standard Prometheus metrics endpoint.
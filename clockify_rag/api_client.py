@@ -4,17 +4,23 @@ This module provides a typed, structured client for interacting with
 Ollama-style APIs for both chat completion and embedding generation.
 """
 
+import asyncio
 import hashlib
+import json
 import logging
 import math
 import random
+import re
 import time
+import weakref
 from datetime import UTC, datetime
-from typing import Any, Dict, List, Optional, Union, cast
+from typing import Any, Dict, Iterator, List, Optional, Union, cast
 from typing_extensions import TypedDict
 
+import httpx
 import requests
 
+from . import config
 from .config import (
     RAG_OLLAMA_URL,
     RAG_CHAT_MODEL,
@@ -37,6 +43,7 @@ from .config import (
 from .circuit_breaker import CircuitOpenError, get_ollama_circuit_breaker
 from .exceptions import LLMError, EmbeddingError, LLMUnavailableError, LLMBadResponseError
 from .http_utils import get_session
+from .llm_gateway import llm_slot
 
 
 logger = logging.getLogger(__name__)
@@ -124,6 +131,33 @@ class BaseLLMClient:
     ) -> ChatCompletionResponse:
         raise NotImplementedError
 
+    def chat_completion_stream(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> Iterator[str]:
+        """Yield the completion in pieces; clients without streaming yield it whole."""
+        response = self.chat_completion(
+            messages=messages, model=model, options=options, timeout=timeout, retries=retries
+        )
+        yield (response.get("message") or {}).get("content", "")
+
+    async def achat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> ChatCompletionResponse:
+        """Await a chat completion; clients without async I/O run it in a worker thread."""
+        return await asyncio.to_thread(
+            self.chat_completion, messages=messages, model=model, options=options, timeout=timeout, retries=retries
+        )
+
     def generate_text(
         self,
         prompt: str,
@@ -140,6 +174,15 @@ class BaseLLMClient:
     ) -> List[float]:
         raise NotImplementedError
 
+    async def acreate_embedding(
+        self, text: str, model: Optional[str] = None, timeout: Optional[tuple] = None, retries: Optional[int] = None
+    ) -> List[float]:
+        """Await an embedding; clients without async I/O run it in a worker thread."""
+        return await asyncio.to_thread(self.create_embedding, text, model=model, timeout=timeout, retries=retries)
+
+    async def aclose(self) -> None:
+        """Release connections held for the running event loop."""
+
     def create_embeddings_batch(
         self,
         texts: List[str],
@@ -204,6 +247,10 @@ class OllamaAPIClient(BaseLLMClient):
         base = self.base_url.rstrip("/") if self.base_url else ""
         self._chat_endpoint = f"{base}/api/chat"
         self._emb_endpoint = f"{base}/api/embeddings"
+        # httpx async connection pools belong to one event loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
 
     def _get_session(self, retries: int) -> requests.Session:
         """Return a requests.Session configured for the desired retry count."""
@@ -211,6 +258,40 @@ class OllamaAPIClient(BaseLLMClient):
         session.trust_env = ALLOW_PROXIES
         return session
 
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the pooled httpx client for the running event loop.
+
+        Connection errors are retried by the transport (``self.retries``);
+        at most ``config.OLLAMA_ASYNC_MAX_CONNECTIONS`` requests are on the
+        wire at once and the rest wait for a free connection.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(
+                max_connections=config.OLLAMA_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=min(64, config.OLLAMA_ASYNC_MAX_CONNECTIONS),
+            )
+            if ALLOW_PROXIES:
+                # Let httpx pick proxies up from the environment
+                client = httpx.AsyncClient(limits=limits, trust_env=True)
+            else:
+                transport = httpx.AsyncHTTPTransport(limits=limits, retries=self.retries)
+                client = httpx.AsyncClient(transport=transport, trust_env=False)
+            self._async_clients[loop] = client
+        return client
+
+    @staticmethod
+    def _async_timeout(req_timeout: tuple) -> httpx.Timeout:
+        connect, read = req_timeout
+        # No pool timeout: requests queued behind the connection cap wait their turn
+        return httpx.Timeout(read, connect=connect, pool=None)
+
+    async def aclose(self) -> None:
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
     def chat_completion(
         self,
         messages: List[ChatMessage],
@@ -243,15 +324,7 @@ class OllamaAPIClient(BaseLLMClient):
             raise CircuitOpenError("ollama_llm", cb.get_retry_after())
 
         model = model or self.gen_model
-        options = options or {
-            "temperature": 0,
-            "seed": DEFAULT_SEED,
-            "num_ctx": DEFAULT_NUM_CTX,
-            "num_predict": DEFAULT_NUM_PREDICT,
-            "top_p": 0.9,
-            "top_k": 40,
-            "repeat_penalty": 1.05,
-        }
+        options = options or self._default_chat_options()
 
         payload: ChatCompletionRequest = {
             "model": model or self.gen_model,
@@ -270,8 +343,142 @@ class OllamaAPIClient(BaseLLMClient):
             response = session.post(self._chat_endpoint, json=payload, timeout=req_timeout, allow_redirects=False)
             response.raise_for_status()
             result = response.json()
-        except requests.exceptions.Timeout as e:
+        except Exception as e:
+            cb.record_failure()  # Track failure for circuit breaker
+            raise self._chat_error(e, model, req_timeout, response) from e
+
+        validated = self._validate_chat_response(result, model)
+        cb.record_success()  # Track success for circuit breaker
+        duration = time.time() - start_time
+        logger.debug("Chat completion finished in %.2fs model=%s", duration, model)
+        return validated
+
+    async def achat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> ChatCompletionResponse:
+        """Chat completion over httpx without holding a thread while the model generates.
+
+        Same payload, validation, errors and circuit breaker as :meth:`chat_completion`;
+        connection retries come from the pooled transport, so ``retries`` is ignored.
+        """
+        cb = get_ollama_circuit_breaker()
+        if not cb.allow_request():
+            raise CircuitOpenError("ollama_llm", cb.get_retry_after())
+
+        model = model or self.gen_model
+        payload: ChatCompletionRequest = {
+            "model": model,
+            "messages": messages,
+            "options": options or self._default_chat_options(),
+            "stream": False,
+        }
+        req_timeout = timeout or (self.chat_connect_timeout, self.chat_read_timeout)
+        start_time = time.time()
+        response = None
+
+        try:
+            response = await self._get_async_client().post(
+                self._chat_endpoint, json=payload, timeout=self._async_timeout(req_timeout)
+            )
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            cb.record_failure()
+            raise self._chat_error(e, model, req_timeout, response) from e
+
+        validated = self._validate_chat_response(result, model)
+        cb.record_success()
+        logger.debug("Async chat completion finished in %.2fs model=%s", time.time() - start_time, model)
+        return validated
+
+    def chat_completion_stream(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> Iterator[str]:
+        """Stream a chat completion, yielding content pieces as the model produces them.
+
+        Ollama answers ``"stream": true`` with NDJSON: one message delta per line,
+        the last one carrying ``"done": true``. The read timeout applies between
+        lines, not to the whole generation.
+
+        Raises:
+            LLMError: If the request fails or the stream is malformed
+            CircuitOpenError: If the LLM service circuit breaker is open
+        """
+        cb = get_ollama_circuit_breaker()
+        if not cb.allow_request():
+            raise CircuitOpenError("ollama_llm", cb.get_retry_after())
+
+        model = model or self.gen_model
+        payload: ChatCompletionRequest = {
+            "model": model,
+            "messages": messages,
+            "options": options or self._default_chat_options(),
+            "stream": True,
+        }
+        req_timeout = timeout or (self.chat_connect_timeout, self.chat_read_timeout)
+        session = self._get_session(retries or self.retries)
+        start_time = time.time()
+        response = None
+        pieces = 0
+
+        try:
+            response = session.post(
+                self._chat_endpoint, json=payload, timeout=req_timeout, allow_redirects=False, stream=True
+            )
+            response.raise_for_status()
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    delta = json.loads(line)
+                    if not isinstance(delta, dict):
+                        raise ValueError(f"expected JSON object per line, got {type(delta).__name__}")
+                    if delta.get("error"):
+                        raise LLMError(f"Chat completion stream error: {delta['error']}")
+                    piece = (delta.get("message") or {}).get("content") or delta.get("response") or ""
+                    if piece:
+                        pieces += 1
+                        yield piece
+                    if delta.get("done"):
+                        break
+        except LLMError:
+            cb.record_failure()
+            raise
+        except Exception as e:
             cb.record_failure()  # Track failure for circuit breaker
+            raise self._chat_error(e, model, req_timeout, response) from e
+
+        if not pieces:
+            cb.record_failure()
+            raise LLMBadResponseError(f"Chat completion stream returned no content for model {model}")
+        cb.record_success()
+        logger.debug("Chat completion stream finished in %.2fs model=%s", time.time() - start_time, model)
+
+    @staticmethod
+    def _default_chat_options() -> ChatCompletionOptions:
+        return {
+            "temperature": 0,
+            "seed": DEFAULT_SEED,
+            "num_ctx": DEFAULT_NUM_CTX,
+            "num_predict": DEFAULT_NUM_PREDICT,
+            "top_p": 0.9,
+            "top_k": 40,
+            "repeat_penalty": 1.05,
+        }
+
+    def _chat_error(self, e: Exception, model: str, req_timeout: tuple, response) -> LLMError:
+        """Log a failed chat request and map it onto the LLMError hierarchy."""
+        if isinstance(e, (requests.exceptions.Timeout, httpx.TimeoutException)):
             logger.error(
                 "Chat completion timeout (read %.1fs) model=%s host=%s: %s",
                 req_timeout[1],
@@ -279,18 +486,16 @@ class OllamaAPIClient(BaseLLMClient):
                 self.base_url,
                 e,
             )
-            raise LLMUnavailableError(f"Chat completion timeout for model {model}") from e
-        except requests.exceptions.ConnectionError as e:
-            cb.record_failure()  # Track failure for circuit breaker
+            return LLMUnavailableError(f"Chat completion timeout for model {model}")
+        if isinstance(e, (requests.exceptions.ConnectionError, httpx.TransportError)):
             logger.error(
                 "Chat completion connection error model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise LLMUnavailableError(f"Chat completion connection error for model {model}") from e
-        except requests.exceptions.HTTPError as e:
-            cb.record_failure()  # Track failure for circuit breaker
+            return LLMUnavailableError(f"Chat completion connection error for model {model}")
+        if isinstance(e, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
             status = getattr(e.response, "status_code", getattr(response, "status_code", "unknown"))
             logger.error(
                 "Chat completion HTTP error model=%s host=%s status=%s: %s",
@@ -299,35 +504,25 @@ class OllamaAPIClient(BaseLLMClient):
                 status,
                 e,
             )
-            raise LLMError(f"Chat completion HTTP error (status {status})") from e
-        except ValueError as e:
-            cb.record_failure()  # Track failure for circuit breaker
+            return LLMError(f"Chat completion HTTP error (status {status})")
+        if isinstance(e, ValueError):
             logger.error(
                 "Chat completion invalid JSON model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise LLMBadResponseError(f"Chat completion returned invalid JSON for model {model}") from e
-        except requests.exceptions.RequestException as e:
-            cb.record_failure()  # Track failure for circuit breaker
+            return LLMBadResponseError(f"Chat completion returned invalid JSON for model {model}")
+        if isinstance(e, (requests.exceptions.RequestException, httpx.HTTPError)):
             logger.error(
                 "Chat completion request error model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise LLMError(f"Chat completion request error: {e}") from e
-        except Exception as e:
-            cb.record_failure()  # Track failure for circuit breaker
-            logger.error("Chat completion unexpected error model=%s: %s", model, e)
-            raise LLMError(f"Chat completion unexpected error: {e}") from e
-
-        validated = self._validate_chat_response(result, model)
-        cb.record_success()  # Track success for circuit breaker
-        duration = time.time() - start_time
-        logger.debug("Chat completion finished in %.2fs model=%s", duration, model)
-        return validated
+            return LLMError(f"Chat completion request error: {e}")
+        logger.error("Chat completion unexpected error model=%s: %s", model, e)
+        return LLMError(f"Chat completion unexpected error: {e}")
 
     def generate_text(
         self,
@@ -404,11 +599,39 @@ class OllamaAPIClient(BaseLLMClient):
             response.raise_for_status()
             result = response.json()
             embedding = self._validate_embedding_response(result)
-            duration = time.time() - start_time
-            logger.debug("Embedding created in %.2fs for model %s dim=%d", duration, model, len(embedding))
-            return embedding
+        except Exception as e:
+            raise self._embedding_error(e, model, req_timeout, response) from e
+
+        duration = time.time() - start_time
+        logger.debug("Embedding created in %.2fs for model %s dim=%d", duration, model, len(embedding))
+        return embedding
+
+    async def acreate_embedding(
+        self, text: str, model: Optional[str] = None, timeout: Optional[tuple] = None, retries: Optional[int] = None
+    ) -> List[float]:
+        """Embedding over httpx; same payload, validation and errors as :meth:`create_embedding`."""
+        if EMB_BACKEND == "local":
+            raise EmbeddingError(
+                "acreate_embedding method is for API embeddings only. Use local embedding methods for local backend."
+            )
 
-        except requests.exceptions.Timeout as e:
+        model = model or self.emb_model
+        req_timeout = timeout or (self.emb_connect_timeout, self.emb_read_timeout)
+        payload: EmbeddingRequest = {"model": model, "prompt": text, "options": None}
+        response = None
+
+        try:
+            response = await self._get_async_client().post(
+                self._emb_endpoint, json=payload, timeout=self._async_timeout(req_timeout)
+            )
+            response.raise_for_status()
+            return self._validate_embedding_response(response.json())
+        except Exception as e:
+            raise self._embedding_error(e, model, req_timeout, response) from e
+
+    def _embedding_error(self, e: Exception, model: str, req_timeout: tuple, response) -> EmbeddingError:
+        """Log a failed embedding request and wrap it in EmbeddingError."""
+        if isinstance(e, (requests.exceptions.Timeout, httpx.TimeoutException)):
             logger.error(
                 "Embedding creation timeout (read %.1fs) model=%s host=%s: %s",
                 req_timeout[1],
@@ -416,16 +639,16 @@ class OllamaAPIClient(BaseLLMClient):
                 self.base_url,
                 e,
             )
-            raise EmbeddingError(f"Embedding creation timeout for model {model}") from e
-        except requests.exceptions.ConnectionError as e:
+            return EmbeddingError(f"Embedding creation timeout for model {model}")
+        if isinstance(e, (requests.exceptions.ConnectionError, httpx.TransportError)):
             logger.error(
                 "Embedding creation connection error model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise EmbeddingError(f"Embedding creation connection error for model {model}") from e
-        except requests.exceptions.HTTPError as e:
+            return EmbeddingError(f"Embedding creation connection error for model {model}")
+        if isinstance(e, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
             status = getattr(e.response, "status_code", getattr(response, "status_code", "unknown"))
             logger.error(
                 "Embedding creation HTTP error model=%s host=%s status=%s: %s",
@@ -434,26 +657,25 @@ class OllamaAPIClient(BaseLLMClient):
                 status,
                 e,
             )
-            raise EmbeddingError(f"Embedding creation HTTP error (status {status})") from e
-        except ValueError as e:
+            return EmbeddingError(f"Embedding creation HTTP error (status {status})")
+        if isinstance(e, ValueError):
             logger.error(
                 "Embedding creation invalid JSON model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise EmbeddingError(f"Embedding creation returned invalid JSON for model {model}") from e
-        except requests.exceptions.RequestException as e:
+            return EmbeddingError(f"Embedding creation returned invalid JSON for model {model}")
+        if isinstance(e, (requests.exceptions.RequestException, httpx.HTTPError)):
             logger.error(
                 "Embedding creation request error model=%s host=%s: %s",
                 model,
                 self.base_url,
                 e,
             )
-            raise EmbeddingError(f"Embedding creation request error: {e}") from e
-        except Exception as e:
-            logger.error("Embedding creation unexpected error model=%s: %s", model, e)
-            raise EmbeddingError(f"Embedding creation unexpected error: {e}") from e
+            return EmbeddingError(f"Embedding creation request error: {e}")
+        logger.error("Embedding creation unexpected error model=%s: %s", model, e)
+        return EmbeddingError(f"Embedding creation unexpected error: {e}")
 
     def create_embeddings_batch(
         self,
@@ -643,6 +865,28 @@ class MockLLMClient(BaseLLMClient):
         }
         return response
 
+    def chat_completion_stream(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> Iterator[str]:
+        content = self.chat_completion(messages=messages, model=model, options=options)["message"]["content"]
+        # One piece per word (with its trailing whitespace), like a token stream
+        yield from re.findall(r"\s*\S+\s*", content) or [content]
+
+    async def achat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        options: Optional[ChatCompletionOptions] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> ChatCompletionResponse:
+        return self.chat_completion(messages=messages, model=model, options=options)
+
     def generate_text(
         self,
         prompt: str,
@@ -675,6 +919,15 @@ class MockLLMClient(BaseLLMClient):
     ) -> List[float]:
         return self._deterministic_vector(text)
 
+    async def acreate_embedding(
+        self,
+        text: str,
+        model: Optional[str] = None,
+        timeout: Optional[tuple] = None,
+        retries: Optional[int] = None,
+    ) -> List[float]:
+        return self._deterministic_vector(text)
+
     def create_embeddings_batch(
         self,
         texts: List[str],
@@ -773,16 +1026,61 @@ def chat_completion(
 
     Returns:
         Chat completion response
+
+    Raises:
+        LLMOverloadedError: If the LLM gateway sheds the call (queue full or deadline)
+    """
+    client = get_llm_client()
+    with llm_slot(_gateway_model(client, model)):
+        return client.chat_completion(
+            messages=messages,
+            model=model,
+            options=options,
+            stream=stream,
+            timeout=timeout,
+            retries=retries,
+        )
+
+
+def chat_completion_stream(
+    messages: List[ChatMessage],
+    model: Optional[str] = None,
+    options: Optional[ChatCompletionOptions] = None,
+    timeout: Optional[tuple] = None,
+    retries: Optional[int] = None,
+) -> Iterator[str]:
+    """Global function to stream a chat completion as content pieces.
+
+    Args:
+        messages: List of chat messages
+        model: Model to use (defaults to configured gen_model)
+        options: Generation options
+        timeout: (connect, read) timeout tuple; the read timeout applies between pieces
+        retries: Number of retries for this request
+
+    Returns:
+        Iterator over content pieces, in order; it holds an LLM gateway slot
+        from the first piece until it is exhausted or closed
     """
     client = get_llm_client()
-    return client.chat_completion(
+    pieces = client.chat_completion_stream(
         messages=messages,
         model=model,
         options=options,
-        stream=stream,
         timeout=timeout,
         retries=retries,
     )
+    return _stream_in_slot(_gateway_model(client, model), pieces)
+
+
+def _gateway_model(client: BaseLLMClient, model: Optional[str]) -> str:
+    """Model name an LLM gateway slot is taken for (the client's default when unset)."""
+    return model or getattr(client, "gen_model", "") or config.RAG_CHAT_MODEL or ""
+
+
+def _stream_in_slot(model: str, pieces: Iterator[str]) -> Iterator[str]:
+    with llm_slot(model):
+        yield from pieces
 
 
 def create_embedding(
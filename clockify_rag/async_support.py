@@ -1,8 +1,11 @@
-"""Async support for non-blocking Ollama API calls.
+"""Async answer pipeline for non-blocking Ollama API calls.
 
 OPTIMIZATION (Analysis Section 9.1 #1): Async LLM calls for 2-4x concurrent throughput.
-This module provides async versions of HTTP and LLM functions while maintaining
-backward compatibility with the synchronous API.
+``async_answer_once`` runs the whole query pipeline on the event loop: the query
+embedding, rerank and answer calls are awaited over httpx (``BaseLLMClient.achat_completion``
+/ ``acreate_embedding``), and the CPU-bound scoring (BM25 + dense retrieval, MMR,
+packing) runs on a small bounded executor (``ASYNC_SCORING_WORKERS``). An in-flight
+query therefore holds a socket, not a thread, while it waits on the model.
 
 Usage:
     # Async mode (requires asyncio event loop)
@@ -18,10 +21,13 @@ Usage:
 """
 
 import asyncio
-import json
+import functools
 import logging
+import os
+import threading
 import time
-from typing import Dict, List, Tuple, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 
@@ -39,14 +45,54 @@ from .config import (
     DEFAULT_NUM_CTX,
     DEFAULT_NUM_PREDICT,
     DEFAULT_RETRIES,
-    REFUSAL_STR,
 )
-from .exceptions import LLMError, LLMUnavailableError
-from .confidence_routing import get_routing_action
-from .api_client import get_llm_client, ChatMessage, ChatCompletionOptions
+from . import config
+from .exceptions import LLMError, LLMOverloadedError, LLMUnavailableError
+from .api_client import get_llm_client, ChatMessage, ChatCompletionOptions, _gateway_model
+from .caching import get_query_embedding_cache
+from .embed_batcher import get_embedding_batcher
+from .llm_gateway import PRIORITY_BACKGROUND, allm_slot, llm_priority
+from .singleflight import SingleFlight, request_key
+from .tracing import propagate_context, span, traced
 
 logger = logging.getLogger(__name__)
 
+# Identical concurrent async_answer_once calls share one pipeline run
+_ANSWER_FLIGHT = SingleFlight("async_answer")
+
+# Bounded pool for the CPU-bound pipeline stages (created on first use)
+_SCORING_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_SCORING_EXECUTOR_LOCK = threading.Lock()
+
+
+def _scoring_workers() -> int:
+    return config.ASYNC_SCORING_WORKERS or os.cpu_count() or 1
+
+
+def get_scoring_executor() -> ThreadPoolExecutor:
+    """Return the executor that runs retrieval scoring, MMR and packing for async queries."""
+    global _SCORING_EXECUTOR
+    with _SCORING_EXECUTOR_LOCK:
+        if _SCORING_EXECUTOR is None:
+            _SCORING_EXECUTOR = ThreadPoolExecutor(max_workers=_scoring_workers(), thread_name_prefix="rag-scoring")
+        return _SCORING_EXECUTOR
+
+
+def shutdown_scoring_executor(wait: bool = True) -> None:
+    """Stop the scoring executor; the next async query starts a fresh one."""
+    global _SCORING_EXECUTOR
+    with _SCORING_EXECUTOR_LOCK:
+        executor, _SCORING_EXECUTOR = _SCORING_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+async def _offload(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a CPU-bound pipeline stage on the scoring executor (in the caller's context, for tracing)."""
+    loop = asyncio.get_running_loop()
+    call = propagate_context(functools.partial(fn, *args, **kwargs))
+    return await loop.run_in_executor(get_scoring_executor(), call)
+
 
 async def async_embed_query(text: str, retries: int = 0) -> np.ndarray:
     """Async version of embed_query.
@@ -56,25 +102,70 @@ async def async_embed_query(text: str, retries: int = 0) -> np.ndarray:
         retries: Number of retries
 
     Returns:
-        Normalized embedding vector (numpy array)
+        Normalized embedding vector (numpy array), from the query-embedding cache when present
     """
-    client = get_llm_client()
+    with span("embed_query") as s:
+        cache = get_query_embedding_cache()
+        cached = cache.get(text)
+        s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        if config.QUERY_EMBED_BATCH_WAIT_MS > 0:
+            embedding = await asyncio.wrap_future(get_embedding_batcher().submit(text))
+            cache.put(text, embedding)
+            return embedding
+
+        client = get_llm_client()
+        try:
+            vector: List[float] = await client.acreate_embedding(
+                text, model=RAG_EMBED_MODEL, timeout=(EMB_CONNECT_T, EMB_READ_T), retries=retries
+            )
+            embedding = np.array(vector, dtype=np.float32)
+            norm = np.linalg.norm(embedding)
+            if norm > 0:
+                embedding = embedding / norm
+            cache.put(text, embedding)
+            return embedding
+        except Exception as e:
+            logger.error(f"Failed to embed query: {e}")
+            raise LLMError(f"Embedding failed: {e}") from e
+
+
+@traced("rerank")
+async def async_rerank_with_llm(
+    question: str,
+    chunks,
+    selected,
+    seed: Optional[int] = None,
+    num_ctx: Optional[int] = None,
+    num_predict: Optional[int] = None,
+    retries: Optional[int] = None,
+) -> Tuple:
+    """Async version of rerank_with_llm (same prompt, cache and fallbacks).
+
+    Returns: (order, scores, rerank_applied, rerank_reason)
+    """
+    from .retrieval import _rerank_cache_lookup, _rerank_fallback, _rerank_from_response, _rerank_request
+
+    if len(selected) <= 1:
+        return selected, {}, False, "disabled"
+
+    cache_key, cached = _rerank_cache_lookup(question, selected, chunks)
+    if cached:
+        order, scores = cached
+        return order, scores, True, "cache"
+
+    request = _rerank_request(question, chunks, selected, seed, num_ctx, num_predict)
     try:
-        vector: List[float] = await asyncio.to_thread(
-            client.create_embedding,
-            text,
-            RAG_EMBED_MODEL,
-            (EMB_CONNECT_T, EMB_READ_T),
-            retries,
-        )
-        embedding = np.array(vector, dtype=np.float32)
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        return embedding
+        with llm_priority(PRIORITY_BACKGROUND):
+            async with allm_slot(request["model"]):
+                response = await get_llm_client().achat_completion(
+                    **request, retries=DEFAULT_RETRIES if retries is None else retries
+                )
+        return _rerank_from_response(response, chunks, selected, cache_key)
     except Exception as e:
-        logger.error(f"Failed to embed query: {e}")
-        raise LLMError(f"Embedding failed: {e}") from e
+        return _rerank_fallback(e, selected)
 
 
 async def async_ask_llm(
@@ -101,13 +192,14 @@ async def async_ask_llm(
     from .prompts import QWEN_SYSTEM_PROMPT, build_rag_user_prompt
 
     # Use new Qwen prompts if chunks provided, otherwise legacy prompts
-    if chunks is not None:
-        system_prompt = QWEN_SYSTEM_PROMPT
-        user_prompt = build_rag_user_prompt(question, chunks)
-    else:
-        # Legacy format for backward compatibility
-        system_prompt = get_system_prompt()
-        user_prompt = USER_WRAPPER.format(snips=context_block, q=question)
+    with span("prompt_build"):
+        if chunks is not None:
+            system_prompt = QWEN_SYSTEM_PROMPT
+            user_prompt = build_rag_user_prompt(question, chunks)
+        else:
+            # Legacy format for backward compatibility
+            system_prompt = get_system_prompt()
+            user_prompt = USER_WRAPPER.format(snips=context_block, q=question)
 
     client = get_llm_client()
     messages: List[ChatMessage] = [
@@ -121,15 +213,15 @@ async def async_ask_llm(
     }
 
     try:
-        result = await asyncio.to_thread(
-            client.chat_completion,
-            messages,
-            RAG_CHAT_MODEL,
-            options,
-            False,
-            (CHAT_CONNECT_T, CHAT_READ_T),
-            retries,
-        )
+        with span("llm_http", model=RAG_CHAT_MODEL):
+            async with allm_slot(_gateway_model(client, RAG_CHAT_MODEL)):
+                result = await client.achat_completion(
+                    messages,
+                    model=RAG_CHAT_MODEL,
+                    options=options,
+                    timeout=(CHAT_CONNECT_T, CHAT_READ_T),
+                    retries=retries,
+                )
         return result.get("message", {}).get("content", "")
     except LLMUnavailableError:
         raise
@@ -165,13 +257,9 @@ async def async_generate_llm_answer(
     Returns:
         Tuple of (answer_text, timing, confidence, reasoning, sources_used, structured_meta)
     """
-    from .answer import parse_qwen_json
+    from .answer import _llm_answer_inputs, _parse_llm_answer
 
-    # Extract packed chunks if all data is provided (new code path)
-    packed_chunks = None
-    if all_chunks is not None and packed_ids is not None:
-        chunk_id_to_chunk = {c["id"]: c for c in all_chunks}
-        packed_chunks = [chunk_id_to_chunk[cid] for cid in packed_ids if cid in chunk_id_to_chunk]
+    packed_chunks, _structured, valid_url_map = _llm_answer_inputs(packed_ids, all_chunks, article_blocks)
 
     t0 = time.time()
     raw_response = (
@@ -187,54 +275,8 @@ async def async_generate_llm_answer(
     ).strip()
     timing = time.time() - t0
 
-    # Parse JSON response with confidence
-    confidence = None
-    reasoning: Optional[str] = None
-    sources_used: Optional[List[str]] = None
-    intent = "other"
-    user_role_inferred = "unknown"
-    security_sensitivity = "medium"
-    short_intent_summary = ""
-    needs_human_escalation = False
-    answer_style = "ticket_reply"
-    answer = raw_response  # Default to raw response if parsing fails
-
-    try:
-        parsed = parse_qwen_json(raw_response)
-        answer = parsed["answer"]
-        intent = parsed.get("intent", intent)
-        user_role_inferred = parsed.get("user_role_inferred", user_role_inferred)
-        security_sensitivity = parsed.get("security_sensitivity", security_sensitivity)
-        short_intent_summary = parsed.get("short_intent_summary", short_intent_summary)
-        needs_human_escalation = parsed.get("needs_human_escalation", needs_human_escalation)
-        answer_style = parsed.get("answer_style", answer_style)
-        confidence = parsed.get("confidence", confidence)
-        reasoning = parsed.get("reasoning")
-        sources_used = parsed.get("sources_used")
-    except (json.JSONDecodeError, ValueError):
-        answer = raw_response
-
-    # Compute confidence from scores (preferred method, overrides LLM JSON confidence)
-    if scores_dict is not None and selected_indices is not None:
-        from .retrieval import compute_confidence_from_scores
-
-        confidence = compute_confidence_from_scores(scores_dict, selected_indices)
-
-    return (
-        answer,
-        timing,
-        confidence,
-        reasoning,
-        sources_used,
-        {
-            "intent": intent,
-            "user_role_inferred": user_role_inferred,
-            "security_sensitivity": security_sensitivity,
-            "short_intent_summary": short_intent_summary,
-            "needs_human_escalation": needs_human_escalation,
-            "answer_style": answer_style,
-        },
-    )
+    # The reply is always parsed as JSON here; plain text falls back to the raw response
+    return _parse_llm_answer(raw_response, timing, True, valid_url_map, packed_ids, selected_indices, scores_dict)
 
 
 async def async_answer_once(
@@ -252,6 +294,8 @@ async def async_answer_once(
     num_predict: int = DEFAULT_NUM_PREDICT,
     retries: int = DEFAULT_RETRIES,
     faiss_index_path: Optional[str] = None,
+    faiss_index=None,
+    retrieved: Optional[Tuple[List[int], Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """Async version of answer_once for non-blocking LLM calls.
 
@@ -264,174 +308,161 @@ async def async_answer_once(
         top_k: Number of candidates to retrieve
         pack_top: Number of chunks to pack in context
         threshold: Minimum similarity threshold
-        use_rerank: Whether to apply LLM reranking
+        use_rerank: Whether to rerank (with the ``RERANK_BACKEND`` backend)
         seed, num_ctx, num_predict, retries: LLM parameters
         faiss_index_path: Path to FAISS index file
+        faiss_index: Loaded FAISS index to use instead of the process-wide one
+        retrieved: ``retrieve`` result for ``question`` computed by the caller (e.g. one
+            entry of ``retrieve_batch``); retrieval is skipped
 
     Returns:
         Dict with answer and metadata (same format as answer_once)
-    """
-    from .retrieval import retrieve, coverage_ok, pack_snippets
-    from .answer import apply_mmr_diversification, apply_diversity_limits, build_citation_details
 
-    t_start = time.time()
+    Concurrent calls with the same normalised question, index objects and
+    parameters are coalesced (``COALESCE_REQUESTS``): one call runs the
+    pipeline and the others receive its result. Calls with ``retrieved`` are
+    not coalesced.
+    """
+    params = dict(
+        hnsw=hnsw,
+        top_k=top_k,
+        pack_top=pack_top,
+        threshold=threshold,
+        use_rerank=use_rerank,
+        seed=seed,
+        num_ctx=num_ctx,
+        num_predict=num_predict,
+        retries=retries,
+        faiss_index_path=faiss_index_path,
+        faiss_index=faiss_index,
+    )
+    if retrieved is not None or not config.COALESCE_REQUESTS:
+        return await _async_answer_once(question, chunks, vecs_n, bm, retrieved=retrieved, **params)
 
-    # Retrieve (synchronous for now, retrieval is fast)
-    t0 = time.time()
-    selected, scores = retrieve(
-        question, chunks, vecs_n, bm, top_k=top_k, hnsw=hnsw, retries=retries, faiss_index_path=faiss_index_path
+    key = request_key(
+        question,
+        index=(id(chunks), id(vecs_n), id(bm), id(hnsw), id(faiss_index)),
+        **{name: value for name, value in params.items() if name not in ("hnsw", "retries", "faiss_index")},
     )
-    retrieve_time = time.time() - t0
+    result, _shared = await _ANSWER_FLIGHT.do_async(
+        key, lambda: _async_answer_once(question, chunks, vecs_n, bm, **params)
+    )
+    return result
 
-    # Check coverage
-    if not coverage_ok(selected, scores["dense"], threshold):
-        return {
-            "answer": REFUSAL_STR,
-            "refused": True,
-            "confidence": None,
-            "selected_chunks": [],
-            "packed_chunks": [],
-            "context_block": "",
-            "timing": {
-                "total_ms": (time.time() - t_start) * 1000,
-                "retrieve_ms": retrieve_time * 1000,
-                "mmr_ms": 0,
-                "rerank_ms": 0,
-                "llm_ms": 0,
-            },
-            "metadata": {"retrieval_count": len(selected), "coverage_check": "failed"},
-            "routing": get_routing_action(None, refused=True, critical=False),
-        }
 
-    # Apply MMR diversification
-    t0 = time.time()
-    mmr_selected = apply_mmr_diversification(selected, scores, vecs_n, pack_top)
-    mmr_time = time.time() - t0
+@traced("answer")
+async def _async_answer_once(
+    question: str,
+    chunks: List[Dict],
+    vecs_n: np.ndarray,
+    bm: Dict,
+    hnsw=None,
+    top_k: int = DEFAULT_TOP_K,
+    pack_top: int = DEFAULT_PACK_TOP,
+    threshold: float = DEFAULT_THRESHOLD,
+    use_rerank: bool = False,
+    seed: int = DEFAULT_SEED,
+    num_ctx: int = DEFAULT_NUM_CTX,
+    num_predict: int = DEFAULT_NUM_PREDICT,
+    retries: int = DEFAULT_RETRIES,
+    faiss_index_path: Optional[str] = None,
+    faiss_index=None,
+    retrieved: Optional[Tuple[List[int], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Run the async answer pipeline once (no coalescing)."""
+    from .retrieval import retrieve, coverage_ok, pack_snippets, normalize_query, validate_query_length
+    from .answer import _PipelineRun, apply_mmr_diversification, apply_diversity_limits, build_citation_details
 
-    # Reranking (synchronous for now)
-    rerank_time = 0.0
-    rerank_applied = False
-    rerank_reason = "disabled"
-    if use_rerank:
-        from .answer import apply_reranking
+    run = _PipelineRun.start(question, top_k, pack_top)
 
-        t0 = time.time()
-        mmr_selected, rerank_scores, rerank_applied, rerank_reason, rerank_time = apply_reranking(
+    # Retrieve: await the query embedding, score on the executor. The local
+    # SentenceTransformer backend is CPU-bound, so it embeds inside the offloaded call.
+    t0 = time.time()
+    if retrieved is None:
+        query_vector = None
+        if config.EMB_BACKEND != "local":
+            query_vector = await async_embed_query(validate_query_length(normalize_query(question)), retries=retries)
+        retrieved = await _offload(
+            retrieve,
             question,
             chunks,
-            mmr_selected,
-            scores,
-            use_rerank,
-            seed=seed,
-            num_ctx=num_ctx,
-            num_predict=num_predict,
+            vecs_n,
+            bm,
+            top_k=top_k,
+            hnsw=hnsw,
             retries=retries,
+            faiss_index_path=faiss_index_path,
+            faiss_index=faiss_index,
+            query_vector=query_vector,
         )
+    run.selected, scores = retrieved
+    run.retrieve_time = time.time() - t0
+
+    # Check coverage
+    if not coverage_ok(run.selected, scores["dense"], threshold):
+        return run.coverage_refusal(threshold)
 
-    mmr_selected = apply_diversity_limits(mmr_selected, chunks)
+    # Apply MMR diversification
+    t0 = time.time()
+    mmr_selected = await _offload(apply_mmr_diversification, run.selected, scores, vecs_n, pack_top)
+    run.mmr_time = time.time() - t0
 
-    # Pack snippets
-    context_block, packed_ids, used_tokens, article_blocks = pack_snippets(
-        chunks, mmr_selected, pack_top=pack_top, num_ctx=num_ctx
+    # Optional reranking: an awaited LLM call, or the cross-encoder on the executor
+    if use_rerank and config.RERANK_BACKEND != "none":
+        t0 = time.time()
+        if config.RERANK_BACKEND == "cross_encoder":
+            from .retrieval import rerank_with_cross_encoder
+
+            mmr_selected, _rerank_scores, run.rerank_applied, run.rerank_reason = await _offload(
+                rerank_with_cross_encoder, question, chunks, mmr_selected
+            )
+        else:
+            mmr_selected, _rerank_scores, run.rerank_applied, run.rerank_reason = await async_rerank_with_llm(
+                question, chunks, mmr_selected, seed=seed, num_ctx=num_ctx, num_predict=num_predict, retries=retries
+            )
+        run.rerank_time = time.time() - t0
+
+    run.mmr_selected = apply_diversity_limits(mmr_selected, chunks)
+
+    # Pack snippets grouped by article
+    run.context_block, run.packed_ids, run.used_tokens, article_blocks = await _offload(
+        pack_snippets, chunks, run.mmr_selected, pack_top=pack_top, num_ctx=num_ctx
     )
-    citation_details = build_citation_details(chunks, packed_ids)
-
-    def _failure(reason: str, error: Exception) -> Dict[str, Any]:
-        total_time = time.time() - t_start
-        return {
-            "answer": REFUSAL_STR,
-            "refused": True,
-            "confidence": None,
-            "selected_chunks": selected,
-            "packed_chunks": mmr_selected,
-            "context_block": context_block,
-            "timing": {
-                "total_ms": total_time * 1000,
-                "retrieve_ms": retrieve_time * 1000,
-                "mmr_ms": mmr_time * 1000,
-                "rerank_ms": rerank_time * 1000,
-                "llm_ms": 0,
-            },
-            "metadata": {
-                "retrieval_count": len(selected),
-                "packed_count": len(packed_ids),
-                "used_tokens": used_tokens,
-                "rerank_applied": rerank_applied,
-                "rerank_reason": rerank_reason,
-                "llm_error": reason,
-                "llm_error_msg": str(error),
-            },
-            "routing": get_routing_action(None, refused=True, critical=True),
-        }
+    run.citation_details = build_citation_details(chunks, run.packed_ids)
 
     # Generate answer (async)
     try:
-        answer, llm_time, confidence, reasoning, sources_used, structured_meta = await async_generate_llm_answer(
+        llm_out = await async_generate_llm_answer(
             question,
-            context_block,
+            run.context_block,
             seed=seed,
             num_ctx=num_ctx,
             num_predict=num_predict,
             retries=retries,
-            packed_ids=packed_ids,
+            packed_ids=run.packed_ids,
             all_chunks=chunks,
-            selected_indices=selected,
+            selected_indices=run.selected,
             scores_dict=scores,
             article_blocks=article_blocks,
         )
+    except LLMOverloadedError:
+        raise  # shed by the LLM gateway: surfaced to the caller (429/503), not answered as a refusal
     except LLMUnavailableError as exc:
         logger.error(f"LLM unavailable during async answer generation: {exc}")
-        return _failure("llm_unavailable", exc)
+        return run.llm_failure("llm_unavailable", exc)
     except LLMError as exc:
         logger.error(f"LLM error during async answer generation: {exc}")
-        return _failure("llm_error", exc)
-
-    total_time = time.time() - t_start
-
-    # Confidence-based routing
-    refused = answer == REFUSAL_STR
-    routing = get_routing_action(confidence, refused=refused, critical=False)
-
-    return {
-        "answer": answer,
-        "refused": refused,
-        "confidence": confidence,
-        "intent": (structured_meta or {}).get("intent"),
-        "user_role_inferred": (structured_meta or {}).get("user_role_inferred"),
-        "security_sensitivity": (structured_meta or {}).get("security_sensitivity"),
-        "short_intent_summary": (structured_meta or {}).get("short_intent_summary"),
-        "answer_style": (structured_meta or {}).get("answer_style"),
-        "needs_human_escalation": (structured_meta or {}).get("needs_human_escalation"),
-        "sources_used": sources_used,
-        "citation_details": citation_details,
-        "selected_chunks": selected,
-        "packed_chunks": mmr_selected,
-        "context_block": context_block,
-        "timing": {
-            "total_ms": total_time * 1000,
-            "retrieve_ms": retrieve_time * 1000,
-            "mmr_ms": mmr_time * 1000,
-            "rerank_ms": rerank_time * 1000,
-            "llm_ms": llm_time * 1000,
-        },
-        "metadata": {
-            "retrieval_count": len(selected),
-            "packed_count": len(packed_ids),
-            "used_tokens": used_tokens,
-            "rerank_applied": rerank_applied,
-            "rerank_reason": rerank_reason,
-            "citation_details": citation_details,
-            "reasoning": reasoning,
-            "sources_used": sources_used,
-            **(structured_meta or {}),
-        },
-        "routing": routing,
-    }
+        return run.llm_failure("llm_error", exc)
+
+    return run.result(*llm_out)
 
 
 __all__ = [
     "async_embed_query",
+    "async_rerank_with_llm",
     "async_ask_llm",
     "async_generate_llm_answer",
     "async_answer_once",
+    "get_scoring_executor",
+    "shutdown_scoring_executor",
 ]
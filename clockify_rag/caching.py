@@ -1,12 +1,15 @@
 """Query caching and rate limiting for RAG system."""
 
+import copy
 import hashlib
 import logging
 import os
 import threading
 import time
 from collections import OrderedDict, deque
-from typing import Optional
+from typing import Optional, Tuple
+
+import numpy as np
 
 from .metrics import MetricNames, increment_counter, set_gauge
 
@@ -15,6 +18,8 @@ logger = logging.getLogger(__name__)
 # FIX (Error #2): Declare globals at module level for safe initialization
 _RATE_LIMITER = None
 _QUERY_CACHE = None
+_QUERY_EMBED_CACHE = None
+_SEMANTIC_ANSWER_CACHE = None
 
 
 class RateLimiter:
@@ -319,6 +324,365 @@ def get_query_cache():
     return _QUERY_CACHE
 
 
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU of query text -> query embedding.
+
+    Keys are the question lowercased with whitespace collapsed, prefixed with the
+    embedding namespace (backend, model, dim) so a model or backend switch never
+    returns a vector from another embedding space. Embeddings are deterministic
+    per model, so entries do not expire; the LRU bound keeps memory flat.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, maxsize=4096):
+        """Initialize query-embedding cache.
+
+        Args:
+            maxsize: Maximum number of cached vectors (0 disables the cache)
+        """
+        self.maxsize = maxsize
+        self._cache: OrderedDict = OrderedDict()  # {(backend, model, dim, text): float32 vector}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Cache key text: lowercased, whitespace collapsed."""
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def _namespace() -> Tuple[str, str, int]:
+        from .embedding_cache import current_namespace
+
+        return current_namespace()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return a copy of the cached vector for ``text``, or None on a miss."""
+        if self.maxsize <= 0:
+            return None
+        key = (*self._namespace(), self.normalize(text))
+        with self._lock:
+            vec = self._cache.get(key)
+            if vec is None:
+                self.misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        if vec is None:
+            increment_counter(MetricNames.QUERY_EMBED_CACHE_MISSES)
+            return None
+        increment_counter(MetricNames.QUERY_EMBED_CACHE_HITS)
+        return vec.copy()
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        """Store the embedding of ``text`` (evicting the least recently used entry when full)."""
+        if self.maxsize <= 0:
+            return
+        key = (*self._namespace(), self.normalize(text))
+        vec = np.array(vector, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._cache[key] = vec
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            size = len(self._cache)
+        set_gauge(MetricNames.QUERY_EMBED_CACHE_SIZE, size)
+
+    def __contains__(self, text: str) -> bool:
+        key = (*self._namespace(), self.normalize(text))
+        with self._lock:
+            return key in self._cache
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def clear(self):
+        """Clear all cache entries."""
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+        set_gauge(MetricNames.QUERY_EMBED_CACHE_SIZE, 0)
+
+    def stats(self) -> dict:
+        """Get cache statistics.
+
+        Returns:
+            Dict with hits, misses, size, maxsize, hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+    def save(self, path: str) -> int:
+        """Write the current namespace's entries to ``path`` (.npz), oldest first.
+
+        Returns:
+            Number of entries saved
+        """
+        import io
+        import json
+
+        from .utils import atomic_write_bytes
+
+        backend, model, dim = self._namespace()
+        with self._lock:
+            items = [(key[3], vec) for key, vec in self._cache.items() if key[:3] == (backend, model, dim)]
+        meta = {"format_version": self.FORMAT_VERSION, "backend": backend, "model": model, "dim": dim}
+        vectors = np.array([vec for _, vec in items], dtype=np.float32).reshape(len(items), dim)
+        buf = io.BytesIO()
+        np.savez(buf, meta=np.array(json.dumps(meta)), texts=np.array([text for text, _ in items]), vectors=vectors)
+        try:
+            atomic_write_bytes(path, buf.getvalue())
+        except OSError as e:
+            logger.warning(f"[query_embed_cache] Failed to save cache: {e}")
+            return 0
+        logger.info(f"[query_embed_cache] SAVE {len(items)} entries to {path}")
+        return len(items)
+
+    def load(self, path: str) -> int:
+        """Load entries saved by :meth:`save` for the current namespace.
+
+        Returns:
+            Number of entries loaded (0 if the file is missing, unreadable or
+            from another backend/model/dim)
+        """
+        import json
+
+        if not os.path.exists(path):
+            logger.debug(f"[query_embed_cache] No cache file found at {path}")
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                texts = [str(t) for t in data["texts"]]
+                vectors = np.asarray(data["vectors"], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"[query_embed_cache] Failed to load cache: {e}")
+            return 0
+
+        namespace = (meta.get("backend"), meta.get("model"), meta.get("dim"))
+        if meta.get("format_version") != self.FORMAT_VERSION or namespace != self._namespace():
+            logger.info(f"[query_embed_cache] Skipping {path}: saved for {namespace}, current {self._namespace()}")
+            return 0
+        for text, vec in zip(texts, vectors):
+            self.put(text, vec)
+        loaded = min(len(texts), max(self.maxsize, 0))
+        logger.info(f"[query_embed_cache] LOAD {loaded} entries from {path}")
+        return loaded
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Get global query-embedding cache instance."""
+    from . import config  # Import here to avoid circular import
+
+    global _QUERY_EMBED_CACHE
+    if _QUERY_EMBED_CACHE is None:
+        _QUERY_EMBED_CACHE = QueryEmbeddingCache(maxsize=config.QUERY_EMBED_CACHE_SIZE)
+    return _QUERY_EMBED_CACHE
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed by query-embedding similarity (TTL + LRU).
+
+    Catches paraphrases the exact-text tiers miss ("how do i add a timer" vs
+    "how to add timer"): a lookup returns the cached answer whose query vector
+    has the highest cosine similarity to the new one, provided it reaches
+    ``threshold``. Vectors live in one preallocated float32 matrix, so a lookup
+    is a single matrix-vector product.
+
+    Entries are scoped by embedding namespace and retrieval params (which carry
+    the index signature). Storing an answer for a new index signature drops every
+    entry built on another index.
+    """
+
+    def __init__(self, maxsize=512, ttl_seconds=3600, threshold=0.95):
+        """Initialize semantic answer cache.
+
+        Args:
+            maxsize: Maximum number of cached answers (0 disables the cache)
+            ttl_seconds: Time-to-live for cache entries in seconds
+            threshold: Minimum cosine similarity for a hit
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: OrderedDict = OrderedDict()  # {slot: (scope, question, answer, metadata, timestamp)}
+        self._vectors: Optional[np.ndarray] = None  # (maxsize, dim), allocated on first put
+        self._scope_hashes = np.zeros(max(maxsize, 0), dtype=np.int64)
+        self._free = list(range(max(maxsize, 0) - 1, -1, -1))
+        self._index_signature = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    @staticmethod
+    def _scope(params: Optional[dict]) -> tuple:
+        from .embedding_cache import current_namespace
+
+        return (*current_namespace(), tuple(sorted((params or {}).items())))
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def get(self, vector: np.ndarray, params: Optional[dict] = None):
+        """Return the closest cached answer for a query vector.
+
+        Returns:
+            (answer, metadata, similarity, cached_question) on a hit, None on a miss
+        """
+        if not self.enabled:
+            return None
+        scope = self._scope(params)
+        query = self._unit(vector)
+        with self._lock:
+            hit = self._lookup(query, scope)
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                slot, similarity = hit
+                _scope, question, answer, metadata, _ts = self._entries[slot]
+            size = len(self._entries)
+        set_gauge(MetricNames.SEMANTIC_CACHE_SIZE, size)
+        if hit is None:
+            return None
+        logger.debug(f"[semantic_cache] HIT similarity={similarity:.3f} cached_question={question!r}")
+        return answer, copy.deepcopy(metadata), similarity, question
+
+    def _lookup(self, query: np.ndarray, scope: tuple):
+        """Best live slot in ``scope`` at or above the threshold (caller holds the lock)."""
+        if self._vectors is None or not self._entries or self._vectors.shape[1] != query.shape[0]:
+            return None
+        slots = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+        slots = slots[self._scope_hashes[slots] == hash(scope)]
+        if slots.size == 0:
+            return None
+        sims = self._vectors[slots] @ query
+        now = time.time()
+        for i in np.argsort(-sims):
+            similarity = float(sims[i])
+            if similarity < self.threshold:
+                return None
+            slot = int(slots[i])
+            entry_scope, _q, _a, _m, timestamp = self._entries[slot]
+            if now - timestamp > self.ttl_seconds:
+                self._release(slot)
+                continue
+            if entry_scope != scope:  # hash collision
+                continue
+            self._entries.move_to_end(slot)
+            return slot, similarity
+        return None
+
+    def put(self, question: str, vector: np.ndarray, answer: str, metadata: dict, params: Optional[dict] = None):
+        """Store an answer under its query vector (evicting the least recently used entry when full)."""
+        if not self.enabled:
+            return
+        scope = self._scope(params)
+        query = self._unit(vector)
+        index_signature = (params or {}).get("index")
+        metadata_copy = copy.deepcopy(metadata) if metadata is not None else {}
+        with self._lock:
+            if index_signature != self._index_signature:
+                self._drop_other_indexes(index_signature)
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                # First entry, or a new embedding dimension: start a fresh matrix
+                self._vectors = np.zeros((self.maxsize, query.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._free = list(range(self.maxsize - 1, -1, -1))
+            if not self._free:
+                oldest, _ = self._entries.popitem(last=False)
+                self._free.append(oldest)
+            slot = self._free.pop()
+            self._vectors[slot] = query
+            self._scope_hashes[slot] = hash(scope)
+            self._entries[slot] = (scope, question, answer, metadata_copy, time.time())
+            size = len(self._entries)
+        set_gauge(MetricNames.SEMANTIC_CACHE_SIZE, size)
+
+    def _drop_other_indexes(self, index_signature) -> None:
+        """Release entries cached for any index but ``index_signature`` (caller holds the lock)."""
+        stale = [slot for slot, entry in self._entries.items() if dict(entry[0][3]).get("index") != index_signature]
+        for slot in stale:
+            self._release(slot)
+        if stale:
+            logger.info(f"[semantic_cache] Dropped {len(stale)} entries for a previous index")
+        self._index_signature = index_signature
+
+    def invalidate(self, index_signature=None) -> None:
+        """Drop entries not built on ``index_signature`` (all entries when None)."""
+        with self._lock:
+            self._drop_other_indexes(index_signature)
+            size = len(self._entries)
+        set_gauge(MetricNames.SEMANTIC_CACHE_SIZE, size)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        """Clear all cache entries."""
+        with self._lock:
+            self._entries.clear()
+            self._free = list(range(max(self.maxsize, 0) - 1, -1, -1))
+            self._index_signature = None
+            self.hits = 0
+            self.misses = 0
+        set_gauge(MetricNames.SEMANTIC_CACHE_SIZE, 0)
+
+    def stats(self) -> dict:
+        """Get cache statistics.
+
+        Returns:
+            Dict with hits, misses, size, maxsize, threshold, hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+
+def get_semantic_answer_cache() -> SemanticAnswerCache:
+    """Get global semantic answer cache instance."""
+    from . import config  # Import here to avoid circular import
+
+    global _SEMANTIC_ANSWER_CACHE
+    if _SEMANTIC_ANSWER_CACHE is None:
+        _SEMANTIC_ANSWER_CACHE = SemanticAnswerCache(
+            maxsize=config.SEMANTIC_CACHE_SIZE,
+            ttl_seconds=config.SEMANTIC_CACHE_TTL,
+            threshold=config.SEMANTIC_CACHE_THRESHOLD,
+        )
+    return _SEMANTIC_ANSWER_CACHE
+
+
 def log_query(
     query: str,
     answer: str,
@@ -0,0 +1,123 @@
+"""Per-chunk static features for the retrieval hot path.
+
+Everything retrieval needs to know about a chunk that does not depend on the
+query (hub-page flag, article and section identity for dedup, intent keyword
+matches) is computed once per loaded index and kept as NumPy arrays, so
+scoring a query never walks the chunk dicts:
+
+    features = get_chunk_features(chunks)
+    scores *= features.hub_multipliers(config.HUB_PAGE_SCORE_MULTIPLIER)
+
+``load_index`` computes the features when it loads the chunks; any other
+chunk list gets them computed on first use. Features are keyed by the identity
+of the chunk list, so treat a loaded chunk list as immutable.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .intent_classification import INTENT_BOOST_KEYWORDS
+
+# Features for the last few chunk lists (current index, a hot-swapped one, test corpora)
+_FEATURES_MAX = 4
+_FEATURES: "OrderedDict[int, tuple]" = OrderedDict()
+_FEATURES_LOCK = threading.Lock()
+
+
+def _article_key(chunk: Dict[str, Any]) -> str:
+    """Return a stable article identifier for grouping chunks."""
+    meta = chunk.get("metadata", {}) or {}
+    for key in ("url", "source_url", "doc_url"):
+        val = chunk.get(key) or meta.get(key)
+        if val:
+            return str(val)
+    if chunk.get("article_id"):
+        return f"article:{chunk['article_id']}"
+    if meta.get("article_id"):
+        return f"article:{meta['article_id']}"
+    return str(chunk.get("doc_name") or chunk.get("id"))
+
+
+def _intern(values: List[Any]) -> np.ndarray:
+    """Map each value to a dense int id (first occurrence order)."""
+    ids: Dict[Any, int] = {}
+    return np.fromiter((ids.setdefault(v, len(ids)) for v in values), dtype=np.int32, count=len(values))
+
+
+@dataclass
+class ChunkFeatures:
+    """Query-independent per-chunk arrays, aligned with the chunk list."""
+
+    is_hub: np.ndarray  # bool: chunk is a hub/category page
+    article_ids: np.ndarray  # int32 id of the chunk's article key
+    section_ids: np.ndarray  # int32 id of the chunk's section
+    dedup_ids: np.ndarray  # int32 id of the (article, section) pair retrieval dedups on
+    intent_masks: Dict[str, np.ndarray]  # intent name -> bool: text or title has a boost keyword
+    _hub_cache: Dict[float, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[Dict[str, Any]]) -> "ChunkFeatures":
+        is_hub = np.fromiter(
+            (bool((c.get("metadata") or {}).get("is_hub")) for c in chunks), dtype=bool, count=len(chunks)
+        )
+        articles = [_article_key(c) for c in chunks]
+        sections = [c.get("section") for c in chunks]
+        lowered = [f"{c.get('text') or ''}\n{c.get('title') or ''}".lower() for c in chunks]
+        intent_masks = {
+            intent: np.fromiter((any(kw in text for kw in keywords) for text in lowered), dtype=bool, count=len(chunks))
+            for intent, keywords in INTENT_BOOST_KEYWORDS.items()
+        }
+        return cls(
+            is_hub=is_hub,
+            article_ids=_intern(articles),
+            section_ids=_intern(sections),
+            dedup_ids=_intern(list(zip(articles, sections))),
+            intent_masks=intent_masks,
+        )
+
+    def __len__(self) -> int:
+        return int(self.is_hub.shape[0])
+
+    def hub_multipliers(self, multiplier: float) -> np.ndarray:
+        """Score multiplier per chunk: ``multiplier`` for hub pages, 1.0 otherwise."""
+        vec = self._hub_cache.get(multiplier)
+        if vec is None:
+            vec = np.where(self.is_hub, np.float32(multiplier), np.float32(1.0)).astype(np.float32)
+            self._hub_cache[multiplier] = vec
+        return vec
+
+    def intent_mask(self, intent: str) -> Optional[np.ndarray]:
+        """Chunks matching ``intent``'s boost keywords, or None if the intent has none."""
+        return self.intent_masks.get(intent)
+
+    def dedup(self, idx: np.ndarray) -> List[int]:
+        """Keep the first of ``idx`` (ranked chunk indices) per (article, section)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        if not idx.size:
+            return []
+        _, first = np.unique(self.dedup_ids[idx], return_index=True)
+        return idx[np.sort(first)].tolist()
+
+
+def get_chunk_features(chunks: Sequence[Dict[str, Any]]) -> ChunkFeatures:
+    """Features for ``chunks``, computed once per chunk list."""
+    key = id(chunks)
+    with _FEATURES_LOCK:
+        entry = _FEATURES.get(key)
+        # The entry holds a reference to its list, so a live id() is never reused
+        if entry is not None and entry[0] is chunks and len(entry[1]) == len(chunks):
+            _FEATURES.move_to_end(key)
+            return entry[1]
+    features = ChunkFeatures.from_chunks(chunks)
+    with _FEATURES_LOCK:
+        _FEATURES[key] = (chunks, features)
+        _FEATURES.move_to_end(key)
+        while len(_FEATURES) > _FEATURES_MAX:
+            _FEATURES.popitem(last=False)
+    return features
@@ -4,12 +4,16 @@ This module provides utilities to parse and chunk documents for the RAG system.
 It includes heading-aware splitting, sentence-aware chunking, and overlap management.
 """
 
+import json
 import logging
+import os
 import pathlib
 import re
 import unicodedata
 import hashlib
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from .config import CHUNK_CHARS, CHUNK_OVERLAP
 from .utils import norm_ws, strip_noise
@@ -18,6 +22,8 @@ logger = logging.getLogger(__name__)
 
 _FRONT_MATTER_PATTERN = re.compile(r"^---\s*\n(.*?)\n---\s*\n(.*?)(?=\n---\s*\n|\Z)", re.S | re.M)
 _HIGH_PRIORITY_SECTIONS = {"key points", "limits & gotchas", "canonical answer"}
+# Below this many articles, process start-up costs more than parallel chunking saves
+PARALLEL_CHUNK_MIN_ARTICLES = 32
 
 # Rank 23: NLTK for sentence-aware chunking
 try:
@@ -435,88 +441,178 @@ def yield_sentence_aware_chunk(text: str, maxc: int, overlap: int) -> list:
     return character_chunking(text, maxc, overlap)
 
 
-def build_chunks(md_path: str) -> list:
-    """Parse and chunk markdown with enhanced metadata extraction.
+def chunk_parsed_article(art: dict, source_path: pathlib.Path, doc_name: str) -> list:
+    """Chunk one parsed article (as returned by ``parse_articles``) with enhanced metadata.
 
     Args:
-        md_path: Path to the markdown file to chunk
+        art: Parsed article dict with title, url, body and meta
+        source_path: Markdown file the article came from
+        doc_name: Stem of ``source_path`` (fallback article id/slug)
 
     Returns:
-        List of chunk dictionaries with enhanced metadata
+        List of chunk dictionaries for this article, in section order
     """
-    path_obj = pathlib.Path(md_path)
     chunks = []
+    meta = dict(art.get("meta") or {})
+    article_id = str(meta.get("id") or meta.get("slug") or doc_name).strip()
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "-", meta.get("slug") or article_id or doc_name).strip("-") or doc_name
+    meta.setdefault("slug", slug)
+    title = norm_ws(meta.get("short_title") or meta.get("title") or art["title"])
+    source_url = meta.get("source_url") or meta.get("url") or art.get("url")
+
+    sects = split_by_headings(art["body"]) or [art["body"]]
+
+    for sect_idx, sect in enumerate(sects):
+        # Extract the section header/title from the content
+        head = sect.splitlines()[0] if sect else art["title"]
+        section_label = _clean_section_header(head)
+
+        # Build breadcrumb-style hierarchy for disambiguation
+        clean_title = title.replace(" - Clockify Help", "").strip()
+        hierarchy = [clean_title] if clean_title else []
+        if section_label and section_label.lower() != clean_title.lower():
+            hierarchy.append(section_label)
+
+        subsection_headers = extract_subsection_headers(sect)
+        if subsection_headers:
+            hierarchy.append(subsection_headers[0])
+
+        breadcrumb = " > ".join(hierarchy)
+
+        # Create chunks for this section
+        text_chunks = sliding_chunks(sect)
+
+        for chunk_idx, piece in enumerate(text_chunks):
+            enriched_text = f"Context: {breadcrumb}\n\n{piece}" if breadcrumb else piece
+            # Stable ID for repeatable citations across rebuilds
+            hash_source = f"{slug}|{sect_idx}|{chunk_idx}|{enriched_text}"
+            cid_hash = hashlib.sha1(hash_source.encode("utf-8")).hexdigest()[:8]
+            cid = f"{slug}_{sect_idx}_{chunk_idx}_{cid_hash}"
+
+            # Extract additional metadata
+            metadata = {**extract_metadata(piece), **meta}
+            if section_label:
+                metadata.setdefault("section_type", section_label)
+                importance = _section_importance(section_label)
+                if importance:
+                    metadata["section_importance"] = importance
+            if breadcrumb:
+                metadata["breadcrumb"] = breadcrumb
+
+            chunk_obj = {
+                "id": cid,
+                "article_id": article_id,
+                "title": title,
+                "url": source_url,
+                "section": section_label,
+                "subsection": subsection_headers[0] if subsection_headers else "",
+                "text": enriched_text,
+                "doc_path": str(source_path),
+                "doc_name": doc_name,
+                "section_idx": sect_idx,
+                "chunk_idx": chunk_idx,
+                "char_count": len(enriched_text),
+                "word_count": len(enriched_text.split()),
+                "metadata": metadata,
+            }
+
+            chunks.append(chunk_obj)
 
-    for source_path, raw in _iter_markdown_sources(path_obj):
-        doc_name = source_path.stem
+    return chunks
+
+
+def chunking_signature() -> Dict[str, Any]:
+    """Settings that change chunk output; chunks built under different settings are not reusable."""
+    return {"chunk_chars": CHUNK_CHARS, "chunk_overlap": CHUNK_OVERLAP, "nltk": _NLTK_AVAILABLE}
 
+
+def iter_articles(md_path: str):
+    """Yield ``(key, sha, source_path, doc_name, article)`` for every article in the corpus.
+
+    ``key`` identifies the article across edits (document plus id, URL or
+    title; repeats get a ``#n`` suffix) and ``sha`` fingerprints everything
+    chunking reads, so an unchanged sha means unchanged chunks.
+    """
+    seen: Dict[str, int] = {}
+    for source_path, raw in _iter_markdown_sources(pathlib.Path(md_path)):
+        doc_name = source_path.stem
         for art in parse_articles(raw):
-            meta = dict(art.get("meta") or {})
-            article_id = str(meta.get("id") or meta.get("slug") or doc_name).strip()
-            slug = re.sub(r"[^A-Za-z0-9_-]+", "-", meta.get("slug") or article_id or doc_name).strip("-") or doc_name
-            meta.setdefault("slug", slug)
-            title = norm_ws(meta.get("short_title") or meta.get("title") or art["title"])
-            source_url = meta.get("source_url") or meta.get("url") or art.get("url")
-
-            sects = split_by_headings(art["body"]) or [art["body"]]
-
-            for sect_idx, sect in enumerate(sects):
-                # Extract the section header/title from the content
-                head = sect.splitlines()[0] if sect else art["title"]
-                section_label = _clean_section_header(head)
-
-                # Build breadcrumb-style hierarchy for disambiguation
-                clean_title = title.replace(" - Clockify Help", "").strip()
-                hierarchy = [clean_title] if clean_title else []
-                if section_label and section_label.lower() != clean_title.lower():
-                    hierarchy.append(section_label)
-
-                subsection_headers = extract_subsection_headers(sect)
-                if subsection_headers:
-                    hierarchy.append(subsection_headers[0])
-
-                breadcrumb = " > ".join(hierarchy)
-
-                # Create chunks for this section
-                text_chunks = sliding_chunks(sect)
-
-                for chunk_idx, piece in enumerate(text_chunks):
-                    enriched_text = f"Context: {breadcrumb}\n\n{piece}" if breadcrumb else piece
-                    # Stable ID for repeatable citations across rebuilds
-                    hash_source = f"{slug}|{sect_idx}|{chunk_idx}|{enriched_text}"
-                    cid_hash = hashlib.sha1(hash_source.encode("utf-8")).hexdigest()[:8]
-                    cid = f"{slug}_{sect_idx}_{chunk_idx}_{cid_hash}"
-
-                    # Extract additional metadata
-                    metadata = {**extract_metadata(piece), **meta}
-                    if section_label:
-                        metadata.setdefault("section_type", section_label)
-                        importance = _section_importance(section_label)
-                        if importance:
-                            metadata["section_importance"] = importance
-                    if breadcrumb:
-                        metadata["breadcrumb"] = breadcrumb
-
-                    chunk_obj = {
-                        "id": cid,
-                        "article_id": article_id,
-                        "title": title,
-                        "url": source_url,
-                        "section": section_label,
-                        "subsection": subsection_headers[0] if subsection_headers else "",
-                        "text": enriched_text,
-                        "doc_path": str(source_path),
-                        "doc_name": doc_name,
-                        "section_idx": sect_idx,
-                        "chunk_idx": chunk_idx,
-                        "char_count": len(enriched_text),
-                        "word_count": len(enriched_text.split()),
-                        "metadata": metadata,
-                    }
-
-                    chunks.append(chunk_obj)
+            meta = art.get("meta") or {}
+            ident = meta.get("id") or art.get("url") or art.get("title") or ""
+            base_key = f"{doc_name}:{ident}"
+            seen[base_key] = seen.get(base_key, 0) + 1
+            key = base_key if seen[base_key] == 1 else f"{base_key}#{seen[base_key]}"
+            payload = json.dumps(
+                {
+                    "doc": str(source_path),
+                    "title": art["title"],
+                    "url": art.get("url"),
+                    "body": art["body"],
+                    "meta": meta,
+                },
+                sort_keys=True,
+                default=str,
+            )
+            yield key, hashlib.sha256(payload.encode("utf-8")).hexdigest(), source_path, doc_name, art
+
+
+def resolve_chunk_workers(workers: Optional[int] = None) -> int:
+    """Number of chunking processes: ``workers`` or ``config.CHUNK_WORKERS`` (0 = one per CPU)."""
+    from . import config
+
+    workers = config.CHUNK_WORKERS if workers is None else workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _chunk_shard(shard: List[Tuple[pathlib.Path, str, dict]]) -> List[list]:
+    return [chunk_parsed_article(art, source_path, doc_name) for source_path, doc_name, art in shard]
+
+
+def chunk_articles(articles: Iterable[Tuple[pathlib.Path, str, dict]], workers: Optional[int] = None) -> List[list]:
+    """Chunk ``(source_path, doc_name, article)`` items, optionally across a process pool.
+
+    Articles are chunked independently, so the pool only changes where the
+    work runs: results come back per article, in input order, identical to
+    serial chunking.
 
-    return chunks
+    Args:
+        articles: Parsed articles with their source file and document name
+        workers: Worker processes (default: ``config.CHUNK_WORKERS``; 1 = serial, 0 = one per CPU)
+
+    Returns:
+        One list of chunk dictionaries per input article
+    """
+    articles = list(articles)
+    workers = min(resolve_chunk_workers(workers), len(articles))
+    if workers <= 1 or len(articles) < PARALLEL_CHUNK_MIN_ARTICLES:
+        return _chunk_shard(articles)
+
+    # Contiguous shards keep the output in order; several per worker even out long articles
+    size = -(-len(articles) // (workers * 4))
+    shards = [articles[i : i + size] for i in range(0, len(articles), size)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_chunk_shard, shards))
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("Parallel chunking unavailable (%s); chunking serially", e)
+        return _chunk_shard(articles)
+    return [article_chunks for shard in results for article_chunks in shard]
+
+
+def build_chunks(md_path: str, workers: Optional[int] = None) -> list:
+    """Parse and chunk markdown with enhanced metadata extraction.
+
+    Args:
+        md_path: Path to the markdown file to chunk
+        workers: Chunking processes (see :func:`chunk_articles`)
+
+    Returns:
+        List of chunk dictionaries with enhanced metadata
+    """
+    articles = [(source_path, doc_name, art) for _key, _sha, source_path, doc_name, art in iter_articles(md_path)]
+    return [chunk for article_chunks in chunk_articles(articles, workers) for chunk in article_chunks]
 
 
 def extract_subsection_headers(section_text: str) -> List[str]:
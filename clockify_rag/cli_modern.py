@@ -23,6 +23,8 @@ from rich.table import Table
 from . import config
 from .answer import answer_once, answer_to_json
 from .runtime import ensure_index_ready, chat_repl
+from .generations import artifact_files, current_generation
+from .incremental import build_incremental
 from .indexing import build, index_is_fresh
 from .utils import ALLOWED_CORPUS_FILENAME, check_ollama_connectivity, resolve_corpus_path
 
@@ -110,15 +112,17 @@ def get_dependency_info() -> dict:
 def get_index_info() -> dict:
     """Check index files and their status, including cache statistics."""
     info = {}
+    generation = current_generation()
+    files = artifact_files(generation)
     required_files = [
-        config.FILES["chunks"],
-        config.FILES["emb"],
-        config.FILES["meta"],
-        config.FILES["bm25"],
-        config.FILES["index_meta"],
+        files["chunks"],
+        files["emb"],
+        files["meta"],
+        files["bm25_index"],
+        files["index_meta"],
     ]
 
-    for key, fname in config.FILES.items():
+    for key, fname in files.items():
         exists = os.path.exists(fname)
         size = os.path.getsize(fname) if exists else 0
         info[key] = {
@@ -133,24 +137,32 @@ def get_index_info() -> dict:
     # Cache statistics
     cache_stats: dict = {
         "entries": 0,
+        "rows": 0,
         "size_mb": 0.0,
         "exists": False,
+        "legacy_jsonl": os.path.exists(config.FILES["emb_cache"]),  # migrated on next build
     }
-    cache_path = config.FILES.get("emb_cache", "emb_cache.jsonl")
-    if os.path.exists(cache_path):
+    cache_root = config.FILES["emb_cache_store"]
+    if os.path.isdir(cache_root):
         cache_stats["exists"] = True
-        cache_stats["size_mb"] = round(os.path.getsize(cache_path) / (1024 * 1024), 2)
+        size = sum(
+            os.path.getsize(os.path.join(dirpath, name)) for dirpath, _, names in os.walk(cache_root) for name in names
+        )
+        cache_stats["size_mb"] = round(size / (1024 * 1024), 2)
         try:
-            with open(cache_path, "r", encoding="utf-8") as f:
-                cache_stats["entries"] = sum(1 for _ in f)
+            from .embedding_cache import EmbeddingCacheStore
+
+            store = EmbeddingCacheStore.open(migrate=False)
+            cache_stats["entries"] = len(store)
+            cache_stats["rows"] = store.rows
         except Exception:
             pass
 
     # Index metadata (build info, staleness)
     index_meta = {}
-    if os.path.exists(config.FILES["index_meta"]):
+    if os.path.exists(files["index_meta"]):
         try:
-            with open(config.FILES["index_meta"], "r", encoding="utf-8") as f:
+            with open(files["index_meta"], "r", encoding="utf-8") as f:
                 index_meta = json.load(f)
         except Exception:
             pass
@@ -160,6 +172,7 @@ def get_index_info() -> dict:
         "index_ready": all_required,
         "cache": cache_stats,
         "meta": index_meta,
+        "generation": os.path.basename(generation) if generation else None,
     }
 
 
@@ -355,6 +368,12 @@ def ingest(
         help="Input markdown file (only knowledge_helpcenter.md is supported)",
     ),
     force: bool = typer.Option(False, "--force", "-f", help="Force rebuild even if index exists"),
+    incremental: bool = typer.Option(
+        False, "--incremental", help="Re-chunk and re-embed only changed articles (falls back to a full build)"
+    ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", min=0, help="Chunking processes (default: CHUNK_WORKERS; 1 = serial, 0 = one per CPU)"
+    ),
 ) -> None:
     """Build or rebuild the index from knowledge base.
 
@@ -366,6 +385,8 @@ def ingest(
 
     Example:
         ragctl ingest --input knowledge_helpcenter.md --force
+        ragctl ingest --incremental
+        ragctl ingest --force --workers 4
     """
     if input and os.path.basename(input) != ALLOWED_CORPUS_FILENAME:
         console.print(f"❌ Only {ALLOWED_CORPUS_FILENAME} is supported for ingestion.")
@@ -385,7 +406,19 @@ def ingest(
     console.print(f"📥 Ingesting: {input_file_abs}")
 
     try:
-        build(input_file_abs, retries=2)
+        if incremental:
+            stats = build_incremental(input_file_abs, retries=2, workers=workers)
+            articles = stats.get("articles")
+            if articles:
+                console.print(
+                    f"   Articles: {articles['changed']} changed, {articles['added']} added, "
+                    f"{articles['removed']} removed, {articles['unchanged']} unchanged"
+                )
+            if stats.get("fallback_reason"):
+                console.print(f"   Full rebuild: {stats['fallback_reason']}")
+            console.print(f"   Took {stats['timings_ms']['total']:.0f} ms ({stats['mode']})")
+        else:
+            build(input_file_abs, retries=2, workers=workers)
 
         console.print("✅ Index built successfully!")
 
@@ -395,6 +395,8 @@ EMB_MODEL = RAG_EMBED_MODEL
 # ====== CHUNKING CONFIG ======
 CHUNK_CHARS = _parse_env_int("CHUNK_CHARS", 1600, min_val=100, max_val=8000)
 CHUNK_OVERLAP = _parse_env_int("CHUNK_OVERLAP", 200, min_val=0, max_val=4000)
+# Processes used to chunk articles during builds (1 = serial, 0 = one per CPU)
+CHUNK_WORKERS = _parse_env_int("CHUNK_WORKERS", 1, min_val=0, max_val=64)
 
 # ====== RETRIEVAL CONFIG ======
 # OPTIMIZATION: Increase retrieval parameters for better recall on internal deployment
@@ -437,6 +439,9 @@ AUTO_REBUILD_ON_STALE = _get_bool_env("AUTO_REBUILD_ON_STALE", "0")
 # FIX (Error #13): Use safe env var parsing
 BM25_K1 = _parse_env_float("BM25_K1", 1.2, min_val=0.1, max_val=10.0)  # Was 1.0, now 1.2
 BM25_B = _parse_env_float("BM25_B", 0.65, min_val=0.0, max_val=1.0)
+# The index is stored as memory-mapped .npy arrays (FILES["bm25_index"]). Set to 1
+# to also write the legacy bm25.json during builds for debugging.
+BM25_EXPORT_JSON = _get_bool_env("BM25_EXPORT_JSON", "0")
 
 # ====== LLM CONFIG ======
 # OPTIMIZATION: Increase DEFAULT_NUM_CTX to 32768 to match Qwen 32B's full context window
@@ -463,6 +468,11 @@ MMR_LAMBDA = _parse_env_float("MMR_LAMBDA", 0.75, min_val=0.0, max_val=1.0)  # W
 # Can be overridden via CTX_BUDGET env var
 # FIX (Error #13): Use safe env var parsing
 CTX_TOKEN_BUDGET = _parse_env_int("CTX_BUDGET", 12000, min_val=100, max_val=100000)  # Was 6000, now 12000
+# Token counting for packing: a local Hugging Face tokenizer.json gives real counts
+# (needs the `tokenizers` package). Empty uses tiktoken for GPT models and a
+# chars-per-token heuristic otherwise. Real-tokenizer encodings are LRU-cached.
+TOKENIZER_PATH = _get_env_value("TOKENIZER_PATH", "") or ""
+TOKENIZER_CACHE_SIZE = _parse_env_int("TOKENIZER_CACHE_SIZE", 4096, min_val=0, max_val=1000000)
 
 # ====== EMBEDDINGS BACKEND (v4.1) ======
 EMB_BACKEND = (_get_env_value("EMB_BACKEND", "ollama") or "ollama").lower()  # "local" or "ollama"
@@ -547,6 +557,16 @@ ALLOWED_ORIGINS = [
 # FIX (Error #13): Use safe env var parsing
 EMB_MAX_WORKERS = _parse_env_int("EMB_MAX_WORKERS", 8, min_val=1, max_val=64)  # Concurrent requests
 EMB_BATCH_SIZE = _parse_env_int("EMB_BATCH_SIZE", 32, min_val=1, max_val=1000)  # Texts per batch
+# Send each batch as one POST /api/embed request (Ollama >= 0.3). Servers without
+# the batched endpoint are detected automatically and served per-text instead.
+EMB_BATCH_API = _get_bool_env("EMB_BATCH_API", "1")
+# Rewrite the binary embedding cache once more than this fraction of its rows
+# belong to chunks that are no longer in the corpus (rows are append-only).
+EMB_CACHE_COMPACT_RATIO = _parse_env_float("EMB_CACHE_COMPACT_RATIO", 0.25, min_val=0.0, max_val=1.0)
+# Incremental builds patch the index in place; once the rows replaced since the
+# last full build exceed this fraction of it, fall back to a full rebuild so
+# idf statistics and the FAISS IVF centroids are refreshed from scratch.
+INCREMENTAL_MAX_DRIFT = _parse_env_float("INCREMENTAL_MAX_DRIFT", 0.3, min_val=0.0, max_val=1.0)
 
 # ====== REFUSAL STRING ======
 # Exact refusal string (ASCII quotes only)
@@ -569,11 +589,54 @@ STRICT_CITATIONS = _get_bool_env(
     "RAG_STRICT_CITATIONS", "0"
 )  # Refuse answers without citations (improves trust in regulated environments)
 
+# Per-stage tracing spans, keyed by correlation ID (served by /v1/debug/trace/{id})
+TRACING_ENABLED = _get_bool_env("TRACING_ENABLED", "1")
+TRACE_BUFFER_SIZE = _parse_env_int("TRACE_BUFFER_SIZE", 256, min_val=1, max_val=100000)  # recent traces kept
+TRACE_EXPORT_PATH = _get_env_value("TRACE_EXPORT_PATH", "") or ""  # OTLP JSON lines file; empty = memory only
+
 # ====== CACHING & RATE LIMITING CONFIG ======
 # Query cache size
 CACHE_MAXSIZE = _parse_env_int("CACHE_MAXSIZE", 100, min_val=1, max_val=10000)
 # Cache TTL in seconds
 CACHE_TTL = _parse_env_int("CACHE_TTL", 3600, min_val=60, max_val=86400)
+# Query-embedding LRU: normalised question text -> query vector, per backend/model/dim (0 disables)
+QUERY_EMBED_CACHE_SIZE = _parse_env_int("QUERY_EMBED_CACHE_SIZE", 4096, min_val=0, max_val=1_000_000)
+# Persist the query-embedding cache here (.npz) on API shutdown and reload it on startup (empty = memory only)
+QUERY_EMBED_CACHE_PATH = _get_env_value("QUERY_EMBED_CACHE_PATH", "") or ""
+# Questions (one per line, # comments) embedded into the cache at API startup (empty = no warm-load)
+QUERY_EMBED_WARM_FILE = os.environ.get("QUERY_EMBED_WARM_FILE", "config/faq_top_clockify.txt").strip()
+# Micro-batch concurrent query embeddings: wait up to this many ms for more queries before one
+# batched backend call (0 = embed each query on its own), and send at most QUERY_EMBED_BATCH_MAX texts
+QUERY_EMBED_BATCH_WAIT_MS = _parse_env_float("QUERY_EMBED_BATCH_WAIT_MS", 0.0, min_val=0.0, max_val=1000.0)
+QUERY_EMBED_BATCH_MAX = _parse_env_int("QUERY_EMBED_BATCH_MAX", 32, min_val=1, max_val=1024)
+# Semantic answer cache: serve paraphrases of cached questions by query-vector cosine similarity
+# (max cached answers; 0 disables). Measure false hits first: python scripts/eval_semantic_cache.py
+SEMANTIC_CACHE_SIZE = _parse_env_int("SEMANTIC_CACHE_SIZE", 0, min_val=0, max_val=100_000)
+SEMANTIC_CACHE_THRESHOLD = _parse_env_float("SEMANTIC_CACHE_THRESHOLD", 0.95, min_val=0.0, max_val=1.0)
+SEMANTIC_CACHE_TTL = _parse_env_int("SEMANTIC_CACHE_TTL", 3600, min_val=60, max_val=86400)
+# Serve /v1/query from the FAQ precomputed cache and the query cache before running the pipeline
+API_CACHE_ENABLED = _get_bool_env("API_CACHE_ENABLED", "1")
+# Coalesce identical concurrent questions (same normalised text + params) into one pipeline run
+COALESCE_REQUESTS = _get_bool_env("COALESCE_REQUESTS", "1")
+# /v1/query pipeline: "async" awaits Ollama on the event loop (no thread per in-flight query),
+# "thread" runs the synchronous pipeline in the server's thread pool
+API_PIPELINE = (_get_env_value("API_PIPELINE", "async") or "async").strip().lower()
+if API_PIPELINE not in ("async", "thread"):
+    _logger.warning(f"Invalid API_PIPELINE={API_PIPELINE!r}, using 'async'")
+    API_PIPELINE = "async"
+# Threads for CPU-bound scoring (retrieval, MMR, packing) in the async pipeline (0 = one per CPU)
+ASYNC_SCORING_WORKERS = _parse_env_int("ASYNC_SCORING_WORKERS", 0, min_val=0, max_val=64)
+# Concurrent HTTP connections to Ollama from the async pipeline; further requests wait for a free one
+OLLAMA_ASYNC_MAX_CONNECTIONS = _parse_env_int("OLLAMA_ASYNC_MAX_CONNECTIONS", 256, min_val=1, max_val=10000)
+# /v1/query/batch: max questions per request, and how many of its answers are generated concurrently
+API_BATCH_MAX_QUESTIONS = _parse_env_int("API_BATCH_MAX_QUESTIONS", 64, min_val=1, max_val=1024)
+API_BATCH_LLM_CONCURRENCY = _parse_env_int("API_BATCH_LLM_CONCURRENCY", 4, min_val=1, max_val=256)
+# LLM gateway: concurrent generations per model (0 disables the gateway); further calls queue,
+# interactive answers ahead of background work (rerank, FAQ cache builds), up to LLM_QUEUE_MAX per model.
+# A call is shed (429 queue full, 503 over deadline) when its expected queue wait exceeds LLM_QUEUE_TIMEOUT seconds
+LLM_MAX_IN_FLIGHT = _parse_env_int("LLM_MAX_IN_FLIGHT", 4, min_val=0, max_val=1024)
+LLM_QUEUE_MAX = _parse_env_int("LLM_QUEUE_MAX", 64, min_val=0, max_val=100_000)
+LLM_QUEUE_TIMEOUT = _parse_env_float("LLM_QUEUE_TIMEOUT", 30.0, min_val=0.0, max_val=600.0)
 # Rate limiting: max requests per window
 RATE_LIMIT_ENABLED = _get_bool_env("RATE_LIMIT_ENABLED", "0")
 RATE_LIMIT_REQUESTS = _parse_env_int("RATE_LIMIT_REQUESTS", 10, min_val=1, max_val=1000)
@@ -640,14 +703,31 @@ FILES = {
     "chunks": "chunks.jsonl",
     "emb": "vecs_n.npy",  # Pre-normalized embeddings (float32)
     "emb_f16": "vecs_f16.memmap",  # float16 memory-mapped (optional)
-    "emb_cache": "emb_cache.jsonl",  # Per-chunk embedding cache
+    "emb_cache": "emb_cache.jsonl",  # Legacy JSONL embedding cache (migrated once into emb_cache_store)
+    "emb_cache_store": "emb_cache",  # Binary per-chunk embedding cache: one directory per backend/model/dim
     "meta": "meta.jsonl",
-    "bm25": "bm25.json",
+    "bm25": "bm25.json",  # Legacy/debug JSON export (read only if bm25_index is absent)
+    "bm25_index": "bm25_index",  # Binary BM25 artifact: directory of memory-mapped .npy arrays
     "faiss_index": "faiss.index",  # FAISS IVFFlat index (v4.1)
     "hnsw": "hnsw_cosine.bin",  # Optional HNSW index (if USE_HNSWLIB=1)
     "index_meta": "index.meta.json",  # Artifact versioning
+    "article_manifest": "articles.json",  # Per-article content hash -> chunk rows (incremental builds)
+    "index_generations": "index_generations",  # Versioned build directories + CURRENT pointer
 }
 
+# Write each build into a new index_generations/gen-NNNNNN directory and activate
+# it with an atomic pointer swap, so servers never read a half-written index.
+# With 0, artifacts are written in place at the FILES paths above.
+INDEX_GENERATIONS = _get_bool_env("INDEX_GENERATIONS", "1")
+# Superseded generations kept on disk (current included) for other worker
+# processes that have not yet swapped; older ones are removed once unpinned.
+INDEX_KEEP_GENERATIONS = _parse_env_int("INDEX_KEEP_GENERATIONS", 2, min_val=1, max_val=20)
+
+# Memory-map vecs_n.npy read-only instead of copying it onto each process heap, so
+# API workers (uvicorn --workers N) share one page-cache copy of the matrix.
+# Set EMB_MMAP=0 on Windows if in-process rebuilds must replace a mapped file.
+EMB_MMAP = _get_bool_env("EMB_MMAP", "1")
+
 # ====== BUILD LOCK CONFIG ======
 BUILD_LOCK = ".build.lock"
 # FIX (Error #13): Use safe env var parsing
@@ -668,6 +748,26 @@ RERANK_SNIPPET_MAX_CHARS = 500  # Truncate chunk text for reranking prompt
 RERANK_MAX_CHUNKS = 12  # Maximum chunks to send to reranking
 RERANK_CACHE_MAX_ITEMS = _parse_env_int("RERANK_CACHE_MAX_ITEMS", 256, min_val=0, max_val=5000)
 RERANK_CACHE_TTL_SEC = _parse_env_int("RERANK_CACHE_TTL_SEC", 300, min_val=0, max_val=86400)
+# Rerank backend: "none" keeps MMR order, "llm" asks the chat model (rerank_with_llm),
+# "cross_encoder" scores (question, chunk) pairs locally with sentence-transformers
+RERANK_BACKEND = (_get_env_value("RERANK_BACKEND", "llm") or "llm").strip().lower()
+if RERANK_BACKEND not in ("none", "llm", "cross_encoder"):
+    _logger.warning(f"Invalid RERANK_BACKEND={RERANK_BACKEND!r}, using 'llm'")
+    RERANK_BACKEND = "llm"
+RERANK_CE_MODEL = (
+    _get_env_value("RERANK_CE_MODEL", "cross-encoder/ms-marco-MiniLM-L-12-v2")
+    or "cross-encoder/ms-marco-MiniLM-L-12-v2"
+)
+RERANK_CE_MAX_CANDIDATES = _parse_env_int(
+    "RERANK_CE_MAX_CANDIDATES", 12, min_val=1, max_val=200
+)  # Head of the MMR list that gets scored; the tail keeps MMR order
+RERANK_CE_BATCH_SIZE = _parse_env_int("RERANK_CE_BATCH_SIZE", 32, min_val=1, max_val=512)  # Pairs per forward pass
+RERANK_CE_CACHE_SIZE = _parse_env_int(
+    "RERANK_CE_CACHE_SIZE", 50000, min_val=0, max_val=10_000_000
+)  # Cached (query, chunk) scores (0 = off)
+RERANK_CE_THREADS = _parse_env_int(
+    "RERANK_CE_THREADS", 2, min_val=0, max_val=256
+)  # torch CPU threads for the cross-encoder (0 = torch default)
 
 # Retrieval thresholds (Quick Win #6)
 COVERAGE_MIN_CHUNKS = 2  # Minimum chunks above threshold to proceed
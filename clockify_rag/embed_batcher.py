@@ -0,0 +1,161 @@
+"""Micro-batching of concurrent query embeddings.
+
+Under concurrent load every query would otherwise issue its own embedding call
+(one HTTP request to Ollama, or one SentenceTransformer forward pass). The
+batcher queues those requests for up to ``max_wait_ms`` or ``max_batch`` items,
+embeds them with a single batched backend call and resolves each caller's
+future with its own vector:
+
+    batcher = get_embedding_batcher()
+    vec = batcher.embed(text)                              # blocking callers
+    vec = await asyncio.wrap_future(batcher.submit(text))  # asyncio callers
+
+Identical texts queued in the same window share one slot in the batch. Batch
+sizes and per-request queue waits are exported as histograms.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from . import config
+from .metrics import MetricNames, observe_histogram
+
+logger = logging.getLogger(__name__)
+
+_BATCHER: Optional["EmbeddingBatcher"] = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def embed_query_batch(texts: Sequence[str]) -> np.ndarray:
+    """Embed ``texts`` with the configured backend in one batched call (L2-normalised rows)."""
+    if config.EMB_BACKEND == "local":
+        from .embedding import embed_local_batch
+
+        return embed_local_batch(list(texts), normalize=True)
+    from .embeddings_client import embed_texts
+
+    return embed_texts(list(texts))
+
+
+class EmbeddingBatcher:
+    """Collect query-embedding requests from many threads into batched backend calls."""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[Sequence[str]], np.ndarray] = embed_query_batch,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        """Initialize the batcher.
+
+        Args:
+            embed_batch: Backend call mapping a list of texts to a (n, dim) array
+            max_batch: Most texts sent in one backend call
+            max_wait_ms: Longest the first queued request waits for company
+        """
+        self.embed_batch = embed_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, text: str) -> Future:
+        """Queue ``text``; the returned future resolves to its normalised vector."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Embedding batcher is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="rag-embed-batcher", daemon=True)
+                self._worker.start()
+            self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Embed ``text`` through the next batch, blocking until its vector is ready."""
+        return self.submit(text).result(timeout=timeout)
+
+    def close(self) -> None:
+        """Stop the worker after it drains the requests already queued."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+        self._queue.put(None)
+        if worker is not None:
+            worker.join()
+
+    def _collect(self, first) -> List:
+        """Gather up to ``max_batch`` requests, waiting at most ``max_wait`` after the first."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # re-queue the stop signal for the main loop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            dispatched = time.perf_counter()
+            for _text, _future, queued in batch:
+                observe_histogram(MetricNames.QUERY_EMBED_QUEUE_WAIT, (dispatched - queued) * 1000)
+
+            # Identical texts in one window share a slot
+            texts = list(dict.fromkeys(text for text, _future, _queued in batch))
+            observe_histogram(MetricNames.QUERY_EMBED_BATCH_SIZE, len(texts))
+            try:
+                vectors = np.asarray(self.embed_batch(texts), dtype=np.float32)
+                if vectors.shape[0] != len(texts):
+                    raise ValueError(f"Batched embedding returned {vectors.shape[0]} vectors for {len(texts)} texts")
+            except Exception as exc:
+                logger.warning("Batched query embedding of %d texts failed: %s", len(texts), exc)
+                for _text, future, _queued in batch:
+                    future.set_exception(exc)
+                continue
+
+            rows = {text: row for text, row in zip(texts, vectors)}
+            for text, future, _queued in batch:
+                future.set_result(rows[text].copy())
+            logger.debug("[embed_batcher] embedded %d texts for %d requests", len(texts), len(batch))
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Return the process-wide batcher (``QUERY_EMBED_BATCH_MAX`` / ``QUERY_EMBED_BATCH_WAIT_MS``)."""
+    global _BATCHER
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = EmbeddingBatcher(
+                max_batch=config.QUERY_EMBED_BATCH_MAX, max_wait_ms=config.QUERY_EMBED_BATCH_WAIT_MS
+            )
+        return _BATCHER
+
+
+def shutdown_embedding_batcher() -> None:
+    """Stop the process-wide batcher; the next batched embed starts a fresh one."""
+    global _BATCHER
+    with _BATCHER_LOCK:
+        batcher, _BATCHER = _BATCHER, None
+    if batcher is not None:
+        batcher.close()
@@ -2,14 +2,15 @@
 
 import atexit
 import gc
-import json
 import logging
-import os
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import numpy as np
 
 from . import config
+from .embedding_cache import EmbeddingCacheStore
 from .exceptions import EmbeddingError
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,12 @@ _MAX_OUTSTANDING_REQUESTS = 64
 
 # Global state for lazy-loaded cross-encoder (OPTIMIZATION: Fast, accurate reranking)
 _CROSS_ENCODER = None
+_CROSS_ENCODER_NAME = None
+# One cross-encoder inference at a time, so reranking stays within RERANK_CE_THREADS CPU threads
+_CROSS_ENCODER_LOCK = threading.Lock()
+# (model, normalised query, chunk id) -> cross-encoder score, LRU (RERANK_CE_CACHE_SIZE entries)
+_CE_SCORE_CACHE: "OrderedDict[tuple, float]" = OrderedDict()
+_CE_SCORE_CACHE_LOCK = threading.Lock()
 
 
 def cleanup_embedding_models():
@@ -35,7 +42,7 @@ def cleanup_embedding_models():
 
     After cleanup, models will be lazily reloaded on next use.
     """
-    global _ST_ENCODER, _CROSS_ENCODER
+    global _ST_ENCODER, _CROSS_ENCODER, _CROSS_ENCODER_NAME
 
     cleaned: list[str] = []
 
@@ -47,6 +54,7 @@ def cleanup_embedding_models():
     if _CROSS_ENCODER is not None:
         del _CROSS_ENCODER
         _CROSS_ENCODER = None
+        _CROSS_ENCODER_NAME = None
         cleaned.append("CrossEncoder")
 
     if cleaned:
@@ -71,20 +79,73 @@ def _load_st_encoder():
 
 
 def _load_cross_encoder():
-    """Lazy-load CrossEncoder model for reranking.
+    """Lazy-load the CrossEncoder model (``RERANK_CE_MODEL``) for reranking.
 
     OPTIMIZATION: CrossEncoder provides 10-15% accuracy boost over LLM reranking
     with 50-100x speed improvement (10ms vs 500-1000ms per rerank).
+    ``RERANK_CE_THREADS > 0`` sets torch's intra-op thread count (process-wide).
     """
-    global _CROSS_ENCODER
+    global _CROSS_ENCODER, _CROSS_ENCODER_NAME
     if _CROSS_ENCODER is None:
         from sentence_transformers import CrossEncoder
 
-        _CROSS_ENCODER = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-12-v2")
-        logger.debug("Loaded CrossEncoder: ms-marco-MiniLM-L-12-v2 (for reranking)")
+        if config.RERANK_CE_THREADS > 0:
+            import torch
+
+            torch.set_num_threads(config.RERANK_CE_THREADS)
+        _CROSS_ENCODER = CrossEncoder(config.RERANK_CE_MODEL)
+        _CROSS_ENCODER_NAME = config.RERANK_CE_MODEL
+        logger.debug("Loaded CrossEncoder: %s (for reranking)", config.RERANK_CE_MODEL)
     return _CROSS_ENCODER
 
 
+def clear_cross_encoder_cache() -> None:
+    """Drop all cached cross-encoder scores."""
+    with _CE_SCORE_CACHE_LOCK:
+        _CE_SCORE_CACHE.clear()
+
+
+def cross_encoder_scores(query: str, chunks: list) -> np.ndarray:
+    """Cross-encoder relevance of each chunk to ``query`` (float32, in chunk order).
+
+    Scores are cached per (model, normalised query, chunk id); the misses are
+    scored together in one batched ``predict`` (``RERANK_CE_BATCH_SIZE`` pairs per
+    forward pass).
+    """
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    model = _load_cross_encoder()
+    cache_size = config.RERANK_CE_CACHE_SIZE
+    norm_q = " ".join(query.lower().split())
+    keys = [(_CROSS_ENCODER_NAME, norm_q, chunk.get("id")) for chunk in chunks]
+    scores = np.empty(len(chunks), dtype=np.float32)
+    missing = []
+    with _CE_SCORE_CACHE_LOCK:
+        for i, key in enumerate(keys):
+            cached = _CE_SCORE_CACHE.get(key) if cache_size and key[2] is not None else None
+            if cached is None:
+                missing.append(i)
+            else:
+                _CE_SCORE_CACHE.move_to_end(key)
+                scores[i] = cached
+
+    if missing:
+        pairs = [[query, chunks[i].get("text", "")] for i in missing]
+        with _CROSS_ENCODER_LOCK:
+            predicted = model.predict(pairs, batch_size=config.RERANK_CE_BATCH_SIZE, show_progress_bar=False)
+        scores[missing] = np.asarray(predicted, dtype=np.float32).reshape(-1)
+        if cache_size:
+            with _CE_SCORE_CACHE_LOCK:
+                for i in missing:
+                    if keys[i][2] is not None:
+                        _CE_SCORE_CACHE[keys[i]] = float(scores[i])
+                        _CE_SCORE_CACHE.move_to_end(keys[i])
+                while len(_CE_SCORE_CACHE) > cache_size:
+                    _CE_SCORE_CACHE.popitem(last=False)
+    logger.debug("[cross-encoder] scored %d pairs (%d cached)", len(chunks), len(chunks) - len(missing))
+    return scores
+
+
 def rerank_cross_encoder(query: str, chunks: list, top_k: int = 6) -> list:
     """Rerank chunks using cross-encoder for better relevance scoring.
 
@@ -102,22 +163,12 @@ def rerank_cross_encoder(query: str, chunks: list, top_k: int = 6) -> list:
     if not chunks:
         return []
 
-    model = _load_cross_encoder()
-
-    # Create query-document pairs
-    pairs = [[query, chunk.get("text", "")] for chunk in chunks]
-
-    # Score all pairs (batch prediction is fast)
-    scores = model.predict(pairs)
-
-    # Sort by score (descending)
-    ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)
-
-    # Return top_k
-    result = [chunk for chunk, score in ranked[:top_k]]
+    scores = cross_encoder_scores(query, chunks)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    result = [chunks[i] for i in order]
 
     logger.debug(
-        f"[cross-encoder] Reranked {len(chunks)} → {len(result)} chunks (scores: {[f'{s:.3f}' for _, s in ranked[:top_k]]})"
+        f"[cross-encoder] Reranked {len(chunks)} → {len(result)} chunks (scores: {[f'{scores[i]:.3f}' for i in order]})"
     )
     return result
 
@@ -162,105 +213,100 @@ def validate_ollama_embeddings(sample_text: str = "test") -> tuple:
         return 0, False
 
 
-def _embed_single_text(index: int, text: str, retries: int, total: int) -> tuple:
-    """Embed a single text using remote Ollama (helper for parallel batching).
+def _embed_text_batch(start: int, batch: list, retries: int, total: int) -> tuple:
+    """Embed one batch of texts using remote Ollama (helper for parallel batching).
 
     Args:
-        index: Index of this text in the full list
-        text: Text to embed
+        start: Index of the first text of this batch in the full list
+        batch: Texts to embed (at most config.EMB_BATCH_SIZE)
         retries: Number of retries for HTTP session (passed to embeddings_client)
         total: Total number of texts (for logging)
 
     Returns:
-        tuple: (index, embedding_list) or raises EmbeddingError
+        tuple: (start, list of embedding lists) or raises EmbeddingError
     """
+    end = start + len(batch) - 1
     try:
-        # Use the new remote-first embeddings_client module
-        from .embeddings_client import embed_query
+        # One POST /api/embed per batch; embeddings_client falls back to
+        # per-text /api/embeddings on servers without the batched endpoint.
+        from .embeddings_client import embed_texts as _client_embed_texts
 
-        # Embed single text and return as list (matching old API contract)
-        embedding = embed_query(text, retries=retries)
+        embeddings = _client_embed_texts(batch, retries=retries, batch_size=len(batch))
 
-        if embedding is None or embedding.size == 0:
-            raise EmbeddingError(f"Embedding chunk {index}: empty embedding returned (check Ollama API format)")
+        if embeddings is None or embeddings.shape[0] != len(batch):
+            raise EmbeddingError(f"Embedding chunks {start}-{end}: wrong number of embeddings returned")
 
-        return (index, embedding.tolist())
+        return (start, embeddings.tolist())
     except EmbeddingError as e:
-        raise EmbeddingError(f"Embedding chunk {index} failed: {e}") from e
+        raise EmbeddingError(f"Embedding chunks {start}-{end} of {total} failed: {e}") from e
     except Exception as e:
-        raise EmbeddingError(f"Embedding chunk {index}: {e}") from e
+        raise EmbeddingError(f"Embedding chunks {start}-{end} of {total}: {e}") from e
 
 
 def embed_texts(texts: list, retries: int | None = None, suppress_errors: bool = False) -> np.ndarray:
     """Embed texts using Ollama with parallel batching (Rank 10: 3-5x speedup).
 
-    Uses ThreadPoolExecutor to send multiple embedding requests concurrently.
-    Falls back to sequential processing for small batches or on error.
+    Texts are split into batches of config.EMB_BATCH_SIZE, each sent as one
+    request, with up to config.EMB_MAX_WORKERS batches in flight at once.
     """
     if len(texts) == 0:
         return np.zeros((0, config.EMB_DIM), dtype="float32")
 
     total = len(texts)
     effective_retries = config.DEFAULT_RETRIES if retries is None else retries
-
-    # OPTIMIZATION: Always use parallel batching for 3-5x speedup, even on small batches
-    # This eliminates the sequential fallback that added 10x overhead on query embeddings
-    # Previous behavior: sequential for < 32 texts or single-threaded
-    # New behavior: always parallel (even for 1 text, the overhead is negligible vs 3-5x speedup)
+    batch_size = config.EMB_BATCH_SIZE
 
     # Parallel batching mode (always enabled for internal deployment)
-    # Priority #7: Cap outstanding futures to prevent socket exhaustion
     logger.info(
-        f"[Rank 10] Embedding {total} texts with {config.EMB_MAX_WORKERS} workers (retries={effective_retries})"
+        f"[Rank 10] Embedding {total} texts in batches of {batch_size} with {config.EMB_MAX_WORKERS} workers "
+        f"(retries={effective_retries})"
     )
     results = [None] * total  # Pre-allocate to maintain order
     completed = 0
 
-    # Priority #7: Limit outstanding futures to max_workers * config.EMB_BATCH_SIZE
-    # This prevents memory exhaustion and socket exhaustion on large corpora
-    max_outstanding = min(config.EMB_MAX_WORKERS * config.EMB_BATCH_SIZE, _MAX_OUTSTANDING_REQUESTS)
-    logger.debug(f"[Priority #7] Capping outstanding futures at {max_outstanding}")
+    # Priority #7: Limit outstanding batches to the worker count so only
+    # EMB_MAX_WORKERS requests (and their payloads) are alive at a time
+    max_outstanding = min(config.EMB_MAX_WORKERS, _MAX_OUTSTANDING_REQUESTS)
+    logger.debug(f"[Priority #7] Capping outstanding batches at {max_outstanding}")
 
     try:
         with ThreadPoolExecutor(max_workers=config.EMB_MAX_WORKERS) as executor:
             # Priority #7: Use sliding window approach instead of submitting all at once
-            # Submit initial batch
             pending_futures: dict = {}
-            text_iter = enumerate(texts)
+            batch_iter = ((start, texts[start : start + batch_size]) for start in range(0, total, batch_size))
 
-            # Submit initial batch up to max_outstanding without dropping the item
-            while len(pending_futures) < max_outstanding:
+            def _submit_next() -> bool:
                 try:
-                    i, text = next(text_iter)
+                    start, batch = next(batch_iter)
                 except StopIteration:
-                    break
-                future = executor.submit(_embed_single_text, i, text, effective_retries, total)
-                pending_futures[future] = i
+                    return False
+                future = executor.submit(_embed_text_batch, start, batch, effective_retries, total)
+                pending_futures[future] = start
+                return True
 
-            # Process completions and submit new tasks as slots open
+            # Submit initial batches up to max_outstanding
+            while len(pending_futures) < max_outstanding and _submit_next():
+                pass
+
+            # Process completions and submit new batches as slots open
             while pending_futures:
                 # Wait for at least one future to complete
                 done, _ = wait(pending_futures.keys(), return_when=FIRST_COMPLETED)
 
                 for future in done:
                     pending_futures.pop(future)
-                    idx_result, emb = future.result()  # Will raise if _embed_single_text raised
-                    results[idx_result] = emb
-                    completed += 1
+                    start, embs = future.result()  # Will raise if _embed_text_batch raised
+                    results[start : start + len(embs)] = embs
+                    previous = completed
+                    completed += len(embs)
 
                     # Log progress every 100 completions
-                    if completed % 100 == 0 or completed == total:
+                    if completed // 100 != previous // 100 or completed == total:
                         logger.info(f"  [{completed}/{total}]")
 
-                # Submit new tasks to fill slots (up to max_outstanding)
-                while len(pending_futures) < max_outstanding:
-                    try:
-                        i, text = next(text_iter)
-                        future = executor.submit(_embed_single_text, i, text, effective_retries, total)
-                        pending_futures[future] = i
-                    except StopIteration:
-                        # No more texts to process
-                        break
+                # Submit new batches to fill slots (up to max_outstanding)
+                while len(pending_futures) < max_outstanding and _submit_next():
+                    pass
 
     except Exception as e:
         if suppress_errors:
@@ -279,101 +325,41 @@ def embed_texts(texts: list, retries: int | None = None, suppress_errors: bool =
 
 
 def load_embedding_cache() -> dict:
-    """Load embedding cache from disk with dimension validation.
+    """Load the embedding cache for the current backend/model/dim as a dict.
 
-    FIX: Filters out cached embeddings with mismatched dimensions to prevent
-    mixing embeddings from different models/backends (e.g., 384-dim local vs 768-dim ollama).
+    Reads the binary store (see embedding_cache.EmbeddingCacheStore); a legacy
+    emb_cache.jsonl is migrated into it on first use. Entries from other
+    backends or dimensions live in their own namespaces and are never mixed in.
 
     Returns:
         dict: {content_hash: embedding_vector} mapping (only valid embeddings for current config.EMB_DIM)
     """
-    # Compute expected dimension based on current backend
-    expected_dim = config.EMB_DIM_LOCAL if config.EMB_BACKEND == "local" else config.EMB_DIM_OLLAMA
-
-    cache = {}
-    cache_path = config.FILES["emb_cache"]
-    if os.path.exists(cache_path):
-        logger.info(f"[INFO] Loading embedding cache from {cache_path}")
-        filtered_count = 0
-        try:
-            with open(cache_path, "r", encoding="utf-8") as f:
-                for line_num, line in enumerate(f, 1):
-                    if line.strip():
-                        try:
-                            entry = json.loads(line)
-                            embedding = np.array(entry["embedding"], dtype=np.float32)
-
-                            # Validate dimension matches current backend
-                            if len(embedding) != expected_dim:
-                                filtered_count += 1
-                                logger.debug(
-                                    f"Filtered cache entry (line {line_num}): "
-                                    f"dim={len(embedding)} != expected={expected_dim} "
-                                    f"(backend={config.EMB_BACKEND})"
-                                )
-                                continue
-
-                            # Optionally validate backend/model if stored
-                            stored_backend = entry.get("backend")
-                            if stored_backend and stored_backend != config.EMB_BACKEND:
-                                filtered_count += 1
-                                logger.debug(
-                                    f"Filtered cache entry (line {line_num}): "
-                                    f"backend={stored_backend} != current={config.EMB_BACKEND}"
-                                )
-                                continue
-
-                            cache[entry["hash"]] = embedding
-                        except (KeyError, ValueError, TypeError) as e:
-                            logger.debug(f"Skipping malformed cache entry (line {line_num}): {e}")
-                            continue
-
-            valid_count = len(cache)
-            logger.info(
-                f"[INFO] Cache loaded: {valid_count} valid embeddings " f"(filtered {filtered_count} mismatched)"
-            )
-
-            if filtered_count > 0:
-                logger.warning(
-                    f"⚠️  Filtered {filtered_count} cached embeddings with incompatible dimensions. "
-                    f"This is expected after switching embedding backends "
-                    f"(e.g., local→ollama or vice versa). "
-                    f"These will be recomputed and cached with current backend."
-                )
-        except Exception as e:
-            logger.warning(f"[WARN] Failed to load cache: {e}; starting fresh")
-            cache = {}
-    return cache
+    try:
+        store = EmbeddingCacheStore.open()
+        cache = store.to_dict()
+        logger.info(f"[INFO] Cache loaded: {len(cache)} embeddings from {store.path}")
+        return cache
+    except Exception as e:
+        logger.warning(f"[WARN] Failed to load cache: {e}; starting fresh")
+        return {}
 
 
 def save_embedding_cache(cache: dict):
-    """Save embedding cache to disk with backend/dimension metadata.
+    """Make the on-disk cache for the current backend hold exactly ``cache``.
 
-    FIX: Stores backend, model, and dimension metadata with each cache entry
-    to enable validation when loading (prevents dimension mismatches).
+    New hashes are appended to the binary store; entries missing from
+    ``cache`` are compacted away.
 
     Args:
         cache: dict of {content_hash: embedding_vector}
     """
-    cache_path = config.FILES["emb_cache"]
     logger.info(f"[INFO] Saving {len(cache)} embeddings to cache")
     try:
-        # Atomic write with temp file
-        temp_path = cache_path + ".tmp"
-        with open(temp_path, "w", encoding="utf-8") as f:
-            for content_hash, embedding in cache.items():
-                entry = {
-                    "hash": content_hash,
-                    "embedding": embedding.tolist(),
-                    "backend": config.EMB_BACKEND,  # Store backend for validation
-                    "model": config.RAG_EMBED_MODEL if config.EMB_BACKEND == "ollama" else "all-MiniLM-L6-v2",
-                    "dim": int(len(embedding)),  # Store dimension for validation
-                }
-                f.write(json.dumps(entry) + "\n")
-        # Ensure write hits disk before rename
-        with open(temp_path, "rb") as f:
-            os.fsync(f.fileno())
-        os.replace(temp_path, cache_path)  # Atomic on POSIX
+        store = EmbeddingCacheStore.open()
+        new = [h for h in cache if h not in store]
+        if new:
+            store.append(new, np.array([cache[h] for h in new], dtype=np.float32))
+        store.compact(cache.keys())
         logger.info(f"[INFO] Cache saved successfully (backend={config.EMB_BACKEND}, dim={config.EMB_DIM})")
     except Exception as e:
         logger.warning(f"[WARN] Failed to save cache: {e}")
@@ -0,0 +1,313 @@
+"""Binary per-chunk embedding cache.
+
+The cache maps a chunk's content hash (sha256 of its text) to its embedding so
+rebuilds only embed new or changed chunks. It replaces emb_cache.jsonl, which
+stored every vector as a JSON list (~10 KB of text per 768-dim chunk) and was
+rewritten and re-parsed in full on each build.
+
+Layout: one namespace directory per (backend, model, dim) under FILES["emb_cache_store"]:
+
+    emb_cache/
+      ollama-nomic-embed-text-768/
+        meta.json      # format_version, backend, model, dim
+        vectors.f32    # append-only raw float32 matrix, one row per entry
+        hashes.txt     # append-only, line i = content hash of row i
+
+New entries are appended to both files without rewriting them; the matrix is
+read through a read-only memmap. When a hash is appended twice, the later row
+wins. Rows no longer referenced by the corpus stay on disk until ``compact()``
+rewrites the namespace into a fresh directory and swaps it in.
+
+Switching backends or models therefore keeps the other namespaces intact, and
+the legacy JSONL file is migrated once on first open, then renamed to
+``emb_cache.jsonl.migrated``.
+
+Usage:
+    store = EmbeddingCacheStore.open()
+    rows = store.lookup(chunk_hashes)          # -1 for misses
+    vecs[rows >= 0] = store.vectors[rows[rows >= 0]]
+    store.append(miss_hashes, new_vectors)
+    store.compact(chunk_hashes)                # drop stale rows
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import config
+from .utils import atomic_replace_dir, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+LOCAL_EMBED_MODEL = "all-MiniLM-L6-v2"
+
+_VECTORS = "vectors.f32"
+_HASHES = "hashes.txt"
+_META = "meta.json"
+
+
+def current_namespace() -> Tuple[str, str, int]:
+    """(backend, model, dim) of the embeddings the current config produces."""
+    if config.EMB_BACKEND == "local":
+        return "local", LOCAL_EMBED_MODEL, config.EMB_DIM_LOCAL
+    return config.EMB_BACKEND, config.RAG_EMBED_MODEL or "", config.EMB_DIM_OLLAMA
+
+
+def _namespace_dirname(backend: str, model: str, dim: int) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model).strip("_") or "model"
+    return f"{backend}-{slug}-{dim}"
+
+
+def _fsync_file(path: str) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+class EmbeddingCacheStore:
+    """Append-only float32 matrix plus a content-hash → row index for one namespace."""
+
+    def __init__(self, root: str, backend: str, model: str, dim: int):
+        """Open (or lazily create) the namespace for ``(backend, model, dim)`` under ``root``."""
+        self.root = root
+        self.backend = backend
+        self.model = model
+        self.dim = int(dim)
+        self.path = os.path.join(root, _namespace_dirname(backend, model, self.dim))
+        self._hashes: list = []
+        self._rows: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._load()
+
+    @classmethod
+    def open(cls, root: Optional[str] = None, migrate: bool = True) -> "EmbeddingCacheStore":
+        """Open the store for the current embedding config.
+
+        With ``migrate`` (the default) a legacy emb_cache.jsonl next to the
+        store is imported first and renamed so the migration runs once.
+        """
+        root = root or config.FILES["emb_cache_store"]
+        legacy = config.FILES["emb_cache"]
+        if migrate and os.path.exists(legacy):
+            migrate_jsonl_cache(legacy, root)
+        return cls(root, *current_namespace())
+
+    # ------------------------------------------------------------------ loading
+    def _load(self) -> None:
+        meta_path = os.path.join(self.path, _META)
+        if not os.path.exists(meta_path):
+            return
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[WARN] Unreadable embedding cache metadata {meta_path}: {e}; starting fresh")
+            meta = {}
+        expected = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "backend": self.backend,
+            "model": self.model,
+            "dim": self.dim,
+        }
+        if any(meta.get(key) != value for key, value in expected.items()):
+            logger.warning(f"[WARN] Embedding cache {self.path} does not match {expected}; starting fresh")
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+
+        hashes_path = os.path.join(self.path, _HASHES)
+        vectors_path = os.path.join(self.path, _VECTORS)
+        try:
+            with open(hashes_path, "rb") as f:
+                raw = f.read()
+            vectors_size = os.path.getsize(vectors_path)
+        except OSError as e:
+            logger.warning(f"[WARN] Incomplete embedding cache {self.path}: {e}; starting fresh")
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        # A crash mid-append can leave a partial last line or matrix row: keep
+        # only rows that are complete in both files and truncate the rest.
+        complete = raw[: raw.rfind(b"\n") + 1].decode("ascii")
+        hashes = complete.split("\n")[:-1]
+        row_bytes = self.dim * 4
+        n_rows = min(len(hashes), vectors_size // row_bytes)
+        if n_rows < len(hashes) or len(complete) != len(raw) or vectors_size != n_rows * row_bytes:
+            logger.warning(f"[WARN] Repairing embedding cache {self.path}: keeping {n_rows} complete rows")
+            hashes = hashes[:n_rows]
+            with open(hashes_path, "r+b") as f:
+                f.truncate(sum(len(h) + 1 for h in hashes))
+            with open(vectors_path, "r+b") as f:
+                f.truncate(n_rows * row_bytes)
+
+        self._hashes = hashes
+        self._rows = {h: row for row, h in enumerate(hashes)}
+
+    def _init_namespace(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        for name in (_VECTORS, _HASHES):
+            open(os.path.join(self.path, name), "ab").close()
+        atomic_write_json(
+            os.path.join(self.path, _META),
+            {"format_version": CACHE_FORMAT_VERSION, "backend": self.backend, "model": self.model, "dim": self.dim},
+        )
+
+    # ------------------------------------------------------------------ reading
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self._rows
+
+    @property
+    def rows(self) -> int:
+        """Rows on disk, including superseded and stale ones."""
+        return len(self._hashes)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Read-only (rows, dim) float32 view of the matrix file."""
+        if self._vectors is None:
+            if not self._hashes:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            self._vectors = np.memmap(
+                os.path.join(self.path, _VECTORS), dtype=np.float32, mode="r", shape=(len(self._hashes), self.dim)
+            )
+        return self._vectors
+
+    def lookup(self, hashes: Sequence[str]) -> np.ndarray:
+        """Row index for each hash, -1 where it is not cached."""
+        rows = self._rows
+        return np.fromiter((rows.get(h, -1) for h in hashes), dtype=np.int64, count=len(hashes))
+
+    def get(self, content_hash: str) -> Optional[np.ndarray]:
+        row = self._rows.get(content_hash)
+        return None if row is None else np.array(self.vectors[row])
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """{content_hash: vector} for every live entry (copies the vectors)."""
+        vectors = np.array(self.vectors)
+        return {h: vectors[row] for h, row in self._rows.items()}
+
+    def stale_rows(self, live_hashes: Iterable[str]) -> int:
+        """Rows ``compact(live_hashes)`` would drop."""
+        live = set(live_hashes)
+        return self.rows - sum(1 for h in self._rows if h in live)
+
+    # ------------------------------------------------------------------ writing
+    def append(self, hashes: Sequence[str], vectors: np.ndarray) -> None:
+        """Append rows without rewriting existing data.
+
+        The matrix is written and synced before the hash lines, so a crash
+        never leaves a hash pointing at a missing row.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape != (len(hashes), self.dim):
+            raise ValueError(f"Expected a ({len(hashes)}, {self.dim}) matrix, got {vectors.shape}")
+        if not hashes:
+            return
+        if not os.path.exists(os.path.join(self.path, _META)):
+            self._init_namespace()
+
+        with open(os.path.join(self.path, _VECTORS), "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(os.path.join(self.path, _HASHES), "a", encoding="ascii", newline="\n") as f:
+            f.write("".join(f"{h}\n" for h in hashes))
+            f.flush()
+            os.fsync(f.fileno())
+
+        start = len(self._hashes)
+        self._hashes.extend(hashes)
+        for offset, h in enumerate(hashes):
+            self._rows[h] = start + offset
+        self._vectors = None  # remap on next read
+
+    def compact(self, live_hashes: Optional[Iterable[str]] = None) -> int:
+        """Rewrite the namespace keeping one row per live hash; returns rows dropped.
+
+        ``live_hashes`` defaults to every cached hash (only superseded
+        duplicates are dropped). The new files are built in a temp directory
+        and swapped in, so readers never see a half-written namespace.
+        """
+        keep = self._rows if live_hashes is None else set(live_hashes)
+        kept = [(h, row) for h, row in self._rows.items() if h in keep]
+        dropped = self.rows - len(kept)
+        if dropped == 0:
+            return 0
+
+        kept.sort(key=lambda item: item[1])
+        hashes = [h for h, _ in kept]
+        vectors = np.asarray(self.vectors[[row for _, row in kept]], dtype=np.float32)
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp.emb_cache.", dir=self.root)
+        try:
+            with open(os.path.join(tmp_dir, _VECTORS), "wb") as f:
+                f.write(vectors.tobytes())
+            with open(os.path.join(tmp_dir, _HASHES), "w", encoding="ascii", newline="\n") as f:
+                f.write("".join(f"{h}\n" for h in hashes))
+            for name in (_VECTORS, _HASHES):
+                _fsync_file(os.path.join(tmp_dir, name))
+            atomic_write_json(
+                os.path.join(tmp_dir, _META),
+                {"format_version": CACHE_FORMAT_VERSION, "backend": self.backend, "model": self.model, "dim": self.dim},
+            )
+            self._vectors = None  # release the old mapping before the swap
+            atomic_replace_dir(tmp_dir, self.path)
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._hashes = hashes
+        self._rows = {h: row for row, h in enumerate(hashes)}
+        logger.info(f"[INFO] Compacted embedding cache: dropped {dropped} rows, kept {len(hashes)}")
+        return dropped
+
+
+def migrate_jsonl_cache(jsonl_path: str, root: Optional[str] = None) -> int:
+    """Import a legacy emb_cache.jsonl into the binary store; returns entries imported.
+
+    Entries are grouped into their (backend, model, dim) namespaces; entries
+    written before backend/model were recorded are assumed to match the
+    current config. The JSONL file is renamed to ``*.migrated`` afterwards.
+    """
+    root = root or config.FILES["emb_cache_store"]
+    current_backend, current_model, _ = current_namespace()
+    groups: Dict[Tuple[str, str, int], Dict[str, list]] = {}
+    skipped = 0
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                embedding = [float(x) for x in entry["embedding"]]
+                key = (entry.get("backend") or current_backend, entry.get("model") or current_model, len(embedding))
+                groups.setdefault(key, {})[entry["hash"]] = embedding
+            except (KeyError, ValueError, TypeError) as e:
+                skipped += 1
+                logger.debug(f"Skipping malformed cache entry (line {line_num}): {e}")
+
+    imported = 0
+    for (backend, model, dim), entries in groups.items():
+        store = EmbeddingCacheStore(root, backend, model, dim)
+        new = {h: vec for h, vec in entries.items() if h not in store}
+        if new:
+            store.append(list(new), np.array(list(new.values()), dtype=np.float32))
+            imported += len(new)
+
+    os.replace(jsonl_path, jsonl_path + ".migrated")
+    logger.info(
+        f"[INFO] Migrated {imported} embeddings from {jsonl_path} into {root} "
+        f"({len(groups)} namespace(s), {skipped} malformed lines skipped)"
+    )
+    return imported
+
+
+__all__ = ["EmbeddingCacheStore", "current_namespace", "migrate_jsonl_cache"]
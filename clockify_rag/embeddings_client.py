@@ -19,6 +19,8 @@ import requests
 
 from .config import (
     DEFAULT_RETRIES,
+    EMB_BATCH_API,
+    EMB_BATCH_SIZE,
     EMB_CONNECT_T,
     EMB_DIM,
     EMB_READ_T,
@@ -73,6 +75,10 @@ except ImportError as e:
 # Global instance (lazy-loaded)
 _EMBEDDING_CLIENT = None
 _EMBEDDING_DIM: int | None = None
+# Whether the server accepts batched POST /api/embed (None = not probed yet).
+# Ollama < 0.3 only has the single-prompt /api/embeddings endpoint.
+_BATCH_API_SUPPORTED: bool | None = None
+_BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
 _RETRYABLE_EXC = (
     requests.exceptions.Timeout,
     requests.exceptions.ConnectionError,
@@ -195,12 +201,82 @@ def _retry_embed(fn_name: str, retries: Optional[int], func):
     raise EmbeddingError(f"Embedding {fn_name} failed after {max_attempts} attempts: {last_err}") from last_err
 
 
-def embed_texts(texts: List[str], retries: Optional[int] = None) -> np.ndarray:
+def _http_status(err: BaseException) -> Optional[int]:
+    """Return the HTTP status code behind a (possibly wrapped) requests error."""
+
+    seen: Optional[BaseException] = err
+    while seen is not None:
+        response = getattr(seen, "response", None)
+        if response is not None and getattr(response, "status_code", None) is not None:
+            return response.status_code
+        seen = seen.__cause__
+    return None
+
+
+def _check_dim(embedding: Sequence[float], idx: int) -> None:
+    """Per-vector dimension validation to catch model mismatches early."""
+
+    actual_dim = len(embedding)
+    if actual_dim != EMB_DIM:
+        raise EmbeddingError(
+            f"Embedding dimension mismatch at index {idx}: got {actual_dim}, expected {EMB_DIM}. "
+            f"Check that EMB_DIM config matches the model '{RAG_EMBED_MODEL}' output."
+        )
+
+
+def _post_embed_batch(texts: Sequence[str]) -> Optional[list]:
+    """Embed ``texts`` with one POST /api/embed request.
+
+    Returns None when the server does not support the batched endpoint, so the
+    caller can fall back to per-text requests.
+    """
+
+    try:
+        resp = http_post_with_retries(
+            f"{RAG_OLLAMA_URL}/api/embed",
+            {"model": RAG_EMBED_MODEL, "input": list(texts)},
+            retries=0,
+            timeout=(EMB_CONNECT_T, EMB_READ_T),
+        )
+    except requests.exceptions.RequestException as err:
+        if _http_status(err) in _BATCH_UNSUPPORTED_STATUS:
+            return None
+        raise
+
+    embeddings = resp.get("embeddings") if isinstance(resp, dict) else None
+    if not isinstance(embeddings, list):
+        return None
+    if len(embeddings) != len(texts):
+        raise EmbeddingError(f"Batched embedding returned {len(embeddings)} vectors for {len(texts)} inputs")
+    return embeddings
+
+
+def _post_embed_single(text: str) -> list:
+    """Embed one text with POST /api/embeddings (works on every Ollama version)."""
+
+    resp = http_post_with_retries(
+        f"{RAG_OLLAMA_URL}/api/embeddings",
+        {"model": RAG_EMBED_MODEL, "prompt": text},
+        retries=0,
+        timeout=(EMB_CONNECT_T, EMB_READ_T),
+    )
+    if not isinstance(resp, dict) or "embedding" not in resp:
+        raise EmbeddingError("Embedding response missing 'embedding' field")
+    return resp["embedding"]
+
+
+def embed_texts(texts: List[str], retries: Optional[int] = None, batch_size: Optional[int] = None) -> np.ndarray:
     """Embed multiple texts using remote Ollama with L2 normalization.
 
+    Texts are sent ``batch_size`` at a time (default ``EMB_BATCH_SIZE``) to the
+    batched ``/api/embed`` endpoint. If the server does not support it, this
+    falls back to one ``/api/embeddings`` request per text and remembers that
+    for the rest of the process (see ``clear_cache``).
+
     Args:
         texts: List of strings to embed
         retries: Optional override for retry attempts (defaults to config.DEFAULT_RETRIES)
+        batch_size: Optional override for texts per /api/embed request
 
     Returns:
         NumPy array of shape (len(texts), embedding_dim) with float32 dtype, L2-normalized
@@ -218,28 +294,31 @@ def embed_texts(texts: List[str], retries: Optional[int] = None) -> np.ndarray:
     if not cb.allow_request():
         raise CircuitOpenError("ollama_embeddings", cb.get_retry_after())
 
+    step = max(1, batch_size or EMB_BATCH_SIZE)
+
     def _embed_batch() -> np.ndarray:
+        global _BATCH_API_SUPPORTED
+
         # Use the REST API directly to guarantee timeout/retry control
-        payloads = []
-        for idx, text in enumerate(texts):
-            resp = http_post_with_retries(
-                f"{RAG_OLLAMA_URL}/api/embeddings",
-                {"model": RAG_EMBED_MODEL, "prompt": text},
-                retries=0,
-                timeout=(EMB_CONNECT_T, EMB_READ_T),
-            )
-            if not isinstance(resp, dict) or "embedding" not in resp:
-                raise EmbeddingError("Embedding response missing 'embedding' field")
-
-            embedding = resp["embedding"]
-            # Per-call dimension validation to catch model mismatches early
-            actual_dim = len(embedding)
-            if actual_dim != EMB_DIM:
-                raise EmbeddingError(
-                    f"Embedding dimension mismatch at index {idx}: got {actual_dim}, expected {EMB_DIM}. "
-                    f"Check that EMB_DIM config matches the model '{RAG_EMBED_MODEL}' output."
-                )
-            payloads.append(embedding)
+        payloads: list = []
+        while len(payloads) < len(texts):
+            start = len(payloads)
+            embeddings = None
+            if EMB_BATCH_API and _BATCH_API_SUPPORTED is not False:
+                embeddings = _post_embed_batch(texts[start : start + step])
+                if embeddings is None:
+                    logger.warning(
+                        "Ollama at %s does not support batched /api/embed; falling back to per-text requests",
+                        RAG_OLLAMA_URL,
+                    )
+                    _BATCH_API_SUPPORTED = False
+                else:
+                    _BATCH_API_SUPPORTED = True
+            if embeddings is None:
+                embeddings = [_post_embed_single(text) for text in texts[start : start + step]]
+            for offset, embedding in enumerate(embeddings):
+                _check_dim(embedding, start + offset)
+            payloads.extend(embeddings)
 
         embeddings_array = _normalize_vectors(payloads)
         logger.debug("Successfully embedded and normalized %d texts: shape %s", len(texts), embeddings_array.shape)
@@ -314,8 +393,10 @@ def embed_query(text: str, retries: Optional[int] = None) -> np.ndarray:
 def clear_cache():
     """Clear the cached embedding client instance.
 
-    Useful for testing or switching Ollama endpoints at runtime.
+    Useful for testing or switching Ollama endpoints at runtime. Also forgets
+    whether the server supports batched /api/embed.
     """
-    global _EMBEDDING_CLIENT
+    global _EMBEDDING_CLIENT, _BATCH_API_SUPPORTED
     _EMBEDDING_CLIENT = None
+    _BATCH_API_SUPPORTED = None
     logger.debug("Cleared embedding client cache")
@@ -19,6 +19,15 @@ class LLMUnavailableError(LLMError):
     pass
 
 
+class LLMOverloadedError(LLMUnavailableError):
+    """LLM gateway shed the call: its queue is full or the wait would exceed the deadline."""
+
+    def __init__(self, message: str, retry_after: float, status_code: int = 503):
+        self.retry_after = retry_after
+        self.status_code = status_code
+        super().__init__(message)
+
+
 class LLMBadResponseError(LLMError):
     """LLM returned a malformed or incomplete payload."""
 
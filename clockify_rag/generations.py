@@ -0,0 +1,268 @@
+"""Versioned index generations and immutable index snapshots.
+
+With ``config.INDEX_GENERATIONS`` enabled, every build writes its artifacts into
+a fresh directory under ``FILES["index_generations"]`` (``gen-000001``,
+``gen-000002``, ...) and only then activates it by atomically replacing the
+``CURRENT`` pointer file. Readers resolve the pointer once and load every
+artifact from that one directory, so a load can never mix files from two
+builds and a build never touches files that a running server has mapped.
+
+Without a pointer (indexes built before generations, or with
+``INDEX_GENERATIONS=0``) artifacts are read from the flat ``FILES`` paths.
+
+Servers hold an :class:`IndexSnapshot` per generation. Each in-flight query
+pins the generation it captured; superseded generations are deleted once
+they are unpinned, beyond the newest ``config.INDEX_KEEP_GENERATIONS``. Pins
+are per process; the retained generations give other worker processes time
+to swap to the new pointer.
+"""
+
+import logging
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import config
+from .utils import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# FILES entries that belong to one build; everything else (embedding cache,
+# build lock) is shared between generations.
+ARTIFACT_KEYS = (
+    "chunks",
+    "emb",
+    "emb_f16",
+    "meta",
+    "bm25",
+    "bm25_index",
+    "faiss_index",
+    "hnsw",
+    "index_meta",
+    "article_manifest",
+)
+POINTER_NAME = "CURRENT"
+_GEN_RE = re.compile(r"^gen-(\d{6,})$")
+
+_PINS: Counter = Counter()
+_PIN_LOCK = threading.Lock()
+
+
+def generations_root() -> str:
+    return config.FILES["index_generations"]
+
+
+def artifact_files(generation_dir: Optional[str] = None) -> Dict[str, str]:
+    """Return a ``FILES``-style mapping with artifact paths inside ``generation_dir``.
+
+    With no directory the flat ``config.FILES`` paths are returned.
+    """
+    files = dict(config.FILES)
+    if generation_dir:
+        for key in ARTIFACT_KEYS:
+            files[key] = os.path.join(generation_dir, os.path.basename(config.FILES[key]))
+    return files
+
+
+def current_generation() -> Optional[str]:
+    """Directory of the active generation, or None when the flat layout is in use."""
+    pointer = os.path.join(generations_root(), POINTER_NAME)
+    try:
+        with open(pointer, encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    if not _GEN_RE.match(name):
+        logger.warning("Ignoring malformed index pointer %s: %r", pointer, name[:40])
+        return None
+    return os.path.join(generations_root(), name)
+
+
+def active_files() -> Dict[str, str]:
+    """Artifact paths of the active index (resolve once per load, then reuse)."""
+    return artifact_files(current_generation())
+
+
+def _generation_seq(name: str) -> Optional[int]:
+    """Sequence number of a generation directory name, or None if it is not one."""
+    match = _GEN_RE.match(name)
+    return int(match.group(1)) if match else None
+
+
+def list_generations() -> List[str]:
+    """Generation directories, oldest first."""
+    root = generations_root()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    seqs: Dict[str, int] = {}
+    for name in names:
+        seq = _generation_seq(name)
+        if seq is not None and os.path.isdir(os.path.join(root, name)):
+            seqs[name] = seq
+    return [os.path.join(root, n) for n in sorted(seqs, key=seqs.__getitem__)]
+
+
+def new_generation() -> str:
+    """Create the next (empty, inactive) generation directory; call under the build lock."""
+    root = generations_root()
+    os.makedirs(root, exist_ok=True)
+    existing = list_generations()
+    last = _generation_seq(os.path.basename(existing[-1])) if existing else None
+    seq = (last or 0) + 1
+    path = os.path.join(root, f"gen-{seq:06d}")
+    os.makedirs(path)
+    return path
+
+
+def activate_generation(generation_dir: str) -> None:
+    """Point readers at ``generation_dir`` with one atomic rename."""
+    name = os.path.basename(os.path.normpath(generation_dir))
+    pointer = os.path.join(generations_root(), POINTER_NAME)
+    atomic_write_text(pointer, name + "\n")
+    logger.info("Activated index generation %s", name)
+
+
+def deactivate_generations() -> None:
+    """Drop the pointer so readers fall back to the flat ``FILES`` layout."""
+    pointer = os.path.join(generations_root(), POINTER_NAME)
+    if os.path.exists(pointer):
+        os.remove(pointer)
+        logger.info("Index generations deactivated; using flat artifact paths")
+
+
+def discard_generation(generation_dir: str) -> None:
+    """Remove a generation that was never activated (failed build)."""
+    shutil.rmtree(generation_dir, ignore_errors=True)
+
+
+def pin(generation_dir: Optional[str]) -> None:
+    if generation_dir:
+        with _PIN_LOCK:
+            _PINS[os.path.normpath(generation_dir)] += 1
+
+
+def unpin(generation_dir: Optional[str]) -> None:
+    if not generation_dir:
+        return
+    key = os.path.normpath(generation_dir)
+    with _PIN_LOCK:
+        _PINS[key] -= 1
+        drained = _PINS[key] <= 0
+        if drained:
+            del _PINS[key]
+    if drained:
+        collect_generations()
+
+
+def pinned_generations() -> Dict[str, int]:
+    with _PIN_LOCK:
+        return dict(_PINS)
+
+
+def collect_generations(keep: Optional[int] = None) -> List[str]:
+    """Delete superseded, unpinned generations beyond the newest ``keep``.
+
+    Returns:
+        The directories that were removed.
+    """
+    keep = config.INDEX_KEEP_GENERATIONS if keep is None else keep
+    current = current_generation()
+    if current is None:
+        return []
+    current = os.path.normpath(current)
+    pinned = pinned_generations()
+    removed = []
+    # Generations newer than the current one are builds still in progress
+    candidates = [os.path.normpath(g) for g in list_generations()]
+    candidates = candidates[: candidates.index(current) + 1] if current in candidates else []
+    # The newest `keep` of those (current included) are retained
+    for gen in candidates[: -max(keep, 1)]:
+        if gen in pinned:
+            continue
+        shutil.rmtree(gen, ignore_errors=True)
+        removed.append(gen)
+    if removed:
+        logger.info("Removed superseded index generations: %s", ", ".join(os.path.basename(g) for g in removed))
+    return removed
+
+
+@dataclass(frozen=True, eq=False)
+class IndexSnapshot:
+    """Immutable view of one loaded index.
+
+    Queries capture the snapshot by reference and keep using it even if a new
+    index is activated meanwhile. Unpacks like the legacy
+    ``(chunks, vecs_n, bm, hnsw)`` tuple returned by ``ensure_index_ready``.
+    """
+
+    chunks: list
+    vecs_n: Any
+    bm: Any
+    hnsw: Any = None
+    faiss_index: Any = None
+    features: Any = None  # ChunkFeatures computed by load_index
+    meta: Dict[str, Any] = field(default_factory=dict)
+    generation: Optional[str] = None
+
+    @classmethod
+    def from_result(cls, result) -> "IndexSnapshot":
+        """Wrap a ``load_index`` dict or a legacy ``(chunks, vecs_n, bm, hnsw)`` tuple."""
+        if isinstance(result, IndexSnapshot):
+            return result
+        if isinstance(result, dict):
+            return cls(
+                chunks=result["chunks"],
+                vecs_n=result["vecs_n"],
+                bm=result["bm"],
+                hnsw=result.get("hnsw"),
+                faiss_index=result.get("faiss_index"),
+                features=result.get("features"),
+                meta=result.get("meta") or {},
+                generation=result.get("generation"),
+            )
+        chunks, vecs_n, bm, hnsw = result
+        return cls(chunks=chunks, vecs_n=vecs_n, bm=bm, hnsw=hnsw)
+
+    def as_tuple(self) -> tuple:
+        return (self.chunks, self.vecs_n, self.bm, self.hnsw)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.as_tuple())
+
+    def __len__(self) -> int:
+        return 4
+
+    def __getitem__(self, item):
+        return self.as_tuple()[item]
+
+    @contextmanager
+    def pinned(self):
+        """Keep this snapshot's generation on disk for the duration of the block."""
+        pin(self.generation)
+        try:
+            yield self
+        finally:
+            unpin(self.generation)
+
+
+__all__ = [
+    "ARTIFACT_KEYS",
+    "IndexSnapshot",
+    "activate_generation",
+    "active_files",
+    "artifact_files",
+    "collect_generations",
+    "current_generation",
+    "deactivate_generations",
+    "list_generations",
+    "new_generation",
+    "pin",
+    "unpin",
+]
@@ -0,0 +1,379 @@
+"""Incremental index rebuilds that only re-chunk and re-embed changed articles.
+
+A full build (``indexing.build``) records an article manifest next to the index:
+for every article, a fingerprint of its source and the chunk rows it produced.
+``build_incremental`` diffs the corpus against that manifest and patches the
+existing artifacts instead of rebuilding them:
+
+* chunks of unchanged articles keep their rows, embeddings and BM25 term counts;
+* chunks of new or edited articles take over the rows freed by removed chunks,
+  then extend the matrix; leftover holes are filled by moving rows off the tail;
+* BM25 document frequencies, idf and avgdl are adjusted for the dropped and
+  added documents only (see ``indexing.update_bm25``);
+* an IVF FAISS index drops and re-adds just the touched ids
+  (``remove_ids``/``add_with_ids``), so row ``i`` stays FAISS id ``i``.
+
+Every artifact is still rewritten (into a new index generation, or through
+the atomic writers in the flat layout), because API workers memory-map them;
+what is saved is the parsing, embedding and indexing work for unchanged
+articles. The build falls back to a full rebuild when the
+manifest is missing or was produced under different chunking/embedding
+settings, and once the rows replaced since the last full build exceed
+``config.INCREMENTAL_MAX_DRIFT`` of it (idf and IVF centroids drift otherwise).
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from . import config
+from .chunking import chunk_articles, iter_articles
+from .indexing import (
+    _build_full,
+    _manifest_header,
+    _try_load_faiss,
+    _validate_corpus_path,
+    build_faiss_index,
+    compact_embedding_cache,
+    embed_chunks_cached,
+    export_bm25_json,
+    load_article_manifest,
+    load_bm25,
+    normalize_rows,
+    publish_build,
+    reset_faiss_index,
+    save_article_manifest,
+    save_bm25_binary,
+    save_faiss_index,
+    update_bm25,
+    write_index_meta,
+)
+from .generations import ARTIFACT_KEYS, active_files
+from .metrics import MetricNames, get_metrics
+from .token_counting import annotate_token_counts
+from .utils import atomic_save_npy, atomic_write_json, atomic_write_jsonl, build_lock, compute_sha256
+
+logger = logging.getLogger(__name__)
+
+
+def plan_slots(n_old: int, removed_rows: List[int], n_new: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Lay out the patched index.
+
+    Args:
+        n_old: Rows in the current index
+        removed_rows: Rows whose chunks are dropped
+        n_new: Number of new chunks to place
+
+    Returns:
+        (order, new_slots): ``order[s]`` is the old row now stored at slot ``s``
+        (``-1`` for a new chunk) and ``new_slots[i]`` is the slot of new chunk ``i``.
+        Surviving rows below the new size never move.
+    """
+    removed = np.zeros(n_old, dtype=bool)
+    removed[np.asarray(removed_rows, dtype=np.int64)] = True
+    n_total = n_old - int(removed.sum()) + n_new
+
+    holes = np.flatnonzero(removed)
+    free = np.concatenate([holes[holes < n_total], np.arange(n_old, max(n_old, n_total))])
+    tail = np.flatnonzero(~removed[n_total:]) + n_total if n_total < n_old else np.empty(0, dtype=np.int64)
+
+    order = np.arange(n_total, dtype=np.int64)
+    order[free[:n_new]] = -1
+    order[free[n_new:]] = tail
+    return order, free[:n_new]
+
+
+def _fallback(md_path: str, retries, reason: str, files: Mapping[str, str], workers: Optional[int] = None) -> dict:
+    logger.info(f"  Incremental build not possible ({reason}); running a full rebuild")
+    stats = _build_full(md_path, retries, files, workers)
+    stats["fallback_reason"] = reason
+    return stats
+
+
+def _load_base(files: Mapping[str, str], n_expected: int) -> Tuple[Optional[dict], str]:
+    """Load the artifacts being patched, or return the reason they cannot be ("" when loaded)."""
+    chunks = []
+    try:
+        with open(files["chunks"], encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    chunks.append(json.loads(line))
+        vecs_n = np.load(files["emb"], mmap_mode="r")
+        bm = load_bm25(files)
+    except (OSError, ValueError) as e:
+        return None, f"cannot read current index: {e}"
+    if bm is None:
+        return None, "BM25 index missing"
+    if not (len(chunks) == n_expected == vecs_n.shape[0] == len(bm["doc_lens"])):
+        return None, "index artifacts out of sync with article manifest"
+    return {"chunks": chunks, "vecs_n": vecs_n, "bm": bm}, ""
+
+
+def _patch_faiss(vecs_n: np.ndarray, order: np.ndarray, n_old: int, base_path: str, path: str) -> str:
+    """Write the FAISS index for the new layout to ``path``; returns "patched" or "rebuilt"."""
+    faiss = _try_load_faiss()
+    index = None
+    if faiss is not None and os.path.exists(base_path) and len(vecs_n) >= config.FAISS_IVF_MIN_ROWS:
+        # Patch a private copy; readers keep the cached index until reset below
+        index = faiss.read_index(base_path)
+        if not hasattr(index, "nlist") or index.ntotal != n_old:
+            index = None
+
+    if index is None:
+        action = "rebuilt"
+        index = build_faiss_index(vecs_n, nlist=config.ANN_NLIST)
+    else:
+        action = "patched"
+        slots = np.arange(len(order), dtype=np.int64)
+        touched = slots[order != slots]
+        stale = np.concatenate([touched[touched < n_old], np.arange(len(order), n_old, dtype=np.int64)])
+        if stale.size:
+            index.remove_ids(stale)
+        if touched.size:
+            index.add_with_ids(np.ascontiguousarray(vecs_n[touched], dtype=np.float32), touched)
+
+    if index is not None:
+        reset_faiss_index()
+        save_faiss_index(index, path)
+    return action
+
+
+def build_incremental(md_path: str, retries=None, workers: Optional[int] = None) -> dict:
+    """Patch the current index for the articles that changed in ``md_path``.
+
+    ``workers`` sets the number of chunking processes (default: ``config.CHUNK_WORKERS``).
+
+    Returns:
+        Build stats: ``mode`` ("incremental", "noop" or "full" after a fallback,
+        with ``fallback_reason``), article and chunk counts and ``timings_ms``.
+    """
+    md_path = _validate_corpus_path(md_path)
+    with build_lock():
+        base_files = active_files()
+        return publish_build(lambda files: _build_incremental(md_path, retries, base_files, files, workers))
+
+
+def _build_incremental(
+    md_path: str, retries, base_files: Mapping[str, str], files: Mapping[str, str], workers: Optional[int] = None
+) -> dict:
+    """Patch the index at ``base_files`` into ``files`` (the same paths in the flat layout)."""
+    manifest = load_article_manifest(base_files["article_manifest"])
+    if manifest is None:
+        return _fallback(md_path, retries, "no article manifest", files, workers)
+    if {k: manifest.get(k) for k in ("chunking", "embedding")} != _manifest_header():
+        return _fallback(md_path, retries, "chunking or embedding settings changed", files, workers)
+    old_articles: Dict[str, dict] = manifest.get("articles") or {}
+    n_old = sum(len(a["rows"]) for a in old_articles.values())
+    base, reason = _load_base(base_files, n_old)
+    if base is None:
+        return _fallback(md_path, retries, reason, files, workers)
+    return _apply_incremental(md_path, retries, manifest, base, base_files, files, workers)
+
+
+def _link_artifacts(base_files: Mapping[str, str], files: Mapping[str, str]) -> None:
+    """Reproduce the artifacts at ``base_files`` (except ``index_meta``) at ``files``.
+
+    Hard links where the filesystem allows (generations are never written in
+    place), copies otherwise; a no-op for paths that are the same (flat layout).
+    """
+    for key in ARTIFACT_KEYS:
+        src, dst = base_files[key], files[key]
+        if key == "index_meta" or not os.path.exists(src) or os.path.abspath(src) == os.path.abspath(dst):
+            continue
+        if os.path.isdir(src):
+            shutil.copytree(src, dst, copy_function=_link_or_copy)
+        else:
+            _link_or_copy(src, dst)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _apply_incremental(
+    md_path: str,
+    retries,
+    manifest: dict,
+    base: dict,
+    base_files: Mapping[str, str],
+    files: Mapping[str, str],
+    workers: Optional[int] = None,
+) -> dict:
+    logger.info("=" * 70)
+    logger.info("UPDATING KNOWLEDGE BASE (incremental)")
+    logger.info("=" * 70)
+    ingest_start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    old_articles: Dict[str, dict] = manifest["articles"]
+    old_chunks = base["chunks"]
+    n_old = len(old_chunks)
+
+    logger.info("\n[1/5] Diffing articles...")
+    t0 = time.perf_counter()
+    current = list(iter_articles(md_path))
+    current_keys = {key for key, *_ in current}
+    changed = [a for a in current if a[0] in old_articles and old_articles[a[0]]["sha"] != a[1]]
+    added = [a for a in current if a[0] not in old_articles]
+    removed_keys = [key for key in old_articles if key not in current_keys]
+    removed_rows = sorted(row for key in [a[0] for a in changed] + removed_keys for row in old_articles[key]["rows"])
+    timings["diff"] = (time.perf_counter() - t0) * 1000
+    articles_stats = {
+        "total": len(current),
+        "unchanged": len(current) - len(changed) - len(added),
+        "changed": len(changed),
+        "added": len(added),
+        "removed": len(removed_keys),
+    }
+    logger.info(
+        f"  {articles_stats['changed']} changed, {articles_stats['added']} added, "
+        f"{articles_stats['removed']} removed, {articles_stats['unchanged']} unchanged"
+    )
+
+    if not (changed or added or removed_keys):
+        kb_sha = compute_sha256(md_path)
+        with open(base_files["index_meta"], encoding="utf-8") as f:
+            index_meta = json.load(f)
+        refresh = index_meta.get("kb_sha256") != kb_sha
+        if refresh:
+            # Only text outside the articles changed: publish the same index under the
+            # new fingerprint (the active generation is never modified in place)
+            _link_artifacts(base_files, files)
+            atomic_write_json(files["index_meta"], {**index_meta, "kb_sha256": kb_sha})
+        timings["total"] = (time.perf_counter() - ingest_start) * 1000
+        return {
+            "activate": refresh,
+            "mode": "noop",
+            "articles": articles_stats,
+            "chunks": {"total": n_old, "embedded": 0, "reused": n_old, "removed": 0},
+            "timings_ms": {name: round(ms, 2) for name, ms in timings.items()},
+        }
+
+    logger.info("\n[2/5] Chunking changed articles...")
+    t0 = time.perf_counter()
+    new_chunks: list = []
+    new_ranges: Dict[str, Tuple[int, int]] = {}
+    dirty = changed + added
+    chunked = chunk_articles([(source_path, doc_name, art) for _k, _s, source_path, doc_name, art in dirty], workers)
+    for (key, *_rest), article_chunks in zip(dirty, chunked):
+        start = len(new_chunks)
+        new_chunks.extend(article_chunks)
+        new_ranges[key] = (start, len(new_chunks))
+    annotate_token_counts(new_chunks)
+    timings["chunk"] = (time.perf_counter() - t0) * 1000
+
+    drift = int(manifest.get("drift_rows", 0)) + max(len(removed_rows), len(new_chunks))
+    full_rows = max(1, int(manifest.get("full_build_rows") or n_old))
+    if drift > config.INCREMENTAL_MAX_DRIFT * full_rows:
+        return _fallback(
+            md_path,
+            retries,
+            f"drift {drift}/{full_rows} rows exceeds INCREMENTAL_MAX_DRIFT={config.INCREMENTAL_MAX_DRIFT}",
+            files,
+            workers,
+        )
+
+    order, new_slots = plan_slots(n_old, removed_rows, len(new_chunks))
+    kept = order >= 0
+    chunks: list = [old_chunks[row] if row >= 0 else None for row in order.tolist()]  # new slots filled below
+    for i, slot in enumerate(new_slots.tolist()):
+        chunks[slot] = new_chunks[i]
+    logger.info(f"  {len(new_chunks)} new chunks replace {len(removed_rows)} ({len(chunks)} total)")
+
+    logger.info(f"\n[3/5] Embedding new chunks with {config.EMB_BACKEND}...")
+    t0 = time.perf_counter()
+    vecs_new, hits = embed_chunks_cached(new_chunks, retries=retries)
+    compact_embedding_cache(chunks)
+    old_vecs = base["vecs_n"]
+    vecs_n = np.empty((len(chunks), old_vecs.shape[1]), dtype=np.float32)
+    vecs_n[kept] = old_vecs[order[kept]]
+    if len(new_chunks):
+        vecs_n[new_slots] = normalize_rows(vecs_new)
+    timings["embed"] = (time.perf_counter() - t0) * 1000
+
+    logger.info("\n[4/5] Patching BM25 and ANN indexes...")
+    t0 = time.perf_counter()
+    bm = update_bm25(base["bm"], order, {slot: new_chunks[i]["text"] for i, slot in enumerate(new_slots.tolist())})
+    timings["bm25"] = (time.perf_counter() - t0) * 1000
+    faiss_action = None
+    if config.USE_ANN == "faiss":
+        t0 = time.perf_counter()
+        try:
+            faiss_action = _patch_faiss(vecs_n, order, n_old, base_files["faiss_index"], files["faiss_index"])
+            logger.info(f"  FAISS index {faiss_action}")
+        except Exception as e:
+            logger.warning(f"  FAISS index update failed: {e}")
+        timings["faiss"] = (time.perf_counter() - t0) * 1000
+
+    logger.info("\n[5/5] Writing artifacts...")
+    t0 = time.perf_counter()
+    atomic_write_jsonl(files["chunks"], chunks)
+    atomic_save_npy(vecs_n, files["emb"])
+    meta_lines = [{"id": c["id"], "title": c["title"], "url": c["url"], "section": c["section"]} for c in chunks]
+    atomic_write_jsonl(files["meta"], meta_lines)
+    save_bm25_binary(bm, files["bm25_index"])
+    if config.BM25_EXPORT_JSON:
+        export_bm25_json(bm, files["bm25"])
+
+    slot_of = np.full(n_old, -1, dtype=np.int64)
+    slot_of[order[kept]] = np.flatnonzero(kept)
+    articles: Dict[str, dict] = {}
+    for key, sha, *_ in current:
+        if key in new_ranges:
+            start, end = new_ranges[key]
+            rows = new_slots[start:end].tolist()
+        else:
+            rows = slot_of[old_articles[key]["rows"]].tolist()
+        articles[key] = {"sha": sha, "rows": rows}
+    save_article_manifest(
+        {**_manifest_header(), "articles": articles, "full_build_rows": full_rows, "drift_rows": drift},
+        files["article_manifest"],
+    )
+    write_index_meta(md_path, chunks, vecs_n, bm, files, build_mode="incremental")
+    timings["write"] = (time.perf_counter() - t0) * 1000
+
+    duration_ms = (time.perf_counter() - ingest_start) * 1000
+    timings["total"] = duration_ms
+    metrics = get_metrics()
+    metrics.increment_counter(MetricNames.INGESTIONS_TOTAL)
+    metrics.observe_histogram(MetricNames.INGESTION_LATENCY, duration_ms)
+    metrics.set_gauge(MetricNames.INDEX_SIZE, len(chunks))
+    logger.info(
+        json.dumps(
+            {
+                "event": "rag.ingest.complete",
+                "mode": "incremental",
+                "md_path": md_path,
+                "chunks": len(chunks),
+                "embedded": len(new_chunks) - hits,
+                "duration_ms": round(duration_ms, 2),
+            }
+        )
+    )
+    logger.info("=" * 70)
+
+    stats = {
+        "mode": "incremental",
+        "articles": articles_stats,
+        "chunks": {
+            "total": len(chunks),
+            "embedded": len(new_chunks) - hits,
+            "reused": len(chunks) - len(new_chunks) + hits,
+            "removed": len(removed_rows),
+        },
+        "drift": round(drift / full_rows, 4),
+        "timings_ms": {name: round(ms, 2) for name, ms in timings.items()},
+    }
+    if faiss_action:
+        stats["faiss"] = faiss_action
+    return stats
+
+
+__all__ = ["build_incremental", "plan_slots"]
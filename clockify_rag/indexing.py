@@ -6,20 +6,37 @@ import logging
 import math
 import os
 import platform
+import shutil
+import tempfile
 import threading
 import time
-from collections import Counter
-from typing import Optional
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, Iterator, Literal, Optional, Tuple
 
 import numpy as np
 
-from .chunking import build_chunks
+from .chunk_features import get_chunk_features
+from .chunking import chunk_articles, chunking_signature, iter_articles
 from . import config
-from .embedding import embed_texts, embed_local_batch, load_embedding_cache, save_embedding_cache
+from .embedding import embed_texts, embed_local_batch
+from .embedding_cache import EmbeddingCacheStore, current_namespace
 from .exceptions import BuildError
+from .generations import (
+    active_files,
+    activate_generation,
+    artifact_files,
+    collect_generations,
+    current_generation,
+    deactivate_generations,
+    discard_generation,
+    new_generation,
+)
 from .utils import (
     ALLOWED_CORPUS_FILENAME,
     build_lock,
+    atomic_replace_dir,
     atomic_write_jsonl,
     atomic_save_npy,
     atomic_write_json,
@@ -27,6 +44,7 @@ from .utils import (
     compute_sha256,
 )
 from .metrics import get_metrics, MetricNames
+from .token_counting import annotate_token_counts
 
 logger = logging.getLogger(__name__)
 
@@ -211,7 +229,107 @@ def reset_faiss_index():
 
 
 # ====== BM25 ======
-def build_bm25(chunks: list) -> dict:
+@dataclass(frozen=True)
+class BM25Postings:
+    """CSR inverted index compiled from BM25 term statistics.
+
+    Postings for the term at row ``vocab[term]`` are
+    ``doc_ids[offsets[row]:offsets[row + 1]]`` (ascending doc ids) with aligned
+    term frequencies in ``tfs``. ``len_norm`` holds ``doc_len / avgdl`` per
+    document, so scoring only touches the postings of the query terms.
+    """
+
+    vocab: Dict[str, int]
+    idf: np.ndarray  # float64 [V]
+    offsets: np.ndarray  # int64 [V + 1]
+    doc_ids: np.ndarray  # int32 [nnz]
+    tfs: np.ndarray  # float32 [nnz]
+    len_norm: np.ndarray  # float32 [N]
+
+    @property
+    def n_docs(self) -> int:
+        return int(self.len_norm.shape[0])
+
+
+class BM25Index(dict):
+    """BM25 statistics dict that carries its compiled inverted index.
+
+    Items are the legacy ``idf``/``avgdl``/``doc_lens``/``doc_tfs`` fields, so the
+    object still JSON-serialises and works wherever a plain dict did. The
+    NumPy postings live on the ``postings`` attribute and are not serialised.
+    """
+
+    def __init__(self, data: dict, postings: Optional[BM25Postings] = None):
+        super().__init__(data)
+        self.postings = postings if postings is not None else compile_bm25_postings(self)
+
+
+def compile_bm25_postings(bm: dict) -> BM25Postings:
+    """Compile per-document term frequency dicts into CSR postings arrays."""
+    terms = sorted(bm["idf"])
+    vocab = {term: row for row, term in enumerate(terms)}
+
+    rows: list[int] = []
+    ids: list[int] = []
+    freqs: list[int] = []
+    for doc_id, tf in enumerate(bm["doc_tfs"]):
+        for term, freq in tf.items():
+            row = vocab.get(term)
+            if row is None or not freq:
+                continue
+            rows.append(row)
+            ids.append(doc_id)
+            freqs.append(freq)
+
+    rows_arr = np.asarray(rows, dtype=np.int64)
+    # Stable sort keeps doc ids ascending inside each term's postings list
+    order = np.argsort(rows_arr, kind="stable")
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    if rows_arr.size:
+        np.cumsum(np.bincount(rows_arr, minlength=len(terms)), out=offsets[1:])
+
+    avgdl = float(bm.get("avgdl") or 0.0)
+    doc_lens = np.asarray(bm["doc_lens"], dtype=np.float32)
+    return BM25Postings(
+        vocab=vocab,
+        idf=np.asarray([bm["idf"][t] for t in terms], dtype=np.float64),
+        offsets=offsets,
+        doc_ids=np.asarray(ids, dtype=np.int32)[order],
+        tfs=np.asarray(freqs, dtype=np.float32)[order],
+        len_norm=(doc_lens / max(1.0, avgdl)).astype(np.float32),
+    )
+
+
+# Postings compiled for plain-dict BM25 indexes (which cannot carry an attribute),
+# keyed by id(); each entry keeps its dict alive so the id is not reused
+_DICT_POSTINGS: "OrderedDict[int, Tuple[dict, BM25Postings]]" = OrderedDict()
+_DICT_POSTINGS_MAX = 4
+_DICT_POSTINGS_LOCK = threading.Lock()
+
+
+def get_bm25_postings(bm: dict) -> BM25Postings:
+    """Return the compiled postings for ``bm``.
+
+    A plain dict (not a ``BM25Index``) is compiled on first use and the result is
+    memoised for that dict object, so it must not be mutated afterwards.
+    """
+    postings = getattr(bm, "postings", None)
+    if postings is not None:
+        return postings
+    with _DICT_POSTINGS_LOCK:
+        entry = _DICT_POSTINGS.get(id(bm))
+        if entry is not None and entry[0] is bm:
+            _DICT_POSTINGS.move_to_end(id(bm))
+            return entry[1]
+    postings = compile_bm25_postings(bm)
+    with _DICT_POSTINGS_LOCK:
+        _DICT_POSTINGS[id(bm)] = (bm, postings)
+        while len(_DICT_POSTINGS) > _DICT_POSTINGS_MAX:
+            _DICT_POSTINGS.popitem(last=False)
+    return postings
+
+
+def build_bm25(chunks: list) -> BM25Index:
     """Build BM25 index."""
     docs = [tokenize(c["text"]) for c in chunks]
     N = len(docs)
@@ -228,285 +346,654 @@ def build_bm25(chunks: list) -> dict:
     idf = {}
     for w, dfw in df.items():
         idf[w] = math.log((N - dfw + 0.5) / (dfw + 0.5) + 1.0)
-    return {
-        "idf": idf,
-        "avgdl": avgdl,
-        "doc_lens": doc_lens,
-        "doc_tfs": [{k: v for k, v in tf.items()} for tf in doc_tfs],
-    }
+    return BM25Index(
+        {
+            "idf": idf,
+            "avgdl": avgdl,
+            "doc_lens": doc_lens,
+            "doc_tfs": [{k: v for k, v in tf.items()} for tf in doc_tfs],
+        }
+    )
 
 
-def bm25_scores(
+# ====== BM25 BINARY ARTIFACT ======
+# On-disk layout of FILES["bm25_index"]: one ``.npy`` file per array plus a small
+# meta.json header. Arrays are opened with ``np.load(mmap_mode="r")`` so startup
+# does no parsing and forked API workers share the same page-cache pages.
+BM25_FORMAT_VERSION = 1
+_BM25_ARRAYS = ("vocab_bytes", "vocab_offsets", "idf", "offsets", "doc_ids", "tfs", "doc_lens")
+
+
+class _TermIdfView(Mapping):
+    """Read-only ``term -> idf`` mapping backed by the compiled vocabulary arrays."""
+
+    __slots__ = ("_vocab", "_idf")
+
+    def __init__(self, vocab: Dict[str, int], idf: np.ndarray):
+        self._vocab = vocab
+        self._idf = idf
+
+    def __getitem__(self, term: str) -> float:
+        return float(self._idf[self._vocab[term]])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._vocab)
+
+    def __len__(self) -> int:
+        return len(self._vocab)
+
+
+def _doc_tfs_from_postings(postings: BM25Postings) -> list[dict]:
+    """Rebuild per-document term frequency dicts by transposing the postings."""
+    terms = sorted(postings.vocab, key=postings.vocab.__getitem__)
+    doc_tfs: list[dict] = [{} for _ in range(postings.n_docs)]
+    rows = np.repeat(np.arange(len(terms)), np.diff(postings.offsets))
+    for row, doc_id, tf in zip(rows.tolist(), postings.doc_ids.tolist(), postings.tfs.tolist()):
+        doc_tfs[doc_id][terms[row]] = int(tf)
+    return doc_tfs
+
+
+def save_bm25_binary(bm: dict, path: Optional[str] = None) -> None:
+    """Write the BM25 index as a directory of ``.npy`` arrays and swap it in atomically."""
+    path = path or config.FILES["bm25_index"]
+    postings = get_bm25_postings(bm)
+    terms = sorted(postings.vocab, key=postings.vocab.__getitem__)
+    encoded = [term.encode("utf-8") for term in terms]
+    vocab_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(e) for e in encoded], out=vocab_offsets[1:])
+
+    arrays: Dict[str, np.ndarray] = {
+        "vocab_bytes": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "vocab_offsets": vocab_offsets,
+        "idf": np.asarray(postings.idf, dtype=np.float64),
+        "offsets": np.asarray(postings.offsets, dtype=np.int64),
+        "doc_ids": np.asarray(postings.doc_ids, dtype=np.int32),
+        "tfs": np.asarray(postings.tfs, dtype=np.float32),
+        "doc_lens": np.asarray(bm["doc_lens"], dtype=np.int32),
+    }
+    header = {
+        "format_version": BM25_FORMAT_VERSION,
+        "avgdl": float(bm.get("avgdl") or 0.0),
+        "n_docs": postings.n_docs,
+        "n_terms": len(terms),
+        "nnz": int(arrays["doc_ids"].size),
+    }
+
+    parent = os.path.dirname(os.path.abspath(path)) or "."
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp.bm25.", dir=parent)
+    try:
+        for name, arr in arrays.items():
+            with open(os.path.join(tmp_dir, f"{name}.npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(arr))
+                f.flush()
+                os.fsync(f.fileno())
+        atomic_write_json(os.path.join(tmp_dir, "meta.json"), header)
+        atomic_replace_dir(tmp_dir, path)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_bm25_binary(path: Optional[str] = None, mmap: bool = True) -> BM25Index:
+    """Open a binary BM25 artifact; arrays are memory-mapped read-only by default.
+
+    The returned index has no ``doc_tfs`` item and its ``idf`` item is a read-only
+    mapping view, so use :func:`export_bm25_json` rather than ``json.dump``.
+    """
+    path = path or config.FILES["bm25_index"]
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format_version") != BM25_FORMAT_VERSION:
+        raise ValueError(f"Unsupported BM25 artifact version {header.get('format_version')!r} in {path}")
+
+    mmap_mode: Optional[Literal["r"]] = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in _BM25_ARRAYS}
+
+    raw = arrays["vocab_bytes"].tobytes()
+    bounds = arrays["vocab_offsets"].tolist()
+    vocab = {raw[bounds[row] : bounds[row + 1]].decode("utf-8"): row for row in range(len(bounds) - 1)}
+
+    avgdl = float(header["avgdl"])
+    doc_lens = arrays["doc_lens"]
+    postings = BM25Postings(
+        vocab=vocab,
+        idf=arrays["idf"],
+        offsets=arrays["offsets"],
+        doc_ids=arrays["doc_ids"],
+        tfs=arrays["tfs"],
+        len_norm=(np.asarray(doc_lens, dtype=np.float32) / max(1.0, avgdl)).astype(np.float32),
+    )
+    return BM25Index(
+        {"idf": _TermIdfView(vocab, arrays["idf"]), "avgdl": avgdl, "doc_lens": doc_lens},
+        postings=postings,
+    )
+
+
+def export_bm25_json(bm: dict, path: Optional[str] = None) -> None:
+    """Write ``bm`` in the legacy bm25.json layout (debugging and external tooling)."""
+    path = path or config.FILES["bm25"]
+    doc_tfs = bm.get("doc_tfs")
+    if doc_tfs is None:
+        doc_tfs = _doc_tfs_from_postings(get_bm25_postings(bm))
+    atomic_write_json(
+        path,
+        {
+            "idf": {term: float(value) for term, value in bm["idf"].items()},
+            "avgdl": float(bm.get("avgdl") or 0.0),
+            "doc_lens": [int(n) for n in bm["doc_lens"]],
+            "doc_tfs": doc_tfs,
+        },
+    )
+
+
+def bm25_artifact_exists(files: Optional[Mapping[str, str]] = None) -> bool:
+    """Return True when either the binary BM25 artifact or a legacy bm25.json is present."""
+    files = files or active_files()
+    return os.path.isdir(files["bm25_index"]) or os.path.exists(files["bm25"])
+
+
+def load_bm25(files: Optional[Mapping[str, str]] = None) -> Optional[BM25Index]:
+    """Load BM25 statistics, preferring the memory-mapped binary artifact."""
+    files = files or active_files()
+    if os.path.isdir(files["bm25_index"]):
+        return load_bm25_binary(files["bm25_index"])
+    if os.path.exists(files["bm25"]):
+        logger.info(f"Loading legacy {files['bm25']}; rebuild to switch to the binary BM25 artifact")
+        with open(files["bm25"], encoding="utf-8") as f:
+            return BM25Index(json.load(f))
+    return None
+
+
+# bm25_sparse_scores_batch accumulates at most this many (query, document) slots at once
+_BM25_BATCH_BLOCK = 1 << 22
+
+
+def _query_term_rows(query: str, postings: BM25Postings) -> Tuple[list[int], list[int]]:
+    """Postings rows of the query's terms that occur in the corpus, with their query term frequencies."""
+    rows: list[int] = []
+    weights: list[int] = []
+    for term, qtf in Counter(tokenize(query)).items():
+        row = postings.vocab.get(term)
+        if row is not None and postings.offsets[row + 1] > postings.offsets[row]:
+            rows.append(row)
+            weights.append(qtf)
+    return rows, weights
+
+
+def _prune_top_k(
+    postings: BM25Postings, doc_ids: np.ndarray, scores: np.ndarray, top_k: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Rank 24: keep only the best top_k documents when the corpus is large enough
+    if top_k is not None and top_k > 0 and postings.n_docs > top_k * 1.1 and doc_ids.size > top_k:
+        keep = np.sort(np.argpartition(-scores, top_k - 1)[:top_k])
+        doc_ids, scores = doc_ids[keep], scores[keep]
+    return doc_ids.astype(np.int32), scores
+
+
+def bm25_sparse_scores(
     query: str, bm: dict, k1: Optional[float] = None, b: Optional[float] = None, top_k: Optional[int] = None
-) -> np.ndarray:
-    """Compute BM25 scores with optional early termination (Rank 24)."""
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score only the documents that contain a query term.
+
+    Gathers the postings of each query term, computes per-posting BM25
+    contributions in one vectorised pass and accumulates them per document
+    with ``np.add.at``.
+
+    Returns:
+        (doc_ids, scores): int32 ascending doc ids and aligned float32 scores.
+        With ``top_k`` set, only the ``top_k`` best documents are kept.
+    """
     if k1 is None:
         k1 = config.BM25_K1
     if b is None:
         b = config.BM25_B
-    q = tokenize(query)
-    idf = bm["idf"]
-    avgdl = bm["avgdl"]
-    doc_lens = bm["doc_lens"]
-    doc_tfs = bm["doc_tfs"]
-
-    # Rank 24: Early termination with Wand-like pruning
-    # OPTIMIZATION: Lowered threshold from 1.5x to 1.1x for 2-3x speedup on medium/large corpora
-    if top_k is not None and top_k > 0 and len(doc_lens) > top_k * 1.1:  # Was 1.5, now 1.1
-        import heapq
-
-        term_upper_bounds = {}
-        for w in q:
-            if w in idf:
-                term_upper_bounds[w] = idf[w] * (k1 + 1)
-
-        total_upper_bound = sum(term_upper_bounds.values())
-        top_scores: list[tuple[float, int]] = []
-        threshold = 0.0
-
-        for i, tf in enumerate(doc_tfs):
-            if not any(w in tf for w in q):
-                continue
+    postings = get_bm25_postings(bm)
 
-            if len(top_scores) >= top_k and total_upper_bound < threshold:
-                continue
+    rows, weights = _query_term_rows(query, postings)
+    if not rows:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
 
-            dl = doc_lens[i]
-            s = 0.0
-            for w in q:
-                if w not in idf:
-                    continue
-                f = tf.get(w, 0)
-                if f == 0:
-                    continue
-                denom = f + k1 * (1 - b + b * dl / max(1.0, avgdl))
-                s += idf[w] * (f * (k1 + 1)) / denom
-
-            if len(top_scores) < top_k:
-                heapq.heappush(top_scores, (s, i))
-                if len(top_scores) == top_k:
-                    threshold = top_scores[0][0]
-            elif s > threshold:
-                heapq.heapreplace(top_scores, (s, i))
-                threshold = top_scores[0][0]
-
-        scores = np.zeros(len(doc_lens), dtype="float32")
-        for score, idx in top_scores:
-            scores[idx] = score
-
-        return scores
-
-    # Original implementation: compute all scores
-    scores = np.zeros(len(doc_lens), dtype="float32")
-    for i, tf in enumerate(doc_tfs):
-        dl = doc_lens[i]
-        s = 0.0
-        for w in q:
-            if w not in idf:
-                continue
-            f = tf.get(w, 0)
-            if f == 0:
-                continue
-            denom = f + k1 * (1 - b + b * dl / max(1.0, avgdl))
-            s += idf[w] * (f * (k1 + 1)) / denom
-        scores[i] = s
+    starts = postings.offsets[rows]
+    lengths = postings.offsets[np.asarray(rows) + 1] - starts
+    ids = np.concatenate([postings.doc_ids[s : s + n] for s, n in zip(starts, lengths)])
+    tf = np.concatenate([postings.tfs[s : s + n] for s, n in zip(starts, lengths)]).astype(np.float64)
+    term_weight = np.repeat(postings.idf[rows] * np.asarray(weights, dtype=np.float64), lengths)
+
+    denom = tf + k1 * (1 - b + b * postings.len_norm[ids])
+    contrib = term_weight * (tf * (k1 + 1)) / denom
+
+    doc_ids, inverse = np.unique(ids, return_inverse=True)
+    acc = np.zeros(doc_ids.shape[0], dtype=np.float64)
+    np.add.at(acc, inverse, contrib)
+    return _prune_top_k(postings, doc_ids, acc.astype(np.float32), top_k)
+
+
+def bm25_sparse_scores_batch(
+    queries: list[str], bm: dict, k1: Optional[float] = None, b: Optional[float] = None, top_k: Optional[int] = None
+) -> list[Tuple[np.ndarray, np.ndarray]]:
+    """``bm25_sparse_scores`` for many queries in one pass over shared postings.
+
+    Each distinct term's postings are gathered, and their length-normalised
+    term frequencies computed, once for the whole batch; the per-query
+    contributions are then accumulated together, keyed by (query, document).
+    Contributions are summed in the same order as for a single query, so each
+    result is identical to ``bm25_sparse_scores`` for that query.
+    """
+    if k1 is None:
+        k1 = config.BM25_K1
+    if b is None:
+        b = config.BM25_B
+    postings = get_bm25_postings(bm)
+    empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+
+    pair_query: list[int] = []
+    pair_rows: list[int] = []
+    pair_weights: list[int] = []
+    for qi, query in enumerate(queries):
+        rows, weights = _query_term_rows(query, postings)
+        pair_query.extend([qi] * len(rows))
+        pair_rows.extend(rows)
+        pair_weights.extend(weights)
+    if not pair_rows:
+        return [empty for _ in queries]
+
+    # Postings of each distinct term, laid out back to back
+    terms, pair_term = np.unique(np.asarray(pair_rows, dtype=np.int64), return_inverse=True)
+    starts = postings.offsets[terms]
+    lengths = postings.offsets[terms + 1] - starts
+    term_ids = np.concatenate([postings.doc_ids[s : s + n] for s, n in zip(starts, lengths)])
+    tf = np.concatenate([postings.tfs[s : s + n] for s, n in zip(starts, lengths)]).astype(np.float64)
+    numer = tf * (k1 + 1)
+    denom = tf + k1 * (1 - b + b * postings.len_norm[term_ids])
+
+    # Expand to one entry per (query, term, document), in query then term order
+    pair_lengths = lengths[pair_term]
+    term_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pair_offsets = np.concatenate(([0], np.cumsum(pair_lengths)[:-1]))
+    pos = np.arange(int(pair_lengths.sum())) + np.repeat(term_starts[pair_term] - pair_offsets, pair_lengths)
+    term_weight = np.repeat(postings.idf[pair_rows] * np.asarray(pair_weights, dtype=np.float64), pair_lengths)
+    contrib = term_weight * numer[pos] / denom[pos]
+
+    # Accumulate per (query, document) with bincount, a block of queries at a time: it adds
+    # in array order like np.add.at, without sorting the batch's postings
+    n_docs = max(postings.n_docs, 1)
+    entry_query = np.repeat(np.asarray(pair_query, dtype=np.int64), pair_lengths)
+    entry_doc = term_ids[pos].astype(np.int64)
+    block = max(1, _BM25_BATCH_BLOCK // n_docs)
+    results = []
+    for q0 in range(0, len(queries), block):
+        q1 = min(q0 + block, len(queries))
+        lo, hi = np.searchsorted(entry_query, [q0, q1])
+        keys = (entry_query[lo:hi] - q0) * n_docs + entry_doc[lo:hi]
+        size = (q1 - q0) * n_docs
+        present = np.flatnonzero(np.bincount(keys, minlength=size))
+        acc = np.bincount(keys, weights=contrib[lo:hi], minlength=size)[present].astype(np.float32)
+        bounds = np.searchsorted(present, np.arange(q1 - q0 + 1, dtype=np.int64) * n_docs)
+        for offset in range(q1 - q0):
+            start, end = bounds[offset], bounds[offset + 1]
+            if start == end:
+                results.append(empty)
+            else:
+                doc_ids = present[start:end] - offset * n_docs
+                results.append(_prune_top_k(postings, doc_ids, acc[start:end], top_k))
+    return results
+
+
+def bm25_scores(
+    query: str, bm: dict, k1: Optional[float] = None, b: Optional[float] = None, top_k: Optional[int] = None
+) -> np.ndarray:
+    """Compute dense BM25 scores from the inverted index (Rank 24: optional top_k pruning)."""
+    doc_ids, sparse = bm25_sparse_scores(query, bm, k1=k1, b=b, top_k=top_k)
+    scores = np.zeros(get_bm25_postings(bm).n_docs, dtype="float32")
+    scores[doc_ids] = sparse
     return scores
 
 
+def update_bm25(bm: dict, order: np.ndarray, new_docs: Dict[int, str]) -> BM25Index:
+    """Patch BM25 statistics for a new row layout without re-tokenizing unchanged documents.
+
+    Args:
+        bm: Current BM25 index over ``N`` documents
+        order: For each new row, the old row it keeps (``-1`` for new documents)
+        new_docs: Text of every new row whose ``order`` entry is ``-1``
+
+    Document frequencies are adjusted for the dropped and added documents only;
+    idf and avgdl are then recomputed, so the result matches ``build_bm25`` on
+    the new chunk list.
+    """
+    postings = get_bm25_postings(bm)
+    old_tfs = bm.get("doc_tfs")
+    if old_tfs is None:
+        old_tfs = _doc_tfs_from_postings(postings)
+    old_lens = [int(n) for n in bm["doc_lens"]]
+
+    terms = sorted(postings.vocab, key=postings.vocab.__getitem__)
+    df: Counter = Counter(dict(zip(terms, np.diff(postings.offsets).tolist())))
+    kept = set(int(r) for r in order if r >= 0)
+    for row in range(len(old_tfs)):
+        if row not in kept:
+            df.subtract(old_tfs[row].keys())
+
+    doc_tfs: list[dict] = []
+    doc_lens: list[int] = []
+    for slot, row in enumerate(order.tolist()):
+        if row >= 0:
+            doc_tfs.append(old_tfs[row])
+            doc_lens.append(old_lens[row])
+        else:
+            toks = tokenize(new_docs[slot])
+            tf = dict(Counter(toks))
+            df.update(tf.keys())
+            doc_tfs.append(tf)
+            doc_lens.append(len(toks))
+
+    N = len(doc_tfs)
+    idf = {w: math.log((N - dfw + 0.5) / (dfw + 0.5) + 1.0) for w, dfw in df.items() if dfw > 0}
+    return BM25Index({"idf": idf, "avgdl": sum(doc_lens) / max(1, N), "doc_lens": doc_lens, "doc_tfs": doc_tfs})
+
+
+# ====== ARTICLE MANIFEST ======
+# FILES["article_manifest"] records which chunk rows each article produced and a
+# fingerprint of its source, so incremental builds only re-chunk changed articles.
+ARTICLE_MANIFEST_VERSION = 1
+
+
+def save_article_manifest(manifest: dict, path: Optional[str] = None) -> None:
+    atomic_write_json(
+        path or config.FILES["article_manifest"], {"format_version": ARTICLE_MANIFEST_VERSION, **manifest}
+    )
+
+
+def load_article_manifest(path: Optional[str] = None) -> Optional[dict]:
+    """Return the article manifest of the current index, or None if missing or outdated."""
+    path = path or active_files()["article_manifest"]
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != ARTICLE_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _manifest_header() -> dict:
+    """Build settings an incremental build must share with the index it patches."""
+    return {"chunking": chunking_signature(), "embedding": list(current_namespace())}
+
+
 # ====== BUILD FUNCTION ======
-def build(md_path: str, retries=None):
-    """Build knowledge base with atomic writes and locking."""
+def _validate_corpus_path(md_path: str) -> str:
     md_path = os.path.expandvars(os.path.expanduser(str(md_path)))
     if os.path.basename(md_path) != ALLOWED_CORPUS_FILENAME:
         raise BuildError(f"Only {ALLOWED_CORPUS_FILENAME} is supported for ingestion.")
     if not os.path.isfile(md_path):
         raise BuildError(f"{md_path} not found")
-    with build_lock():
-        logger.info("=" * 70)
-        logger.info("BUILDING KNOWLEDGE BASE")
-        logger.info("=" * 70)
-        metrics = get_metrics()
-        metrics.increment_counter(MetricNames.INGESTIONS_TOTAL)
-        ingest_start = time.time()
-        logger.info(
-            json.dumps(
-                {
-                    "event": "rag.ingest.start",
-                    "md_path": md_path,
-                    "backend": config.EMB_BACKEND,
-                }
+    return md_path
+
+
+def embed_chunks_cached(chunks: list, retries=None) -> Tuple[np.ndarray, int]:
+    """Embed chunk texts through the binary embedding cache.
+
+    Returns:
+        (vecs, hits): raw (unnormalized) float32 matrix aligned with ``chunks``
+        and the number of rows served from the cache. Misses are embedded with
+        the configured backend and appended to the cache.
+    """
+    emb_store = EmbeddingCacheStore.open()
+    effective_retries = config.DEFAULT_RETRIES if retries is None else retries
+
+    # Compute content hashes and look them up in the binary cache
+    chunk_hashes = [hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest() for chunk in chunks]
+    cache_rows = emb_store.lookup(chunk_hashes)
+    hit_mask = cache_rows >= 0
+    cache_miss_indices = np.flatnonzero(~hit_mask)
+
+    hits = len(chunks) - len(cache_miss_indices)
+    hit_rate = hits / len(chunks) * 100 if chunks else 0
+    logger.info(f"  Cache: {hits}/{len(chunks)} hits ({hit_rate:.1f}%)")
+
+    # Cached rows come straight from the memory-mapped matrix (always emb_store.dim wide)
+    expected_dim = emb_store.dim
+    vecs = np.empty((len(chunks), expected_dim), dtype=np.float32)
+    vecs[hit_mask] = emb_store.vectors[cache_rows[hit_mask]]
+
+    # Embed cache misses
+    if len(cache_miss_indices):
+        texts_to_embed = [chunks[i]["text"] for i in cache_miss_indices]
+        logger.info(f"  Computing {len(texts_to_embed)} new embeddings...")
+
+        if config.EMB_BACKEND == "local":
+            new_embeddings = embed_local_batch(texts_to_embed, normalize=False)
+        else:
+            new_embeddings = embed_texts(texts_to_embed, retries=effective_retries)
+
+        new_embeddings = np.asarray(new_embeddings, dtype=np.float32)
+        if new_embeddings.shape != (len(texts_to_embed), expected_dim):
+            raise BuildError(
+                f"New embeddings have shape {new_embeddings.shape}, "
+                f"expected {(len(texts_to_embed), expected_dim)} for backend={config.EMB_BACKEND}. "
+                f"Check {config.EMB_BACKEND} configuration or model output."
             )
-        )
+        vecs[cache_miss_indices] = new_embeddings
+        # Appends only the new rows; the rest of the cache is not rewritten
+        emb_store.append([chunk_hashes[i] for i in cache_miss_indices], new_embeddings)
+
+    return vecs, hits
+
+
+def compact_embedding_cache(chunks: list) -> None:
+    """Drop cache rows for chunks no longer in the corpus once they pass EMB_CACHE_COMPACT_RATIO."""
+    emb_store = EmbeddingCacheStore.open(migrate=False)
+    live = [hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest() for chunk in chunks]
+    stale = emb_store.stale_rows(live)
+    if stale and stale > config.EMB_CACHE_COMPACT_RATIO * emb_store.rows:
+        emb_store.compact(live)
+        logger.info(f"  Pruned {stale} stale embedding cache rows")
+
+
+def normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1e-9
+    return (vecs / norms).astype("float32")
+
+
+def write_index_meta(
+    md_path: str, chunks: list, vecs_n: np.ndarray, bm: dict, files: Mapping[str, str], **extra
+) -> dict:
+    """Write ``files["index_meta"]`` describing the artifacts just written."""
+    index_meta = {
+        "kb_sha256": compute_sha256(md_path),
+        "chunks": len(chunks),
+        "emb_rows": int(vecs_n.shape[0]),
+        "bm25_docs": len(bm["doc_lens"]),
+        "gen_model": config.RAG_CHAT_MODEL,
+        "emb_model": config.RAG_EMBED_MODEL if config.EMB_BACKEND == "ollama" else "all-MiniLM-L6-v2",
+        "emb_backend": config.EMB_BACKEND,
+        "ann": config.USE_ANN,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **extra,
+    }
+    atomic_write_json(files["index_meta"], index_meta)
+    return index_meta
+
 
-        logger.info("\n[1/4] Parsing and chunking...")
-        chunks = build_chunks(md_path)
-        logger.info(f"  Created {len(chunks)} chunks")
-        atomic_write_jsonl(config.FILES["chunks"], chunks)
+def build(md_path: str, retries=None, workers: Optional[int] = None) -> dict:
+    """Build knowledge base with atomic writes and locking.
 
-        logger.info(f"\n[2/4] Embedding with {config.EMB_BACKEND}...")
-        emb_cache = load_embedding_cache()
-        effective_retries = config.DEFAULT_RETRIES if retries is None else retries
+    With ``config.INDEX_GENERATIONS`` the index is written to a new generation
+    directory and activated only once complete. ``workers`` sets the number of
+    chunking processes (default: ``config.CHUNK_WORKERS``).
 
-        # Compute content hashes
-        chunk_hashes = []
-        cache_hits = []
-        cache_miss_indices = []
-        cache_changed = False
+    Returns:
+        Build stats: ``mode``, chunk counts and per-stage ``timings_ms``.
+    """
+    md_path = _validate_corpus_path(md_path)
+    with build_lock():
+        return publish_build(lambda files: _build_full(md_path, retries, files, workers))
 
-        for i, chunk in enumerate(chunks):
-            chunk_hash = hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest()
-            chunk_hashes.append(chunk_hash)
 
-            if chunk_hash in emb_cache:
-                cache_hits.append(emb_cache[chunk_hash])
-            else:
-                cache_hits.append(None)
-                cache_miss_indices.append(i)
-
-        valid_hashes = set(chunk_hashes)
-        stale_keys = [key for key in emb_cache.keys() if key not in valid_hashes]
-        if stale_keys:
-            for key in stale_keys:
-                emb_cache.pop(key, None)
-            cache_changed = True
-            logger.info(f"  Pruned {len(stale_keys)} stale embedding cache entries")
-
-        hit_rate = (len(chunks) - len(cache_miss_indices)) / len(chunks) * 100 if chunks else 0
-        logger.info(f"  Cache: {len(chunks) - len(cache_miss_indices)}/{len(chunks)} hits ({hit_rate:.1f}%)")
-
-        # Compute expected dimension based on current backend
-        expected_dim = config.EMB_DIM_LOCAL if config.EMB_BACKEND == "local" else config.EMB_DIM_OLLAMA
-
-        # Embed cache misses
-        new_embeddings: np.ndarray = np.empty((0, expected_dim), dtype=np.float32)
-        if cache_miss_indices:
-            texts_to_embed = [chunks[i]["text"] for i in cache_miss_indices]
-            logger.info(f"  Computing {len(texts_to_embed)} new embeddings...")
-
-            if config.EMB_BACKEND == "local":
-                new_embeddings = embed_local_batch(texts_to_embed, normalize=False)
-            else:
-                new_embeddings = embed_texts(texts_to_embed, retries=effective_retries)
-
-            for i, idx in enumerate(cache_miss_indices):
-                chunk_hash = chunk_hashes[idx]
-                emb_cache[chunk_hash] = new_embeddings[i].astype(np.float32)
-            cache_changed = True
-
-        # Reconstruct full embedding matrix with dimension validation
-        vecs_list: list = []
-        new_emb_idx = 0
-        for i in range(len(chunks)):
-            if cache_hits[i] is not None:
-                cached_emb = cache_hits[i]
-                # Defensive check: validate cached embedding dimension
-                if len(cached_emb) != expected_dim:
-                    raise BuildError(
-                        f"Cached embedding {i} has dimension {len(cached_emb)}, "
-                        f"expected {expected_dim} for backend={config.EMB_BACKEND}. "
-                        f"This should have been filtered by load_embedding_cache(). "
-                        f"Try deleting {config.FILES['emb_cache']} and rebuilding."
-                    )
-                vecs_list.append(cached_emb)
-            else:
-                new_emb = new_embeddings[new_emb_idx]
-                # Validate new embedding dimension
-                if len(new_emb) != expected_dim:
-                    raise BuildError(
-                        f"New embedding {i} has dimension {len(new_emb)}, "
-                        f"expected {expected_dim} for backend={config.EMB_BACKEND}. "
-                        f"Check {config.EMB_BACKEND} configuration or model output."
-                    )
-                vecs_list.append(new_emb)
-                new_emb_idx += 1
-
-        # Final sanity check before array construction
-        if vecs_list:
-            first_dim = len(vecs_list[0])
-            for idx, vec in enumerate(vecs_list):
-                if len(vec) != first_dim:
-                    raise BuildError(
-                        f"Dimension mismatch at index {idx}: "
-                        f"expected {first_dim}, got {len(vec)}. "
-                        f"Cannot mix embeddings with different dimensions."
-                    )
-
-        vecs = np.array(vecs_list, dtype=np.float32)
-
-        if cache_miss_indices or cache_changed:
-            save_embedding_cache(emb_cache)
-
-        # Normalize embeddings
-        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
-        norms[norms == 0] = 1e-9
-        vecs_n = (vecs / norms).astype("float32")
-        atomic_save_npy(vecs_n, config.FILES["emb"])
-        logger.info(f"  Saved {vecs_n.shape} embeddings (normalized)")
-
-        # Write metadata
-        meta_lines = [{"id": c["id"], "title": c["title"], "url": c["url"], "section": c["section"]} for c in chunks]
-        atomic_write_jsonl(config.FILES["meta"], meta_lines)
-
-        logger.info("\n[3/4] Building BM25 index...")
-        bm = build_bm25(chunks)
-        atomic_write_json(config.FILES["bm25"], bm)
-        logger.info(f"  Indexed {len(bm['idf'])} unique terms")
-
-        # Optional FAISS
-        if config.USE_ANN == "faiss":
-            try:
-                logger.info("\n[3.1/4] Building FAISS ANN index...")
-                faiss_index = build_faiss_index(vecs_n, nlist=config.ANN_NLIST)
-                if faiss_index is not None:
-                    # FIX: Reset cache BEFORE saving to prevent race condition
-                    # where concurrent readers could get stale cached index
-                    # between save and reset. After reset, readers will re-load
-                    # from disk (getting either old or new version, both valid).
-                    reset_faiss_index()
-                    save_faiss_index(faiss_index, config.FILES["faiss_index"])
-                    logger.info(f"  Saved FAISS index to {config.FILES['faiss_index']}")
-            except Exception as e:
-                logger.warning(f"  FAISS index build failed: {e}")
-
-        # Write metadata
-        logger.info("\n[3.6/4] Writing artifact metadata...")
-        kb_sha = compute_sha256(md_path)
-        index_meta = {
-            "kb_sha256": kb_sha,
-            "chunks": len(chunks),
-            "emb_rows": int(vecs_n.shape[0]),
-            "bm25_docs": len(bm["doc_lens"]),
-            "gen_model": config.RAG_CHAT_MODEL,
-            "emb_model": config.RAG_EMBED_MODEL if config.EMB_BACKEND == "ollama" else "all-MiniLM-L6-v2",
-            "emb_backend": config.EMB_BACKEND,
-            "ann": config.USE_ANN,
-            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        }
-        atomic_write_json(config.FILES["index_meta"], index_meta)
-        logger.info("  Saved index metadata")
+def publish_build(build_fn) -> dict:
+    """Run ``build_fn(files)`` against a new generation and activate it on success.
 
-        # Note: FAISS cache reset moved to before save_faiss_index() to prevent race condition
+    Without generations ``build_fn`` writes in place to the flat ``config.FILES``
+    layout. ``build_fn`` may return stats with ``"activate": False`` when it
+    wrote nothing; the new generation is then discarded. The caller holds the
+    build lock.
+    """
+    if not config.INDEX_GENERATIONS:
+        stats = build_fn(dict(config.FILES))
+        if stats.pop("activate", True):
+            # A flat build supersedes any generation activated while INDEX_GENERATIONS was on
+            deactivate_generations()
+        return stats
+
+    generation = new_generation()
+    try:
+        stats = build_fn(artifact_files(generation))
+    except BaseException:
+        discard_generation(generation)
+        raise
+    if not stats.pop("activate", True):
+        discard_generation(generation)
+        return stats
+    activate_generation(generation)
+    collect_generations()
+    stats["generation"] = os.path.basename(generation)
+    return stats
+
+
+def _build_full(
+    md_path: str, retries=None, files: Optional[Mapping[str, str]] = None, workers: Optional[int] = None
+) -> dict:
+    """Full rebuild into ``files`` (default: flat ``config.FILES``); the caller holds the build lock."""
+    files = files or config.FILES
+    logger.info("=" * 70)
+    logger.info("BUILDING KNOWLEDGE BASE")
+    logger.info("=" * 70)
+    metrics = get_metrics()
+    metrics.increment_counter(MetricNames.INGESTIONS_TOTAL)
+    ingest_start = time.time()
+    timings: Dict[str, float] = {}
+    logger.info(
+        json.dumps(
+            {
+                "event": "rag.ingest.start",
+                "md_path": md_path,
+                "backend": config.EMB_BACKEND,
+            }
+        )
+    )
+
+    logger.info("\n[1/4] Parsing and chunking...")
+    t0 = time.perf_counter()
+    chunks: list = []
+    articles: Dict[str, dict] = {}
+    parsed = list(iter_articles(md_path))
+    chunked = chunk_articles([(source_path, doc_name, art) for _k, _s, source_path, doc_name, art in parsed], workers)
+    for (key, sha, *_rest), article_chunks in zip(parsed, chunked):
+        articles[key] = {"sha": sha, "rows": list(range(len(chunks), len(chunks) + len(article_chunks)))}
+        chunks.extend(article_chunks)
+    logger.info(f"  Created {len(chunks)} chunks")
+    annotate_token_counts(chunks)
+    atomic_write_jsonl(files["chunks"], chunks)
+    timings["chunk"] = (time.perf_counter() - t0) * 1000
+
+    logger.info(f"\n[2/4] Embedding with {config.EMB_BACKEND}...")
+    t0 = time.perf_counter()
+    vecs, hits = embed_chunks_cached(chunks, retries=retries)
+    compact_embedding_cache(chunks)
+
+    # Normalize embeddings
+    vecs_n = normalize_rows(vecs)
+    atomic_save_npy(vecs_n, files["emb"])
+    logger.info(f"  Saved {vecs_n.shape} embeddings (normalized)")
+    timings["embed"] = (time.perf_counter() - t0) * 1000
+
+    # Write metadata
+    meta_lines = [{"id": c["id"], "title": c["title"], "url": c["url"], "section": c["section"]} for c in chunks]
+    atomic_write_jsonl(files["meta"], meta_lines)
+
+    logger.info("\n[3/4] Building BM25 index...")
+    t0 = time.perf_counter()
+    bm = build_bm25(chunks)
+    save_bm25_binary(bm, files["bm25_index"])
+    if config.BM25_EXPORT_JSON:
+        export_bm25_json(bm, files["bm25"])
+        logger.info(f"  Exported debug copy to {files['bm25']}")
+    logger.info(f"  Indexed {len(bm['idf'])} unique terms")
+    timings["bm25"] = (time.perf_counter() - t0) * 1000
 
-        duration_ms = (time.time() - ingest_start) * 1000
-        metrics.observe_histogram(MetricNames.INGESTION_LATENCY, duration_ms)
-        metrics.set_gauge(MetricNames.INDEX_SIZE, len(chunks))
-        logger.info(
-            json.dumps(
-                {
-                    "event": "rag.ingest.complete",
-                    "md_path": md_path,
-                    "chunks": len(chunks),
-                    "duration_ms": round(duration_ms, 2),
-                    "cache_hit_rate": round(hit_rate, 2) if chunks else 0.0,
-                }
-            )
+    # Optional FAISS
+    if config.USE_ANN == "faiss":
+        t0 = time.perf_counter()
+        try:
+            logger.info("\n[3.1/4] Building FAISS ANN index...")
+            faiss_index = build_faiss_index(vecs_n, nlist=config.ANN_NLIST)
+            if faiss_index is not None:
+                # FIX: Reset cache BEFORE saving to prevent race condition
+                # where concurrent readers could get stale cached index
+                # between save and reset. After reset, readers will re-load
+                # from disk (getting either old or new version, both valid).
+                reset_faiss_index()
+                save_faiss_index(faiss_index, files["faiss_index"])
+                logger.info(f"  Saved FAISS index to {files['faiss_index']}")
+        except Exception as e:
+            logger.warning(f"  FAISS index build failed: {e}")
+        timings["faiss"] = (time.perf_counter() - t0) * 1000
+
+    # Write metadata
+    logger.info("\n[3.6/4] Writing artifact metadata...")
+    save_article_manifest(
+        {**_manifest_header(), "articles": articles, "full_build_rows": len(chunks), "drift_rows": 0},
+        files["article_manifest"],
+    )
+    write_index_meta(md_path, chunks, vecs_n, bm, files, build_mode="full")
+    logger.info("  Saved index metadata")
+
+    # Note: FAISS cache reset moved to before save_faiss_index() to prevent race condition
+
+    duration_ms = (time.time() - ingest_start) * 1000
+    timings["total"] = duration_ms
+    hit_rate = hits / len(chunks) * 100 if chunks else 0.0
+    metrics.observe_histogram(MetricNames.INGESTION_LATENCY, duration_ms)
+    metrics.set_gauge(MetricNames.INDEX_SIZE, len(chunks))
+    logger.info(
+        json.dumps(
+            {
+                "event": "rag.ingest.complete",
+                "md_path": md_path,
+                "chunks": len(chunks),
+                "duration_ms": round(duration_ms, 2),
+                "cache_hit_rate": round(hit_rate, 2),
+            }
         )
+    )
 
-        logger.info("\n[4/4] Done.")
-        logger.info("=" * 70)
+    logger.info("\n[4/4] Done.")
+    logger.info("=" * 70)
+    return {
+        "mode": "full",
+        "chunks": {"total": len(chunks), "embedded": len(chunks) - hits, "reused": hits},
+        "timings_ms": {name: round(ms, 2) for name, ms in timings.items()},
+    }
+
+
+def load_embeddings(path: Optional[str] = None, mmap: Optional[bool] = None) -> np.ndarray:
+    """Load the normalized embedding matrix.
+
+    With ``mmap`` (default: ``config.EMB_MMAP``) the array is a read-only
+    ``np.memmap`` backed by the page cache, so processes loading the same file
+    share its pages instead of each holding a private copy.
+    """
+    path = path or active_files()["emb"]
+    if mmap is None:
+        mmap = config.EMB_MMAP
+    return np.load(path, mmap_mode="r" if mmap else None)
 
 
-def load_index(kb_path: Optional[str] = None):
+def load_index(kb_path: Optional[str] = None, mmap: Optional[bool] = None, files: Optional[Mapping[str, str]] = None):
     """Load all index artifacts with dimension and freshness validation.
 
     FIX: Validates that stored embeddings match the current config.EMB_BACKEND and config.EMB_DIM
@@ -519,15 +1006,23 @@ def load_index(kb_path: Optional[str] = None):
     Args:
         kb_path: Optional path to knowledge base for freshness validation.
                  If provided, compares stored hash with current KB hash.
+        mmap: Memory-map the embedding matrix read-only (default: config.EMB_MMAP).
+        files: Artifact paths to load (default: the active generation, resolved once).
 
     Returns:
         dict with index artifacts, or None if validation fails (requiring rebuild)
     """
-    if not os.path.exists(config.FILES["index_meta"]):
+    if files is None:
+        generation = current_generation()
+        files = artifact_files(generation)
+    else:
+        generation = None
+
+    if not os.path.exists(files["index_meta"]):
         logger.warning("[rebuild] index.meta.json missing")
         return None
 
-    with open(config.FILES["index_meta"], encoding="utf-8") as f:
+    with open(files["index_meta"], encoding="utf-8") as f:
         meta = json.load(f)
 
     # Validate knowledge base freshness (warning only, not blocking)
@@ -565,13 +1060,13 @@ def load_index(kb_path: Optional[str] = None):
 
     # Load chunks
     chunks = []
-    with open(config.FILES["chunks"], encoding="utf-8") as f:
+    with open(files["chunks"], encoding="utf-8") as f:
         for line in f:
             if line.strip():
                 chunks.append(json.loads(line))
 
-    # Load embeddings
-    vecs_n = np.load(config.FILES["emb"])
+    # Load embeddings (read-only memmap when requested)
+    vecs_n = load_embeddings(files["emb"], mmap=mmap)
 
     # Validate embedding dimensions
     # Compute expected dimension based on current backend
@@ -590,18 +1085,23 @@ def load_index(kb_path: Optional[str] = None):
         logger.error("")
         return None
 
-    # Load BM25
-    with open(config.FILES["bm25"], encoding="utf-8") as f:
-        bm = json.load(f)
+    # Load BM25 (memory-mapped binary artifact, legacy JSON as fallback)
+    bm = load_bm25(files)
+    if bm is None:
+        logger.warning(f"[rebuild] {files['bm25_index']} missing")
+        return None
 
     # Optional FAISS
     faiss_index = None
-    if config.USE_ANN == "faiss" and os.path.exists(config.FILES["faiss_index"]):
-        faiss_index = load_faiss_index(config.FILES["faiss_index"])
+    if config.USE_ANN == "faiss" and os.path.exists(files["faiss_index"]):
+        faiss_index = load_faiss_index(files["faiss_index"])
 
     # Build chunk dict
     chunks_dict = {c["id"]: c for c in chunks}
 
+    # Query-independent per-chunk features (hub multipliers, dedup ids, intent masks)
+    features = get_chunk_features(chunks)
+
     logger.info(f"Loaded {len(chunks)} chunks, {vecs_n.shape[0]} vectors, {len(bm['idf'])} terms")
 
     return {
@@ -610,10 +1110,28 @@ def load_index(kb_path: Optional[str] = None):
         "vecs_n": vecs_n,
         "bm": bm,
         "faiss_index": faiss_index,
+        "features": features,
         "meta": meta,
+        "generation": generation,
     }
 
 
+def index_signature(meta: Optional[dict] = None) -> Optional[str]:
+    """Fingerprint the built index from its metadata; changes on every rebuild.
+
+    Reads the active index metadata when ``meta`` is not given. Returns None when no
+    metadata is available.
+    """
+    if meta is None:
+        try:
+            with open(active_files()["index_meta"], encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+    fields = [str(meta.get(key, "")) for key in ("kb_sha256", "built_at", "chunks", "emb_backend", "emb_model")]
+    return hashlib.sha256("|".join(fields).encode("utf-8")).hexdigest()[:16]
+
+
 def index_is_fresh(kb_path: str) -> bool:
     """Return True when index artifacts match the current knowledge base and backend."""
 
@@ -621,18 +1139,18 @@ def index_is_fresh(kb_path: str) -> bool:
     if not os.path.exists(kb_path):
         return False
 
+    files = active_files()
     required_files = [
-        config.FILES["chunks"],
-        config.FILES["emb"],
-        config.FILES["meta"],
-        config.FILES["bm25"],
-        config.FILES["index_meta"],
+        files["chunks"],
+        files["emb"],
+        files["meta"],
+        files["index_meta"],
     ]
-    if not all(os.path.exists(path) for path in required_files):
+    if not all(os.path.exists(path) for path in required_files) or not bm25_artifact_exists(files):
         return False
 
     try:
-        with open(config.FILES["index_meta"], encoding="utf-8") as f:
+        with open(files["index_meta"], encoding="utf-8") as f:
             meta = json.load(f)
     except Exception:
         return False
@@ -6,11 +6,19 @@ OPTIMIZATION: Routes queries to optimized retrieval strategies based on intent.
 
 import logging
 import re
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# Chunks whose text or title contains one of these get the intent's boost_factor
+INTENT_BOOST_KEYWORDS = {
+    "pricing": ["pricing", "plan", "tier", "cost", "price", "subscription", "free", "paid", "trial", "upgrade"],
+    "troubleshooting": ["error", "issue", "problem", "troubleshoot", "fix", "solution"],
+}
+
 
 @dataclass
 class IntentConfig:
@@ -149,15 +157,21 @@ def get_intent_metadata(intent_name: str, confidence: float) -> Dict:
     }
 
 
-def adjust_scores_by_intent(chunks: list, scores: Dict, intent_config: IntentConfig) -> Dict:
+def adjust_scores_by_intent(
+    chunks: list, scores: Dict, intent_config: IntentConfig, positions: Optional[np.ndarray] = None
+) -> Dict:
     """Adjust retrieval scores based on intent-specific boosting.
 
     OPTIMIZATION: Boosts chunks that match the intent (e.g., pricing sections for pricing queries).
+    Keyword matches come from the precomputed per-chunk features, so this is a
+    vectorised multiply rather than a scan of every chunk's text.
 
     Args:
         chunks: List of chunk dicts
         scores: Dict with 'dense', 'bm25', 'hybrid' score arrays
         intent_config: Intent configuration
+        positions: Chunk index of each score entry, when the arrays hold candidate
+            scores only rather than one score per chunk
 
     Returns:
         Modified scores dict with intent boosting applied
@@ -166,33 +180,25 @@ def adjust_scores_by_intent(chunks: list, scores: Dict, intent_config: IntentCon
     if intent_config.boost_factor == 1.0:
         return scores
 
-    # Intent-specific keywords for boosting
-    intent_keywords = {
-        "pricing": ["pricing", "plan", "tier", "cost", "price", "subscription", "free", "paid", "trial", "upgrade"],
-        "troubleshooting": ["error", "issue", "problem", "troubleshoot", "fix", "solution"],
-    }
-
-    keywords = intent_keywords.get(intent_config.name, [])
-    if not keywords:
+    if intent_config.name not in INTENT_BOOST_KEYWORDS:
         return scores
 
-    # Boost chunks that contain intent-specific keywords
-    boosted_count = 0
-    for i, chunk in enumerate(chunks):
-        chunk_text = chunk.get("text", "").lower()
-        chunk_title = chunk.get("title", "").lower()
-
-        # Check if chunk is relevant to this intent
-        if any(kw in chunk_text or kw in chunk_title for kw in keywords):
-            # Apply boost to all score types
-            if i < len(scores.get("dense", [])):
-                scores["dense"][i] *= intent_config.boost_factor
-            if i < len(scores.get("bm25", [])):
-                scores["bm25"][i] *= intent_config.boost_factor
-            if i < len(scores.get("hybrid", [])):
-                scores["hybrid"][i] *= intent_config.boost_factor
-
-            boosted_count += 1
+    from .chunk_features import get_chunk_features
+
+    mask = get_chunk_features(chunks).intent_mask(intent_config.name)
+    if mask is None:
+        return scores
+    if positions is not None:
+        mask = mask[np.asarray(positions, dtype=np.int64)]
+
+    # Boost chunks that contain intent-specific keywords, in all score types
+    for name in ("dense", "bm25", "hybrid"):
+        arr = scores.get(name)
+        if arr is None:
+            continue
+        n = min(len(arr), len(mask))
+        arr[:n][mask[:n]] *= intent_config.boost_factor
+    boosted_count = int(np.count_nonzero(mask))
 
     if boosted_count > 0:
         logger.debug(
@@ -0,0 +1,353 @@
+"""Admission control in front of LLM generations.
+
+Chat completions pass through the process-wide gateway (``llm_slot`` /
+``allm_slot``): at most ``LLM_MAX_IN_FLIGHT`` calls per model reach Ollama at
+once, the rest wait in a per-model queue where interactive answers go ahead of
+background work (reranking, FAQ cache builds), first come first served within
+a priority.
+
+Instead of letting a saturated Ollama push every call towards ``CHAT_READ_T``
+(and the circuit breaker), a call is shed with ``LLMOverloadedError``:
+
+- up front, when the queue already holds ``LLM_QUEUE_MAX`` calls (status 429);
+- up front, when its expected wait (rounds of generation ahead of it x mean
+  generation time) exceeds its deadline, ``LLM_QUEUE_TIMEOUT`` seconds by default (503);
+- when it is still queued at its deadline (503).
+
+The error carries a ``retry_after`` hint (seconds) for the ``Retry-After`` header.
+Time spent waiting for a slot is traced as an ``llm_queue`` span.
+
+    with llm_priority(PRIORITY_BACKGROUND):
+        rerank_with_llm(...)   # LLM calls in this context queue as background
+
+    with llm_slot(model):
+        client.chat_completion(...)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import config
+from .exceptions import LLMOverloadedError
+from .metrics import MetricNames, get_metrics
+from .tracing import span
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+_PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)  # served in this order
+
+# Weight of the latest generation in a model's mean generation time
+_SERVICE_TIME_ALPHA = 0.2
+
+# (priority, deadline override) of LLM calls made in the current context
+_request_class: ContextVar[Tuple[str, Optional[float]]] = ContextVar(
+    "llm_priority", default=(PRIORITY_INTERACTIVE, None)
+)
+
+
+@contextmanager
+def llm_priority(priority: str, deadline: Optional[float] = None) -> Iterator[None]:
+    """Queue LLM calls made in this context (and executor work it propagates to) at ``priority``.
+
+    ``deadline`` overrides ``LLM_QUEUE_TIMEOUT`` (seconds a call may wait for a
+    slot; ``math.inf`` never sheds on time); when omitted an enclosing override is kept.
+    """
+    if priority not in _PRIORITIES:
+        raise ValueError(f"Unknown LLM priority {priority!r}; expected one of {_PRIORITIES}")
+    if deadline is None:
+        deadline = _request_class.get()[1]
+    token = _request_class.set((priority, deadline))
+    try:
+        yield
+    finally:
+        _request_class.reset(token)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    """One queued call; woken through a thread event or, for coroutines, a future on their loop."""
+
+    __slots__ = ("rank", "wake", "granted", "cancelled")
+
+    def __init__(self, rank: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.rank = rank
+        self.wake: Union[threading.Event, "asyncio.Future[None]"] = (
+            threading.Event() if loop is None else loop.create_future()
+        )
+        self.granted = False
+        self.cancelled = False
+
+    def grant(self) -> bool:
+        """Hand this waiter the slot; False if it can no longer be woken (its loop is closed)."""
+        if isinstance(self.wake, threading.Event):
+            self.granted = True
+            self.wake.set()
+            return True
+        try:
+            self.wake.get_loop().call_soon_threadsafe(_resolve, self.wake)
+        except RuntimeError:
+            return False
+        self.granted = True
+        return True
+
+    def wait(self, timeout: Optional[float]) -> None:
+        """Block the calling thread until granted or ``timeout`` passes."""
+        if isinstance(self.wake, threading.Event):
+            self.wake.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float]) -> None:
+        """Wait on the event loop until granted; raises ``asyncio.TimeoutError`` after ``timeout``."""
+        if not isinstance(self.wake, threading.Event):
+            await asyncio.wait_for(self.wake, timeout)
+
+
+class _ModelQueue:
+    __slots__ = ("in_flight", "heap", "queued", "service_s")
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.heap: List[Tuple[int, int, _Waiter]] = []
+        self.queued = [0] * len(_PRIORITIES)  # live (not cancelled) waiters per priority
+        self.service_s = 0.0  # mean generation time, 0 until the first call finishes
+
+
+class LLMGateway:
+    """Per-model concurrency limit with a priority queue and deadline-based load shedding.
+
+    A finished call hands its slot straight to the next waiter, so a free slot
+    never coexists with a non-empty queue.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        """Hold one of ``model``'s slots for the body of the ``with`` (blocking while queued)."""
+        priority, deadline = self._call_class()
+        start = time.perf_counter()
+        with span("llm_queue", model=model, priority=priority):
+            waiter = self._admit(model, priority, deadline, None)
+            if waiter is not None:
+                try:
+                    waiter.wait(None if math.isinf(deadline) else deadline)
+                except BaseException:
+                    self._abandon(model, waiter)
+                    raise
+                if not self._withdraw(model, waiter):
+                    raise self._timed_out(model, priority)
+        with self._held(model, priority, start):
+            yield
+
+    @asynccontextmanager
+    async def aslot(self, model: str) -> AsyncIterator[None]:
+        """Async :meth:`slot`: a queued call waits on the event loop, not in a thread."""
+        priority, deadline = self._call_class()
+        start = time.perf_counter()
+        with span("llm_queue", model=model, priority=priority):
+            waiter = self._admit(model, priority, deadline, asyncio.get_running_loop())
+            if waiter is not None:
+                try:
+                    await waiter.wait_async(None if math.isinf(deadline) else deadline)
+                except asyncio.TimeoutError:
+                    if not self._withdraw(model, waiter):
+                        raise self._timed_out(model, priority)
+                except BaseException:
+                    self._abandon(model, waiter)
+                    raise
+        with self._held(model, priority, start):
+            yield
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model in-flight calls, queued calls per priority and mean generation time."""
+        with self._lock:
+            return {
+                model: {
+                    "in_flight": q.in_flight,
+                    "queued": dict(zip(_PRIORITIES, q.queued)),
+                    "mean_service_s": round(q.service_s, 4),
+                }
+                for model, q in self._models.items()
+            }
+
+    def _call_class(self) -> Tuple[str, float]:
+        priority, deadline = _request_class.get()
+        return priority, self.queue_timeout if deadline is None else deadline
+
+    def _admit(
+        self, model: str, priority: str, deadline: float, loop: Optional[asyncio.AbstractEventLoop]
+    ) -> Optional[_Waiter]:
+        """Take a free slot (None), queue a waiter, or raise ``LLMOverloadedError``."""
+        rank = _PRIORITIES.index(priority)
+        with self._lock:
+            q = self._models.get(model)
+            if q is None:
+                q = self._models[model] = _ModelQueue()
+            if q.in_flight < self.max_in_flight:
+                q.in_flight += 1
+                self._publish(model, q)
+                return None
+            expected_wait = self._expected_wait(q, sum(q.queued[: rank + 1]) + 1)
+            if sum(q.queued) >= self.max_queue:
+                reason, status = "queue_full", 429
+            elif expected_wait > deadline:
+                reason, status = "deadline", 503
+            else:
+                waiter = _Waiter(rank, loop)
+                heapq.heappush(q.heap, (rank, next(self._seq), waiter))
+                q.queued[rank] += 1
+                self._publish(model, q)
+                return waiter
+        raise self._overloaded(model, priority, reason, status, expected_wait)
+
+    def _expected_wait(self, q: _ModelQueue, position: int) -> float:
+        """Seconds until queue ``position`` (1-based) gets a slot, if every slot just started a mean generation.
+
+        Whole rounds, not ``position / slots``: an admitted call should not time out
+        unless generations run slower than their mean.
+        """
+        return math.ceil(position / self.max_in_flight) * q.service_s
+
+    def _withdraw(self, model: str, waiter: _Waiter) -> bool:
+        """True if ``waiter`` was granted its slot; otherwise take it out of the queue."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            q = self._models[model]
+            q.queued[waiter.rank] -= 1
+            self._publish(model, q)
+            return False
+
+    def _abandon(self, model: str, waiter: _Waiter) -> None:
+        """The caller gave up while queued (cancelled or interrupted): drop or pass on its slot."""
+        if self._withdraw(model, waiter):
+            self._release(model, None)
+
+    @contextmanager
+    def _held(self, model: str, priority: str, start: float) -> Iterator[None]:
+        began = time.perf_counter()
+        get_metrics().observe_histogram(
+            MetricNames.LLM_QUEUE_WAIT, (began - start) * 1000, labels={"priority": priority}
+        )
+        try:
+            yield
+        finally:
+            self._release(model, time.perf_counter() - began)
+
+    def _release(self, model: str, service_s: Optional[float]) -> None:
+        with self._lock:
+            q = self._models[model]
+            if service_s is not None:
+                q.service_s = (
+                    service_s if not q.service_s else q.service_s + _SERVICE_TIME_ALPHA * (service_s - q.service_s)
+                )
+            while q.heap:
+                _rank, _seq, waiter = heapq.heappop(q.heap)
+                if waiter.cancelled:
+                    continue
+                q.queued[waiter.rank] -= 1
+                if waiter.grant():
+                    break  # the slot passes to the waiter; in_flight is unchanged
+            else:
+                q.in_flight -= 1
+            self._publish(model, q)
+
+    def _timed_out(self, model: str, priority: str) -> LLMOverloadedError:
+        with self._lock:
+            q = self._models[model]
+            expected_wait = self._expected_wait(q, sum(q.queued) + 1)
+        return self._overloaded(model, priority, "timeout", 503, expected_wait)
+
+    def _overloaded(
+        self, model: str, priority: str, reason: str, status: int, expected_wait: float
+    ) -> LLMOverloadedError:
+        get_metrics().increment_counter(
+            MetricNames.LLM_SHED, labels={"model": model, "priority": priority, "reason": reason}
+        )
+        return LLMOverloadedError(
+            f"LLM '{model}' is overloaded ({reason}); expected queue wait {expected_wait:.1f}s",
+            retry_after=max(1.0, expected_wait),
+            status_code=status,
+        )
+
+    @staticmethod
+    def _publish(model: str, q: _ModelQueue) -> None:
+        metrics = get_metrics()
+        metrics.set_gauge(MetricNames.LLM_IN_FLIGHT, q.in_flight, labels={"model": model})
+        for priority, queued in zip(_PRIORITIES, q.queued):
+            metrics.set_gauge(MetricNames.LLM_QUEUE_DEPTH, queued, labels={"model": model, "priority": priority})
+
+
+_GATEWAY: Optional[LLMGateway] = None
+_GATEWAY_LOCK = threading.Lock()
+
+
+def _settings() -> Tuple[int, int, float]:
+    return config.LLM_MAX_IN_FLIGHT, config.LLM_QUEUE_MAX, config.LLM_QUEUE_TIMEOUT
+
+
+def get_llm_gateway() -> Optional[LLMGateway]:
+    """Process-wide gateway (None when ``LLM_MAX_IN_FLIGHT=0``), rebuilt if its settings change."""
+    global _GATEWAY
+    settings = _settings()
+    if settings[0] <= 0:
+        return None
+    gateway = _GATEWAY
+    if gateway is None or (gateway.max_in_flight, gateway.max_queue, gateway.queue_timeout) != settings:
+        with _GATEWAY_LOCK:
+            gateway = _GATEWAY
+            if gateway is None or (gateway.max_in_flight, gateway.max_queue, gateway.queue_timeout) != settings:
+                gateway = _GATEWAY = LLMGateway(*settings)
+    return gateway
+
+
+@contextmanager
+def llm_slot(model: str) -> Iterator[None]:
+    """Hold a gateway slot for ``model`` (no-op with the gateway disabled)."""
+    gateway = get_llm_gateway()
+    if gateway is None:
+        yield
+        return
+    with gateway.slot(model):
+        yield
+
+
+@asynccontextmanager
+async def allm_slot(model: str) -> AsyncIterator[None]:
+    """Async :func:`llm_slot`."""
+    gateway = get_llm_gateway()
+    if gateway is None:
+        yield
+        return
+    async with gateway.aslot(model):
+        yield
+
+
+__all__ = [
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_BACKGROUND",
+    "LLMGateway",
+    "get_llm_gateway",
+    "llm_priority",
+    "llm_slot",
+    "allm_slot",
+]
@@ -14,10 +14,11 @@ caller if desired.
 from __future__ import annotations
 
 import json
+import math
 import threading
 import time
 from dataclasses import dataclass
-from typing import Dict, Tuple, Optional, Any, Iterable
+from typing import Dict, Tuple, Optional, Any
 
 
 # ========================= Metric name constants =========================
@@ -39,16 +40,30 @@ class MetricNames:
     REFUSALS_TOTAL = "refusals_total"
     RATE_LIMIT_ALLOWED = "rate_limit_allowed"
     RATE_LIMIT_BLOCKED = "rate_limit_blocked"
+    RESPONSE_CACHE_HITS = "response_cache_hits"  # labelled by cache_type
+    RESPONSE_CACHE_MISSES = "response_cache_misses"
+    COALESCED_REQUESTS = "coalesced_requests"  # labelled by path
+    QUERY_EMBED_CACHE_HITS = "query_embedding_cache_hits"
+    QUERY_EMBED_CACHE_MISSES = "query_embedding_cache_misses"
+    LLM_SHED = "llm_shed_total"  # LLM calls rejected by the gateway, labelled by model, priority and reason
 
     # Latencies
     QUERY_LATENCY = "query_latency_ms"
     RETRIEVAL_LATENCY = "retrieval_latency_ms"
     LLM_LATENCY = "llm_latency_ms"
+    TIME_TO_FIRST_TOKEN = "time_to_first_token_ms"  # streamed queries, labelled by source
     INGESTION_LATENCY = "ingestion_latency_ms"
+    QUERY_EMBED_QUEUE_WAIT = "query_embedding_queue_wait_ms"  # time queued in the embedding batcher
+    QUERY_EMBED_BATCH_SIZE = "query_embedding_batch_size"  # distinct texts per batched embedding call
+    LLM_QUEUE_WAIT = "llm_queue_wait_ms"  # time an LLM call waited for a gateway slot, labelled by priority
 
     # Gauges
     CACHE_SIZE = "cache_size"
+    QUERY_EMBED_CACHE_SIZE = "query_embedding_cache_size"
+    SEMANTIC_CACHE_SIZE = "semantic_cache_size"
     INDEX_SIZE = "index_size"
+    LLM_QUEUE_DEPTH = "llm_queue_depth"  # calls waiting in the LLM gateway, labelled by model and priority
+    LLM_IN_FLIGHT = "llm_in_flight"  # calls holding a gateway slot, labelled by model
 
 
 # ========================= Internal helpers =============================
@@ -74,6 +89,126 @@ class HistogramStats:
     p99: float
 
 
+# Buckets per power of two: bucket ``i`` holds (2**((i-1)/64), 2**(i/64)], so a
+# bucket midpoint is within ~0.55% of any value in it.
+_LOG_BUCKETS_PER_OCTAVE = 64
+
+
+def _bucket_index(magnitude: float) -> int:
+    return math.ceil(math.log2(min(magnitude, 1e300)) * _LOG_BUCKETS_PER_OCTAVE)
+
+
+def _bucket_bound(index: int) -> float:
+    return 2.0 ** (index / _LOG_BUCKETS_PER_OCTAVE)
+
+
+class LogHistogram:
+    """Fixed log-scale histogram with O(1) observe and O(buckets) percentiles.
+
+    Count, sum, min and max are exact; percentiles are the midpoint of the
+    bucket holding the nearest-rank sample (the extremes return min/max).
+    Zero and negative values get their own zero bucket and a mirrored set of
+    log buckets. Buckets are sparse, so memory grows with the range of values
+    seen, not with the number of observations.
+    """
+
+    __slots__ = ("count", "sum", "min", "max", "zero", "pos", "neg")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.zero = 0
+        self.pos: Dict[int, int] = {}
+        self.neg: Dict[int, int] = {}
+
+    def observe(self, v: float) -> None:
+        self.count += 1
+        self.sum += v
+        if v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+        if v > 0:
+            i = _bucket_index(v)
+            self.pos[i] = self.pos.get(i, 0) + 1
+        elif v < 0:
+            i = _bucket_index(-v)
+            self.neg[i] = self.neg.get(i, 0) + 1
+        else:
+            self.zero += 1
+
+    def merge(self, other: "LogHistogram") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zero += other.zero
+        for i, c in other.pos.items():
+            self.pos[i] = self.pos.get(i, 0) + c
+        for i, c in other.neg.items():
+            self.neg[i] = self.neg.get(i, 0) + c
+
+    def buckets(self) -> list[Tuple[float, float, int]]:
+        """Non-empty buckets as ``(lower, upper, count)``, in ascending value order."""
+        out = [(-_bucket_bound(i), -_bucket_bound(i - 1), self.neg[i]) for i in sorted(self.neg, reverse=True)]
+        if self.zero:
+            out.append((0.0, 0.0, self.zero))
+        out.extend((_bucket_bound(i - 1), _bucket_bound(i), self.pos[i]) for i in sorted(self.pos))
+        return out
+
+    def cumulative_buckets(self) -> list[Tuple[float, int]]:
+        """Prometheus ``le`` buckets: counts at or below each power of two spanning the data.
+
+        The powers of two are bucket boundaries, so these counts are exact.
+        ``le=0`` is included when zero or negative values were observed.
+        """
+        below = self.zero + sum(self.neg.values())
+        out = [(0.0, below)] if below else []
+        if self.pos:
+            indices = sorted(self.pos)
+            first = (indices[0] - 1) // _LOG_BUCKETS_PER_OCTAVE
+            last = -(-indices[-1] // _LOG_BUCKETS_PER_OCTAVE)
+            pos = 0
+            for octave in range(first, last + 1):
+                limit = octave * _LOG_BUCKETS_PER_OCTAVE
+                while pos < len(indices) and indices[pos] <= limit:
+                    below += self.pos[indices[pos]]
+                    pos += 1
+                out.append((2.0**octave, below))
+        return out
+
+    def stats(self) -> HistogramStats:
+        n = self.count
+        if n == 0:
+            return HistogramStats(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        buckets = self.buckets()
+
+        def pct(p: float) -> float:
+            rank = int(max(0, min(n - 1, round(p * (n - 1)))))
+            if rank == 0:
+                return self.min
+            if rank == n - 1:
+                return self.max
+            seen = 0
+            for lower, upper, count in buckets:
+                seen += count
+                if seen > rank:
+                    return min(self.max, max(self.min, (lower + upper) / 2))
+            return self.max
+
+        return HistogramStats(
+            count=n,
+            min=self.min,
+            max=self.max,
+            mean=self.sum / n,
+            p50=pct(0.50),
+            p95=pct(0.95),
+            p99=pct(0.99),
+        )
+
+
 class HistogramStatsView(dict):
     """Dict-like view that also provides attribute access for tests."""
 
@@ -100,13 +235,46 @@ class Snapshot:
 # ========================= MetricsCollector =============================
 
 
+class _Shard:
+    """One thread's counters and histograms, guarded by a lock only the scrape contends for."""
+
+    __slots__ = ("lock", "owner", "counters", "histos")
+
+    def __init__(self, owner: Optional[threading.Thread]) -> None:
+        self.lock = threading.Lock()
+        self.owner = owner
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histos: Dict[Tuple[str, Labels], LogHistogram] = {}
+
+    def alive(self) -> bool:
+        """Whether the owning thread can still write; the retired shard has no owner and never dies."""
+        return self.owner is None or self.owner.is_alive()
+
+
+def _fold_into(target: _Shard, shard: _Shard) -> None:
+    with shard.lock:
+        for key, value in shard.counters.items():
+            target.counters[key] = target.counters.get(key, 0.0) + value
+        for key, hist in shard.histos.items():
+            merged = target.histos.get(key)
+            if merged is None:
+                merged = target.histos[key] = LogHistogram()
+            merged.merge(hist)
+
+
 class MetricsCollector:
     """Thread-safe in-memory metrics store.
 
     Data model (all keyed by (name, labels)):
     - counters: monotonically increasing floats
     - gauges: last-set float
-    - histograms: list of float observations (bounded by max_history)
+    - histograms: cumulative ``LogHistogram`` sketches
+
+    Counters and histograms are recorded into a per-thread shard, so request
+    threads never wait on each other; reads merge the shards. Shards of
+    finished threads are folded into a retired shard on the next read.
+    ``max_history`` is accepted for compatibility: histograms keep bucket
+    counts rather than samples, so there is no history to bound.
     """
 
     def __init__(self, max_history: int = 10000) -> None:
@@ -114,9 +282,47 @@ class MetricsCollector:
         self._start = time.time()
         self._max_history = int(max_history)
 
-        self._counters: Dict[Tuple[str, Labels], float] = {}
         self._gauges: Dict[Tuple[str, Labels], float] = {}
-        self._histo: Dict[Tuple[str, Labels], list] = {}
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard(None)
+
+    # ----- shards -----
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _live_shards(self) -> list[_Shard]:
+        """All shards to read, after folding those of finished threads into the retired shard."""
+        with self._lock:
+            finished = [shard for shard in self._shards if not shard.alive()]
+            if finished:
+                self._shards = [shard for shard in self._shards if shard.alive()]
+                with self._retired.lock:
+                    for shard in finished:
+                        _fold_into(self._retired, shard)
+            return [self._retired, *self._shards]
+
+    def _merged(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], LogHistogram]]:
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histos: Dict[Tuple[str, Labels], LogHistogram] = {}
+        for shard in self._live_shards():
+            with shard.lock:
+                for key, value in shard.counters.items():
+                    counters[key] = counters.get(key, 0.0) + value
+                for key, hist in shard.histos.items():
+                    merged = histos.get(key)
+                    if merged is None:
+                        merged = histos[key] = LogHistogram()
+                    merged.merge(hist)
+        return counters, histos
 
     # ----- counter API -----
 
@@ -127,8 +333,9 @@ class MetricsCollector:
         labels: Optional[Dict[str, str]] = None,
     ) -> None:
         key = (str(getattr(name, "value", name)), _norm_labels(labels))
-        with self._lock:
-            self._counters[key] = self._counters.get(key, 0.0) + float(value)
+        shard = self._shard()
+        with shard.lock:
+            shard.counters[key] = shard.counters.get(key, 0.0) + float(value)
 
     def get_counter(
         self,
@@ -136,8 +343,11 @@ class MetricsCollector:
         labels: Optional[Dict[str, str]] = None,
     ) -> float:
         key = (str(getattr(name, "value", name)), _norm_labels(labels))
-        with self._lock:
-            return float(self._counters.get(key, 0.0))
+        total = 0.0
+        for shard in self._live_shards():
+            with shard.lock:
+                total += shard.counters.get(key, 0.0)
+        return float(total)
 
     # ----- gauge API -----
 
@@ -170,58 +380,48 @@ class MetricsCollector:
     ) -> None:
         key = (str(getattr(name, "value", name)), _norm_labels(labels))
         v = float(value)
-        with self._lock:
-            bucket = self._histo.setdefault(key, [])
-            bucket.append(v)
-            if len(bucket) > self._max_history:
-                # Keep most recent values
-                overflow = len(bucket) - self._max_history
-                if overflow > 0:
-                    del bucket[0:overflow]
-
-    def _stats_for(self, values: Iterable[float]) -> HistogramStats:
-        data = sorted(float(v) for v in values)
-        n = len(data)
-        if n == 0:
-            return HistogramStats(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
-
-        def pct(p: float) -> float:
-            idx = int(max(0, min(n - 1, round(p * (n - 1)))))
-            return data[idx]
-
-        s = sum(data)
-        return HistogramStats(
-            count=n,
-            min=data[0],
-            max=data[-1],
-            mean=s / n,
-            p50=pct(0.50),
-            p95=pct(0.95),
-            p99=pct(0.99),
-        )
+        shard = self._shard()
+        with shard.lock:
+            hist = shard.histos.get(key)
+            if hist is None:
+                hist = shard.histos[key] = LogHistogram()
+            hist.observe(v)
+
+    def get_histogram(
+        self,
+        name: str | MetricNames,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Optional[LogHistogram]:
+        """Merged histogram for one series, or None if nothing was observed."""
+        key = (str(getattr(name, "value", name)), _norm_labels(labels))
+        merged = LogHistogram()
+        for shard in self._live_shards():
+            with shard.lock:
+                hist = shard.histos.get(key)
+                if hist is not None:
+                    merged.merge(hist)
+        return merged if merged.count else None
 
     def get_histogram_stats(
         self,
         name: str | MetricNames,
         labels: Optional[Dict[str, str]] = None,
     ) -> Optional[HistogramStatsView]:
-        key = (str(getattr(name, "value", name)), _norm_labels(labels))
-        with self._lock:
-            values = self._histo.get(key)
-            if not values:
-                return None
-            stats = self._stats_for(values)
-            return HistogramStatsView(
-                {
-                    "count": stats.count,
-                    "min": stats.min,
-                    "max": stats.max,
-                    "mean": stats.mean,
-                    "p50": stats.p50,
-                    "p95": stats.p95,
-                    "p99": stats.p99,
-                }
-            )
+        hist = self.get_histogram(name, labels)
+        if hist is None:
+            return None
+        stats = hist.stats()
+        return HistogramStatsView(
+            {
+                "count": stats.count,
+                "min": stats.min,
+                "max": stats.max,
+                "mean": stats.mean,
+                "p50": stats.p50,
+                "p95": stats.p95,
+                "p99": stats.p99,
+            }
+        )
 
     # ----- timing helpers -----
 
@@ -268,25 +468,27 @@ class MetricsCollector:
     # ----- snapshot / export / reset -----
 
     def get_snapshot(self) -> Snapshot:
+        return self._snapshot(*self._merged())
+
+    def _snapshot(
+        self,
+        counters: Dict[Tuple[str, Labels], float],
+        histos: Dict[Tuple[str, Labels], LogHistogram],
+    ) -> Snapshot:
         with self._lock:
-            now = time.time()
-            counters = {self._format_key(name, labels): value for (name, labels), value in self._counters.items()}
             gauges = {self._format_key(name, labels): value for (name, labels), value in self._gauges.items()}
-            histograms = {
-                self._format_key(name, labels): self._stats_for(values)
-                for (name, labels), values in self._histo.items()
-                if values
-            }
-            return Snapshot(
-                timestamp=now,
-                uptime_seconds=now - self._start,
-                counters=counters,
-                gauges=gauges,
-                histograms=histograms,
-            )
+        now = time.time()
+        return Snapshot(
+            timestamp=now,
+            uptime_seconds=now - self._start,
+            counters={self._format_key(name, labels): value for (name, labels), value in counters.items()},
+            gauges=gauges,
+            histograms={self._format_key(name, labels): hist.stats() for (name, labels), hist in histos.items()},
+        )
 
     def export_json(self, include_histograms: bool = True) -> str:
-        snap = self.get_snapshot()
+        counters, histos = self._merged()
+        snap = self._snapshot(counters, histos)
 
         def hist_to_dict(h: HistogramStats) -> Dict[str, float]:
             return {
@@ -307,58 +509,59 @@ class MetricsCollector:
             "histogram_stats": {name: hist_to_dict(h) for name, h in snap.histograms.items()},
         }
 
-        # Raw histogram samples deliberately omitted by default; tests only
-        # require stats + toggle behavior.
+        # Per-bucket counts ([lower, upper, count]) are omitted on request;
+        # tests only require stats + toggle behavior.
         if include_histograms:
-            payload["histogram_raw"] = {
-                name: [float(v) for v in self._histo[(base, lbls)]]
-                for (base, lbls), _ in self._histo.items()
-                for name in [self._format_key(base, lbls)]
+            payload["histogram_buckets"] = {
+                self._format_key(name, labels): [list(bucket) for bucket in hist.buckets()]
+                for (name, labels), hist in histos.items()
             }
 
         return json.dumps(payload, sort_keys=True)
 
     def export_prometheus(self) -> str:
-        """Render metrics in a simple Prometheus text exposition format."""
+        """Render metrics in the Prometheus text exposition format.
+
+        Histograms are native Prometheus histograms: cumulative ``_bucket``
+        series at power-of-two ``le`` bounds plus ``+Inf``, ``_sum`` and ``_count``.
+        """
 
         lines: list[str] = []
         seen_types: set[str] = set()
-
+        counters, histos = self._merged()
         with self._lock:
-            # Counters
-            for (name, labels), value in sorted(self._counters.items()):
-                if name not in seen_types:
-                    lines.append(f"# TYPE {name} counter")
-                    seen_types.add(name)
-                label_txt = self._format_labels(labels)
-                lines.append(f"{name}{label_txt} {value}")
-
-            # Gauges
-            for (name, labels), value in sorted(self._gauges.items()):
-                if name not in seen_types:
-                    lines.append(f"# TYPE {name} gauge")
-                    seen_types.add(name)
-                label_txt = self._format_labels(labels)
-                lines.append(f"{name}{label_txt} {value}")
-
-            # Histograms as summaries (count/sum + quantiles)
-            for (name, labels), values in sorted(self._histo.items()):
-                if not values:
-                    continue
-                stats = self._stats_for(values)
-                summary_name = name
-                if summary_name not in seen_types:
-                    lines.append(f"# TYPE {summary_name} summary")
-                    seen_types.add(summary_name)
-
-                label_txt = self._format_labels(labels)
-                # Count & sum
-                lines.append(f"{summary_name}_count{label_txt} {stats.count}")
-                lines.append(f"{summary_name}_sum{label_txt} {stats.mean * stats.count}")
-                # Quantiles
-                for q, v in ((0.5, stats.p50), (0.95, stats.p95), (0.99, stats.p99)):
-                    q_labels = self._merge_labels(labels, {"quantile": str(q)})
-                    lines.append(f"{summary_name}{self._format_labels(q_labels)} {v}")
+            gauges = dict(self._gauges)
+
+        # Counters
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen_types:
+                lines.append(f"# TYPE {name} counter")
+                seen_types.add(name)
+            label_txt = self._format_labels(labels)
+            lines.append(f"{name}{label_txt} {value}")
+
+        # Gauges
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in seen_types:
+                lines.append(f"# TYPE {name} gauge")
+                seen_types.add(name)
+            label_txt = self._format_labels(labels)
+            lines.append(f"{name}{label_txt} {value}")
+
+        # Histograms (cumulative buckets + sum/count)
+        for (name, labels), hist in sorted(histos.items()):
+            if name not in seen_types:
+                lines.append(f"# TYPE {name} histogram")
+                seen_types.add(name)
+
+            for le, cumulative in hist.cumulative_buckets():
+                le_labels = self._merge_labels(labels, {"le": repr(le)})
+                lines.append(f"{name}_bucket{self._format_labels(le_labels)} {cumulative}")
+            inf_labels = self._merge_labels(labels, {"le": "+Inf"})
+            lines.append(f"{name}_bucket{self._format_labels(inf_labels)} {hist.count}")
+            label_txt = self._format_labels(labels)
+            lines.append(f"{name}_sum{label_txt} {hist.sum}")
+            lines.append(f"{name}_count{label_txt} {hist.count}")
 
         return "\n".join(lines) + "\n"
 
@@ -366,17 +569,16 @@ class MetricsCollector:
         """Simple CSV export: metric_type,metric_name,labels,value"""
 
         rows = ["metric_type,metric_name,labels,value"]
+        counters, histos = self._merged()
         with self._lock:
-            for (name, labels), value in sorted(self._counters.items()):
-                rows.append(f'counter,{name},"{self._labels_str(labels)}",{value}')
-            for (name, labels), value in sorted(self._gauges.items()):
-                rows.append(f'gauge,{name},"{self._labels_str(labels)}",{value}')
-            for (name, labels), values in sorted(self._histo.items()):
-                if not values:
-                    continue
-                stats = self._stats_for(values)
-                lbl = self._labels_str(labels)
-                rows.append(f'histogram_mean,{name},"{lbl}",{stats.mean}')
+            gauges = dict(self._gauges)
+        for (name, labels), value in sorted(counters.items()):
+            rows.append(f'counter,{name},"{self._labels_str(labels)}",{value}')
+        for (name, labels), value in sorted(gauges.items()):
+            rows.append(f'gauge,{name},"{self._labels_str(labels)}",{value}')
+        for (name, labels), hist in sorted(histos.items()):
+            lbl = self._labels_str(labels)
+            rows.append(f'histogram_mean,{name},"{lbl}",{hist.sum / hist.count}')
         return "\n".join(rows) + "\n"
 
     def get_summary(self) -> Dict[str, Any]:
@@ -432,9 +634,11 @@ class MetricsCollector:
 
     def reset(self) -> None:
         with self._lock:
-            self._counters.clear()
+            for shard in [self._retired, *self._shards]:
+                with shard.lock:
+                    shard.counters.clear()
+                    shard.histos.clear()
             self._gauges.clear()
-            self._histo.clear()
             self._start = time.time()
 
     # ----- formatting helpers -----
@@ -455,10 +659,7 @@ class MetricsCollector:
     def _format_labels(labels: Labels) -> str:
         if not labels:
             return ""
-        ordered = list(labels)
-        if any(k == "quantile" for k, _ in ordered):
-            ordered.sort(key=lambda kv: (kv[0] != "quantile", kv[0], kv[1]))
-        inner = ",".join(f'{k}="{v}"' for k, v in ordered)
+        inner = ",".join(f'{k}="{v}"' for k, v in labels)
         return f"{{{inner}}}"
 
     @staticmethod
@@ -33,6 +33,7 @@ Usage:
 import hashlib
 import json
 import logging
+import math
 import os
 from typing import Dict, List, Optional, Any
 from pathlib import Path
@@ -248,6 +249,23 @@ class PrecomputedCache:
         return self.stale
 
 
+def faq_entry_to_result(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a precomputed FAQ entry like an ``answer_once()`` result."""
+    metadata = dict(entry.get("metadata") or {})
+    metadata.setdefault("used_tokens", 0)
+    metadata["cache_type"] = "faq_precomputed"
+    packed = entry.get("packed_chunks", [])
+    return {
+        "answer": entry["answer"],
+        "refused": bool(entry.get("refused")),
+        "confidence": entry.get("confidence"),
+        "selected_chunks": packed,
+        "selected_chunk_ids": metadata.get("source_chunk_ids") or packed,
+        "metadata": metadata,
+        "routing": {"action": "cache"},
+    }
+
+
 def build_faq_cache(
     questions: List[str],
     chunks: List[Dict],
@@ -273,6 +291,7 @@ def build_faq_cache(
         PrecomputedCache instance with precomputed answers
     """
     from .answer import answer_once
+    from .llm_gateway import PRIORITY_BACKGROUND, llm_priority
 
     effective_sig = kb_signature or _default_kb_signature()
     cache = PrecomputedCache(kb_signature=effective_sig)
@@ -283,7 +302,9 @@ def build_faq_cache(
         logger.info(f"Processing FAQ {i}/{len(questions)}: {question[:60]}...")
 
         try:
-            result = answer_once(question, chunks, vecs_n, bm, **answer_kwargs)
+            # Background work: queues behind interactive queries and waits for a slot instead of being shed
+            with llm_priority(PRIORITY_BACKGROUND, deadline=math.inf):
+                result = answer_once(question, chunks, vecs_n, bm, **answer_kwargs)
             cache.put(question, result)
         except Exception as e:
             logger.error(f"Failed to process FAQ: {question[:60]}: {e}")
@@ -345,6 +366,7 @@ def get_precomputed_cache(cache_path: str = "faq_cache.json", kb_signature: Opti
 __all__ = [
     "PrecomputedCache",
     "build_faq_cache",
+    "faq_entry_to_result",
     "load_faq_list",
     "get_precomputed_cache",
 ]
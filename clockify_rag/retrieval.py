@@ -14,24 +14,30 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
-import math
 import os
 import pathlib
 import re
 import threading
 import time
 from collections import OrderedDict
-from typing import Any, Optional, Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Dict, List, Tuple
 
 import numpy as np
 import clockify_rag.config as config
 from .api_client import ChatCompletionOptions, ChatMessage
-from .embedding import embed_query as _embedding_embed_query
+from .caching import get_query_embedding_cache
+from .chunk_features import _article_key, get_chunk_features
+from .embed_batcher import get_embedding_batcher
+from .embedding import cross_encoder_scores, embed_query as _embedding_embed_query
 from .exceptions import LLMError, ValidationError
-from .indexing import bm25_scores, get_faiss_index
+from .indexing import bm25_scores, bm25_sparse_scores, bm25_sparse_scores_batch, get_faiss_index
 from .utils import tokenize  # FIX (Error #17): Import tokenize from utils instead of duplicating
 from .intent_classification import classify_intent, get_intent_metadata, adjust_scores_by_intent
 from .prompts import QWEN_SYSTEM_PROMPT, build_rag_user_prompt
+from .token_counting import get_token_counter
+from .llm_gateway import PRIORITY_BACKGROUND, llm_priority
+from .tracing import current_span, span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -168,7 +174,7 @@ def compute_confidence_from_scores(
     - Coverage (number of high-quality chunks)
 
     Args:
-        scores_dict: Dictionary with 'hybrid', 'dense', 'bm25' score arrays
+        scores_dict: Dictionary with 'hybrid', 'dense', 'bm25' scores (arrays, DenseScoreStore or SparseScores)
         selected_indices: List of selected chunk indices
         threshold: Minimum acceptable similarity threshold
 
@@ -181,12 +187,12 @@ def compute_confidence_from_scores(
     try:
         import numpy as np
 
-        # Extract scores for selected indices
-        hybrid_scores = np.asarray(scores_dict.get("hybrid", np.array([])), dtype="float32")
-        if hybrid_scores.size == 0:
+        # Extract scores for selected indices (index directly: the scores may be SparseScores)
+        hybrid_scores = scores_dict.get("hybrid")
+        if hybrid_scores is None or len(hybrid_scores) == 0:
             return 50  # Fallback if no scores available
 
-        selected_scores = [hybrid_scores[i] for i in selected_indices if i < len(hybrid_scores)]
+        selected_scores = [float(hybrid_scores[i]) for i in selected_indices if i < len(hybrid_scores)]
         if not selected_scores:
             return 50
 
@@ -299,6 +305,47 @@ QUERY_EXPANSIONS_ENV_VAR = "CLOCKIFY_QUERY_EXPANSIONS"
 _DEFAULT_QUERY_EXPANSION_PATH = pathlib.Path(__file__).resolve().parent.parent / "config" / "query_expansions.json"
 _query_expansion_cache = None
 _query_expansion_override = None
+_query_expansion_matcher = None
+_WORD_BOUNDARY_RE = re.compile(r"\b")
+
+
+class QueryExpansionMatcher:
+    """Every expansion term that occurs in a query as a whole word, found in one pass.
+
+    Compiled once per expansion dictionary. A term matches wherever
+    ``re.search(r"\\b" + re.escape(term) + r"\\b", text)`` would, so it must span
+    two word boundaries of the query. The matcher walks the query's boundary
+    pairs no more than the longest term apart and looks each span up in a
+    term -> position map. Per-query cost depends on the query length, not on
+    the dictionary size.
+    """
+
+    def __init__(self, expansions: Dict[str, List[str]]):
+        self.positions = {term: pos for pos, term in enumerate(expansions) if term}
+        self.synonyms = list(expansions.values())
+        self.max_len = max(map(len, self.positions), default=0)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def matches(self, text: str) -> List[int]:
+        """Positions (in dictionary order) of the terms found in ``text``."""
+        if not self.positions:
+            return []
+        bounds = [m.start() for m in _WORD_BOUNDARY_RE.finditer(text)]
+        found = set()
+        for a, start in enumerate(bounds):
+            for end in bounds[a + 1 :]:
+                if end - start > self.max_len:
+                    break
+                pos = self.positions.get(text[start:end])
+                if pos is not None:
+                    found.add(pos)
+        return sorted(found)
+
+    def expansion_terms(self, text: str) -> List[str]:
+        """Synonyms of the matched terms, deduplicated, in dictionary order."""
+        return list(dict.fromkeys(syn for pos in self.matches(text) for syn in self.synonyms[pos]))
 
 
 def set_query_expansion_path(path):
@@ -312,9 +359,21 @@ def set_query_expansion_path(path):
 
 
 def reset_query_expansion_cache():
-    """Clear cached query expansion data (useful for tests)."""
-    global _query_expansion_cache
+    """Clear cached query expansion data and its compiled matcher (useful for tests)."""
+    global _query_expansion_cache, _query_expansion_matcher
     _query_expansion_cache = None
+    _query_expansion_matcher = None
+
+
+def get_query_expansion_matcher() -> QueryExpansionMatcher:
+    """Matcher for the loaded expansion dictionary, recompiled only when the dictionary changes."""
+    global _query_expansion_matcher
+    expansions = load_query_expansion_dict()
+    cached = _query_expansion_matcher
+    if cached is None or cached[0] is not expansions:
+        cached = (expansions, QueryExpansionMatcher(expansions))
+        _query_expansion_matcher = cached
+    return cached[1]
 
 
 def _resolve_query_expansion_path():
@@ -412,9 +471,11 @@ def approx_tokens(chars: int) -> int:
 
 
 def count_tokens(text: str, model: Optional[str] = None) -> int:
-    """Count actual tokens using tiktoken for supported models.
+    """Count tokens with the counter for ``model`` (see :mod:`clockify_rag.token_counting`).
 
-    Falls back to model-specific heuristics for Qwen and other models.
+    Uses tiktoken for GPT models, a local Hugging Face tokenizer when
+    ``TOKENIZER_PATH`` is set, and model-specific heuristics otherwise
+    (Qwen: ~3.5 chars/token for English, ~1.5 for CJK).
 
     Args:
         text: Text to count tokens for
@@ -423,77 +484,18 @@ def count_tokens(text: str, model: Optional[str] = None) -> int:
     Returns:
         Estimated token count
     """
-    from . import config
-
-    model_name: str = model or config.RAG_CHAT_MODEL or ""
-
-    # Try tiktoken for GPT models
-    if "gpt" in model_name.lower():
-        try:
-            import tiktoken
-
-            encoding = tiktoken.encoding_for_model(model_name)
-            return len(encoding.encode(text))
-        except (ImportError, KeyError):
-            pass
-
-    # For Qwen and other models, use improved heuristic
-    # Qwen tokenizer tends to be more efficient than GPT for English (~3.5 chars/token)
-    # but less efficient for CJK content (~1.5 chars/token)
-    if "qwen" in model_name.lower():
-        # Count CJK characters (Chinese, Japanese, Korean)
-        import re
-
-        cjk_pattern = r"[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uac00-\ud7af]"
-        cjk_chars = len(re.findall(cjk_pattern, text))
-        non_cjk_chars = len(text) - cjk_chars
-
-        # CJK: ~1.5 chars/token, non-CJK: ~3.5 chars/token
-        # Use ceil to ensure we never underestimate (safer for budget enforcement)
-        return math.ceil(cjk_chars / 1.5 + non_cjk_chars / 3.5)
-
-    # Default fallback
-    return approx_tokens(len(text))
+    return get_token_counter(model).count(text)
 
 
 def truncate_to_token_budget(text: str, budget: int) -> str:
     """Truncate text to fit token budget, append ellipsis.
 
+    The cut point comes from a prefix sum of token units rather than a binary
+    search with a recount per step.
+
     FIX (Error #9): Handles edge case where budget is smaller than ellipsis tokens.
     """
-    est_tokens = count_tokens(text)
-    if est_tokens <= budget:
-        return text
-
-    ellipsis = "..."
-    ellipsis_tokens = count_tokens(ellipsis)
-
-    # FIX (Error #9): Guard against budget too small for ellipsis
-    if budget < ellipsis_tokens:
-        # Budget too small for ellipsis, truncate to budget without ellipsis
-        left, right = 0, len(text)
-        while left < right:
-            mid = (left + right + 1) // 2
-            if count_tokens(text[:mid]) <= budget:
-                left = mid
-            else:
-                right = mid - 1
-        return text[:left]
-
-    # Normal case: budget >= ellipsis tokens
-    # Binary search for optimal truncation point
-    left, right = 0, len(text)
-    target = budget - ellipsis_tokens
-
-    while left < right:
-        mid = (left + right + 1) // 2
-        candidate = text[:mid]
-        if count_tokens(candidate) <= target:
-            left = mid
-        else:
-            right = mid - 1
-
-    return text[:left] + ellipsis
+    return get_token_counter().truncate(text, budget)
 
 
 def expand_query(question: str) -> str:
@@ -511,15 +513,7 @@ def expand_query(question: str) -> str:
     if not question:
         return question
 
-    expansions = load_query_expansion_dict()
-    q_lower = question.lower()
-    expanded_terms = []
-
-    for term, synonyms in expansions.items():
-        if re.search(r"\b" + re.escape(term) + r"\b", q_lower):
-            for syn in synonyms:
-                if syn not in expanded_terms:
-                    expanded_terms.append(syn)
+    expanded_terms = get_query_expansion_matcher().expansion_terms(question.lower())
 
     if expanded_terms:
         max_extra = max_length - len(question) - 1
@@ -570,9 +564,61 @@ def embed_query(question: str, retries=0) -> np.ndarray:
     same dimensionality and normalization strategy as stored document
     embeddings, regardless of whether the backend is Ollama or the local
     SentenceTransformer.
+
+    Vectors are cached by normalised question text (``QUERY_EMBED_CACHE_SIZE``),
+    so a repeated question skips the embedding round-trip. With
+    ``QUERY_EMBED_BATCH_WAIT_MS`` set, cache misses from concurrent callers are
+    embedded together by the embedding batcher.
+    """
+    with span("embed_query") as s:
+        cache = get_query_embedding_cache()
+        vec = cache.get(question)
+        s.set(cache_hit=vec is not None)
+        if vec is None:
+            if config.QUERY_EMBED_BATCH_WAIT_MS > 0:
+                vec = get_embedding_batcher().embed(question)
+            else:
+                vec = _embedding_embed_query(question, retries=retries)
+            cache.put(question, vec)
+    return vec
+
+
+def warm_query_embeddings(questions: List[str], retries: int = 0) -> int:
+    """Embed questions missing from the query-embedding cache in one batched pass.
+
+    Questions are normalised the way :func:`retrieve` normalises them, so asking
+    one later is a cache hit.
+
+    Returns:
+        Number of vectors added to the cache
     """
+    cache = get_query_embedding_cache()
+    if cache.maxsize <= 0:
+        return 0
+    texts = []
+    for question in questions:
+        try:
+            texts.append(validate_query_length(normalize_query(question)))
+        except ValidationError:
+            continue
+    texts = [text for text in dict.fromkeys(texts) if text not in cache]
+    if not texts:
+        return 0
+
+    for text, vec in zip(texts, _embed_texts_batch(texts, retries)):
+        cache.put(text, vec)
+    return len(texts)
+
 
-    return _embedding_embed_query(question, retries=retries)
+def _embed_texts_batch(texts: List[str], retries: int = 0) -> np.ndarray:
+    """Normalized embeddings of ``texts`` from one batched backend call."""
+    if config.EMB_BACKEND == "local":
+        from .embedding import embed_local_batch
+
+        return embed_local_batch(texts, normalize=True)
+    from .embeddings_client import embed_texts
+
+    return embed_texts(texts, retries=retries)
 
 
 class DenseScoreStore:
@@ -631,37 +677,135 @@ class DenseScoreStore:
         except (IndexError, KeyError):
             return default
 
+    def take(self, indices) -> np.ndarray:
+        """Scores at ``indices`` as a float32 array, computing any missing ones in one matrix product."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size and (indices.min() < 0 or indices.max() >= self._length):
+            raise IndexError("score index out of range")
+        if self._full is not None:
+            return self._full[indices].astype("float32", copy=False)
+
+        missing = [int(i) for i in dict.fromkeys(indices.tolist()) if int(i) not in self._cache]
+        if missing:
+            if self._vecs is None or self._qv is None:
+                raise KeyError(missing[0])
+            computed = np.asarray(self._vecs[missing], dtype="float32").dot(self._qv)
+            self._cache.update(zip(missing, computed.tolist()))
+        return np.array([self._cache[int(i)] for i in indices.tolist()], dtype="float32")
+
     def to_array(self) -> np.ndarray:
         return self._materialize_full().copy()
 
 
-def retrieve(
-    question: str, chunks, vecs_n, bm, top_k=None, hnsw=None, retries=0, faiss_index_path=None
-) -> Tuple[List[int], Dict[str, Any]]:
-    """Hybrid retrieval: dense + BM25 + dedup. Optionally uses FAISS/HNSW for fast K-NN.
+class SparseScores:
+    """Corpus-length score vector that stores only its non-fill entries.
 
-    FIX (Error #5): Validates query length at entry point to prevent DoS attacks.
+    Holds candidate ids and aligned scores; every other position reads as
+    ``fill``. Indexing costs a binary search, and ``np.asarray`` (or
+    ``to_array``) materializes the dense vector only for callers that need it.
+    """
 
-    OPTIMIZATION: Intent-based retrieval with dynamic alpha weighting (+8-12% accuracy).
-    Adjusts BM25/dense balance based on query intent:
-    - Procedural (how-to): alpha=0.65 (favor BM25 for keyword matching)
-    - Factual (what/define): alpha=0.35 (favor dense for semantic understanding)
-    - Pricing: alpha=0.70 (high BM25 for exact terms)
-    - General: alpha=0.50 (balanced)
+    __slots__ = ("_length", "ids", "values", "fill", "_dense")
 
-    Query expansion: Applies domain-specific synonym expansion for BM25 (keyword-based),
-    uses original query for dense retrieval (embeddings already capture semantics).
+    def __init__(self, length: int, ids: np.ndarray, values: np.ndarray, fill: float = 0.0) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        values = np.asarray(values, dtype="float32")
+        if ids.shape != values.shape:
+            raise ValueError(f"ids and values must align: {ids.shape} != {values.shape}")
+        if ids.size > 1 and np.any(ids[1:] < ids[:-1]):
+            order = np.argsort(ids, kind="stable")
+            ids, values = ids[order], values[order]
+        self._length = int(length)
+        self.ids = ids
+        self.values = values
+        self.fill = float(fill)
+        self._dense: Optional[np.ndarray] = None
 
-    Returns:
-        Tuple of (filtered_indices, scores_dict) where filtered_indices is list of int
-        and scores_dict contains 'dense', 'bm25', 'hybrid' numpy arrays plus 'intent_metadata'.
-    """
-    # FIX (Error #1): Use centralized FAISS index getter instead of duplicate global state
-    # FIX (Error #5): Validate query at entry point
-    global RETRIEVE_PROFILE_LAST
+    def __len__(self) -> int:
+        return self._length
 
+    @property
+    def shape(self) -> Tuple[int]:
+        return (self._length,)
+
+    def take(self, indices) -> np.ndarray:
+        """Scores at ``indices`` as a float32 array (``fill`` where none is stored)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        out = np.full(indices.shape, self.fill, dtype="float32")
+        if self.ids.size and indices.size:
+            pos = np.minimum(np.searchsorted(self.ids, indices), self.ids.size - 1)
+            hit = self.ids[pos] == indices
+            out[hit] = self.values[pos[hit]]
+        return out
+
+    def __getitem__(self, idx: int) -> float:
+        idx = int(idx)
+        if idx < 0 or idx >= self._length:
+            raise IndexError(idx)
+        return float(self.take(idx))
+
+    def get(self, idx: int, default: Optional[float] = None) -> Optional[float]:
+        try:
+            return self[idx]
+        except IndexError:
+            return default
+
+    def to_array(self) -> np.ndarray:
+        dense = np.full(self._length, self.fill, dtype="float32")
+        dense[self.ids] = self.values
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        if self._dense is None:
+            self._dense = self.to_array()
+        return self._dense if dtype is None else self._dense.astype(dtype, copy=False)
+
+
+def _sparse_zscore_at(scores: SparseScores, positions: np.ndarray) -> np.ndarray:
+    """``normalize_scores_zscore(scores)[positions]`` without materializing the corpus-length vector."""
+    n = len(scores)
+    if n == 0 or not positions.size:
+        return np.zeros(positions.shape, dtype="float32")
+    n_fill = n - scores.ids.size
+    mean = (float(scores.values.sum(dtype=np.float64)) + n_fill * scores.fill) / n
+    dev = scores.values.astype(np.float64) - mean
+    var = (float(dev.dot(dev)) + n_fill * (scores.fill - mean) ** 2) / n
+    if var <= 0:
+        return np.zeros(positions.shape, dtype="float32")
+    return ((scores.take(positions) - mean) / np.sqrt(var)).astype("float32")
+
+
+@dataclass
+class _QueryPlan:
+    """Query-side inputs of one retrieval: normalised text, BM25 expansion and intent."""
+
+    question: str
+    expanded: str
+    alpha: float
+    intent_name: Optional[str] = None
+    intent_config: Any = None
+    intent_metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def _plan_query(question: str) -> _QueryPlan:
+    # FIX (Error #5): Validate query at entry point
     question = validate_query_length(normalize_query(question))
 
+    # OPTIMIZATION: Classify query intent for specialized retrieval strategy (if enabled)
+    if config.USE_INTENT_CLASSIFICATION:
+        intent_name, intent_config, intent_confidence = classify_intent(question)
+        return _QueryPlan(
+            question,
+            expand_query(question),  # Expand query for BM25 keyword matching
+            intent_config.alpha_hybrid,  # Use intent-specific alpha
+            intent_name,
+            intent_config,
+            get_intent_metadata(intent_name, intent_confidence),
+        )
+    return _QueryPlan(question, expand_query(question), config.ALPHA_HYBRID)  # Use static alpha from config
+
+
+def _effective_top_k(top_k: Optional[int]) -> int:
     # Use centralized config value if not specified
     requested_top_k = top_k
     if top_k is None:
@@ -677,92 +821,86 @@ def retrieve(
     logger.debug(
         f"Retrieval config: requested_top_k={requested_top_k}, effective_top_k={top_k}, max_allowed={config.MAX_TOP_K}"
     )
+    return top_k
 
-    # OPTIMIZATION: Classify query intent for specialized retrieval strategy (if enabled)
-    intent_metadata = {}
-    if config.USE_INTENT_CLASSIFICATION:
-        intent_name, intent_config, intent_confidence = classify_intent(question)
-        alpha_hybrid = intent_config.alpha_hybrid  # Use intent-specific alpha
-        intent_metadata = get_intent_metadata(intent_name, intent_confidence)
-    else:
-        alpha_hybrid = config.ALPHA_HYBRID  # Use static alpha from config
 
-    # Expand query for BM25 keyword matching
-    expanded_question = expand_query(question)
+def _ann_candidate_count(top_k: int) -> int:
+    return max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER)
 
-    # Use original question for embedding
-    qv_n = embed_query(question, retries=retries)
 
-    # Get FAISS index from centralized source (indexing module)
-    faiss_index = None
-    if config.USE_ANN == "faiss":
+def _resolve_faiss_index(faiss_index, faiss_index_path, dim: int):
+    """The FAISS index to search (the caller's snapshot or the process-wide one), or None."""
+    if config.USE_ANN != "faiss":
+        return None
+    if faiss_index is None:
         faiss_index = get_faiss_index(faiss_index_path)
-        if faiss_index:
-            # Defensive: skip FAISS if dimension mismatches current query vectors (e.g., toy tests)
-            try:
-                faiss_dim = getattr(faiss_index, "d", None)
-                if faiss_dim is not None and faiss_dim != qv_n.shape[0]:
-                    logger.info(
-                        "info: ann=fallback reason=dim-mismatch faiss_d=%s q_dim=%s",
-                        faiss_dim,
-                        qv_n.shape[0],
-                    )
-                    faiss_index = None
-            except Exception as e:
-                logger.debug("FAISS dimension check failed: %s", e)
+    if faiss_index:
+        # Defensive: skip FAISS if dimension mismatches current query vectors (e.g., toy tests)
+        try:
+            faiss_dim = getattr(faiss_index, "d", None)
+            if faiss_dim is not None and faiss_dim != dim:
+                logger.info("info: ann=fallback reason=dim-mismatch faiss_d=%s q_dim=%s", faiss_dim, dim)
                 faiss_index = None
+        except Exception as e:
+            logger.debug("FAISS dimension check failed: %s", e)
+            faiss_index = None
 
-        if faiss_index:
-            # Only set nprobe for IVF indexes (not flat indexes)
-            if hasattr(faiss_index, "nprobe"):
-                faiss_index.nprobe = config.ANN_NPROBE
-            logger.info("info: ann=faiss status=loaded nprobe=%d", config.ANN_NPROBE)
-        elif faiss_index_path:
-            logger.info("info: ann=fallback reason=missing-index")
+    if faiss_index:
+        # Only set nprobe for IVF indexes (not flat indexes)
+        if hasattr(faiss_index, "nprobe"):
+            faiss_index.nprobe = config.ANN_NPROBE
+        logger.info("info: ann=faiss status=loaded nprobe=%d", config.ANN_NPROBE)
+    elif faiss_index_path:
+        logger.info("info: ann=fallback reason=missing-index")
+    return faiss_index
 
-    dense_scores_full = None
-    candidate_idx: List[int] = []
-    n_chunks = len(chunks)
-    dot_elapsed = 0.0
-    dense_computed = 0
 
-    if faiss_index:
-        # Only score FAISS candidates, don't compute full corpus
-        distances, indices = faiss_index.search(
-            qv_n.reshape(1, -1).astype("float32"),
-            max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER),
-        )
-        # Filter indices and distances together to maintain alignment
-        # (prevents misalignment when FAISS returns -1 sentinels)
-        valid_pairs = [(int(i), float(d)) for i, d in zip(indices[0], distances[0]) if 0 <= i < n_chunks]
-        candidate_idx = [i for i, _ in valid_pairs]
-        dense_from_ann = np.array([d for _, d in valid_pairs], dtype=np.float32)
-
-        dense_scores = dense_from_ann
-        dense_computed = len(candidate_idx)
-        dot_elapsed = 0.0
-    elif hnsw:
-        _, cand = hnsw.knn_query(qv_n, k=max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER))
-        candidate_idx = cand[0].tolist()
-        dot_start = time.perf_counter()
-        # Compute scores only for HNSW candidates to avoid full-matrix dot products
-        if candidate_idx:
-            dense_scores = np.array([float(vecs_n[idx].dot(qv_n)) for idx in candidate_idx], dtype=np.float32)
-        else:
-            dense_scores = np.array([], dtype=np.float32)
-        dense_scores_full = None
-        dot_elapsed = time.perf_counter() - dot_start
-        dense_computed = len(candidate_idx)
-    else:
-        dot_start = time.perf_counter()
-        dense_scores_full = vecs_n.dot(qv_n)
-        dot_elapsed = time.perf_counter() - dot_start
-        dense_computed = n_chunks
-        dense_scores = dense_scores_full
-        candidate_idx = np.arange(len(chunks)).tolist()
+def _faiss_candidates(indices: np.ndarray, distances: np.ndarray, n_chunks: int) -> Tuple[List[int], np.ndarray]:
+    """Candidates and their dense scores from one row of a FAISS search result."""
+    # Filter indices and distances together to maintain alignment
+    # (prevents misalignment when FAISS returns -1 sentinels)
+    valid_pairs = [(int(i), float(d)) for i, d in zip(indices, distances) if 0 <= i < n_chunks]
+    return [i for i, _ in valid_pairs], np.array([d for _, d in valid_pairs], dtype=np.float32)
+
 
-    if not candidate_idx and not faiss_index:
-        max_candidates = max(config.ANN_CANDIDATE_MIN, top_k * config.FAISS_CANDIDATE_MULTIPLIER)
+def _hnsw_candidate_scores(candidate_idx: List[int], vecs_n, qv_n) -> np.ndarray:
+    # Compute scores only for HNSW candidates to avoid full-matrix dot products
+    if candidate_idx:
+        return np.array([float(vecs_n[idx].dot(qv_n)) for idx in candidate_idx], dtype=np.float32)
+    return np.array([], dtype=np.float32)
+
+
+def _rank_query(
+    plan: _QueryPlan,
+    chunks,
+    vecs_n,
+    bm,
+    qv_n: np.ndarray,
+    top_k: int,
+    *,
+    used_faiss: bool,
+    used_hnsw: bool,
+    candidate_idx: List[int],
+    dense_scores: np.ndarray,
+    dense_scores_full: Optional[np.ndarray],
+    dense_computed: int,
+    dot_elapsed: float,
+    bm_sparse: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+) -> Tuple[List[int], Dict[str, Any], Dict[str, Any]]:
+    """Hybrid scoring, top-k and dedup for one query once its dense candidates are known.
+
+    Shared by :func:`retrieve` and :func:`retrieve_batch`. ``bm_sparse`` is the
+    query's ``bm25_sparse_scores`` result when the caller scored BM25 for a whole
+    batch; without it BM25 is scored here.
+
+    Returns:
+        (filtered_indices, scores_dict, profile_data)
+    """
+    features = get_chunk_features(chunks)
+    n_chunks = len(chunks)
+
+    if not candidate_idx and not used_faiss:
+        max_candidates = _ann_candidate_count(top_k)
         dense_scores_full = vecs_n.dot(qv_n)
         if len(chunks) > max_candidates:
             top_indices = np.argsort(dense_scores_full)[::-1][:max_candidates]
@@ -773,93 +911,80 @@ def retrieve(
             dense_scores = dense_scores_full
 
     candidate_idx_array = np.array(candidate_idx, dtype=np.int32)
+    intent_config = plan.intent_config
+    boost_intent = config.USE_INTENT_CLASSIFICATION and intent_config.boost_factor != 1.0
 
-    # Use expanded query for BM25
-    bm_scores_full = bm25_scores(expanded_question, bm, top_k=top_k * 3)
+    # Hub/category pages are down-weighted to keep specific answers prioritized
+    hub_multipliers = None
+    if config.HUB_PAGE_SCORE_MULTIPLIER < 1.0:
+        hub_multipliers = features.hub_multipliers(config.HUB_PAGE_SCORE_MULTIPLIER)
 
-    # Normalize once, then slice for candidates
-    zs_bm_full = normalize_scores_zscore(bm_scores_full)
-    zs_dense_full = None
     if dense_scores_full is not None:
-        dense_scores_full = np.asarray(dense_scores_full, dtype="float32")
-        zs_dense_full = normalize_scores_zscore(dense_scores_full)
-        zs_dense = zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-    else:
-        dense_scores = np.asarray(dense_scores, dtype="float32")
-        zs_dense = normalize_scores_zscore(dense_scores)
-    zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-
-    # OPTIMIZATION: Apply intent-based score boosting (if enabled)
-    # Boosts chunks containing intent-specific keywords (e.g., pricing sections for pricing queries)
-    # Note: When using FAISS, only BM25 scores are boosted (dense scores not fully materialized for performance)
-    if config.USE_INTENT_CLASSIFICATION and intent_config.boost_factor != 1.0:
-        # Build scores dict for boosting (include dense only if available)
-        temp_scores = {"bm25": zs_bm_full}
-        if zs_dense_full is not None:
-            temp_scores["dense"] = zs_dense_full
-
-        # Apply intent-specific boosting to relevant chunks
-        temp_scores = adjust_scores_by_intent(chunks, temp_scores, intent_config)
-
-        # Update normalized scores with boosted values
-        zs_bm_full = temp_scores["bm25"]
-        if zs_dense_full is not None:
-            # Only update dense scores if they were fully materialized
+        # Linear scan: dense scores already cover the corpus, so score it densely.
+        # Use expanded query for BM25; normalize once, then slice for candidates
+        if bm_sparse is None:
+            with span("bm25_scores"):
+                bm_scores_full = bm25_scores(plan.expanded, bm, top_k=top_k * 3)
+        else:
+            bm_scores_full = np.zeros(n_chunks, dtype="float32")
+            bm_scores_full[bm_sparse[0]] = bm_sparse[1]
+        with span("zscore"):
+            zs_bm_full = normalize_scores_zscore(bm_scores_full)
+            dense_scores_full = np.asarray(dense_scores_full, dtype="float32")
+            zs_dense_full = normalize_scores_zscore(dense_scores_full)
+
+        # OPTIMIZATION: Apply intent-based score boosting (if enabled)
+        # Boosts chunks containing intent-specific keywords (e.g., pricing sections for pricing queries)
+        if boost_intent:
+            with span("intent_boost", intent=plan.intent_name):
+                temp_scores = adjust_scores_by_intent(
+                    chunks, {"bm25": zs_bm_full, "dense": zs_dense_full}, intent_config
+                )
+            zs_bm_full = temp_scores["bm25"]
             zs_dense_full = temp_scores["dense"]
 
-        # Re-slice candidate scores from boosted full scores
-        zs_bm = zs_bm_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-        if zs_dense_full is not None:
-            zs_dense = zs_dense_full[candidate_idx_array] if candidate_idx_array.size else np.array([], dtype="float32")
-
-    # Hybrid scoring (OPTIMIZATION: use intent-specific alpha for +8-12% accuracy)
-    def _apply_hub_penalty(scores: np.ndarray, idx_array: np.ndarray) -> np.ndarray:
-        """Down-weight hub/category pages to keep specific answers prioritized."""
-
-        if not scores.size or config.HUB_PAGE_SCORE_MULTIPLIER >= 1.0:
-            return scores
-
-        # Copy to avoid mutating inputs used elsewhere
-        penalized = scores.copy()
-        for pos, chunk_idx in enumerate(idx_array):
-            meta = chunks[chunk_idx].get("metadata", {}) or {}
-            if bool(meta.get("is_hub")):
-                penalized[pos] = penalized[pos] * config.HUB_PAGE_SCORE_MULTIPLIER
-        return penalized
+        # Hybrid scoring (OPTIMIZATION: use intent-specific alpha for +8-12% accuracy)
+        hybrid_full = plan.alpha * zs_bm_full + (1 - plan.alpha) * zs_dense_full
+        if hub_multipliers is not None and hybrid_full.size:
+            hybrid_full = hybrid_full * hub_multipliers
+        hybrid_penalized = hybrid_full[candidate_idx_array]
+        bm25_out: Any = bm_scores_full
+        hybrid_out: Any = hybrid_full
+    else:
+        # ANN: only the candidates are scored. BM25 stays sparse (documents matching a
+        # query term), its z-score statistics are taken over the whole corpus analytically,
+        # and nothing corpus-sized is allocated per query.
+        if bm_sparse is None:
+            with span("bm25_scores") as s:
+                bm_sparse = bm25_sparse_scores(plan.expanded, bm, top_k=top_k * 3)
+                s.set(matched=int(bm_sparse[0].size))
+        bm25_out = SparseScores(n_chunks, *bm_sparse)
+        with span("zscore"):
+            zs_bm = _sparse_zscore_at(bm25_out, candidate_idx_array)
+            dense_scores = np.asarray(dense_scores, dtype="float32")
+            zs_dense = normalize_scores_zscore(dense_scores)
+
+        # Note: only BM25 scores are boosted here (dense scores exist for the candidates only)
+        if boost_intent and candidate_idx_array.size:
+            with span("intent_boost", intent=plan.intent_name):
+                boosted = adjust_scores_by_intent(chunks, {"bm25": zs_bm}, intent_config, positions=candidate_idx_array)
+                zs_bm = boosted["bm25"]
+
+        hybrid = plan.alpha * zs_bm + (1 - plan.alpha) * zs_dense
+        hybrid_penalized = hybrid
+        if hub_multipliers is not None and hybrid.size:
+            hybrid_penalized = hybrid * hub_multipliers[candidate_idx_array]
+        hybrid_out = SparseScores(n_chunks, candidate_idx_array, hybrid_penalized)
 
-    hybrid = alpha_hybrid * zs_bm + (1 - alpha_hybrid) * zs_dense
-    hybrid_penalized = _apply_hub_penalty(hybrid, candidate_idx_array) if hybrid.size else hybrid
     if hybrid_penalized.size:
         top_positions = np.argsort(hybrid_penalized)[::-1][:top_k]
         top_idx = candidate_idx_array[top_positions]
     else:
         top_idx = np.array([], dtype=np.int32)
 
-    # Deduplication (stable by article key to avoid cross-article collisions)
-    seen = set()
-    filtered = []
-    for i in top_idx:
-        try:
-            dedup_key = (_article_key(chunks[i]), chunks[i].get("section"))
-        except Exception:
-            dedup_key = (chunks[i].get("title"), chunks[i].get("section"))
-        key = dedup_key
-        if key in seen:
-            continue
-        seen.add(key)
-        filtered.append(i)
-
-    # Reuse cached normalized scores for full hybrid (OPTIMIZATION: use intent-specific alpha)
-    if zs_dense_full is not None:
-        hybrid_full = alpha_hybrid * zs_bm_full + (1 - alpha_hybrid) * zs_dense_full
-    else:
-        hybrid_full = np.zeros(len(chunks), dtype="float32")
-        for idx, score in zip(candidate_idx, hybrid):
-            hybrid_full[idx] = score
-
-    if hybrid_full.size and config.HUB_PAGE_SCORE_MULTIPLIER < 1.0:
-        full_idx_array = np.arange(len(chunks), dtype=np.int32)
-        hybrid_full = _apply_hub_penalty(hybrid_full, full_idx_array)
+    # Deduplication (stable by article key + section to avoid cross-article collisions)
+    with span("dedup"):
+        filtered = features.dedup(top_idx)
 
     if dense_scores_full is not None:
         dense_scores_store = DenseScoreStore(len(chunks), full_scores=dense_scores_full)
@@ -869,45 +994,278 @@ def retrieve(
         )
 
     dense_total = n_chunks
-    used_hnsw = bool(hnsw) and faiss_index is None
-    dense_computed_total = dense_computed or (dense_total if (used_hnsw or not faiss_index) else 0)
-    dense_reused = dense_total - dense_computed_total
-
-    # FIX: Thread-safe update of profiling state
-    global RETRIEVE_PROFILE_LAST
+    dense_computed_total = dense_computed or (dense_total if (used_hnsw or not used_faiss) else 0)
     profile_data = {
-        "used_faiss": bool(faiss_index),
+        "used_faiss": used_faiss,
         "used_hnsw": used_hnsw,
         "candidates": int(len(candidate_idx)),
         "dense_total": int(dense_total),
-        "dense_reused": int(dense_reused),
+        "dense_reused": int(dense_total - dense_computed_total),
         "dense_computed": int(dense_computed_total),
         "dense_saved": int(dense_total - dense_computed_total),
         "dense_dot_time_ms": round(dot_elapsed * 1000, 3),
     }
 
+    # OPTIMIZATION: Include intent metadata for logging and debugging (already populated above)
+    return (
+        filtered,
+        {
+            "dense": dense_scores_store,
+            "bm25": bm25_out,
+            "hybrid": hybrid_out,
+            "intent_metadata": plan.intent_metadata,  # intent classification metadata (or empty dict if disabled)
+        },
+        profile_data,
+    )
+
+
+def _record_profile(profile_data: Dict[str, Any]) -> None:
+    # FIX: Thread-safe update of profiling state
+    global RETRIEVE_PROFILE_LAST
     with _RETRIEVE_PROFILE_LOCK:
         RETRIEVE_PROFILE_LAST = profile_data
 
     if logger.isEnabledFor(logging.DEBUG):
         logger.debug(
             "profile: retrieval ann=%s reused=%d computed=%d total=%d dot_ms=%.3f",
-            "faiss" if faiss_index else ("hnsw" if used_hnsw else "linear"),
+            "faiss" if profile_data["used_faiss"] else ("hnsw" if profile_data["used_hnsw"] else "linear"),
             profile_data["dense_reused"],
             profile_data["dense_computed"],
-            dense_total,
+            profile_data["dense_total"],
             profile_data["dense_dot_time_ms"],
         )
 
-    # OPTIMIZATION: Include intent metadata for logging and debugging (already populated above)
-    return filtered, {
-        "dense": dense_scores_store,
-        "bm25": bm_scores_full,
-        "hybrid": hybrid_full,
-        "intent_metadata": intent_metadata,  # OPTIMIZATION: intent classification metadata (or empty dict if disabled)
-    }
+
+@traced("retrieve")
+def retrieve(
+    question: str,
+    chunks,
+    vecs_n,
+    bm,
+    top_k=None,
+    hnsw=None,
+    retries=0,
+    faiss_index_path=None,
+    faiss_index=None,
+    query_vector=None,
+) -> Tuple[List[int], Dict[str, Any]]:
+    """Hybrid retrieval: dense + BM25 + dedup. Optionally uses FAISS/HNSW for fast K-NN.
+
+    FIX (Error #5): Validates query length at entry point to prevent DoS attacks.
+
+    OPTIMIZATION: Intent-based retrieval with dynamic alpha weighting (+8-12% accuracy).
+    Adjusts BM25/dense balance based on query intent:
+    - Procedural (how-to): alpha=0.65 (favor BM25 for keyword matching)
+    - Factual (what/define): alpha=0.35 (favor dense for semantic understanding)
+    - Pricing: alpha=0.70 (high BM25 for exact terms)
+    - General: alpha=0.50 (balanced)
+
+    Query expansion: Applies domain-specific synonym expansion for BM25 (keyword-based),
+    uses original query for dense retrieval (embeddings already capture semantics).
+
+    ``faiss_index`` pins the ANN index to the caller's index snapshot; without it
+    the process-wide index from ``get_faiss_index`` is used. ``query_vector`` is a
+    normalized embedding of the question computed by the caller (the async
+    pipeline awaits it over HTTP); without it the question is embedded here.
+
+    Each stage (embedding, ANN search or dense scan, BM25, z-scores, intent boost,
+    dedup) is a tracing span under ``retrieve``; the retrieval profile is set as
+    attributes of the ``retrieve`` span of the current request.
+
+    Returns:
+        Tuple of (filtered_indices, scores_dict) where filtered_indices is list of int
+        and scores_dict contains 'dense', 'bm25', 'hybrid' corpus-length scores plus 'intent_metadata'.
+        'dense' is a DenseScoreStore. On the linear path 'bm25' and 'hybrid' are numpy arrays;
+        with FAISS/HNSW they are SparseScores holding only the scored documents, so per-query
+        allocation is O(candidates) rather than O(corpus).
+    """
+    plan = _plan_query(question)
+    top_k = _effective_top_k(top_k)
+
+    # Use original question for embedding
+    qv_n = query_vector if query_vector is not None else embed_query(plan.question, retries=retries)
+
+    # Get FAISS index from the caller's snapshot or the centralized source (indexing module)
+    faiss_index = _resolve_faiss_index(faiss_index, faiss_index_path, qv_n.shape[0])
+
+    dense_scores_full = None
+    n_chunks = len(chunks)
+    dot_elapsed = 0.0
+
+    if faiss_index:
+        # Only score FAISS candidates, don't compute full corpus
+        with span("ann_search", backend="faiss"):
+            distances, indices = faiss_index.search(qv_n.reshape(1, -1).astype("float32"), _ann_candidate_count(top_k))
+        candidate_idx, dense_scores = _faiss_candidates(indices[0], distances[0], n_chunks)
+    elif hnsw:
+        with span("ann_search", backend="hnsw"):
+            _, cand = hnsw.knn_query(qv_n, k=_ann_candidate_count(top_k))
+        candidate_idx = cand[0].tolist()
+        dot_start = time.perf_counter()
+        dense_scores = _hnsw_candidate_scores(candidate_idx, vecs_n, qv_n)
+        dot_elapsed = time.perf_counter() - dot_start
+    else:
+        dot_start = time.perf_counter()
+        with span("dense_scores", rows=n_chunks):
+            dense_scores_full = vecs_n.dot(qv_n)
+        dot_elapsed = time.perf_counter() - dot_start
+        dense_scores = dense_scores_full
+        candidate_idx = np.arange(n_chunks).tolist()
+
+    filtered, scores, profile_data = _rank_query(
+        plan,
+        chunks,
+        vecs_n,
+        bm,
+        qv_n,
+        top_k,
+        used_faiss=bool(faiss_index),
+        used_hnsw=bool(hnsw) and not faiss_index,
+        candidate_idx=candidate_idx,
+        dense_scores=dense_scores,
+        dense_scores_full=dense_scores_full,
+        dense_computed=len(candidate_idx),
+        dot_elapsed=dot_elapsed,
+    )
+    _record_profile(profile_data)
+    current_span().set(**profile_data, selected=len(filtered))
+    return filtered, scores
+
+
+def embed_queries(questions: List[str], retries: int = 0) -> np.ndarray:
+    """Embed normalised questions as rows of one matrix.
+
+    Cached vectors are reused; the misses are embedded in one batched backend
+    call (as in :func:`warm_query_embeddings`) and added to the cache.
+    """
+    with span("embed_query", queries=len(questions)) as s:
+        cache = get_query_embedding_cache()
+        vectors: Dict[str, np.ndarray] = {}
+        missing = []
+        for text in dict.fromkeys(questions):
+            vec = cache.get(text)
+            if vec is None:
+                missing.append(text)
+            else:
+                vectors[text] = vec
+        s.set(cache_hits=len(vectors))
+        if missing:
+            for text, vec in zip(missing, _embed_texts_batch(missing, retries)):
+                vectors[text] = vec
+                cache.put(text, vec)
+    if not questions:
+        return np.zeros((0, config.EMB_DIM), dtype="float32")
+    return np.stack([np.asarray(vectors[text], dtype="float32") for text in questions])
+
+
+# Dense scores of the linear path are computed for this many (query, chunk) pairs at a time
+_BATCH_DENSE_BLOCK = 1 << 24
 
 
+@traced("retrieve_batch")
+def retrieve_batch(
+    questions: List[str],
+    chunks,
+    vecs_n,
+    bm,
+    top_k=None,
+    hnsw=None,
+    retries=0,
+    faiss_index_path=None,
+    faiss_index=None,
+    query_vectors=None,
+) -> List[Tuple[List[int], Dict[str, Any]]]:
+    """:func:`retrieve` for many questions, sharing the work across the batch.
+
+    The questions are embedded in one batched call (cache misses only), the ANN
+    index is searched once with the whole query matrix (or, on the linear path,
+    dense scores come from one ``Q @ vecs_n.T`` matrix product per block of
+    questions), and BM25 is scored for all questions over shared postings
+    (:func:`~clockify_rag.indexing.bm25_sparse_scores_batch`). Hybrid scoring,
+    intent boosting and dedup then run per question exactly as in ``retrieve``.
+
+    Results are in question order and have the same shape as ``retrieve``'s.
+    BM25 scores are identical to single-query scoring; dense scores come from a
+    matrix product rather than per-query matrix-vector products, so they can
+    differ from ``retrieve``'s in the last float32 bits.
+
+    ``query_vectors`` is an optional ``(len(questions), dim)`` matrix of
+    normalized embeddings computed by the caller. Any invalid question raises
+    :class:`ValidationError` before work starts.
+    """
+    plans = [_plan_query(question) for question in questions]
+    top_k = _effective_top_k(top_k)
+    if not plans:
+        return []
+
+    if query_vectors is None:
+        query_vectors = embed_queries([plan.question for plan in plans], retries=retries)
+    Q = np.asarray(query_vectors, dtype="float32")
+    faiss_index = _resolve_faiss_index(faiss_index, faiss_index_path, Q.shape[1])
+    n_chunks = len(chunks)
+    n_queries = len(plans)
+
+    ann_rows = None
+    dense_rows: List[np.ndarray] = []  # linear path only, filled block by block in question order
+    dot_elapsed = [0.0] * n_queries
+    if faiss_index:
+        with span("ann_search", backend="faiss", queries=n_queries):
+            distances, indices = faiss_index.search(Q, _ann_candidate_count(top_k))
+    elif hnsw:
+        with span("ann_search", backend="hnsw", queries=n_queries):
+            _, ann_rows = hnsw.knn_query(Q, k=_ann_candidate_count(top_k))
+    else:
+        block = max(1, _BATCH_DENSE_BLOCK // max(n_chunks, 1))
+        with span("dense_scores", rows=n_chunks, queries=n_queries):
+            for lo in range(0, n_queries, block):
+                dot_start = time.perf_counter()
+                scores_block = Q[lo : lo + block] @ vecs_n.T
+                per_query = (time.perf_counter() - dot_start) / scores_block.shape[0]
+                dense_rows.extend(scores_block)
+                dot_elapsed[lo : lo + block] = [per_query] * scores_block.shape[0]
+
+    with span("bm25_scores", queries=n_queries):
+        bm_results = bm25_sparse_scores_batch([plan.expanded for plan in plans], bm, top_k=top_k * 3)
+
+    results = []
+    profile_data: Dict[str, Any] = {}
+    for i, plan in enumerate(plans):
+        qv_n = Q[i]
+        dense_full = None
+        if faiss_index:
+            candidate_idx, dense_scores = _faiss_candidates(indices[i], distances[i], n_chunks)
+        elif ann_rows is not None:
+            candidate_idx = ann_rows[i].tolist()
+            dot_start = time.perf_counter()
+            dense_scores = _hnsw_candidate_scores(candidate_idx, vecs_n, qv_n)
+            dot_elapsed[i] = time.perf_counter() - dot_start
+        else:
+            dense_scores = dense_full = dense_rows[i]
+            candidate_idx = np.arange(n_chunks).tolist()
+        filtered, scores, profile_data = _rank_query(
+            plan,
+            chunks,
+            vecs_n,
+            bm,
+            qv_n,
+            top_k,
+            used_faiss=bool(faiss_index),
+            used_hnsw=ann_rows is not None,
+            candidate_idx=candidate_idx,
+            dense_scores=dense_scores,
+            dense_scores_full=dense_full,
+            dense_computed=len(candidate_idx),
+            dot_elapsed=dot_elapsed[i],
+            bm_sparse=bm_results[i],
+        )
+        results.append((filtered, scores))
+
+    _record_profile(profile_data)
+    current_span().set(queries=n_queries, used_faiss=bool(faiss_index), used_hnsw=ann_rows is not None)
+    return results
+
+
+@traced("rerank")
 def rerank_with_llm(
     question: str,
     chunks,
@@ -925,111 +1283,148 @@ def rerank_with_llm(
     if len(selected) <= 1:
         return selected, {}, False, "disabled"
 
-    cache_key = None
-    if _rerank_cache_enabled():
-        cache_key = _make_rerank_cache_key(question, selected, chunks)
-        cached = _rerank_cache_get(cache_key, selected, chunks)
-        if cached:
-            order, scores = cached
-            return order, scores, True, "cache"
+    cache_key, cached = _rerank_cache_lookup(question, selected, chunks)
+    if cached:
+        order, scores = cached
+        return order, scores, True, "cache"
+
+    from .api_client import chat_completion
+
+    try:
+        with llm_priority(PRIORITY_BACKGROUND):
+            response = chat_completion(
+                **_rerank_request(question, chunks, selected, seed, num_ctx, num_predict),
+                retries=config.DEFAULT_RETRIES if retries is None else retries,
+            )
+        return _rerank_from_response(response, chunks, selected, cache_key)
+    except Exception as e:
+        return _rerank_fallback(e, selected)
+
+
+def _rerank_cache_lookup(question: str, selected: List[int], chunks) -> Tuple[Optional[str], Optional[Tuple]]:
+    """Return ``(cache_key, cached)``; both None when the rerank cache is disabled."""
+    if not _rerank_cache_enabled():
+        return None, None
+    cache_key = _make_rerank_cache_key(question, selected, chunks)
+    return cache_key, _rerank_cache_get(cache_key, selected, chunks)
 
-    # Build passage list
+
+def _rerank_request(question: str, chunks, selected, seed, num_ctx, num_predict) -> Dict[str, Any]:
+    """Chat completion kwargs (messages, model, options, timeout) for one rerank call."""
     passages_text = "\n\n".join(
         [f"[id={chunks[i]['id']}]\n{chunks[i]['text'][:config.RERANK_SNIPPET_MAX_CHARS]}" for i in selected]
     )
-    if seed is None:
-        seed = config.DEFAULT_SEED
-    if num_ctx is None:
-        num_ctx = config.DEFAULT_NUM_CTX
-    if num_predict is None:
-        num_predict = config.DEFAULT_NUM_PREDICT
-    if retries is None:
-        retries = config.DEFAULT_RETRIES
-
-    from .api_client import chat_completion
-
     messages: List[ChatMessage] = [
         {"role": "user", "content": RERANK_PROMPT.format(q=question, passages=passages_text)}
     ]
-
     options: ChatCompletionOptions = {
         "temperature": 0,
-        "seed": seed,
-        "num_ctx": num_ctx,
-        "num_predict": num_predict,
+        "seed": config.DEFAULT_SEED if seed is None else seed,
+        "num_ctx": config.DEFAULT_NUM_CTX if num_ctx is None else num_ctx,
+        "num_predict": config.DEFAULT_NUM_PREDICT if num_predict is None else num_predict,
         "top_p": 0.9,
         "top_k": 40,
         "repeat_penalty": 1.05,
     }
+    return {
+        "messages": messages,
+        "model": getattr(config, "RERANK_MODEL", "") or config.RAG_CHAT_MODEL,
+        "options": options,
+        "timeout": (config.CHAT_CONNECT_T, config.RERANK_READ_T),
+    }
 
-    rerank_scores: Dict[int, float] = {}
-    rerank_model = getattr(config, "RERANK_MODEL", "") or config.RAG_CHAT_MODEL
 
-    try:
-        response = chat_completion(
-            messages=messages,
-            model=rerank_model,
-            options=options,
-            timeout=(config.CHAT_CONNECT_T, config.RERANK_READ_T),
-            retries=retries,
-        )
-        resp = response
-        msg = (resp.get("message") or {}).get("content", "").strip()
+def _rerank_from_response(response, chunks, selected, cache_key: Optional[str]) -> Tuple:
+    """Turn the model's ranked JSON array into (order, scores, rerank_applied, rerank_reason)."""
+    rerank_scores: Dict[int, float] = {}
+    msg = (response.get("message") or {}).get("content", "").strip()
 
-        if not msg:
-            logger.debug("info: rerank=fallback reason=empty")
-            return selected, rerank_scores, False, "empty"
+    if not msg:
+        logger.debug("info: rerank=fallback reason=empty")
+        return selected, rerank_scores, False, "empty"
 
-        # Try to parse strict JSON array
-        try:
-            ranked = json.loads(msg)
-            if not isinstance(ranked, list):
-                logger.debug("info: rerank=fallback reason=json")
-                return selected, rerank_scores, False, "json"
-
-            # Map back to indices
-            cid_to_idx = {chunks[i]["id"]: i for i in selected}
-            reranked = []
-            for entry in ranked:
-                idx = cid_to_idx.get(entry.get("id"))
-                if idx is not None:
-                    score = entry.get("score", 0)
-                    rerank_scores[idx] = score
-                    reranked.append((idx, score))
-
-            if reranked:
-                reranked.sort(key=lambda x: x[1], reverse=True)
-                if cache_key:
-                    order_ids = [str(chunks[idx]["id"]) for idx, _ in reranked]
-                    scores_by_id = {str(chunks[idx]["id"]): float(score) for idx, score in rerank_scores.items()}
-                    _rerank_cache_put(cache_key, order_ids, scores_by_id)
-                return [idx for idx, _ in reranked], rerank_scores, True, ""
-            else:
-                logger.debug("info: rerank=fallback reason=empty")
-                return selected, rerank_scores, False, "empty"
-        except json.JSONDecodeError:
-            logger.debug("info: rerank=fallback reason=json")
-            return selected, rerank_scores, False, "json"
-    except LLMError as e:
+    # Try to parse strict JSON array
+    try:
+        ranked = json.loads(msg)
+    except json.JSONDecodeError:
+        logger.debug("info: rerank=fallback reason=json")
+        return selected, rerank_scores, False, "json"
+    if not isinstance(ranked, list):
+        logger.debug("info: rerank=fallback reason=json")
+        return selected, rerank_scores, False, "json"
+
+    # Map back to indices
+    cid_to_idx = {chunks[i]["id"]: i for i in selected}
+    reranked = []
+    for entry in ranked:
+        idx = cid_to_idx.get(entry.get("id"))
+        if idx is not None:
+            score = entry.get("score", 0)
+            rerank_scores[idx] = score
+            reranked.append((idx, score))
+
+    if not reranked:
+        logger.debug("info: rerank=fallback reason=empty")
+        return selected, rerank_scores, False, "empty"
+
+    reranked.sort(key=lambda x: x[1], reverse=True)
+    if cache_key:
+        order_ids = [str(chunks[idx]["id"]) for idx, _ in reranked]
+        scores_by_id = {str(chunks[idx]["id"]): float(score) for idx, score in rerank_scores.items()}
+        _rerank_cache_put(cache_key, order_ids, scores_by_id)
+    return [idx for idx, _ in reranked], rerank_scores, True, ""
+
+
+def _rerank_fallback(e: Exception, selected) -> Tuple:
+    """Keep the MMR order when the rerank call or its parsing fails."""
+    if isinstance(e, LLMError):
         # Handle LLM-specific errors from the API client
         error_type = type(e).__name__
         if "timeout" in str(e).lower():
             logger.debug("info: rerank=fallback reason=timeout")
-            return selected, rerank_scores, False, "timeout"
+            return selected, {}, False, "timeout"
         elif "connection" in str(e).lower():
             logger.debug("info: rerank=fallback reason=conn")
-            return selected, rerank_scores, False, "conn"
+            return selected, {}, False, "conn"
         else:
             logger.debug(f"info: rerank=fallback reason=http error_type={error_type}")
-            return selected, rerank_scores, False, "http"
-    except (json.JSONDecodeError, KeyError, IndexError) as e:
+            return selected, {}, False, "http"
+    if isinstance(e, (json.JSONDecodeError, KeyError, IndexError)):
         # FIX (Error #8): More specific exception handling for expected errors
         logger.debug(f"info: rerank=fallback reason=error error_type={type(e).__name__}")
-        return selected, rerank_scores, False, "error"
+        return selected, {}, False, "error"
+    # FIX (Error #8): Unexpected errors logged at WARNING level for visibility
+    logger.warning(f"Unexpected error in reranking: {type(e).__name__}: {e}", exc_info=e)
+    return selected, {}, False, "unexpected"
+
+
+@traced("rerank")
+def rerank_with_cross_encoder(question: str, chunks, selected) -> Tuple:
+    """Rerank MMR-selected passages with the local cross-encoder (``RERANK_BACKEND=cross_encoder``).
+
+    Only the first ``RERANK_CE_MAX_CANDIDATES`` passages are scored, in one batched
+    ``predict`` (previously seen pairs come from the score cache); the rest keep
+    their MMR order after them.
+
+    Returns: (order, scores, rerank_applied, rerank_reason)
+    """
+    if len(selected) <= 1:
+        return selected, {}, False, "disabled"
+
+    head = list(selected[: config.RERANK_CE_MAX_CANDIDATES])
+    tail = list(selected[config.RERANK_CE_MAX_CANDIDATES :])
+    current_span().set(backend="cross_encoder", candidates=len(head))
+    try:
+        scores = cross_encoder_scores(question, [chunks[i] for i in head])
+    except ImportError as e:
+        logger.warning("Cross-encoder rerank unavailable (%s); keeping MMR order", e)
+        return selected, {}, False, "unavailable"
     except Exception as e:
-        # FIX (Error #8): Unexpected errors logged at WARNING level for visibility
-        logger.warning(f"Unexpected error in reranking: {type(e).__name__}: {e}", exc_info=True)
-        return selected, rerank_scores, False, "unexpected"
+        return _rerank_fallback(e, selected)
+
+    order = [head[j] for j in np.argsort(-scores, kind="stable")]
+    rerank_scores = {idx: float(score) for idx, score in zip(head, scores)}
+    return order + tail, rerank_scores, True, ""
 
 
 def _fmt_snippet_header(chunk):
@@ -1040,20 +1435,6 @@ def _fmt_snippet_header(chunk):
     return hdr
 
 
-def _article_key(chunk: Dict[str, Any]) -> str:
-    """Return a stable article identifier for grouping chunks."""
-    meta = chunk.get("metadata", {}) or {}
-    for key in ("url", "source_url", "doc_url"):
-        val = chunk.get(key) or meta.get(key)
-        if val:
-            return str(val)
-    if chunk.get("article_id"):
-        return f"article:{chunk['article_id']}"
-    if meta.get("article_id"):
-        return f"article:{meta['article_id']}"
-    return str(chunk.get("doc_name") or chunk.get("id"))
-
-
 def _sort_article_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Sort chunks from the same article by structural position."""
 
@@ -1072,6 +1453,7 @@ def _sort_article_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         return chunks
 
 
+@traced("pack_snippets")
 def pack_snippets(
     chunks,
     order,
@@ -1099,8 +1481,13 @@ def pack_snippets(
     if effective_budget <= 0:
         return "", [], 0, []
 
+    # Token accounting is additive (see token_counting): blocks grow by each chunk's
+    # precomputed units instead of being recounted from scratch per chunk
+    counter = get_token_counter()
     sep_text = "\n\n---\n\n"
-    sep_tokens = count_tokens(sep_text)
+    sep_units = counter.units(sep_text)
+    sep_tokens = counter.to_tokens(sep_units)
+    joiner_units = counter.units("\n\n")
 
     # Group chunks by article key in retrieval order
     article_order: List[str] = []
@@ -1150,23 +1537,22 @@ def pack_snippets(
 
         body_parts: List[str] = []
         included_ids: List[Any] = []
-        body_text = ""
+        block_units = counter.units(article_header)
         for chunk in chunks_for_article:
-            addition = ("" if not body_parts else "\n\n") + chunk["text"]
-            candidate_body = body_text + addition
-            candidate_tokens = count_tokens(article_header + candidate_body)
-            if candidate_tokens <= available_tokens:
+            join_units = joiner_units if body_parts else 0
+            candidate_units = block_units + join_units + counter.chunk_units(chunk)
+            if counter.to_tokens(candidate_units) <= available_tokens:
                 body_parts.append(chunk["text"])
                 included_ids.append(chunk["id"])
-                body_text = candidate_body
+                block_units = candidate_units
                 continue
 
-            remaining_for_body = available_tokens - count_tokens(article_header + body_text)
-            truncated = truncate_to_token_budget(chunk["text"], max(0, remaining_for_body))
+            remaining_for_body = available_tokens - counter.to_tokens(block_units)
+            truncated = counter.truncate(chunk["text"], max(0, remaining_for_body))
             if truncated:
                 body_parts.append(truncated)
                 included_ids.append(chunk["id"])
-                body_text = (body_text + ("\n\n" if body_text else "") + truncated) if truncated else body_text
+                block_units += join_units + counter.units(truncated)
             break
 
         if not body_parts:
@@ -1174,7 +1560,7 @@ def pack_snippets(
 
         article_body = "\n\n".join(body_parts)
         block_text = article_header + article_body
-        block_tokens = count_tokens(block_text)
+        block_tokens = counter.to_tokens(block_units)
         needed_tokens = sep_cost + block_tokens
         if used_tokens + needed_tokens > effective_budget:
             break
@@ -1187,6 +1573,7 @@ def pack_snippets(
                 "text": article_body,
                 "chunk_ids": included_ids,
                 "text_block": block_text,
+                "units": block_units,
             }
         )
         used_tokens += needed_tokens
@@ -1203,9 +1590,12 @@ def pack_snippets(
     out_pieces: List[str] = []
     packed_ids: List[Any] = []
     article_blocks: List[Dict[str, Any]] = []
+    packed_units = 0
     for blk in selected_blocks:
         if out_pieces:
             out_pieces.append(sep_text)
+            packed_units += sep_units
+        packed_units += blk["units"]
         out_pieces.append(blk["text_block"])
         packed_ids.extend(blk["chunk_ids"])
         article_blocks.append(
@@ -1219,7 +1609,7 @@ def pack_snippets(
         )
 
     packed_text = "".join(out_pieces)
-    used_tokens = count_tokens(packed_text)
+    used_tokens = counter.to_tokens(packed_units) if selected_blocks else count_tokens(packed_text)
 
     return packed_text, packed_ids, used_tokens, article_blocks
 
@@ -1260,41 +1650,22 @@ def coverage_ok(selected, dense_scores, threshold):
     return highs >= 2
 
 
-def ask_llm(
+@traced("prompt_build")
+def _llm_request(
     question: str,
     snippets_block: str,
-    seed: Optional[int] = None,
-    num_ctx: Optional[int] = None,
-    num_predict: Optional[int] = None,
-    retries: Optional[int] = None,
-    chunks: Optional[List[Dict[str, Any]]] = None,
-) -> str:
-    """Call Ollama chat with Qwen using production-grade prompts.
-
-    Returns plain text answer (not JSON). Confidence is computed separately
-    from retrieval scores, not from LLM output.
-
-    Args:
-        question: User question
-        snippets_block: Legacy formatted context string (used if chunks not provided)
-        seed, num_ctx, num_predict, retries: LLM parameters
-        chunks: Optional list of chunk dicts for new prompt format.
-                If provided, uses QWEN_SYSTEM_PROMPT and build_rag_user_prompt().
-                If None, falls back to legacy prompts (for backward compatibility).
-
-    Returns:
-        Plain text answer from LLM
-    """
+    seed: Optional[int],
+    num_ctx: Optional[int],
+    num_predict: Optional[int],
+    chunks: Optional[List[Dict[str, Any]]],
+) -> Tuple[List[ChatMessage], ChatCompletionOptions]:
+    """Build the chat messages and options shared by :func:`ask_llm` and :func:`ask_llm_stream`."""
     if seed is None:
         seed = config.DEFAULT_SEED
     if num_ctx is None:
         num_ctx = config.DEFAULT_NUM_CTX
     if num_predict is None:
         num_predict = config.DEFAULT_NUM_PREDICT
-    if retries is None:
-        retries = config.DEFAULT_RETRIES
-
-    from .api_client import chat_completion
 
     # Use new prompts if chunks provided, otherwise fall back to legacy
     if chunks is not None:
@@ -1320,21 +1691,87 @@ def ask_llm(
         "top_k": 40,
         "repeat_penalty": 1.05,
     }
+    return messages, options
+
+
+def ask_llm(
+    question: str,
+    snippets_block: str,
+    seed: Optional[int] = None,
+    num_ctx: Optional[int] = None,
+    num_predict: Optional[int] = None,
+    retries: Optional[int] = None,
+    chunks: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Call Ollama chat with Qwen using production-grade prompts.
+
+    Returns plain text answer (not JSON). Confidence is computed separately
+    from retrieval scores, not from LLM output.
+
+    Args:
+        question: User question
+        snippets_block: Legacy formatted context string (used if chunks not provided)
+        seed, num_ctx, num_predict, retries: LLM parameters
+        chunks: Optional list of chunk dicts for new prompt format.
+                If provided, uses QWEN_SYSTEM_PROMPT and build_rag_user_prompt().
+                If None, falls back to legacy prompts (for backward compatibility).
+
+    Returns:
+        Plain text answer from LLM
+    """
+    if retries is None:
+        retries = config.DEFAULT_RETRIES
+
+    from .api_client import chat_completion
+
+    messages, options = _llm_request(question, snippets_block, seed, num_ctx, num_predict, chunks)
 
     try:
-        response = chat_completion(
+        with span("llm_http", model=config.RAG_CHAT_MODEL):
+            response = chat_completion(
+                messages=messages,
+                model=config.RAG_CHAT_MODEL,
+                options=options,
+                timeout=(config.CHAT_CONNECT_T, config.CHAT_READ_T),
+                retries=retries,
+            )
+        msg = (response.get("message") or {}).get("content")
+        if msg:
+            return msg
+        return str(response.get("response", ""))
+    except LLMError:
+        # Re-raise LLMError as is
+        raise
+    except Exception as e:
+        raise LLMError(f"LLM call failed: {e} [hint: check RAG_OLLAMA_URL or increase CHAT timeouts]") from e
+
+
+def ask_llm_stream(
+    question: str,
+    snippets_block: str,
+    seed: Optional[int] = None,
+    num_ctx: Optional[int] = None,
+    num_predict: Optional[int] = None,
+    retries: Optional[int] = None,
+    chunks: Optional[List[Dict[str, Any]]] = None,
+) -> Iterator[str]:
+    """Streaming variant of :func:`ask_llm`: yields the raw LLM output in pieces as generated."""
+    if retries is None:
+        retries = config.DEFAULT_RETRIES
+
+    from .api_client import chat_completion_stream
+
+    messages, options = _llm_request(question, snippets_block, seed, num_ctx, num_predict, chunks)
+
+    try:
+        yield from chat_completion_stream(
             messages=messages,
             model=config.RAG_CHAT_MODEL,
             options=options,
             timeout=(config.CHAT_CONNECT_T, config.CHAT_READ_T),
             retries=retries,
         )
-        msg = (response.get("message") or {}).get("content")
-        if msg:
-            return msg
-        return str(response.get("response", ""))
     except LLMError:
-        # Re-raise LLMError as is
         raise
     except Exception as e:
         raise LLMError(f"LLM call failed: {e} [hint: check RAG_OLLAMA_URL or increase CHAT timeouts]") from e
@@ -1396,15 +1833,20 @@ def __getattr__(name: str) -> str:
 
 __all__ = [
     "expand_query",
+    "QueryExpansionMatcher",
+    "get_query_expansion_matcher",
     "embed_query",
     "normalize_scores_zscore",
     "DenseScoreStore",
+    "SparseScores",
     "retrieve",
     "rerank_with_llm",
+    "rerank_with_cross_encoder",
     "pack_snippets",
     "derive_role_security_hints",
     "coverage_ok",
     "ask_llm",
+    "ask_llm_stream",
     "tokenize",
     "count_tokens",
     "truncate_to_token_budget",
@@ -5,7 +5,7 @@ from __future__ import annotations
 import json
 import logging
 import os
-from typing import Tuple
+from typing import Optional
 
 from . import config
 from .answer import answer_once
@@ -13,7 +13,8 @@ from .api_client import get_llm_client
 from .caching import get_query_cache
 from .error_handlers import log_and_raise
 from .exceptions import IndexLoadError
-from .indexing import build, load_index
+from .generations import IndexSnapshot, active_files
+from .indexing import bm25_artifact_exists, build, load_index
 from .precomputed_cache import get_precomputed_cache
 from .utils import _log_config_summary, resolve_corpus_path
 
@@ -52,22 +53,29 @@ def _extract_source_urls(chunks: list, result: dict) -> list[str]:
     return sorted(urls)
 
 
-def ensure_index_ready(retries: int = 0) -> Tuple:
-    """Ensure retrieval artifacts are present and return loaded index components."""
+def ensure_index_ready(retries: int = 0, mmap: Optional[bool] = None) -> IndexSnapshot:
+    """Ensure retrieval artifacts are present and return the loaded index.
+
+    ``mmap`` is forwarded to :func:`load_index` (default: ``config.EMB_MMAP``).
+    The returned :class:`IndexSnapshot` unpacks as ``(chunks, vecs_n, bm, hnsw)``.
+    """
     kb_path, kb_exists, candidates = resolve_corpus_path()
 
     artifacts_ok = True
     missing_files = []
+    files = active_files()
     for fname in [
-        config.FILES["chunks"],
-        config.FILES["emb"],
-        config.FILES["meta"],
-        config.FILES["bm25"],
-        config.FILES["index_meta"],
+        files["chunks"],
+        files["emb"],
+        files["meta"],
+        files["index_meta"],
     ]:
         if not os.path.exists(fname):
             artifacts_ok = False
             missing_files.append(fname)
+    if not bm25_artifact_exists(files):
+        artifacts_ok = False
+        missing_files.append(files["bm25_index"])
 
     if not artifacts_ok:
         logger.info(
@@ -91,14 +99,14 @@ def ensure_index_ready(retries: int = 0) -> Tuple:
                 f"provide a valid knowledge base file to build the index (looked for: {', '.join(candidates)})",
             )
 
-    result = load_index(kb_path)
+    result = load_index(kb_path, mmap=mmap)
     if isinstance(result, dict) and (result.get("meta") or {}).get("_stale"):
         if config.AUTO_REBUILD_ON_STALE:
             logger.info("[rebuild] index stale; rebuilding because AUTO_REBUILD_ON_STALE=1")
             if kb_exists:
                 try:
                     build(kb_path, retries=retries)
-                    result = load_index(kb_path)
+                    result = load_index(kb_path, mmap=mmap)
                 except Exception as exc:
                     log_and_raise(
                         IndexLoadError,
@@ -118,7 +126,7 @@ def ensure_index_ready(retries: int = 0) -> Tuple:
         if kb_exists:
             try:
                 build(kb_path, retries=retries)
-                result = load_index()
+                result = load_index(mmap=mmap)
             except Exception as exc:
                 log_and_raise(
                     IndexLoadError,
@@ -139,21 +147,14 @@ def ensure_index_ready(retries: int = 0) -> Tuple:
             "the index may be corrupted; try deleting index files and rebuilding",
         )
 
-    if isinstance(result, dict):
-        chunks = result["chunks"]
-        vecs_n = result["vecs_n"]
-        bm = result["bm"]
-        hnsw = result.get("hnsw")
-    elif isinstance(result, tuple):
-        chunks, vecs_n, bm, hnsw = result
-    else:
+    if not isinstance(result, (dict, tuple)):
         log_and_raise(
             TypeError,
             f"load_index() must return dict or tuple, got {type(result)}",
             "contact support - this indicates a system error",
         )
 
-    return chunks, vecs_n, bm, hnsw
+    return IndexSnapshot.from_result(result)
 
 
 def chat_repl(
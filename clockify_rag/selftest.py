@@ -7,6 +7,7 @@ import sys
 
 from . import config
 from .api_client import get_llm_client
+from .generations import active_files
 from .runtime import ensure_index_ready
 
 
@@ -49,12 +50,13 @@ def run_selftest() -> bool:
                 print(msg)
 
     index_ok = True
+    files = active_files()
     index_files = [
-        config.FILES["chunks"],
-        config.FILES["bm25"],
-        config.FILES["index_meta"],
+        files["chunks"],
+        files["bm25_index"],
+        files["index_meta"],
     ]
-    ann_path = config.FILES.get("faiss_index") if config.USE_ANN == "faiss" else None
+    ann_path = files.get("faiss_index") if config.USE_ANN == "faiss" else None
     if ann_path:
         index_files.append(ann_path)
 
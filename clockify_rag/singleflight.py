@@ -0,0 +1,123 @@
+"""Single-flight coalescing of identical concurrent requests.
+
+When a burst of users asks the same question at once, only the first caller
+(the leader) runs the pipeline; everyone else waits for the leader's result
+instead of issuing their own retrieval, rerank and LLM calls. Entries live only
+while the work is in flight, so this is not a cache: a request that arrives
+after the leader finished starts a new flight.
+
+Both blocking callers (thread pools) and asyncio callers are supported:
+
+    flight = SingleFlight("api_query")
+    result, shared = flight.do(key, lambda: answer_once(...))
+    result, shared = await flight.do_async(key, lambda: async_answer_once(...))
+
+Followers receive a shallow copy of the leader's result, so one caller adding or
+replacing top-level fields (e.g. per-request metadata) does not leak into the
+others; nested objects are still shared and must be treated as read-only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Coroutine, Dict, Hashable, Tuple
+
+from .metrics import MetricNames, get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(question: str, **params: Any) -> Tuple:
+    """Build a coalescing key from the normalised question and request parameters."""
+    normalized = " ".join(question.lower().split())
+    return (normalized, tuple(sorted(params.items())))
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key into one execution."""
+
+    def __init__(self, name: str):
+        """Initialize the group.
+
+        Args:
+            name: Label used for the ``coalesced_requests`` metric
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def _record_coalesced(self, key: Hashable) -> None:
+        get_metrics().increment_counter(MetricNames.COALESCED_REQUESTS, labels={"path": self.name})
+        logger.debug(
+            "[singleflight] %s joined in-flight request %r",
+            self.name,
+            key[0] if isinstance(key, tuple) and key else key,
+        )
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key among concurrent blocking callers.
+
+        Returns:
+            (result, shared) where ``shared`` is True for callers that waited on
+            another caller's execution (they get a shallow copy of the result).
+            Exceptions propagate to every caller.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            self._record_coalesced(key)
+            return copy.copy(future.result()), True
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def do_async(self, key: Hashable, factory: Callable[[], Coroutine[Any, Any, Any]]) -> Tuple[Any, bool]:
+        """Await ``factory()`` once per key among concurrent coroutines on the same loop.
+
+        The shared work runs as a task and each caller awaits it through
+        ``asyncio.shield``, so a cancelled caller does not cancel the others.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None or task.get_loop() is not loop
+            if task is None or leader:
+                task = self._tasks[key] = loop.create_task(factory())
+                task.add_done_callback(partial(self._forget_task, key))
+
+        if leader:
+            return await asyncio.shield(task), False
+        self._record_coalesced(key)
+        return copy.copy(await asyncio.shield(task)), True
+
+    def _forget_task(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+
+__all__ = ["SingleFlight", "request_key"]
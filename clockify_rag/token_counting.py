@@ -0,0 +1,222 @@
+"""Token accounting for context packing.
+
+Counting is done in additive *units*: the units of a concatenation are the sum
+of the units of its parts, and ``to_tokens`` converts a unit total into a token
+count. This lets ``pack_snippets`` grow an article block by adding each chunk's
+units rather than recounting the whole block, and lets truncation find the
+longest prefix that fits from a prefix sum:
+
+    counter = get_token_counter()
+    units = counter.chunk_units(chunk)          # precomputed at build time
+    counter.to_tokens(header_units + units)     # == counter.count(header + text)
+    counter.truncate(text, budget=200)
+
+Backends:
+
+- ``heuristic:qwen`` -- CJK ~1.5 chars/token, everything else ~3.5 chars/token.
+  Units are exact, so packed totals match a full recount.
+- ``heuristic:chars`` -- ~4 chars/token for models without a better estimate.
+- ``tiktoken:<encoding>`` -- real BPE counts for GPT models.
+- ``hf:<path>`` -- a local Hugging Face ``tokenizer.json`` (``TOKENIZER_PATH``;
+  needs the ``tokenizers`` package).
+
+With the real tokenizers units are token counts, and tokens may merge across
+a join, so a sum of parts is a close estimate of the joined count. Their
+encodings are LRU-cached (``TOKENIZER_CACHE_SIZE``).
+
+``annotate_token_counts`` stores each chunk's units in ``chunks.jsonl`` under
+``"tokens"``, tagged with the counter's key so a different counter re-measures.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r"[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uac00-\ud7af]")
+_CJK_RANGES = ((0x4E00, 0x9FFF), (0x3040, 0x309F), (0x30A0, 0x30FF), (0xAC00, 0xD7AF))
+ELLIPSIS = "..."
+
+_COUNTERS: Dict[Tuple[str, str], "TokenCounter"] = {}
+_COUNTERS_LOCK = threading.Lock()
+
+
+class TokenCounter:
+    """Chars-per-token heuristic (~4 chars/token); base class for the other backends."""
+
+    key = "heuristic:chars"
+
+    def units(self, text: str) -> int:
+        """Additive size of ``text``."""
+        return len(text)
+
+    def to_tokens(self, units: int) -> int:
+        """Token count for a unit total."""
+        return max(1, units // 4)
+
+    def count(self, text: str) -> int:
+        return self.to_tokens(self.units(text))
+
+    def chunk_units(self, chunk: Dict[str, Any]) -> int:
+        """Units of ``chunk["text"]``, from the build-time annotation when it was made by this counter."""
+        stored = chunk.get("tokens")
+        if isinstance(stored, dict) and stored.get("counter") == self.key:
+            return int(stored["units"])
+        return self.units(chunk["text"])
+
+    def prefix_units(self, text: str) -> np.ndarray:
+        """``out[m]`` is the units of ``text[:m]`` (length ``len(text) + 1``)."""
+        return np.arange(len(text) + 1, dtype=np.int64)
+
+    def _max_units(self, budget: int) -> int:
+        """Largest unit total that still converts to at most ``budget`` tokens (-1 if none)."""
+        return budget * 4 + 3 if budget >= 1 else -1
+
+    def _prefix_len(self, text: str, budget: int) -> int:
+        """Length of the longest prefix of ``text`` that counts as at most ``budget`` tokens."""
+        fits = np.searchsorted(self.prefix_units(text), self._max_units(budget), side="right")
+        return max(0, int(fits) - 1)
+
+    def truncate(self, text: str, budget: int) -> str:
+        """Longest prefix within ``budget`` tokens, ending in an ellipsis when one fits."""
+        if self.count(text) <= budget:
+            return text
+        ellipsis_tokens = self.count(ELLIPSIS)
+        if budget < ellipsis_tokens:
+            return text[: self._prefix_len(text, budget)]
+        return text[: self._prefix_len(text, budget - ellipsis_tokens)] + ELLIPSIS
+
+
+class QwenHeuristicCounter(TokenCounter):
+    """Qwen estimate: CJK ~1.5 chars/token, other text ~3.5 chars/token, rounded up.
+
+    One CJK char is 14 units and any other char 6, so a token is 21 units.
+    """
+
+    key = "heuristic:qwen"
+
+    def units(self, text: str) -> int:
+        cjk = len(_CJK_RE.findall(text))
+        return 14 * cjk + 6 * (len(text) - cjk)
+
+    def to_tokens(self, units: int) -> int:
+        return math.ceil(units / 21)
+
+    def prefix_units(self, text: str) -> np.ndarray:
+        codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        cjk = np.zeros(codes.shape, dtype=bool)
+        for lo, hi in _CJK_RANGES:
+            cjk |= (codes >= lo) & (codes <= hi)
+        out = np.zeros(len(text) + 1, dtype=np.int64)
+        np.cumsum(np.where(cjk, 14, 6), out=out[1:])
+        return out
+
+    def _max_units(self, budget: int) -> int:
+        return budget * 21
+
+
+class _EncodingCounter(TokenCounter):
+    """Real tokenizer: units are tokens, encodings are LRU-cached by text."""
+
+    def __init__(self, cache_size: int):
+        self._token_ends = lru_cache(maxsize=cache_size)(self._encode) if cache_size > 0 else self._encode
+
+    def _encode(self, text: str) -> Tuple[int, ...]:
+        """End offset (in chars) of each token of ``text``."""
+        raise NotImplementedError
+
+    def units(self, text: str) -> int:
+        return len(self._token_ends(text)) if text else 0
+
+    def to_tokens(self, units: int) -> int:
+        return units
+
+    def _prefix_len(self, text: str, budget: int) -> int:
+        ends = self._token_ends(text) if text else ()
+        if budget >= len(ends):
+            return len(text)
+        return ends[budget - 1] if budget > 0 else 0
+
+
+class TiktokenCounter(_EncodingCounter):
+    def __init__(self, encoding, cache_size: int):
+        super().__init__(cache_size)
+        self.encoding = encoding
+        self.key = f"tiktoken:{encoding.name}"
+
+    def _encode(self, text: str) -> Tuple[int, ...]:
+        tokens = self.encoding.encode(text)
+        _, starts = self.encoding.decode_with_offsets(tokens)
+        return tuple(starts[1:]) + (len(text),) if tokens else ()
+
+
+class HFTokenizerCounter(_EncodingCounter):
+    def __init__(self, path: str, cache_size: int):
+        from tokenizers import Tokenizer
+
+        super().__init__(cache_size)
+        self.tokenizer = Tokenizer.from_file(path)
+        self.key = f"hf:{path}"
+
+    def _encode(self, text: str) -> Tuple[int, ...]:
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        return tuple(end for _start, end in offsets)
+
+
+def _build_counter(model_name: str, tokenizer_path: str) -> TokenCounter:
+    if tokenizer_path:
+        try:
+            return HFTokenizerCounter(tokenizer_path, config.TOKENIZER_CACHE_SIZE)
+        except Exception as e:  # ImportError without `tokenizers`, or an unreadable file
+            logger.warning("TOKENIZER_PATH=%s unusable (%s); using the token-count heuristic", tokenizer_path, e)
+    lowered = model_name.lower()
+    if "gpt" in lowered:
+        try:
+            import tiktoken
+
+            return TiktokenCounter(tiktoken.encoding_for_model(model_name), config.TOKENIZER_CACHE_SIZE)
+        except (ImportError, KeyError):
+            pass
+    if "qwen" in lowered:
+        return QwenHeuristicCounter()
+    return TokenCounter()
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Counter for ``model`` (default ``config.RAG_CHAT_MODEL``), built once per model and tokenizer path."""
+    model_name = model or config.RAG_CHAT_MODEL or ""
+    cache_key = (model_name, config.TOKENIZER_PATH)
+    counter = _COUNTERS.get(cache_key)
+    if counter is None:
+        with _COUNTERS_LOCK:
+            counter = _COUNTERS.get(cache_key)
+            if counter is None:
+                counter = _COUNTERS[cache_key] = _build_counter(model_name, config.TOKENIZER_PATH)
+    return counter
+
+
+def annotate_token_counts(chunks: Iterable[Dict[str, Any]], counter: Optional[TokenCounter] = None) -> None:
+    """Store each chunk's token units under ``chunk["tokens"]`` (build time)."""
+    counter = counter or get_token_counter()
+    for chunk in chunks:
+        chunk["tokens"] = {"counter": counter.key, "units": counter.units(chunk["text"])}
+
+
+__all__ = [
+    "TokenCounter",
+    "QwenHeuristicCounter",
+    "TiktokenCounter",
+    "HFTokenizerCounter",
+    "get_token_counter",
+    "annotate_token_counts",
+]
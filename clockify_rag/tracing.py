@@ -0,0 +1,298 @@
+"""Lightweight per-request tracing spans.
+
+Spans nest through a ContextVar and belong to the trace of the current
+correlation ID (``correlation.get_correlation_id``), so the stages of one
+request form a tree without passing anything around:
+
+    with span("bm25_scores", terms=3) as s:
+        ...
+        s.set(matched=len(ids))
+
+    @traced("pack_snippets")
+    def pack_snippets(...): ...
+
+Outside a request (no correlation ID) or with ``TRACING_ENABLED=0`` spans are
+no-ops. Finished spans are kept in a ring buffer of the last ``TRACE_BUFFER_SIZE``
+traces (``get_trace`` / ``/v1/debug/trace/{correlation_id}``). With
+``TRACE_EXPORT_PATH`` set, each trace is also appended to that file as one
+OTLP/JSON ``ExportTraceServiceRequest`` line once its last open span ends.
+
+Executors do not inherit the caller's context; wrap work handed to one with
+``propagate_context`` so its spans keep their parent.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from . import config
+from .correlation import get_correlation_id
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Span:
+    """One timed stage of a request."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": dict(self.attributes),
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        attributes = {"correlation_id": self.trace_id, **self.attributes}
+        return {
+            "traceId": otlp_trace_id(self.trace_id),
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def otlp_trace_id(correlation_id: str) -> str:
+    """32-hex OTLP trace id: the correlation ID itself when it already is one, else a hash of it."""
+    if _TRACE_ID_RE.match(correlation_id):
+        return correlation_id
+    return hashlib.sha256(correlation_id.encode("utf-8")).hexdigest()[:32]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class TraceBuffer:
+    """Finished spans of the most recent traces, plus the optional OTLP file export."""
+
+    def __init__(self, max_traces: int, export_path: str = ""):
+        self.max_traces = max_traces
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._open: Dict[str, int] = {}
+        self._unexported: Dict[str, List[Span]] = {}
+        self._export_lock = threading.Lock()
+
+    def started(self, span: Span) -> None:
+        with self._lock:
+            self._open[span.trace_id] = self._open.get(span.trace_id, 0) + 1
+
+    def finished(self, span: Span) -> None:
+        trace_id = span.trace_id
+        to_export = None
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+            if self.export_path:
+                self._unexported.setdefault(trace_id, []).append(span)
+            remaining = self._open.get(trace_id, 1) - 1
+            if remaining > 0:
+                self._open[trace_id] = remaining
+            else:
+                self._open.pop(trace_id, None)
+                to_export = self._unexported.pop(trace_id, None)
+        if to_export:
+            self._export(to_export)
+
+    def get(self, trace_id: str) -> Optional[List[Span]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def _export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "clockify-rag"}}]},
+                    "scopeSpans": [{"scope": {"name": "clockify_rag"}, "spans": [s.to_otlp() for s in spans]}],
+                }
+            ]
+        }
+        line = json.dumps(payload, separators=(",", ":"), default=str)
+        try:
+            with self._export_lock, open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("Trace export to %s failed: %s", self.export_path, e)
+
+
+_BUFFER: Optional[TraceBuffer] = None
+_BUFFER_LOCK = threading.Lock()
+
+
+def get_trace_buffer() -> TraceBuffer:
+    """Process-wide trace buffer, rebuilt if the buffer size or export path setting changes."""
+    global _BUFFER
+    buffer = _BUFFER
+    if buffer is None or (buffer.max_traces, buffer.export_path) != (
+        config.TRACE_BUFFER_SIZE,
+        config.TRACE_EXPORT_PATH,
+    ):
+        with _BUFFER_LOCK:
+            buffer = _BUFFER
+            if buffer is None or (buffer.max_traces, buffer.export_path) != (
+                config.TRACE_BUFFER_SIZE,
+                config.TRACE_EXPORT_PATH,
+            ):
+                buffer = _BUFFER = TraceBuffer(config.TRACE_BUFFER_SIZE, config.TRACE_EXPORT_PATH)
+    return buffer
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Union[Span, _NoopSpan]]:
+    """Time a stage as a child of the current span in the current correlation ID's trace."""
+    trace_id = get_correlation_id()
+    if trace_id is None or not config.TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    parent_id = parent.span_id if parent is not None and parent.trace_id == trace_id else None
+    current = Span(name, trace_id, parent_id, attributes)
+    buffer = get_trace_buffer()
+    buffer.started(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:  # exited in a different context (e.g. a generator closed elsewhere)
+            _current_span.set(parent)
+        buffer.finished(current)
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    """The innermost open span, for adding attributes (a no-op object outside a trace)."""
+    current = _current_span.get()
+    if current is None or current.trace_id != get_correlation_id():
+        return _NOOP_SPAN
+    return current
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator: run each call (sync or async) inside ``span(name)``."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def propagate_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind ``fn`` to a copy of the current context (correlation ID and open span) for an executor."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def span_tree(spans: List[Span]) -> List[Dict[str, Any]]:
+    """Nest span dicts under their parents (``children``), ordered by start time."""
+    nodes = {s.span_id: {**s.to_dict(), "children": []} for s in sorted(spans, key=lambda s: s.start_ns)}
+    roots: List[Dict[str, Any]] = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"]) if node["parent_id"] else None
+        (parent["children"] if parent is not None else roots).append(node)
+    return roots
+
+
+def get_trace(correlation_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Span tree of a recent request, or None if it is not in the buffer."""
+    spans = get_trace_buffer().get(correlation_id)
+    return span_tree(spans) if spans is not None else None
+
+
+__all__ = [
+    "Span",
+    "TraceBuffer",
+    "span",
+    "traced",
+    "current_span",
+    "propagate_context",
+    "span_tree",
+    "get_trace",
+    "get_trace_buffer",
+    "otlp_trace_id",
+]
@@ -8,6 +8,7 @@ import os
 import platform
 import pathlib
 import re
+import shutil
 import tempfile
 import time
 import unicodedata
@@ -558,6 +559,23 @@ def atomic_save_npy(arr: np.ndarray, path: str) -> None:
                 logger.debug("Failed to clean up temp file %s: %s", tmp, e)
 
 
+def atomic_replace_dir(src_dir: str, path: str) -> None:
+    """Swap a fully written directory into place at ``path``.
+
+    Directories cannot be replaced in one rename: the old one is moved aside
+    first and removed afterwards. Readers that already mapped files from the
+    old directory keep valid pages.
+    """
+    retired = None
+    if os.path.isdir(path):
+        retired = f"{path}.old.{os.getpid()}"
+        os.replace(path, retired)
+    os.replace(src_dir, path)
+    _fsync_dir(path)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
 # ====== LOGGING UTILITIES ======
 def log_event(event: str, **fields):
     """Log a structured JSON event. Fallback to plain format if JSON serialization fails."""
@@ -277,6 +277,7 @@ def evaluate(
     rag_available = False
     retrieval_chunks = chunks
     retrieval_fn = None
+    batch_retrieval_fn = None
     lexical_retriever = None
     vecs_n = None
     bm = None
@@ -288,7 +289,7 @@ def evaluate(
         print("Hybrid artifacts detected - requiring hybrid retrieval path...")
         try:
             # Priority #12: Use modular retrieval from clockify_rag package
-            from clockify_rag.retrieval import retrieve
+            from clockify_rag.retrieval import retrieve, retrieve_batch
             from clockify_rag.indexing import load_index
 
             print("Loading knowledge base index...")
@@ -306,15 +307,31 @@ def evaluate(
             else:
                 retrieval_chunks, vecs_n, bm, hnsw = result
 
-            retrieval_fn = lambda q: retrieve(
-                q,
-                retrieval_chunks,
-                vecs_n,
-                bm,
-                top_k=TOP_K,
-                hnsw=hnsw,
-                faiss_index_path=faiss_index_path,
-            )[0]
+            def retrieval_fn(q):
+                return retrieve(
+                    q,
+                    retrieval_chunks,
+                    vecs_n,
+                    bm,
+                    top_k=TOP_K,
+                    hnsw=hnsw,
+                    faiss_index_path=faiss_index_path,
+                )[0]
+
+            def batch_retrieval_fn(qs):
+                return [
+                    selected
+                    for selected, _scores in retrieve_batch(
+                        qs,
+                        retrieval_chunks,
+                        vecs_n,
+                        bm,
+                        top_k=TOP_K,
+                        hnsw=hnsw,
+                        faiss_index_path=faiss_index_path,
+                    )
+                ]
+
             rag_available = True
             retrieval_mode = f"Hybrid (FAISS={'enabled' if faiss_available else 'disabled'})"
             print(f"✅ Hybrid retrieval loaded successfully ({retrieval_mode})")
@@ -349,6 +366,16 @@ def evaluate(
 
     print(f"Loaded {len(dataset)} evaluation queries")
 
+    # Hybrid mode retrieves all queries in one batch (one embedding call, one ANN search);
+    # retrieval_fn covers any query the batch did not score
+    batched: dict = {}
+    if batch_retrieval_fn is not None:
+        queries = list(dict.fromkeys(example["query"] for example in dataset))
+        try:
+            batched = dict(zip(queries, batch_retrieval_fn(queries)))
+        except Exception as exc:
+            print(f"Warning: batched retrieval failed ({exc}); retrieving queries one at a time")
+
     # Compute metrics
     mrr_scores = []
     precision_at_5_scores = []
@@ -369,7 +396,10 @@ def evaluate(
 
         try:
             # Retrieve chunks using configured retrieval function
-            retrieved_ids = list(retrieval_fn(query)) if retrieval_fn else []
+            if query in batched:
+                retrieved_ids = list(batched[query])
+            else:
+                retrieved_ids = list(retrieval_fn(query)) if retrieval_fn else []
 
             # Compute metrics
             mrr = compute_mrr(retrieved_ids, relevant_ids)
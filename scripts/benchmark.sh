@@ -73,6 +73,7 @@ echo "" | tee -a "$LOG_FILE"
 # Clean old artifacts for fresh build
 echo "[Preparation] Cleaning old artifacts..." | tee -a "$LOG_FILE"
 rm -f chunks.jsonl vecs_n.npy meta.jsonl bm25.json faiss.index index.meta.json
+rm -rf bm25_index index_generations
 echo "  ✅ Artifacts cleaned" | tee -a "$LOG_FILE"
 echo "" | tee -a "$LOG_FILE"
 
@@ -89,17 +90,18 @@ echo "" | tee -a "$LOG_FILE"
 echo "  ⏱️  Build time: ${BUILD_TIME}s" | tee -a "$LOG_FILE"
 
 # Check artifacts
-if [ -f "chunks.jsonl" ] && [ -f "vecs_n.npy" ] && [ -f "meta.jsonl" ]; then
-    CHUNKS_COUNT=$(wc -l < chunks.jsonl)
-    CHUNKS_SIZE=$(du -h chunks.jsonl | cut -f1)
-    VECS_SIZE=$(du -h vecs_n.npy | cut -f1)
+INDEX_DIR=.; [ -f index_generations/CURRENT ] && INDEX_DIR="index_generations/$(cat index_generations/CURRENT)"
+if [ -f "$INDEX_DIR/chunks.jsonl" ] && [ -f "$INDEX_DIR/vecs_n.npy" ] && [ -f "$INDEX_DIR/meta.jsonl" ]; then
+    CHUNKS_COUNT=$(wc -l < "$INDEX_DIR/chunks.jsonl")
+    CHUNKS_SIZE=$(du -h "$INDEX_DIR/chunks.jsonl" | cut -f1)
+    VECS_SIZE=$(du -h "$INDEX_DIR/vecs_n.npy" | cut -f1)
 
     echo "  Artifacts:" | tee -a "$LOG_FILE"
     echo "    - chunks.jsonl: $CHUNKS_COUNT chunks ($CHUNKS_SIZE)" | tee -a "$LOG_FILE"
     echo "    - vecs_n.npy: $VECS_SIZE" | tee -a "$LOG_FILE"
 
-    if [ -f "faiss.index" ]; then
-        FAISS_SIZE=$(du -h faiss.index | cut -f1)
+    if [ -f "$INDEX_DIR/faiss.index" ]; then
+        FAISS_SIZE=$(du -h "$INDEX_DIR/faiss.index" | cut -f1)
         echo "    - faiss.index: $FAISS_SIZE" | tee -a "$LOG_FILE"
     else
         echo "    - faiss.index: not created (fallback mode)" | tee -a "$LOG_FILE"
@@ -14,7 +14,7 @@ REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(REPO_ROOT))
 
-from clockify_rag import config, build_bm25, compute_sha256
+from clockify_rag import config, build_bm25, compute_sha256, save_bm25_binary
 from clockify_rag.utils import resolve_corpus_path
 
 
@@ -57,13 +57,12 @@ def main() -> None:
 
     chunks_path = REPO_ROOT / config.FILES["chunks"]
     emb_path = REPO_ROOT / config.FILES["emb"]
-    bm25_path = REPO_ROOT / config.FILES["bm25"]
+    bm25_path = REPO_ROOT / config.FILES["bm25_index"]
     meta_path = REPO_ROOT / config.FILES["index_meta"]
 
     _write_jsonl(chunks_path, chunks)
     np.save(emb_path, vecs_n)
-    with bm25_path.open("w", encoding="utf-8") as handle:
-        json.dump(bm, handle)
+    save_bm25_binary(bm, str(bm25_path))
 
     kb_candidate, _, _ = resolve_corpus_path()
     kb_path = Path(kb_candidate)
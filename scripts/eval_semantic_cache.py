@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Measure the semantic answer cache's hit and false-hit rates per threshold.
+
+Every distinct question in the eval dataset is cached (its "answer" is the
+question itself), then each probe is looked up:
+
+- paraphrases (``same_intent: true``) should hit their own question;
+- hard negatives (``same_intent: false``) are near-misses such as "delete a
+  client" vs "delete a project" and must not hit anything;
+- each dataset question is also looked up against a cache of the *other*
+  questions (leave-one-out) and must not hit.
+
+A false hit is any lookup answered with another question's answer. Pick the
+lowest threshold whose false-hit rate is acceptable and set
+``SEMANTIC_CACHE_THRESHOLD`` to it.
+
+Usage:
+    python3 scripts/eval_semantic_cache.py
+
+    # Custom threshold sweep, JSON report
+    python3 scripts/eval_semantic_cache.py --thresholds 0.85,0.9,0.95 --output eval_reports/semantic_cache.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from clockify_rag.caching import SemanticAnswerCache
+from clockify_rag.retrieval import embed_query, normalize_query, validate_query_length, warm_query_embeddings
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = "0.80,0.85,0.88,0.90,0.92,0.94,0.95,0.96,0.98"
+
+
+def load_jsonl(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def evaluate(questions, probes, vectors, thresholds):
+    """Hit/false-hit rates per threshold.
+
+    Args:
+        questions: Distinct cached questions
+        probes: ``{"query", "paraphrase", "same_intent"}`` records
+        vectors: Text -> query vector for every question and paraphrase
+        thresholds: Cosine similarity thresholds to sweep
+
+    Returns:
+        One dict per threshold with paraphrase_hit_rate, false_hit_rate and the false hits
+    """
+    rows = []
+    for threshold in thresholds:
+
+        def build(cached):
+            cache = SemanticAnswerCache(maxsize=max(len(cached), 1), threshold=threshold)
+            for question in cached:
+                cache.put(question, vectors[question], question, {})
+            return cache
+
+        full = build(questions)
+        paraphrase_total = paraphrase_hits = lookups = 0
+        false_hits = []
+        for probe in probes:
+            lookups += 1
+            hit = full.get(vectors[probe["paraphrase"]])
+            matched = hit[0] if hit else None
+            if probe["same_intent"]:
+                paraphrase_total += 1
+                paraphrase_hits += matched == probe["query"]
+            if matched is not None and not (probe["same_intent"] and matched == probe["query"]):
+                false_hits.append({"probe": probe["paraphrase"], "served": matched, "similarity": round(hit[2], 4)})
+
+        for question in questions:
+            lookups += 1
+            hit = build([q for q in questions if q != question]).get(vectors[question])
+            if hit is not None:
+                false_hits.append({"probe": question, "served": hit[0], "similarity": round(hit[2], 4)})
+
+        rows.append(
+            {
+                "threshold": threshold,
+                "paraphrase_hit_rate": paraphrase_hits / paraphrase_total if paraphrase_total else 0.0,
+                "false_hit_rate": len(false_hits) / lookups if lookups else 0.0,
+                "lookups": lookups,
+                "false_hits": false_hits,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure semantic answer cache false hits on eval paraphrases")
+    parser.add_argument("--dataset", default="eval_datasets/clockify_v1.jsonl", help="Eval dataset (cached questions)")
+    parser.add_argument(
+        "--paraphrases",
+        default="eval_datasets/clockify_v1_paraphrases.jsonl",
+        help="Paraphrases and hard negatives of the dataset questions",
+    )
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="Comma-separated thresholds to sweep")
+    parser.add_argument("--output", help="Write the full report (including every false hit) as JSON")
+    args = parser.parse_args()
+
+    questions = list(dict.fromkeys(record["query"] for record in load_jsonl(args.dataset)))
+    probes = load_jsonl(args.paraphrases)
+    thresholds = sorted(float(t) for t in args.thresholds.split(",") if t.strip())
+
+    # Embed exactly as the API does (normalised text, query-embedding cache)
+    texts = list(dict.fromkeys(questions + [probe["paraphrase"] for probe in probes]))
+    logger.info("Embedding %d questions and paraphrases", len(texts))
+    warm_query_embeddings(texts)
+    vectors = {text: embed_query(validate_query_length(normalize_query(text))) for text in texts}
+
+    rows = evaluate(questions, probes, vectors, thresholds)
+
+    print(f"\n{'threshold':>9}  {'paraphrase hits':>15}  {'false hits':>10}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f}  {row['paraphrase_hit_rate']:>15.1%}  {row['false_hit_rate']:>10.1%}")
+    safe = [row for row in rows if not row["false_hits"]]
+    if safe:
+        print(f"\nLowest threshold with no false hits: {safe[0]['threshold']:.2f}")
+    else:
+        print("\nEvery threshold produced false hits; keep SEMANTIC_CACHE_SIZE=0")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"dataset": args.dataset, "paraphrases": args.paraphrases, "results": rows}, handle, indent=2)
+        logger.info("Report written to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Sequence, Set, Tuple
 
+from clockify_rag.generations import active_files
+
 # OPTIMIZATION (Analysis Section 10.3 #3): Import tokenize from utils to consolidate
 from clockify_rag.utils import tokenize
 
@@ -403,7 +405,7 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
     parser.add_argument(
         "--chunks",
         type=Path,
-        default=Path("chunks.jsonl"),
+        default=Path(active_files()["chunks"]),
         help="Path to the chunks JSONL file produced by the index build.",
     )
     parser.add_argument(
@@ -35,7 +35,8 @@ python3 -c "import numpy, requests, sentence_transformers; print('✅ Dependenci
 # Step 3: Build with local embeddings
 echo "[3/7] Building knowledge base with local embeddings..."
 EMB_BACKEND=local python3 -m clockify_rag.cli_modern ingest --input knowledge_helpcenter.md --force 2>&1 | tee -a "$LOG_FILE"
-if [ -f "chunks.jsonl" ] && [ -f "vecs_n.npy" ] && [ -f "meta.jsonl" ]; then
+INDEX_DIR=.; [ -f index_generations/CURRENT ] && INDEX_DIR="index_generations/$(cat index_generations/CURRENT)"
+if [ -f "$INDEX_DIR/chunks.jsonl" ] && [ -f "$INDEX_DIR/vecs_n.npy" ] && [ -f "$INDEX_DIR/meta.jsonl" ]; then
     echo "✅ Build successful" | tee -a "$LOG_FILE"
 else
     echo "❌ Build failed - missing artifact files" | tee -a "$LOG_FILE"
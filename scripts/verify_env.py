@@ -77,13 +77,11 @@ def check_ollama_connectivity() -> tuple[bool, str]:
 
 
 def check_index_artifacts() -> tuple[bool, list[str]]:
-    """Check if index artifacts exist."""
-    required_files = [
-        "chunks.jsonl",
-        "vecs_n.npy",
-        "meta.jsonl",
-        "bm25.json",
-    ]
+    """Check if index artifacts exist (in the active index generation, if any)."""
+    from clockify_rag.generations import active_files
+
+    files = active_files()
+    required_files = [files[key] for key in ("chunks", "emb", "meta", "bm25_index")]
 
     missing = []
     present = []
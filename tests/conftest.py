@@ -1,5 +1,6 @@
 """Shared pytest fixtures for RAG system tests."""
 
+import asyncio
 import json
 import os
 import platform
@@ -9,6 +10,8 @@ import importlib.util
 
 # Force tests to use local embeddings to avoid remote Ollama dependency
 os.environ.setdefault("EMB_BACKEND", "local")
+# No FAQ query-embedding warm-load on API startup (it would embed in the background during tests)
+os.environ.setdefault("QUERY_EMBED_WARM_FILE", "")
 
 import httpx
 import numpy as np
@@ -113,6 +116,36 @@ def use_mock_llm_client():
     set_llm_client(None)
 
 
+@pytest.fixture(autouse=True)
+def clear_query_embedding_cache():
+    """Start every test with an empty query-embedding cache."""
+    from clockify_rag.caching import get_query_embedding_cache
+
+    get_query_embedding_cache().clear()
+    yield
+    get_query_embedding_cache().clear()
+
+
+@pytest.fixture
+def stub_answer_pipeline(monkeypatch):
+    """Replace the /v1/query answer pipeline with a synchronous fake.
+
+    Installs the fake for both ``API_PIPELINE`` modes: as ``answer_once`` (thread
+    executor) and, run in a worker thread, as ``async_answer_once``.
+    """
+    import clockify_rag.api as api_module
+
+    def install(fake):
+        async def fake_async(*args, **kwargs):
+            return await asyncio.to_thread(fake, *args, **kwargs)
+
+        monkeypatch.setattr(api_module, "answer_once", fake)
+        monkeypatch.setattr(api_module, "async_answer_once", fake_async)
+        return fake
+
+    return install
+
+
 @pytest.fixture
 def sample_chunks():
     """Sample chunks for testing."""
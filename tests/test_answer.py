@@ -17,14 +17,16 @@ from unittest.mock import patch
 
 from clockify_rag.answer import (
     apply_mmr_diversification,
+    apply_mmr_diversification_batch,
     apply_reranking,
     extract_citations,
     validate_citations,
     generate_llm_answer,
     answer_once,
 )
-from clockify_rag.config import REFUSAL_STR
+from clockify_rag.config import MMR_LAMBDA, REFUSAL_STR
 from clockify_rag.exceptions import LLMUnavailableError, LLMError
+from clockify_rag.retrieval import DenseScoreStore
 
 
 @pytest.fixture
@@ -99,6 +101,53 @@ class TestMMRDiversification:
         assert 0 in result
         assert len(result) == 5
 
+    @staticmethod
+    def _reference_mmr(selected, dense, vecs, pack_top):
+        """Straightforward MMR: recompute similarity to every pick on each step."""
+        cand = list(selected)
+        picks = [max(cand, key=lambda j: dense[j])]
+        cand.remove(picks[0])
+        while cand and len(picks) < pack_top:
+            max_sim = {j: max(vecs[j] @ vecs[p] for p in picks) for j in cand}
+            best = max(cand, key=lambda j: MMR_LAMBDA * dense[j] - (1 - MMR_LAMBDA) * max_sim[j])
+            picks.append(best)
+            cand.remove(best)
+        return picks
+
+    def test_mmr_matches_reference_selection(self):
+        """Running max-similarity selection picks the same chunks as the naive recomputation."""
+        rng = np.random.default_rng(7)
+        vecs = rng.standard_normal((300, 32)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        dense = vecs @ vecs[0]
+        selected = rng.permutation(300)[:120].tolist()
+
+        for pack_top in (1, 6, 20, 150):
+            expected = self._reference_mmr(selected, dense, vecs, pack_top)
+            assert apply_mmr_diversification(selected, {"dense": dense}, vecs, pack_top) == expected
+
+    def test_mmr_gathers_lazy_dense_scores_in_one_call(self, sample_embeddings, monkeypatch):
+        """Relevance for a DenseScoreStore is gathered with one vectorised take, not per index."""
+        store = DenseScoreStore(5, vecs=sample_embeddings, qv=sample_embeddings[1], initial=[(1, 1.0)])
+        monkeypatch.setattr(DenseScoreStore, "__getitem__", lambda self, idx: pytest.fail("per-index lookup"))
+
+        result = apply_mmr_diversification([4, 1, 3], {"dense": store}, sample_embeddings, pack_top=3)
+
+        assert result[0] == 1 and sorted(result) == [1, 3, 4]
+
+    def test_mmr_batch_matches_per_query(self):
+        """Batched MMR over ragged candidate pools equals running each query alone."""
+        rng = np.random.default_rng(3)
+        vecs = rng.standard_normal((200, 16)).astype(np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        pools = [rng.permutation(200)[:n].tolist() for n in (40, 7, 0, 1, 25)]
+        scores = [{"dense": vecs @ vecs[q]} for q in range(len(pools))]
+
+        batched = apply_mmr_diversification_batch(pools, scores, vecs, pack_top=8)
+
+        assert batched == [apply_mmr_diversification(p, s, vecs, 8) for p, s in zip(pools, scores)]
+        assert [len(b) for b in batched] == [8, 7, 0, 1, 8]
+
 
 class TestCitationExtraction:
     """Test citation extraction and validation."""
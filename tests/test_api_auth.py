@@ -5,16 +5,14 @@ from fastapi.testclient import TestClient
 import clockify_rag.api as api_module
 
 
-def _prepare_app(monkeypatch):
+def _prepare_app(monkeypatch, stub_answer_pipeline):
     monkeypatch.setattr(
         api_module,
         "ensure_index_ready",
         lambda retries=2: ([], [], {}, None),
     )
 
-    monkeypatch.setattr(
-        api_module,
-        "answer_once",
+    stub_answer_pipeline(
         lambda *_, **__: {
             "answer": "Authorized",
             "confidence": 0.9,
@@ -26,12 +24,12 @@ def _prepare_app(monkeypatch):
     return api_module.create_app()
 
 
-def test_query_requires_api_key(monkeypatch):
+def test_query_requires_api_key(monkeypatch, stub_answer_pipeline):
     monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "api_key")
     monkeypatch.setattr(api_module.config, "API_ALLOWED_KEYS", frozenset({"secret"}))
     monkeypatch.setattr(api_module.config, "API_KEY_HEADER", "x-api-key")
 
-    app = _prepare_app(monkeypatch)
+    app = _prepare_app(monkeypatch, stub_answer_pipeline)
 
     with TestClient(app) as client:
         response = client.post(
@@ -43,12 +41,12 @@ def test_query_requires_api_key(monkeypatch):
     assert response.json()["detail"] == "Missing API key"
 
 
-def test_query_rejects_invalid_key(monkeypatch):
+def test_query_rejects_invalid_key(monkeypatch, stub_answer_pipeline):
     monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "api_key")
     monkeypatch.setattr(api_module.config, "API_ALLOWED_KEYS", frozenset({"secret"}))
     monkeypatch.setattr(api_module.config, "API_KEY_HEADER", "x-api-key")
 
-    app = _prepare_app(monkeypatch)
+    app = _prepare_app(monkeypatch, stub_answer_pipeline)
 
     with TestClient(app) as client:
         response = client.post(
@@ -61,12 +59,12 @@ def test_query_rejects_invalid_key(monkeypatch):
     assert response.json()["detail"] == "Invalid API key"
 
 
-def test_query_accepts_valid_key(monkeypatch):
+def test_query_accepts_valid_key(monkeypatch, stub_answer_pipeline):
     monkeypatch.setattr(api_module.config, "API_AUTH_MODE", "api_key")
     monkeypatch.setattr(api_module.config, "API_ALLOWED_KEYS", frozenset({"secret"}))
     monkeypatch.setattr(api_module.config, "API_KEY_HEADER", "x-api-key")
 
-    app = _prepare_app(monkeypatch)
+    app = _prepare_app(monkeypatch, stub_answer_pipeline)
 
     with TestClient(app) as client:
         response = client.post(
@@ -18,7 +18,7 @@ from clockify_rag.utils import ALLOWED_CORPUS_FILENAME
 
 
 @pytest.mark.asyncio
-async def test_query_during_ingest_sees_consistent_state(monkeypatch, tmp_path):
+async def test_query_during_ingest_sees_consistent_state(monkeypatch, tmp_path, stub_answer_pipeline):
     """Queries during ingest should see consistent state (either old or new, never partial)."""
 
     # Create a test knowledge file
@@ -65,7 +65,7 @@ async def test_query_during_ingest_sees_consistent_state(monkeypatch, tmp_path):
 
     monkeypatch.setattr(api_module, "build", mock_build)
     monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: old_state)
-    monkeypatch.setattr(api_module, "answer_once", mock_answer_once)
+    stub_answer_pipeline(mock_answer_once)
     monkeypatch.setenv("COVERAGE_MIN_CHUNKS", "0")  # Allow queries with minimal chunks
 
     app = api_module.create_app()
@@ -183,7 +183,7 @@ async def test_multiple_concurrent_ingests_serialized(monkeypatch, tmp_path):
 
 
 @pytest.mark.asyncio
-async def test_state_lock_prevents_torn_reads(monkeypatch):
+async def test_state_lock_prevents_torn_reads(monkeypatch, stub_answer_pipeline):
     """Validates that state reads capture atomic snapshots."""
 
     # Create two distinct states
@@ -228,7 +228,7 @@ async def test_state_lock_prevents_torn_reads(monkeypatch):
         return state1 if state_toggle[0] else state2
 
     monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: state1)
-    monkeypatch.setattr(api_module, "answer_once", mock_answer_once)
+    stub_answer_pipeline(mock_answer_once)
 
     app = api_module.create_app()
 
@@ -192,7 +192,7 @@ class TestQueryEndpoint:
         response = client.post("/v1/query", json={"question": "test", "threshold": -0.1})
         assert response.status_code == 422
 
-    def test_query_success_response_schema(self, client):
+    def test_query_success_response_schema(self, client, stub_answer_pipeline):
         """Successful query should return proper schema."""
         mock_result = {
             "answer": "Test answer",
@@ -206,8 +206,8 @@ class TestQueryEndpoint:
             "timing": {"total_ms": 100, "llm_ms": 50},
         }
 
-        with patch("clockify_rag.api.answer_once", return_value=mock_result):
-            response = client.post("/v1/query", json={"question": "How do I track time?"})
+        stub_answer_pipeline(MagicMock(return_value=mock_result))
+        response = client.post("/v1/query", json={"question": "How do I track time?"})
 
         assert response.status_code == 200
         data = response.json()
@@ -318,10 +318,10 @@ class TestErrorResponses:
         response = client.get("/nonexistent")
         assert response.status_code == 404
 
-    def test_internal_error_sanitized(self, client):
+    def test_internal_error_sanitized(self, client, stub_answer_pipeline):
         """Internal errors should not leak details."""
-        with patch("clockify_rag.api.answer_once", side_effect=Exception("Internal DB password: secret123")):
-            response = client.post("/v1/query", json={"question": "test question"})
+        stub_answer_pipeline(MagicMock(side_effect=Exception("Internal DB password: secret123")))
+        response = client.post("/v1/query", json={"question": "test question"})
 
         assert response.status_code == 500
         # Should not contain sensitive info
@@ -340,24 +340,25 @@ class TestContentTypeHandling:
         )
         assert response.status_code == 422
 
-    def test_query_accepts_json(self, client):
+    def test_query_accepts_json(self, client, stub_answer_pipeline):
         """Query should accept JSON content-type."""
-        with patch(
-            "clockify_rag.api.answer_once",
-            return_value={
-                "answer": "test",
-                "refused": False,
-                "confidence": 80,
-                "selected_chunks": [],
-                "selected_chunk_ids": [],
-                "metadata": {},
-                "routing": {},
-                "timing": {},
-            },
-        ):
-            response = client.post(
-                "/v1/query", json={"question": "test question"}, headers={"content-type": "application/json"}
+        stub_answer_pipeline(
+            MagicMock(
+                return_value={
+                    "answer": "test",
+                    "refused": False,
+                    "confidence": 80,
+                    "selected_chunks": [],
+                    "selected_chunk_ids": [],
+                    "metadata": {},
+                    "routing": {},
+                    "timing": {},
+                }
             )
+        )
+        response = client.post(
+            "/v1/query", json={"question": "test question"}, headers={"content-type": "application/json"}
+        )
         assert response.status_code == 200
 
 
@@ -392,7 +393,7 @@ class TestRateLimiting:
 class TestQueryParameterValidation:
     """Tests for query parameter edge cases."""
 
-    def test_accepts_valid_top_k(self, client):
+    def test_accepts_valid_top_k(self, client, stub_answer_pipeline):
         """Should accept valid top_k values."""
         mock_result = {
             "answer": "Test",
@@ -405,11 +406,11 @@ class TestQueryParameterValidation:
             "timing": {},
         }
 
-        with patch("clockify_rag.api.answer_once", return_value=mock_result):
-            response = client.post("/v1/query", json={"question": "test", "top_k": 5})
+        stub_answer_pipeline(MagicMock(return_value=mock_result))
+        response = client.post("/v1/query", json={"question": "test", "top_k": 5})
         assert response.status_code == 200
 
-    def test_accepts_valid_threshold(self, client):
+    def test_accepts_valid_threshold(self, client, stub_answer_pipeline):
         """Should accept valid threshold values."""
         mock_result = {
             "answer": "Test",
@@ -422,11 +423,11 @@ class TestQueryParameterValidation:
             "timing": {},
         }
 
-        with patch("clockify_rag.api.answer_once", return_value=mock_result):
-            response = client.post("/v1/query", json={"question": "test", "threshold": 0.5})
+        stub_answer_pipeline(MagicMock(return_value=mock_result))
+        response = client.post("/v1/query", json={"question": "test", "threshold": 0.5})
         assert response.status_code == 200
 
-    def test_accepts_debug_flag(self, client):
+    def test_accepts_debug_flag(self, client, stub_answer_pipeline):
         """Should accept debug flag."""
         mock_result = {
             "answer": "Test",
@@ -439,6 +440,6 @@ class TestQueryParameterValidation:
             "timing": {},
         }
 
-        with patch("clockify_rag.api.answer_once", return_value=mock_result):
-            response = client.post("/v1/query", json={"question": "test", "debug": True})
+        stub_answer_pipeline(MagicMock(return_value=mock_result))
+        response = client.post("/v1/query", json={"question": "test", "debug": True})
         assert response.status_code == 200
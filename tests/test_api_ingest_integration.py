@@ -24,7 +24,7 @@ class EnsureStub:
 
 
 @pytest.mark.asyncio
-async def test_ingest_then_query_succeeds(tmp_path, monkeypatch):
+async def test_ingest_then_query_succeeds(tmp_path, monkeypatch, stub_answer_pipeline):
     """Trigger ingest on a temporary KB and verify queries succeed afterwards."""
 
     kb_path = tmp_path / ALLOWED_CORPUS_FILENAME
@@ -51,7 +51,7 @@ async def test_ingest_then_query_succeeds(tmp_path, monkeypatch):
         recorded_answer_inputs["bm"] = bm
         return {"answer": "ready", "selected_chunks": [1], "metadata": {}}
 
-    monkeypatch.setattr(api_module, "answer_once", fake_answer)
+    stub_answer_pipeline(fake_answer)
 
     app = api_module.create_app()
 
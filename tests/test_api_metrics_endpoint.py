@@ -43,7 +43,12 @@ def patched_pipeline(monkeypatch, sample_chunks, sample_embeddings, sample_bm25)
         lambda: RateLimiter(max_requests=1000, window_seconds=60.0),
     )
 
-    # Patch retrieval pipeline components used by answer_once
+    # Repeated questions must run the full pipeline here, not the response cache
+    monkeypatch.setattr(api_module.config, "API_CACHE_ENABLED", False)
+
+    # Patch retrieval pipeline components used by answer_once (the thread pipeline)
+    monkeypatch.setattr(api_module.config, "API_PIPELINE", "thread")
+
     def fake_retrieve(_question, _chunks, _vecs, _bm, **_kwargs):
         dense_scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
         scores = {
@@ -6,7 +6,7 @@ import clockify_rag.config as config
 from clockify_rag.exceptions import ValidationError
 
 
-def test_api_query_returns_metadata(monkeypatch):
+def test_api_query_returns_metadata(monkeypatch, stub_answer_pipeline):
     """API should expose metadata from the new answer_once result schema."""
 
     monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
@@ -20,7 +20,7 @@ def test_api_query_returns_metadata(monkeypatch):
         "routing": {"action": "self-serve"},
     }
 
-    monkeypatch.setattr(api_module, "answer_once", lambda *_, **__: result_payload)
+    stub_answer_pipeline(lambda *_, **__: result_payload)
 
     app = api_module.create_app()
 
@@ -49,7 +49,7 @@ def test_api_query_returns_metadata(monkeypatch):
         ),
     ],
 )
-def test_api_query_validation_errors(monkeypatch, question, message):
+def test_api_query_validation_errors(monkeypatch, question, message, stub_answer_pipeline):
     """API should convert validation errors into 400 responses."""
 
     # Set MAX_QUERY_LENGTH to match test expectations (12000 chars)
@@ -61,7 +61,7 @@ def test_api_query_validation_errors(monkeypatch, question, message):
         assert q == question
         raise ValidationError(message)
 
-    monkeypatch.setattr(api_module, "answer_once", fake_answer)
+    stub_answer_pipeline(fake_answer)
 
     app = api_module.create_app()
 
@@ -70,3 +70,87 @@ def test_api_query_validation_errors(monkeypatch, question, message):
 
     assert response.status_code == 400
     assert response.json()["detail"] == message
+
+
+def _counting_answer(calls):
+    def fake_answer(question, *_args, **kwargs):
+        calls.append((question, kwargs.get("top_k")))
+        return {
+            "answer": f"answer #{len(calls)}",
+            "selected_chunk_ids": ["doc-1"],
+            "metadata": {"used_tokens": 64},
+        }
+
+    return fake_answer
+
+
+def test_api_query_cache_hit_and_key(monkeypatch, stub_answer_pipeline):
+    """Repeated questions are served from the query cache; parameters are part of the key."""
+    from clockify_rag.metrics import MetricsCollector, MetricNames
+
+    collector = MetricsCollector()
+    monkeypatch.setattr(api_module, "get_metrics", lambda: collector)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", True)
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+    calls = []
+    stub_answer_pipeline(_counting_answer(calls))
+
+    with TestClient(api_module.create_app()) as client:
+        first = client.post("/v1/query", json={"question": "How do I export a report?"}).json()
+        second = client.post("/v1/query", json={"question": "How do I export a report?"}).json()
+        other_k = client.post("/v1/query", json={"question": "How do I export a report?", "top_k": 5}).json()
+
+    assert len(calls) == 2
+    assert first["metadata"]["cache_hit"] is False and first["metadata"]["cache_type"] is None
+    assert second["metadata"]["cache_hit"] is True and second["metadata"]["cache_type"] == "query_cache"
+    assert second["answer"] == first["answer"]
+    assert second["sources"] == ["doc-1"]
+    assert other_k["metadata"]["cache_hit"] is False
+    assert collector.get_counter(MetricNames.RESPONSE_CACHE_HITS, labels={"cache_type": "query_cache"}) == 1
+    assert collector.get_counter(MetricNames.RESPONSE_CACHE_MISSES) == 2
+
+
+def test_api_query_cache_invalidated_by_reload(monkeypatch, stub_answer_pipeline):
+    """A fresh index load changes the signature, so earlier answers are not reused."""
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", True)
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+    calls = []
+    stub_answer_pipeline(_counting_answer(calls))
+
+    for _ in range(2):
+        with TestClient(api_module.create_app()) as client:
+            response = client.post("/v1/query", json={"question": "Where are my timesheets?"})
+            assert response.json()["metadata"]["cache_hit"] is False
+
+    assert len(calls) == 2
+
+
+def test_api_query_serves_faq_precomputed(monkeypatch, tmp_path, stub_answer_pipeline):
+    """FAQ precomputed answers are returned before the query cache and pipeline."""
+    import clockify_rag.precomputed_cache as precomputed_cache
+    from clockify_rag.precomputed_cache import PrecomputedCache
+
+    faq_path = tmp_path / "faq_cache.json"
+    faq = PrecomputedCache()
+    faq.put(
+        "How do I start a timer?",
+        {"answer": "Click Start.", "confidence": 90, "packed_chunks": ["doc-7"], "metadata": {"used_tokens": 12}},
+    )
+    faq.save(str(faq_path))
+
+    monkeypatch.setattr(precomputed_cache, "_PRECOMPUTED_CACHE", None)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "FAQ_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "FAQ_CACHE_PATH", str(faq_path))
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+    calls = []
+    stub_answer_pipeline(_counting_answer(calls))
+
+    with TestClient(api_module.create_app()) as client:
+        payload = client.post("/v1/query", json={"question": "how do I start a timer"}).json()
+
+    assert calls == []
+    assert payload["answer"] == "Click Start."
+    assert payload["sources"] == ["doc-7"]
+    assert payload["metadata"]["cache_type"] == "faq_precomputed"
+    assert payload["metadata"]["cache_hit"] is True
@@ -11,7 +11,7 @@ import clockify_rag.api as api_module
 
 
 @pytest.mark.asyncio
-async def test_query_concurrency_latency(monkeypatch):
+async def test_query_concurrency_latency(monkeypatch, stub_answer_pipeline):
     """Concurrent requests should not serialize when work runs in threadpool."""
 
     monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
@@ -27,7 +27,7 @@ async def test_query_concurrency_latency(monkeypatch):
             "metadata": {"test": True},
         }
 
-    monkeypatch.setattr(api_module, "answer_once", slow_answer)
+    stub_answer_pipeline(slow_answer)
 
     app = api_module.create_app()
 
@@ -0,0 +1,147 @@
+"""Tests for the fully async /v1/query pipeline (httpx Ollama calls + scoring executor)."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import pytest
+from asgi_lifespan import LifespanManager
+
+import clockify_rag.api as api_module
+import clockify_rag.api_client as api_client_module
+import clockify_rag.async_support as async_support
+import clockify_rag.config as config
+from clockify_rag.api_client import OllamaAPIClient, set_llm_client
+from clockify_rag.async_support import async_answer_once
+
+ANSWER = {
+    "answer": "Click the timer button to start tracking.",
+    "confidence": 80,
+    "intent": "feature_howto",
+    "sources_used": ["https://clockify.me/help/time-tracking"],
+}
+
+
+class _FakeOllama(ThreadingHTTPServer):
+    """Local /api/embeddings and a slow /api/chat that records peak in-flight chats."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, vector, chat_delay):
+        super().__init__(("127.0.0.1", 0), _FakeOllamaHandler)
+        self.vector = vector
+        self.chat_delay = chat_delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.paths = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.paths.append(self.path)
+        if self.path == "/api/embeddings":
+            self._reply({"embedding": server.vector})
+            return
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.chat_delay)
+        with server.lock:
+            server.in_flight -= 1
+        # Rerank prompts get an empty ranking (keeps the MMR order)
+        content = "[]" if "PASSAGES:" in body["messages"][-1]["content"] else json.dumps(ANSWER)
+        self._reply({"model": body["model"], "message": {"role": "assistant", "content": content}, "done": True})
+
+    def _reply(self, obj):
+        payload = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def ollama_index(monkeypatch, sample_chunks, sample_bm25):
+    """768-dim index whose query embedding (from the fake server) matches chunk 0."""
+    monkeypatch.setattr(config, "EMB_BACKEND", "ollama")
+    monkeypatch.setattr(api_client_module, "EMB_BACKEND", "ollama")
+    monkeypatch.setattr(config, "COALESCE_REQUESTS", False)
+    monkeypatch.setattr(config, "ASYNC_SCORING_WORKERS", 2)
+    async_support.shutdown_scoring_executor()
+
+    rng = np.random.default_rng(7)
+    vecs = rng.standard_normal((len(sample_chunks), config.EMB_DIM_OLLAMA)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    server = _FakeOllama(vecs[0].tolist(), chat_delay=0.3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    set_llm_client(OllamaAPIClient(base_url=server.url, retries=0))
+    yield server, sample_chunks, vecs, sample_bm25
+    server.shutdown()
+    server.server_close()
+    async_support.shutdown_scoring_executor()
+
+
+@pytest.mark.asyncio
+async def test_async_pipeline_holds_no_thread_per_query(ollama_index, monkeypatch):
+    server, chunks, vecs, bm = ollama_index
+    monkeypatch.setattr(config, "LLM_MAX_IN_FLIGHT", 0)  # measure the pipeline itself, not the LLM gateway cap
+    questions = [f"How do I start the timer on device {i}?" for i in range(24)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[async_answer_once(q, chunks, vecs, bm, threshold=0.0) for q in questions])
+    elapsed = time.perf_counter() - start
+
+    assert {r["answer"] for r in results} == {ANSWER["answer"]}
+    assert all(r["selected_chunks"][0] == 0 for r in results)
+    assert server.paths.count("/api/embeddings") == len(questions)
+    # All answer calls were in flight at once, on two scoring threads and no to_thread workers
+    assert server.max_in_flight == len(questions)
+    assert elapsed < len(questions) * server.chat_delay / 4
+    names = [t.name for t in threading.enumerate()]
+    assert sum(name.startswith("rag-scoring") for name in names) <= 2
+    assert not any(name.startswith("asyncio_") for name in names)
+
+
+@pytest.mark.asyncio
+async def test_async_and_thread_pipelines_return_the_same_response(ollama_index, monkeypatch):
+    _server, chunks, vecs, bm = ollama_index
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: (chunks, vecs, bm, None))
+    # The thread pipeline embeds through embeddings_client
+    monkeypatch.setattr("clockify_rag.embeddings_client.RAG_OLLAMA_URL", _server.url)
+    monkeypatch.setattr("clockify_rag.embeddings_client.EMB_DIM", config.EMB_DIM_OLLAMA)
+    app = api_module.create_app()
+
+    bodies = {}
+    async with LifespanManager(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=10.0) as client:
+            for mode in ("async", "thread"):
+                monkeypatch.setattr(config, "API_PIPELINE", mode)
+                resp = await client.post("/v1/query", json={"question": "How do I start the timer?", "threshold": 0.0})
+                assert resp.status_code == 200
+                bodies[mode] = resp.json()
+
+    for key in ("answer", "confidence", "refused", "sources"):
+        assert bodies["async"][key] == bodies["thread"][key]
+    assert bodies["async"]["answer"] == ANSWER["answer"]
+    assert bodies["async"]["metadata"]["rerank_reason"] == bodies["thread"]["metadata"]["rerank_reason"]
@@ -18,7 +18,7 @@ Critical coverage areas:
 
 import asyncio
 import time
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 import numpy as np
@@ -80,7 +80,7 @@ class TestAsyncEmbedQuery:
     async def test_async_embed_query_error_handling(self):
         """Test async_embed_query raises LLMError on failure."""
         with patch("clockify_rag.async_support.get_llm_client") as mock_client:
-            mock_client.return_value.create_embedding.side_effect = RuntimeError("Embedding service down")
+            mock_client.return_value.acreate_embedding = AsyncMock(side_effect=RuntimeError("Embedding service down"))
 
             with pytest.raises(LLMError) as exc_info:
                 await async_embed_query("test query")
@@ -114,7 +114,7 @@ class TestAsyncAskLLM:
                 "message": {"content": '{"answer": "Track time with timer button [1].", "confidence": 85}'},
                 "done": True,
             }
-            mock_client.return_value.chat_completion.return_value = mock_response
+            mock_client.return_value.achat_completion = AsyncMock(return_value=mock_response)
 
             result = await async_ask_llm(question, context_block)
 
@@ -139,7 +139,7 @@ class TestAsyncAskLLM:
     async def test_async_ask_llm_unavailable_error(self):
         """Test async_ask_llm propagates LLMUnavailableError."""
         with patch("clockify_rag.async_support.get_llm_client") as mock_client:
-            mock_client.return_value.chat_completion.side_effect = LLMUnavailableError("LLM service down")
+            mock_client.return_value.achat_completion = AsyncMock(side_effect=LLMUnavailableError("LLM service down"))
 
             with pytest.raises(LLMUnavailableError):
                 await async_ask_llm("test question", "test context")
@@ -148,7 +148,7 @@ class TestAsyncAskLLM:
     async def test_async_ask_llm_generic_error(self):
         """Test async_ask_llm converts generic errors to LLMError."""
         with patch("clockify_rag.async_support.get_llm_client") as mock_client:
-            mock_client.return_value.chat_completion.side_effect = RuntimeError("Network error")
+            mock_client.return_value.achat_completion = AsyncMock(side_effect=RuntimeError("Network error"))
 
             with pytest.raises(LLMError) as exc_info:
                 await async_ask_llm("test question", "test context")
@@ -1,5 +1,6 @@
 """Tests for BM25 scoring functionality."""
 
+import json
 import pytest
 import sys
 import os
@@ -8,7 +9,33 @@ import numpy as np
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from clockify_rag.indexing import build_bm25, bm25_scores
+from clockify_rag.indexing import (
+    build_bm25,
+    bm25_scores,
+    compile_bm25_postings,
+    export_bm25_json,
+    get_bm25_postings,
+    load_bm25_binary,
+    save_bm25_binary,
+)
+from clockify_rag.utils import tokenize
+
+
+def _reference_scores(query, bm, k1=1.2, b=0.65):
+    """Per-document dict scan used before the inverted index existed."""
+    q = tokenize(query)
+    scores = np.zeros(len(bm["doc_lens"]), dtype="float32")
+    for i, tf in enumerate(bm["doc_tfs"]):
+        dl = bm["doc_lens"][i]
+        s = 0.0
+        for w in q:
+            f = tf.get(w, 0)
+            if w not in bm["idf"] or f == 0:
+                continue
+            denom = f + k1 * (1 - b + b * dl / max(1.0, bm["avgdl"]))
+            s += bm["idf"][w] * (f * (k1 + 1)) / denom
+        scores[i] = s
+    return scores
 
 
 class TestBM25:
@@ -108,6 +135,87 @@ class TestBM25:
             else:
                 assert scores_default != scores_high_k1
 
+    def test_postings_match_reference_scan(self):
+        """Inverted-index scoring matches the per-document dict scan."""
+        rng = np.random.default_rng(7)
+        vocab = ["time", "track", "timer", "project", "report", "invoice", "tag", "team", "rate", "export"]
+        chunks = [{"id": i, "text": " ".join(rng.choice(vocab, size=rng.integers(3, 30)))} for i in range(200)]
+        bm = build_bm25(chunks)
+        for query in ["track time", "time time timer", "export invoice report", "nothing here"]:
+            expected = _reference_scores(query, bm)
+            np.testing.assert_allclose(bm25_scores(query, bm, k1=1.2, b=0.65), expected, rtol=1e-5, atol=1e-6)
+
+    def test_top_k_keeps_best_documents_only(self):
+        """top_k pruning zeroes everything outside the best top_k documents."""
+        chunks = [{"id": i, "text": "track " * (i % 5 + 1) + "filler words here"} for i in range(50)]
+        bm = build_bm25(chunks)
+        full = bm25_scores("track", bm)
+        pruned = bm25_scores("track", bm, top_k=5)
+
+        assert np.count_nonzero(pruned) == 5
+        kept = np.flatnonzero(pruned)
+        np.testing.assert_allclose(pruned[kept], full[kept])
+        assert pruned[kept].min() >= np.sort(full)[-5]
+
+    def test_plain_dict_is_compiled_on_demand(self):
+        """Legacy JSON-loaded dicts (no compiled postings) still score correctly."""
+        bm = build_bm25(self.chunks)
+        plain = json.loads(json.dumps(bm))
+
+        assert not hasattr(plain, "postings")
+        np.testing.assert_allclose(bm25_scores("track time", plain), bm25_scores("track time", bm))
+        # Compiled once per dict object, not on every query
+        assert get_bm25_postings(plain) is get_bm25_postings(plain)
+
+    def test_postings_layout(self):
+        """Postings are CSR-ordered with ascending doc ids per term."""
+        bm = build_bm25(self.chunks)
+        postings = get_bm25_postings(bm)
+        row = postings.vocab["track"]
+        start, end = postings.offsets[row], postings.offsets[row + 1]
+
+        assert postings.doc_ids[start:end].tolist() == [0, 2]
+        assert postings.offsets[-1] == postings.doc_ids.size == postings.tfs.size
+        assert postings.n_docs == len(self.chunks)
+        assert compile_bm25_postings(bm).vocab == postings.vocab
+
+    def test_binary_artifact_round_trip(self, tmp_path):
+        """The .npy artifact loads memory-mapped and scores exactly like the built index."""
+        bm = build_bm25(self.chunks)
+        path = str(tmp_path / "bm25_index")
+        save_bm25_binary(bm, path)
+        loaded = load_bm25_binary(path)
+
+        assert isinstance(loaded.postings.doc_ids, np.memmap)
+        assert loaded.postings.vocab == get_bm25_postings(bm).vocab
+        assert loaded["avgdl"] == pytest.approx(bm["avgdl"])
+        assert list(loaded["doc_lens"]) == bm["doc_lens"]
+        assert dict(loaded["idf"]) == pytest.approx(bm["idf"])
+        for query in ("track time", "timesheet export", "xyzabc123"):
+            np.testing.assert_allclose(bm25_scores(query, loaded), bm25_scores(query, bm))
+
+    def test_binary_artifact_overwrite(self, tmp_path):
+        """Saving over an existing artifact swaps in the new arrays."""
+        path = str(tmp_path / "bm25_index")
+        save_bm25_binary(build_bm25(self.chunks), path)
+        save_bm25_binary(build_bm25(self.chunks[:2]), path)
+
+        assert load_bm25_binary(path).postings.n_docs == 2
+        assert sorted(os.listdir(tmp_path)) == ["bm25_index"]
+
+    def test_json_export_from_binary(self, tmp_path):
+        """JSON export rebuilds the legacy layout, including per-doc term frequencies."""
+        bm = build_bm25(self.chunks)
+        path = str(tmp_path / "bm25_index")
+        save_bm25_binary(bm, path)
+        export_path = tmp_path / "bm25.json"
+        export_bm25_json(load_bm25_binary(path), str(export_path))
+
+        exported = json.loads(export_path.read_text(encoding="utf-8"))
+        assert exported["doc_tfs"] == bm["doc_tfs"]
+        assert exported["doc_lens"] == bm["doc_lens"]
+        np.testing.assert_allclose(bm25_scores("track time", exported), bm25_scores("track time", bm))
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
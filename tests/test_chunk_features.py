@@ -0,0 +1,99 @@
+"""Tests for precomputed per-chunk retrieval features."""
+
+import numpy as np
+
+import clockify_rag.chunk_features as chunk_features
+import clockify_rag.config as config
+from clockify_rag import retrieval
+from clockify_rag.chunk_features import ChunkFeatures, get_chunk_features
+from clockify_rag.indexing import build_bm25
+from clockify_rag.intent_classification import INTENT_CONFIGS, adjust_scores_by_intent
+
+
+class _CountingChunk(dict):
+    """Chunk dict that counts field reads."""
+
+    reads = 0
+
+    def get(self, *args):
+        _CountingChunk.reads += 1
+        return super().get(*args)
+
+    def __getitem__(self, key):
+        _CountingChunk.reads += 1
+        return super().__getitem__(key)
+
+
+def _chunks():
+    return [
+        {"id": "a1", "title": "Timer", "section": "Start", "text": "Start the timer", "url": "#timer"},
+        {"id": "a2", "title": "Timer", "section": "Start", "text": "Timer start button", "url": "#timer"},
+        {"id": "a3", "title": "Timer", "section": "Stop", "text": "Stop the timer", "url": "#timer"},
+        {"id": "h1", "title": "Hub", "section": "All", "text": "Pricing plans overview", "metadata": {"is_hub": True}},
+        {"id": "p1", "title": "Pricing", "section": "Plans", "text": "Free tier", "metadata": {"article_id": 7}},
+    ]
+
+
+def test_features_match_chunk_fields():
+    features = ChunkFeatures.from_chunks(_chunks())
+
+    assert features.is_hub.tolist() == [False, False, False, True, False]
+    assert features.article_ids.tolist() == [0, 0, 0, 1, 2]
+    assert features.section_ids.tolist() == [0, 0, 1, 2, 3]
+    assert features.intent_mask("pricing").tolist() == [False, False, False, True, True]
+    assert features.intent_mask("general") is None
+    np.testing.assert_allclose(features.hub_multipliers(0.5), [1, 1, 1, 0.5, 1])
+    # First chunk per (article, section), in ranked order
+    assert features.dedup(np.array([1, 0, 2, 3])) == [1, 2, 3]
+
+
+def test_features_are_computed_once_per_chunk_list(monkeypatch):
+    calls = []
+    original = ChunkFeatures.from_chunks.__func__
+
+    def counting(cls, chunks):
+        calls.append(len(chunks))
+        return original(cls, chunks)
+
+    monkeypatch.setattr(ChunkFeatures, "from_chunks", classmethod(counting))
+    monkeypatch.setattr(chunk_features, "_FEATURES", chunk_features.OrderedDict())
+    chunks = _chunks()
+
+    assert get_chunk_features(chunks) is get_chunk_features(chunks)
+    get_chunk_features(_chunks())  # a different list gets its own features
+    assert calls == [5, 5]
+
+
+def test_intent_boost_matches_keyword_scan():
+    chunks = _chunks()
+    intent = INTENT_CONFIGS["pricing"]
+    scores = {"bm25": np.ones(5, dtype=np.float32), "dense": np.full(5, 2.0, dtype=np.float32)}
+
+    adjust_scores_by_intent(chunks, scores, intent)
+
+    keywords = ["pricing", "plan", "tier", "cost", "price", "subscription", "free", "paid", "trial", "upgrade"]
+    expected = np.array(
+        [intent.boost_factor if any(k in (c["text"] + c["title"]).lower() for k in keywords) else 1.0 for c in chunks]
+    )
+    np.testing.assert_allclose(scores["bm25"], expected)
+    np.testing.assert_allclose(scores["dense"], 2.0 * expected)
+
+
+def test_retrieve_does_not_walk_chunk_dicts_per_query(monkeypatch):
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(config, "HUB_PAGE_SCORE_MULTIPLIER", 0.5)
+    chunks = [_CountingChunk(c) for c in _chunks()]
+    rng = np.random.default_rng(0)
+    vecs_n = rng.standard_normal((len(chunks), 8)).astype(np.float32)
+    vecs_n /= np.linalg.norm(vecs_n, axis=1, keepdims=True)
+    bm = build_bm25(chunks)
+    monkeypatch.setattr(retrieval, "embed_query", lambda question, retries=0: vecs_n[3])
+
+    first, _ = retrieval.retrieve("what pricing plans are there", chunks, vecs_n, bm, top_k=5)
+    _CountingChunk.reads = 0
+    second, scores = retrieval.retrieve("what pricing plans are there", chunks, vecs_n, bm, top_k=5)
+
+    assert _CountingChunk.reads == 0
+    assert first == second
+    assert len(second) == 4  # a1/a2 share (article, section)
+    assert scores["hybrid"].shape == (len(chunks),)
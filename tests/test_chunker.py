@@ -1,13 +1,15 @@
 """Tests for chunking functionality."""
 
 import pytest
+import pathlib
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from clockify_rag.chunking import sliding_chunks
+from clockify_rag import chunking
+from clockify_rag.chunking import build_chunks, chunk_articles, sliding_chunks
 from clockify_rag.utils import tokenize
 
 
@@ -84,5 +86,60 @@ class TestTokenizer:
         assert all(t.islower() or not t.isalpha() for t in tokens)
 
 
+def _write_corpus(tmp_path, n_articles):
+    body = "Start the timer from the tracker. Stop it when you finish. " * 40
+    path = tmp_path / "knowledge_helpcenter.md"
+    path.write_text(
+        "".join(
+            f"# [ARTICLE] Article {i}\nhttps://clockify.me/help/article-{i}\n\n"
+            f"## Overview\nArticle {i}. {body[: 200 + 37 * i]}\n\n## Details\nDetails for {i}.\n\n"
+            for i in range(n_articles)
+        ),
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+class TestParallelChunking:
+    """Process-pool chunking must match serial chunking exactly."""
+
+    def test_parallel_output_identical_to_serial(self, tmp_path):
+        path = _write_corpus(tmp_path, chunking.PARALLEL_CHUNK_MIN_ARTICLES * 2 + 5)
+
+        serial = build_chunks(path, workers=1)
+        parallel = build_chunks(path, workers=3)
+
+        assert len(serial) > chunking.PARALLEL_CHUNK_MIN_ARTICLES * 2
+        assert parallel == serial
+
+    def test_small_corpus_stays_serial(self, tmp_path, monkeypatch):
+        path = _write_corpus(tmp_path, 3)
+
+        def no_pool(*_args, **_kwargs):
+            raise AssertionError("process pool started for a small corpus")
+
+        monkeypatch.setattr(chunking, "ProcessPoolExecutor", no_pool)
+        assert len(build_chunks(path, workers=8)) >= 3
+
+    def test_broken_pool_falls_back_to_serial(self, tmp_path, monkeypatch):
+        path = _write_corpus(tmp_path, chunking.PARALLEL_CHUNK_MIN_ARTICLES)
+        serial = build_chunks(path, workers=1)
+
+        def broken_pool(*_args, **_kwargs):
+            raise OSError("no semaphores")
+
+        monkeypatch.setattr(chunking, "ProcessPoolExecutor", broken_pool)
+        assert build_chunks(path, workers=4) == serial
+
+    def test_chunk_articles_keeps_one_result_per_article(self):
+        articles = [
+            (pathlib.Path("kb.md"), "kb", {"title": f"Article {i}", "url": None, "body": f"## Body\nText {i}."})
+            for i in range(5)
+        ]
+        results = chunk_articles(articles, workers=1)
+        assert len(results) == 5
+        assert [r[0]["title"] for r in results] == [f"Article {i}" for i in range(5)]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
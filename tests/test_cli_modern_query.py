@@ -111,3 +111,18 @@ def test_query_default_output_no_sources(monkeypatch, cli_runner):
     assert "No source answer" in out
     assert "Sources:" in out
     assert "(none)" in out
+
+
+def test_ingest_passes_workers_to_build(monkeypatch, cli_runner, tmp_path):
+    """ragctl ingest --workers controls the number of chunking processes."""
+
+    kb = tmp_path / "knowledge_helpcenter.md"
+    kb.write_text("# [ARTICLE] Track time\n\n## Body\nStart the timer.\n", encoding="utf-8")
+    calls = []
+    monkeypatch.setattr(cli_modern, "build", lambda path, retries=2, workers=None: calls.append(workers))
+    monkeypatch.setattr(cli_modern, "get_index_info", lambda: {"index_ready": True})
+
+    response = cli_runner.invoke(cli_modern.app, ["ingest", "--input", str(kb), "--force", "--workers", "4"])
+
+    assert response.exit_code == 0, response.stdout
+    assert calls == [4]
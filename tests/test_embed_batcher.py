@@ -0,0 +1,130 @@
+"""Tests for micro-batching of concurrent query embeddings."""
+
+import threading
+
+import numpy as np
+import pytest
+
+import clockify_rag.config as config
+import clockify_rag.embed_batcher as embed_batcher
+import clockify_rag.retrieval as retrieval
+from clockify_rag.embed_batcher import EmbeddingBatcher, embed_query_batch
+from clockify_rag.metrics import MetricNames, get_metrics
+
+
+def _vector_for(text, dim=16):
+    v = np.random.default_rng(abs(hash(text)) % (2**32)).standard_normal(dim).astype("float32")
+    return v / np.linalg.norm(v)
+
+
+class _RecordingBackend:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        threading.Event().wait(self.delay)
+        return np.stack([_vector_for(t) for t in texts])
+
+
+def _histogram_count(name):
+    stats = get_metrics().get_histogram_stats(name)
+    return stats["count"] if stats else 0
+
+
+def _concurrently(fn, items):
+    results = [None] * len(items)
+    barrier = threading.Barrier(len(items))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = fn(items[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_requests_share_batched_calls():
+    backend = _RecordingBackend(delay=0.02)
+    batcher = EmbeddingBatcher(backend, max_batch=16, max_wait_ms=50)
+    sizes0 = _histogram_count(MetricNames.QUERY_EMBED_BATCH_SIZE)
+    waits0 = _histogram_count(MetricNames.QUERY_EMBED_QUEUE_WAIT)
+    texts = [f"question {i}" for i in range(50)]
+
+    vectors = _concurrently(batcher.embed, texts)
+    batcher.close()
+
+    for text, vec in zip(texts, vectors):
+        np.testing.assert_allclose(vec, _vector_for(text))
+    assert sorted(t for batch in backend.batches for t in batch) == sorted(texts)
+    assert len(backend.batches) < 10
+    assert max(len(batch) for batch in backend.batches) <= 16
+    assert _histogram_count(MetricNames.QUERY_EMBED_BATCH_SIZE) - sizes0 == len(backend.batches)
+    assert _histogram_count(MetricNames.QUERY_EMBED_QUEUE_WAIT) - waits0 == len(texts)
+
+
+def test_identical_texts_share_a_slot_and_get_their_own_copy():
+    backend = _RecordingBackend()
+    batcher = EmbeddingBatcher(backend, max_batch=8, max_wait_ms=100)
+
+    vectors = _concurrently(batcher.embed, ["same question"] * 6)
+    batcher.close()
+
+    assert backend.batches == [["same question"]]
+    vectors[0][:] = 0
+    np.testing.assert_allclose(vectors[1], _vector_for("same question"))
+
+
+def test_backend_failure_reaches_every_waiting_caller():
+    def failing(texts):
+        raise ConnectionError("ollama down")
+
+    batcher = EmbeddingBatcher(failing, max_batch=8, max_wait_ms=50)
+    futures = [batcher.submit(f"q{i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result(timeout=5)
+
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
+
+
+@pytest.mark.parametrize("backend", ["local", "ollama"])
+def test_embed_query_batch_uses_one_backend_call(monkeypatch, backend):
+    calls = []
+
+    def fake_batch(texts, *args, **kwargs):
+        calls.append(list(texts))
+        return np.stack([_vector_for(t) for t in texts])
+
+    monkeypatch.setattr(config, "EMB_BACKEND", backend)
+    monkeypatch.setattr("clockify_rag.embedding.embed_local_batch", fake_batch)
+    monkeypatch.setattr("clockify_rag.embeddings_client.embed_texts", fake_batch)
+
+    assert embed_query_batch(["a", "b", "c"]).shape == (3, 16)
+    assert calls == [["a", "b", "c"]]
+
+
+def test_retrieval_embed_query_goes_through_the_batcher(monkeypatch):
+    backend = _RecordingBackend(delay=0.02)
+    monkeypatch.setattr(config, "QUERY_EMBED_BATCH_WAIT_MS", 50.0)
+    monkeypatch.setattr(embed_batcher, "_BATCHER", EmbeddingBatcher(backend, max_batch=32, max_wait_ms=50))
+    monkeypatch.setattr(
+        retrieval, "_embedding_embed_query", lambda *_a, **_k: pytest.fail("per-query embedding was called")
+    )
+    texts = [f"how do i do thing {i}" for i in range(20)]
+
+    vectors = _concurrently(retrieval.embed_query, texts)
+    embed_batcher.shutdown_embedding_batcher()
+
+    assert len(backend.batches) < len(texts)
+    np.testing.assert_allclose(vectors[3], _vector_for(texts[3]))
+    assert texts[3] in retrieval.get_query_embedding_cache()
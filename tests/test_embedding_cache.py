@@ -0,0 +1,173 @@
+"""Tests for the binary embedding cache store (emb_cache/)."""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+from clockify_rag import config
+from clockify_rag.embedding_cache import EmbeddingCacheStore, migrate_jsonl_cache
+from clockify_rag.generations import active_files
+
+
+def _h(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _vecs(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_append_and_reopen_round_trip(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path), "ollama", "nomic-embed-text", 8)
+    hashes = [_h(f"chunk {i}") for i in range(5)]
+    vecs = _vecs(5)
+    store.append(hashes[:3], vecs[:3])
+    store.append(hashes[3:], vecs[3:])
+
+    reopened = EmbeddingCacheStore(str(tmp_path), "ollama", "nomic-embed-text", 8)
+    rows = reopened.lookup(hashes + [_h("missing")])
+    assert rows.tolist() == [0, 1, 2, 3, 4, -1]
+    np.testing.assert_array_equal(reopened.vectors[rows[:5]], vecs)
+    assert not reopened.vectors.flags.writeable
+
+
+def test_append_does_not_rewrite_existing_rows(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+    store.append([_h("a")], _vecs(1))
+    vectors_path = os.path.join(store.path, "vectors.f32")
+    inode = os.stat(vectors_path).st_ino
+
+    store.append([_h("b")], _vecs(1, seed=1))
+
+    assert os.stat(vectors_path).st_ino == inode
+    assert os.path.getsize(vectors_path) == 2 * 8 * 4
+
+
+def test_namespaces_are_keyed_by_backend_model_and_dim(tmp_path):
+    EmbeddingCacheStore(str(tmp_path), "ollama", "nomic-embed-text", 8).append([_h("a")], _vecs(1))
+
+    assert len(EmbeddingCacheStore(str(tmp_path), "ollama", "nomic-embed-text", 8)) == 1
+    assert len(EmbeddingCacheStore(str(tmp_path), "ollama", "other-model", 8)) == 0
+    assert len(EmbeddingCacheStore(str(tmp_path), "local", "nomic-embed-text", 8)) == 0
+    assert len(EmbeddingCacheStore(str(tmp_path), "ollama", "nomic-embed-text", 16)) == 0
+
+
+def test_compact_drops_stale_and_superseded_rows(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+    vecs = _vecs(4)
+    store.append([_h("a"), _h("b"), _h("c")], vecs[:3])
+    store.append([_h("a")], vecs[3:])  # later row wins
+
+    assert store.rows == 4
+    assert store.stale_rows([_h("a"), _h("c")]) == 2
+    assert store.compact([_h("a"), _h("c")]) == 2
+
+    reopened = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+    assert reopened.rows == 2
+    assert _h("b") not in reopened
+    np.testing.assert_array_equal(reopened.get(_h("a")), vecs[3])
+    np.testing.assert_array_equal(reopened.get(_h("c")), vecs[2])
+
+
+def test_torn_append_is_repaired_on_open(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+    store.append([_h("a"), _h("b")], _vecs(2))
+    # Simulate a crash after the matrix write but before the hash line was complete
+    with open(os.path.join(store.path, "vectors.f32"), "ab") as f:
+        f.write(_vecs(1, seed=3).tobytes())
+    with open(os.path.join(store.path, "hashes.txt"), "a") as f:
+        f.write(_h("c")[:10])
+
+    reopened = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+
+    assert reopened.rows == 2
+    assert _h("c") not in reopened
+    reopened.append([_h("c")], _vecs(1, seed=4))
+    assert EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8).lookup([_h("c")]).tolist() == [2]
+
+
+def test_migrates_legacy_jsonl_once(tmp_path, monkeypatch):
+    legacy = tmp_path / "emb_cache.jsonl"
+    root = tmp_path / "emb_cache"
+    monkeypatch.setitem(config.FILES, "emb_cache", str(legacy))
+    monkeypatch.setitem(config.FILES, "emb_cache_store", str(root))
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    dim = config.EMB_DIM_LOCAL
+    vecs = _vecs(2, dim=dim)
+    lines = [
+        {"hash": _h("a"), "embedding": vecs[0].tolist(), "backend": "local", "model": "all-MiniLM-L6-v2", "dim": dim},
+        {"hash": _h("b"), "embedding": vecs[1].tolist(), "backend": "local", "model": "all-MiniLM-L6-v2", "dim": dim},
+        {"hash": _h("c"), "embedding": [1.0] * 768, "backend": "ollama", "model": "nomic-embed-text", "dim": 768},
+    ]
+    legacy.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n", encoding="utf-8")
+
+    store = EmbeddingCacheStore.open()
+
+    assert len(store) == 2
+    np.testing.assert_allclose(store.get(_h("b")), vecs[1])
+    assert not legacy.exists()
+    assert (tmp_path / "emb_cache.jsonl.migrated").exists()
+    assert len(EmbeddingCacheStore(str(root), "ollama", "nomic-embed-text", 768)) == 1
+    # Nothing left to migrate on the next open
+    assert len(EmbeddingCacheStore.open()) == 2
+
+
+def test_append_rejects_wrong_shape(tmp_path):
+    store = EmbeddingCacheStore(str(tmp_path), "ollama", "m", 8)
+    with pytest.raises(ValueError):
+        store.append([_h("a")], _vecs(1, dim=4))
+
+
+def test_migrate_jsonl_cache_returns_imported_count(tmp_path):
+    legacy = tmp_path / "emb_cache.jsonl"
+    legacy.write_text(json.dumps({"hash": _h("a"), "embedding": [0.5] * 8, "backend": "ollama", "model": "m"}) + "\n")
+
+    assert migrate_jsonl_cache(str(legacy), str(tmp_path / "store")) == 1
+    assert len(EmbeddingCacheStore(str(tmp_path / "store"), "ollama", "m", 8)) == 1
+
+
+def test_rebuild_embeds_only_changed_chunks(tmp_path, monkeypatch):
+    from unittest.mock import patch
+
+    from clockify_rag import build
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    monkeypatch.setattr(config, "EMB_CACHE_COMPACT_RATIO", 0.5)
+    kb = tmp_path / "knowledge_helpcenter.md"
+    article = "# [ARTICLE] {title}\nhttps://clockify.me/help/{slug}\n\n## Body\n{body}\n\n"
+    kb.write_text(
+        article.format(title="Track time", slug="track", body="Start the timer to record time.")
+        + article.format(title="Lock timesheets", slug="lock", body="Lock timesheets from settings."),
+        encoding="utf-8",
+    )
+    embedded = []
+
+    def fake_embed(texts, normalize=False):
+        embedded.append(len(texts))
+        return np.stack([_vecs(1, dim=config.EMB_DIM_LOCAL, seed=len(t))[0] for t in texts])
+
+    with patch("clockify_rag.indexing.embed_local_batch", side_effect=fake_embed):
+        build(str(kb))
+        first = np.load(active_files()["emb"])
+        build(str(kb))
+        assert embedded == [len(first)]  # second build is all cache hits
+        np.testing.assert_array_equal(np.load(active_files()["emb"]), first)
+
+        kb.write_text(
+            article.format(title="Track time", slug="track", body="Start the timer to record time.")
+            + article.format(title="Lock timesheets", slug="lock", body="Admins lock timesheets weekly."),
+            encoding="utf-8",
+        )
+        build(str(kb))
+
+    assert embedded[-1] < len(first)
+    store = EmbeddingCacheStore.open()
+    # Changed chunk was appended; its old row stays until stale rows pass the ratio
+    assert store.rows == len(first) + embedded[-1]
+    with open(active_files()["chunks"], encoding="utf-8") as f:
+        live = [_h(json.loads(line)["text"]) for line in f]
+    assert store.stale_rows(live) == embedded[-1]
@@ -10,14 +10,18 @@ def test_embed_texts_does_not_drop_pending(monkeypatch):
     monkeypatch.setattr(config, "EMB_BATCH_SIZE", 2)
     monkeypatch.setattr(config, "EMB_BACKEND", "ollama")
 
-    def fake_embed_single_text(index, text, retries, total):
-        return index, [float(index)]
+    batches = []
 
-    monkeypatch.setattr(embedding, "_embed_single_text", fake_embed_single_text)
+    def fake_embed_text_batch(start, batch, retries, total):
+        batches.append((start, len(batch)))
+        return start, [[float(start + i)] for i in range(len(batch))]
 
-    texts = [f"text-{i}" for i in range(2 * 2 + 1)]  # > EMB_MAX_WORKERS * EMB_BATCH_SIZE
+    monkeypatch.setattr(embedding, "_embed_text_batch", fake_embed_text_batch)
+
+    texts = [f"text-{i}" for i in range(2 * 2 * 2 + 1)]  # > EMB_MAX_WORKERS batches of EMB_BATCH_SIZE
 
     result = embedding.embed_texts(texts)
 
     assert result.shape[0] == len(texts)
     assert np.array_equal(result.flatten(), np.arange(len(texts), dtype=np.float32))
+    assert sorted(batches) == [(0, 2), (2, 2), (4, 2), (6, 2), (8, 1)]
@@ -0,0 +1,127 @@
+"""Batched /api/embed requests in embeddings_client and embedding.embed_texts."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import clockify_rag.config as config
+from clockify_rag import embedding, embeddings_client
+
+
+def _vector(text, dim):
+    """Deterministic non-normalised vector for ``text``."""
+    seed = sum(ord(ch) for ch in text)
+    return [float((seed + i) % 7 + 1) for i in range(dim)]
+
+
+class _StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, dim, batch_api=True):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.dim = dim
+        self.batch_api = batch_api
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests.append((self.path, body))
+        if self.path == "/api/embed" and self.server.batch_api:
+            payload = {"embeddings": [_vector(t, self.server.dim) for t in body["input"]]}
+        elif self.path == "/api/embeddings":
+            payload = {"embedding": _vector(body["prompt"], self.server.dim)}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub_ollama(monkeypatch):
+    servers = []
+
+    def start(batch_api=True):
+        server = _StubOllama(embeddings_client.EMB_DIM, batch_api=batch_api)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(embeddings_client, "RAG_OLLAMA_URL", server.url)
+        return server
+
+    embeddings_client.clear_cache()
+    yield start
+    embeddings_client.clear_cache()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _expected(texts):
+    vecs = np.array([_vector(t, embeddings_client.EMB_DIM) for t in texts], dtype=np.float32)
+    return vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-9)
+
+
+def test_embed_texts_sends_one_request_per_batch(monkeypatch, stub_ollama):
+    server = stub_ollama()
+    monkeypatch.setattr(config, "EMB_BATCH_SIZE", 32)
+    monkeypatch.setattr(config, "EMB_MAX_WORKERS", 4)
+    texts = [f"chunk {i}" for i in range(100)]
+
+    result = embedding.embed_texts(texts, retries=0)
+
+    assert [path for path, _ in server.requests] == ["/api/embed"] * 4
+    assert sorted(len(body["input"]) for _, body in server.requests) == [4, 32, 32, 32]
+    np.testing.assert_allclose(result, _expected(texts), rtol=1e-6)
+
+
+def test_falls_back_to_per_text_requests_without_batch_api(monkeypatch, stub_ollama):
+    server = stub_ollama(batch_api=False)
+    texts = [f"chunk {i}" for i in range(5)]
+
+    first = embeddings_client.embed_texts(texts, retries=0, batch_size=2)
+    second = embeddings_client.embed_texts(texts[:2], retries=0, batch_size=2)
+
+    paths = [path for path, _ in server.requests]
+    # The missing endpoint is probed once, then remembered
+    assert paths.count("/api/embed") == 1
+    assert paths.count("/api/embeddings") == 7
+    np.testing.assert_allclose(first, _expected(texts), rtol=1e-6)
+    np.testing.assert_allclose(second, _expected(texts[:2]), rtol=1e-6)
+
+
+def test_batch_api_can_be_disabled(monkeypatch, stub_ollama):
+    server = stub_ollama()
+    monkeypatch.setattr(embeddings_client, "EMB_BATCH_API", False)
+
+    embeddings_client.embed_texts(["a", "b", "c"], retries=0)
+
+    assert [path for path, _ in server.requests] == ["/api/embeddings"] * 3
+
+
+def test_batch_dimension_mismatch_raises(monkeypatch):
+    def fake_post(url, json_payload, retries, timeout, **kwargs):
+        return {"embeddings": [[1.0] * embeddings_client.EMB_DIM, [1.0, 2.0]]}
+
+    monkeypatch.setattr(embeddings_client, "http_post_with_retries", fake_post)
+    embeddings_client.clear_cache()
+
+    with pytest.raises(embeddings_client.EmbeddingError, match="index 1"):
+        embeddings_client.embed_texts(["ok", "short"], retries=0)
@@ -4,6 +4,7 @@ This module tests the complete workflow from ingestion to query processing
 using a simple test document and mocked external dependencies.
 """
 
+import shutil
 import tempfile
 from pathlib import Path
 from unittest import mock
@@ -11,6 +12,7 @@ from unittest import mock
 import numpy as np
 
 from clockify_rag.config import FILES, EMB_DIM
+from clockify_rag.generations import active_files
 from clockify_rag.indexing import build, load_index
 from clockify_rag.utils import ALLOWED_CORPUS_FILENAME
 
@@ -62,13 +64,15 @@ If you encounter issues, try rebuilding the index or checking your configuration
             ):
                 # Ensure previous embedding cache entries don't leak into this test
                 Path(FILES["emb_cache"]).unlink(missing_ok=True)
+                shutil.rmtree(FILES["emb_cache_store"], ignore_errors=True)
 
                 # Test 1: Build the index
                 build(str(kb_path))
 
                 # Verify index files were created
-                for file_key in ["chunks", "emb", "meta", "bm25", "index_meta"]:
-                    assert Path(FILES[file_key]).exists(), f"Index file {FILES[file_key]} was not created"
+                files = active_files()
+                for file_key in ["chunks", "emb", "meta", "bm25_index", "index_meta"]:
+                    assert Path(files[file_key]).exists(), f"Index file {files[file_key]} was not created"
 
                 # Test 2: Load the index
                 index_data = load_index()
@@ -130,9 +134,21 @@ If you encounter issues, try rebuilding the index or checking your configuration
             kb_path.unlink(missing_ok=True)
 
             # Remove index files created during test
-            for file_key in ["chunks", "emb", "meta", "bm25", "index_meta", "faiss_index", "emb_cache"]:
+            for file_key in [
+                "chunks",
+                "emb",
+                "meta",
+                "bm25",
+                "index_meta",
+                "faiss_index",
+                "emb_cache",
+                "article_manifest",
+            ]:
                 file_path = FILES[file_key]
                 Path(file_path).unlink(missing_ok=True)
+            shutil.rmtree(FILES["bm25_index"], ignore_errors=True)
+            shutil.rmtree(FILES["emb_cache_store"], ignore_errors=True)
+            shutil.rmtree(FILES["index_generations"], ignore_errors=True)
 
 
 def test_config_validation():
@@ -0,0 +1,229 @@
+"""Tests for incremental index rebuilds (clockify_rag.incremental)."""
+
+import hashlib
+import json
+import os
+
+import httpx
+import numpy as np
+import pytest
+from asgi_lifespan import LifespanManager
+
+import clockify_rag.api as api_module
+from clockify_rag import config
+from clockify_rag.generations import active_files
+from clockify_rag.incremental import build_incremental, plan_slots
+from clockify_rag.indexing import bm25_scores, build, load_article_manifest, load_bm25
+
+ARTICLE = "# [ARTICLE] {title}\nhttps://clockify.me/help/{slug}\n\n## Overview\n{body}\n\n## Details\n{details}\n\n"
+
+
+def _corpus(articles):
+    return "".join(
+        ARTICLE.format(title=title, slug=title.lower().replace(" ", "-"), body=body, details=f"{title} details: {body}")
+        for title, body in articles
+    )
+
+
+BASE = [
+    ("Track time", "Start the timer to record time on a project."),
+    ("Lock timesheets", "Admins lock timesheets from workspace settings."),
+    ("Invoices", "Create invoices from tracked billable hours."),
+    ("Kiosk", "Employees clock in with a PIN on the shared kiosk."),
+    ("Reports", "Summary reports group time by project and user."),
+]
+EDITED = [
+    ("Track time", "Start the timer to record time on a project."),
+    ("Lock timesheets", "Owners and admins lock timesheets every Monday."),
+    ("Kiosk", "Employees clock in with a PIN on the shared kiosk."),
+    ("Reports", "Summary reports group time by project and user."),
+    ("Approvals", "Managers approve submitted timesheets weekly."),
+]
+
+
+def _fake_embed(texts, normalize=False):
+    rows = []
+    for text in texts:
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        rows.append(np.random.default_rng(seed).standard_normal(config.EMB_DIM_LOCAL).astype(np.float32))
+    return np.stack(rows)
+
+
+@pytest.fixture
+def kb_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(config, "INCREMENTAL_MAX_DRIFT", 1.0)
+    embedded = []
+
+    def fake_embed(texts, normalize=False):
+        embedded.append(len(texts))
+        return _fake_embed(texts)
+
+    monkeypatch.setattr("clockify_rag.indexing.embed_local_batch", fake_embed)
+
+    def enter(name, articles):
+        path = tmp_path / name
+        path.mkdir(exist_ok=True)
+        monkeypatch.chdir(path)
+        (path / "knowledge_helpcenter.md").write_text(_corpus(articles), encoding="utf-8")
+        return path
+
+    enter.embedded = embedded
+    return enter
+
+
+def _snapshot():
+    with open(active_files()["chunks"], encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
+    return chunks, np.load(active_files()["emb"]), load_bm25()
+
+
+def test_plan_slots_fills_holes_then_appends_or_compacts():
+    order, new_slots = plan_slots(10, [2, 3], 4)
+    assert order.tolist() == [0, 1, -1, -1, 4, 5, 6, 7, 8, 9, -1, -1]
+    assert new_slots.tolist() == [2, 3, 10, 11]
+
+    order, new_slots = plan_slots(10, [1, 2, 3, 4, 5, 6, 7], 1)
+    # The hole left below the new size is filled by moving surviving tail rows
+    assert order.tolist() == [0, -1, 8, 9]
+    assert new_slots.tolist() == [1]
+
+
+def test_incremental_matches_full_build(kb_dir):
+    kb_dir("full", EDITED)
+    build("knowledge_helpcenter.md")
+    full_chunks, full_vecs, full_bm = _snapshot()
+
+    kb_dir("inc", BASE)
+    build("knowledge_helpcenter.md")
+    kb_dir("inc", EDITED)  # rewrite the corpus in place
+    before = len(kb_dir.embedded)
+    stats = build_incremental("knowledge_helpcenter.md")
+    inc_chunks, inc_vecs, inc_bm = _snapshot()
+
+    assert stats["mode"] == "incremental"
+    assert stats["articles"] == {"total": 5, "unchanged": 3, "changed": 1, "added": 1, "removed": 1}
+    assert set(stats["timings_ms"]) >= {"diff", "chunk", "embed", "bm25", "write", "total"}
+    # Only the edited and the new article were embedded
+    assert len(kb_dir.embedded) == before + 1
+    assert kb_dir.embedded[-1] == stats["chunks"]["embedded"] < len(inc_chunks)
+
+    full_by_id = {c["id"]: i for i, c in enumerate(full_chunks)}
+    assert sorted(full_by_id) == sorted(c["id"] for c in inc_chunks)
+    perm = np.array([full_by_id[c["id"]] for c in inc_chunks])
+    np.testing.assert_allclose(inc_vecs, full_vecs[perm], rtol=1e-6)
+
+    assert dict(inc_bm["idf"]) == pytest.approx(dict(full_bm["idf"]))
+    assert inc_bm["avgdl"] == pytest.approx(full_bm["avgdl"])
+    for query in ("lock timesheets admins", "approve timesheets", "kiosk pin"):
+        np.testing.assert_allclose(bm25_scores(query, inc_bm), bm25_scores(query, full_bm)[perm], rtol=1e-5)
+
+    manifest = load_article_manifest()
+    rows = sorted(row for article in manifest["articles"].values() for row in article["rows"])
+    assert rows == list(range(len(inc_chunks)))
+    assert manifest["drift_rows"] > 0
+
+
+def test_unchanged_corpus_is_noop(kb_dir):
+    kb_dir("noop", BASE)
+    build("knowledge_helpcenter.md")
+    before = os.stat(active_files()["emb"]).st_mtime_ns
+
+    stats = build_incremental("knowledge_helpcenter.md")
+
+    assert stats["mode"] == "noop"
+    assert stats["chunks"]["embedded"] == 0
+    assert os.stat(active_files()["emb"]).st_mtime_ns == before
+
+
+def test_fingerprint_refresh_publishes_new_generation(kb_dir, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_GENERATIONS", True)
+    path = kb_dir("refresh", BASE)
+    build("knowledge_helpcenter.md")
+    old_files = active_files()
+    with open(old_files["index_meta"], encoding="utf-8") as f:
+        old_meta = json.load(f)
+    # Text before the first article is not part of any article
+    path.joinpath("knowledge_helpcenter.md").write_text("Clockify help center export\n\n" + _corpus(BASE))
+
+    stats = build_incremental("knowledge_helpcenter.md")
+
+    assert stats["mode"] == "noop" and stats["chunks"]["embedded"] == 0
+    new_files = active_files()
+    assert new_files["index_meta"] != old_files["index_meta"]
+    with open(old_files["index_meta"], encoding="utf-8") as f:
+        assert json.load(f) == old_meta  # the previous generation is untouched
+    with open(new_files["index_meta"], encoding="utf-8") as f:
+        assert json.load(f)["kb_sha256"] != old_meta["kb_sha256"]
+    with open(old_files["chunks"], encoding="utf-8") as f:
+        assert _snapshot()[0] == [json.loads(line) for line in f]
+    assert build_incremental("knowledge_helpcenter.md").get("generation") is None  # nothing left to refresh
+
+
+def test_falls_back_to_full_build(kb_dir, monkeypatch):
+    kb_dir("fallback", BASE)
+    assert build_incremental("knowledge_helpcenter.md")["fallback_reason"] == "no article manifest"
+
+    kb_dir("fallback", EDITED)
+    monkeypatch.setattr(config, "INCREMENTAL_MAX_DRIFT", 0.05)
+    stats = build_incremental("knowledge_helpcenter.md")
+
+    assert stats["mode"] == "full"
+    assert "drift" in stats["fallback_reason"]
+    # The full rebuild resets the drift budget
+    assert load_article_manifest()["drift_rows"] == 0
+
+
+def test_ivf_index_is_patched_in_place(kb_dir, monkeypatch):
+    faiss = pytest.importorskip("faiss")
+    monkeypatch.setattr(config, "USE_ANN", "faiss")
+    monkeypatch.setattr(config, "FAISS_IVF_MIN_ROWS", 1)
+    monkeypatch.setattr(config, "ANN_NLIST", 2)
+    kb_dir("faiss", BASE)
+    build("knowledge_helpcenter.md")
+    kb_dir("faiss", EDITED)
+
+    stats = build_incremental("knowledge_helpcenter.md")
+
+    assert stats["faiss"] == "patched"
+    index = faiss.read_index(active_files()["faiss_index"])
+    vecs = np.load(active_files()["emb"])
+    assert index.ntotal == len(vecs)
+    index.nprobe = index.nlist
+    _, ids = index.search(vecs, 1)
+    # FAISS id i still maps to row i of the patched matrix
+    assert ids[:, 0].tolist() == list(range(len(vecs)))
+
+
+@pytest.mark.asyncio
+async def test_ingest_endpoint_incremental_mode(monkeypatch, tmp_path):
+    knowledge_file = tmp_path / "knowledge_helpcenter.md"
+    knowledge_file.write_text("# Test\n\nContent.")
+    calls = []
+
+    def fake_incremental(input_file, retries=2):
+        calls.append(input_file)
+        return {"mode": "incremental", "articles": {"changed": 1}, "timings_ms": {"total": 12.5}}
+
+    monkeypatch.setattr(api_module, "build_incremental", fake_incremental)
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: (["chunk"], [[0.1]], {}, None))
+    app = api_module.create_app()
+
+    async with LifespanManager(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            resp = await client.post(
+                "/v1/ingest", json={"input_file": str(knowledge_file), "mode": "incremental", "force": True}
+            )
+            bad = await client.post("/v1/ingest", json={"input_file": str(knowledge_file), "mode": "partial"})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "completed"
+    assert body["mode"] == "incremental"
+    assert body["timings_ms"]["total"] == 12.5
+    assert "reload" in body["timings_ms"]
+    assert body["stats"]["articles"] == {"changed": 1}
+    assert calls == [str(knowledge_file)]
+    assert bad.status_code == 400
@@ -0,0 +1,178 @@
+"""Tests for versioned index generations and hot snapshot swaps."""
+
+import asyncio
+import hashlib
+import os
+import threading
+
+import httpx
+import numpy as np
+import pytest
+from asgi_lifespan import LifespanManager
+
+import clockify_rag.api as api_module
+from clockify_rag import config
+from clockify_rag.generations import (
+    IndexSnapshot,
+    active_files,
+    current_generation,
+    list_generations,
+    new_generation,
+    pin,
+    pinned_generations,
+    unpin,
+)
+from clockify_rag.indexing import build, load_index
+
+CORPUS = "# [ARTICLE] {title}\nhttps://clockify.me/help/{slug}\n\n## Overview\n{body}\n\n"
+
+
+def _fake_embed(texts, normalize=False):
+    rows = []
+    for text in texts:
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        rows.append(np.random.default_rng(seed).standard_normal(config.EMB_DIM_LOCAL).astype(np.float32))
+    return np.stack(rows)
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr("clockify_rag.indexing.embed_local_batch", _fake_embed)
+    path = tmp_path / "knowledge_helpcenter.md"
+
+    def write(body):
+        path.write_text(CORPUS.format(title="Track time", slug="track-time", body=body), encoding="utf-8")
+        return str(path)
+
+    return write
+
+
+def _names(dirs):
+    return [os.path.basename(d) for d in dirs]
+
+
+def test_generations_are_ordered_by_sequence_and_ignore_other_entries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = tmp_path / config.FILES["index_generations"]
+    for name in ("gen-000010", "gen-000002", "gen-tmp", "notes"):
+        (root / name).mkdir(parents=True)
+    (root / "gen-000005").write_text("not a directory", encoding="utf-8")
+
+    assert _names(list_generations()) == ["gen-000002", "gen-000010"]
+    assert os.path.basename(new_generation()) == "gen-000011"
+    assert _names(list_generations())[-1] == "gen-000011"
+
+
+def test_build_activates_new_generation_and_collects_old(kb, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_KEEP_GENERATIONS", 2)
+
+    stats = build(kb("Start the timer."))
+    assert stats["generation"] == os.path.basename(current_generation())
+    assert _names(list_generations()) == ["gen-000001"]
+    assert active_files()["emb"] == os.path.join(current_generation(), "vecs_n.npy")
+
+    build(kb("Start the timer from the tracker."))
+    build(kb("Start the timer from the tracker or the timesheet."))
+
+    assert os.path.basename(current_generation()) == "gen-000003"
+    # The current generation plus one predecessor are retained
+    assert _names(list_generations()) == ["gen-000002", "gen-000003"]
+    assert not os.path.exists("vecs_n.npy")
+
+
+def test_pinned_generation_survives_until_drained(kb, monkeypatch):
+    monkeypatch.setattr(config, "INDEX_KEEP_GENERATIONS", 1)
+    build(kb("Start the timer."))
+    snapshot = IndexSnapshot.from_result(load_index())
+    old = snapshot.generation
+
+    with snapshot.pinned():
+        build(kb("Start the timer from the tracker."))
+        assert os.path.isdir(old)
+        assert current_generation() != old
+        # Vectors captured from the old generation stay readable
+        assert len(np.asarray(snapshot.vecs_n)) == len(snapshot.chunks)
+
+    assert not os.path.exists(old)
+    assert _names(list_generations()) == ["gen-000002"]
+
+
+def test_failed_build_keeps_current_generation(kb, monkeypatch):
+    build(kb("Start the timer."))
+    current = current_generation()
+
+    def broken_embed(texts, normalize=False):
+        raise RuntimeError("embedding backend down")
+
+    monkeypatch.setattr("clockify_rag.indexing.embed_local_batch", broken_embed)
+    with pytest.raises(RuntimeError):
+        build(kb("An edit that never gets embedded."))
+
+    assert current_generation() == current
+    assert list_generations() == [current]
+
+
+def test_flat_build_supersedes_generations(kb, monkeypatch):
+    build(kb("Start the timer."))
+    monkeypatch.setattr(config, "INDEX_GENERATIONS", False)
+
+    build(kb("Start the timer from the tracker."))
+
+    assert current_generation() is None
+    assert active_files()["emb"] == config.FILES["emb"]
+    assert "tracker" in load_index()["chunks"][0]["text"]
+
+
+def test_load_index_reads_one_generation(kb):
+    build(kb("Start the timer."))
+    first = load_index()
+    build(kb("Start the timer from the tracker."))
+    second = load_index()
+
+    assert first["generation"] != second["generation"]
+    assert second["generation"] == current_generation()
+    assert "tracker" in second["chunks"][0]["text"]
+    assert second["meta"]["chunks"] == len(second["chunks"])
+
+
+@pytest.mark.asyncio
+async def test_query_keeps_captured_snapshot_across_swap(monkeypatch, stub_answer_pipeline):
+    old = IndexSnapshot(chunks=["old"], vecs_n=[[0.1]], bm={"id": "old"}, generation="index_generations/gen-000001")
+    new = IndexSnapshot(chunks=["new"], vecs_n=[[0.2]], bm={"id": "new"}, generation="index_generations/gen-000002")
+    started, release = threading.Event(), threading.Event()
+    seen = []
+
+    def slow_answer_once(question, chunks, vecs_n, bm, *args, **kwargs):
+        seen.append(chunks)
+        started.set()
+        release.wait(5)
+        return {"answer": "ok", "selected_chunks": [0], "metadata": {}}
+
+    monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: old)
+    stub_answer_pipeline(slow_answer_once)
+    app = api_module.create_app()
+
+    async with LifespanManager(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=10.0) as client:
+            query = asyncio.create_task(client.post("/v1/query", json={"question": "How do I track time?"}))
+            await asyncio.to_thread(started.wait, 5)
+
+            # Same swap an ingest performs once the new generation is loaded
+            with app.state.lock:
+                app.state.snapshot = new
+                app.state.chunks = new.chunks
+            pin(new.generation)
+            unpin(old.generation)
+
+            # The app moved on; only the in-flight query still holds the old generation
+            assert pinned_generations()[os.path.normpath(old.generation)] == 1
+            release.set()
+            resp = await query
+
+        assert resp.status_code == 200
+        assert seen == [["old"]]
+        assert os.path.normpath(old.generation) not in pinned_generations()
@@ -17,6 +17,7 @@ from clockify_rag import (
     load_index,
     build_chunks,
 )
+from clockify_rag.generations import active_files
 from clockify_rag.utils import ALLOWED_CORPUS_FILENAME
 
 
@@ -118,17 +119,18 @@ class TestBuildPipeline:
             with patch("clockify_rag.indexing.embed_local_batch", side_effect=mock_embed_batch):
                 # Build the index
                 build(sample_kb_path)
+            files = {key: os.path.join(temp_build_dir, path) for key, path in active_files().items()}
         finally:
             os.chdir(original_dir)
 
-        # Check all required files exist
-        assert os.path.exists(os.path.join(temp_build_dir, "chunks.jsonl"))
-        assert os.path.exists(os.path.join(temp_build_dir, "vecs_n.npy"))
-        assert os.path.exists(os.path.join(temp_build_dir, "bm25.json"))
-        assert os.path.exists(os.path.join(temp_build_dir, "index.meta.json"))
+        # Check all required files exist in the activated generation
+        assert os.path.exists(files["chunks"])
+        assert os.path.exists(files["emb"])
+        assert os.path.isdir(files["bm25_index"])
+        assert os.path.exists(files["index_meta"])
 
         # Verify metadata
-        with open(os.path.join(temp_build_dir, "index.meta.json")) as f:
+        with open(files["index_meta"]) as f:
             meta = json.load(f)
             assert "chunks" in meta
             assert "built_at" in meta
@@ -217,8 +219,8 @@ class TestEdgeCases:
                 build(minimal_kb)
 
             # Should still create valid index
-            assert os.path.exists(os.path.join(temp_build_dir, "chunks.jsonl"))
-            assert os.path.exists(os.path.join(temp_build_dir, "vecs_n.npy"))
+            assert os.path.exists(active_files()["chunks"])
+            assert os.path.exists(active_files()["emb"])
 
             idx = load_index()
             assert len(idx["chunks"]) >= 1
@@ -0,0 +1,366 @@
+"""Tests for the LLM gateway: per-model slots, priority queue, load shedding and its API mapping."""
+
+import asyncio
+import json
+import math
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.answer as answer_module
+import clockify_rag.api as api_module
+import clockify_rag.config as config
+import clockify_rag.retrieval as retrieval
+from clockify_rag import api_client, llm_gateway
+from clockify_rag.api_client import OllamaAPIClient, set_llm_client
+from clockify_rag.circuit_breaker import get_ollama_circuit_breaker
+from clockify_rag.exceptions import LLMOverloadedError
+from clockify_rag.llm_gateway import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMGateway, llm_priority
+from clockify_rag.metrics import MetricNames, get_metrics
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def _queued(gateway, model):
+    return sum(gateway.stats().get(model, {}).get("queued", {}).values())
+
+
+@pytest.fixture
+def fresh_gateway(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_GATEWAY", None)
+
+
+def test_waiters_are_served_interactive_first_then_in_arrival_order():
+    gateway = LLMGateway(max_in_flight=1, max_queue=10, queue_timeout=5.0)
+    release = threading.Event()
+    order = []
+
+    def holder():
+        with gateway.slot("m-order"):
+            release.wait()
+
+    def call(name, priority):
+        with llm_priority(priority), gateway.slot("m-order"):
+            order.append(name)
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    _wait_until(lambda: gateway.stats().get("m-order", {}).get("in_flight") == 1)
+    arrivals = [("bg1", PRIORITY_BACKGROUND), ("int1", PRIORITY_INTERACTIVE), ("bg2", PRIORITY_BACKGROUND)]
+    for n, (name, priority) in enumerate(arrivals + [("int2", PRIORITY_INTERACTIVE)], 1):
+        threads.append(threading.Thread(target=call, args=(name, priority)))
+        threads[-1].start()
+        _wait_until(lambda: _queued(gateway, "m-order") == n)
+    assert gateway.stats()["m-order"]["queued"] == {"interactive": 2, "background": 2}
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["int1", "int2", "bg1", "bg2"]
+    assert gateway.stats()["m-order"]["in_flight"] == 0
+    with pytest.raises(ValueError):
+        with llm_priority("urgent"):
+            pass
+
+
+def test_sheds_on_full_queue_expected_wait_and_expired_deadline():
+    gateway = LLMGateway(max_in_flight=1, max_queue=1, queue_timeout=0.2)
+    metrics = get_metrics()
+
+    def shed_count(reason):
+        return metrics.get_counter(
+            MetricNames.LLM_SHED, labels={"model": "m-shed", "priority": "interactive", "reason": reason}
+        )
+
+    before = {reason: shed_count(reason) for reason in ("timeout", "queue_full", "deadline")}
+    with gateway.slot("m-shed"):
+        # No generation time measured yet: the call queues, then gives up at its deadline
+        start = time.perf_counter()
+        with pytest.raises(LLMOverloadedError) as expired:
+            with gateway.slot("m-shed"):
+                pass
+        assert expired.value.status_code == 503 and time.perf_counter() - start >= 0.2
+
+        held = []
+
+        def queue_forever():
+            with llm_priority(PRIORITY_INTERACTIVE, deadline=math.inf):
+                held.append(gateway.slot("m-shed"))
+                held[0].__enter__()  # never exits: keeps the slot once granted
+
+        waiter = threading.Thread(target=queue_forever)
+        waiter.start()
+        _wait_until(lambda: _queued(gateway, "m-shed") == 1)
+        with pytest.raises(LLMOverloadedError) as full:
+            with gateway.slot("m-shed"):
+                pass
+        assert full.value.status_code == 429 and full.value.retry_after >= 1.0
+        time.sleep(0.3)  # the first call takes ~0.3s: longer than the 0.2s deadline
+    waiter.join(5)  # took over the slot and keeps it
+
+    start = time.perf_counter()
+    with pytest.raises(LLMOverloadedError) as predicted:
+        with gateway.slot("m-shed"):
+            pass
+    assert time.perf_counter() - start < 0.1  # rejected up front, not after waiting
+    assert predicted.value.status_code == 503
+    assert {reason: shed_count(reason) - before[reason] for reason in before} == {
+        "timeout": 1,
+        "queue_full": 1,
+        "deadline": 1,
+    }
+    assert metrics.get_gauge(MetricNames.LLM_IN_FLIGHT, labels={"model": "m-shed"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_waiter_cancelled_or_timed_out_leaves_the_queue():
+    gateway = LLMGateway(max_in_flight=1, max_queue=10, queue_timeout=5.0)
+    release = asyncio.Event()
+
+    async def holder():
+        async with gateway.aslot("m-async"):
+            await release.wait()
+
+    async def waiter():
+        async with gateway.aslot("m-async"):
+            return "served"
+
+    hold = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    cancelled = asyncio.create_task(waiter())
+    served = asyncio.create_task(waiter())
+    await asyncio.sleep(0.01)
+    assert gateway.stats()["m-async"]["queued"]["interactive"] == 2
+
+    cancelled.cancel()
+    with llm_priority(PRIORITY_BACKGROUND, deadline=0.05):
+        with pytest.raises(LLMOverloadedError):
+            async with gateway.aslot("m-async"):
+                pass
+    assert gateway.stats()["m-async"]["queued"] == {"interactive": 1, "background": 0}
+
+    release.set()
+    await hold
+    assert await served == "served"
+    assert cancelled.cancelled()
+    assert gateway.stats()["m-async"] == {
+        "in_flight": 0,
+        "queued": {"interactive": 0, "background": 0},
+        "mean_service_s": gateway.stats()["m-async"]["mean_service_s"],
+    }
+
+
+class _SlowOllama(ThreadingHTTPServer):
+    """Local /api/chat that takes ``chat_delay`` seconds and records peak concurrent chats."""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, chat_delay):
+        super().__init__(("127.0.0.1", 0), _SlowOllamaHandler)
+        self.chat_delay = chat_delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chats = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _SlowOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.chats += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.chat_delay)
+        with server.lock:
+            server.in_flight -= 1
+        payload = json.dumps(
+            {"model": body["model"], "message": {"role": "assistant", "content": "ok"}, "done": True}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def slow_ollama():
+    server = _SlowOllama(chat_delay=0.5)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    set_llm_client(OllamaAPIClient(base_url=server.url, retries=0))
+    get_ollama_circuit_breaker().reset()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _burst(n_callers, model):
+    """``n_callers`` concurrent chat completions; returns ("ok" or shed status, seconds) per caller."""
+    barrier = threading.Barrier(n_callers)
+    outcomes = [None] * n_callers
+
+    def caller(i):
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            api_client.chat_completion([{"role": "user", "content": f"q{i}"}], model=model)
+            outcomes[i] = ("ok", time.perf_counter() - start)
+        except LLMOverloadedError as exc:
+            outcomes[i] = (exc.status_code, time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(n_callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    return outcomes
+
+
+def test_load_against_slow_ollama_caps_in_flight_and_sheds_early(monkeypatch, fresh_gateway, slow_ollama):
+    monkeypatch.setattr(config, "LLM_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(config, "LLM_QUEUE_MAX", 4)
+    monkeypatch.setattr(config, "LLM_QUEUE_TIMEOUT", 0.7)
+    delay = slow_ollama.chat_delay
+    waits = get_metrics().get_histogram(MetricNames.LLM_QUEUE_WAIT, labels={"priority": "interactive"})
+    waits_before = waits.count if waits else 0
+
+    # Cold (no generation time known yet): 2 generate, 4 queue, the other 10 get 429 at once;
+    # the queued pair that would start after one more round (2 x 0.5s) gives up at the 0.7s deadline
+    cold = _burst(16, "slow-model")
+    assert sorted(status for status, _ in cold if status != "ok") == [429] * 10 + [503] * 2
+    assert [status for status, _ in cold].count("ok") == 4
+    assert max(elapsed for status, elapsed in cold if status == 429) < delay
+    assert min(elapsed for status, elapsed in cold if status == 503) >= 0.7
+
+    # Warm (mean generation 0.5s over 2 slots): the 3rd queued call would wait 0.75s > 0.7s, so
+    # everything past 2 generating + 2 queued is shed up front with 503 instead of waiting
+    warm = _burst(16, "slow-model")
+    assert [status for status, _ in warm].count("ok") == 4
+    assert max(elapsed for status, elapsed in warm if status != "ok") < delay
+    assert {status for status, _ in warm if status != "ok"} == {503}
+
+    assert slow_ollama.chats == 8 and slow_ollama.max_in_flight == 2
+    assert get_ollama_circuit_breaker().get_stats()["failure_count"] == 0
+    waits = get_metrics().get_histogram(MetricNames.LLM_QUEUE_WAIT, labels={"priority": "interactive"})
+    assert waits.count - waits_before == 8
+    stats = llm_gateway.get_llm_gateway().stats()["slow-model"]
+    assert stats["in_flight"] == 0 and stats["mean_service_s"] >= delay
+
+
+def test_rerank_queues_as_background(monkeypatch):
+    seen = []
+
+    def record_slot(model):
+        seen.append(llm_gateway._request_class.get()[0])
+        return nullcontext()
+
+    monkeypatch.setattr(api_client, "llm_slot", record_slot)
+    chunks = [{"id": f"c{i}", "text": f"passage {i}"} for i in range(3)]
+
+    retrieval.rerank_with_llm("which passage covers the gateway?", chunks, [0, 1, 2], {})
+    api_client.chat_completion([{"role": "user", "content": "hi"}])
+
+    assert seen == [PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE]
+
+
+def test_shed_answer_propagates_instead_of_refusal(
+    monkeypatch, fresh_gateway, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(config, "LLM_MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(config, "LLM_QUEUE_TIMEOUT", 0.0)
+    monkeypatch.setattr(answer_module, "coverage_ok", lambda *_args: True)
+    monkeypatch.setattr(retrieval, "_embedding_embed_query", lambda question, retries=0: sample_embeddings[0])
+
+    with llm_gateway.get_llm_gateway().slot(config.RAG_CHAT_MODEL):
+        with pytest.raises(LLMOverloadedError):
+            answer_module.answer_once("How do I track time?", sample_chunks, sample_embeddings, sample_bm25)
+    result = answer_module.answer_once("How do I track time?", sample_chunks, sample_embeddings, sample_bm25)
+
+    assert result["answer"]
+
+
+@pytest.mark.parametrize("pipeline", ["thread", "async"])
+@pytest.mark.parametrize("status", [429, 503])
+def test_api_maps_shed_queries_to_status_with_retry_after(
+    monkeypatch, stub_answer_pipeline, pipeline, status, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(config, "API_PIPELINE", pipeline)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(retrieval, "_embed_texts_batch", lambda texts, retries=0: sample_embeddings[: len(texts)])
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+
+    def shed(*_args, **_kwargs):
+        raise LLMOverloadedError("LLM 'm' is overloaded (test)", retry_after=2.2, status_code=status)
+
+    stub_answer_pipeline(shed)
+
+    with TestClient(api_module.create_app()) as client:
+        single = client.post("/v1/query", json={"question": "How do I track time?"})
+        batch = client.post("/v1/query/batch", json={"questions": ["How do I track time?", "Reports"]})
+
+    for response in (single, batch):
+        assert response.status_code == status
+        assert response.headers["Retry-After"] == "3"
+        assert response.headers["x-correlation-id"]
+        assert "overloaded" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("pipeline", ["thread", "async"])
+def test_batch_reports_shed_questions_per_item_and_keeps_served_answers(
+    monkeypatch, stub_answer_pipeline, pipeline, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(config, "API_PIPELINE", pipeline)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(retrieval, "_embed_texts_batch", lambda texts, retries=0: sample_embeddings[: len(texts)])
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+
+    def answer_or_shed(question, *_args, **_kwargs):
+        if question == "Reports":
+            raise LLMOverloadedError("LLM 'm' is overloaded (test)", retry_after=1.5, status_code=503)
+        if question == "Jira":
+            raise LLMOverloadedError("LLM 'm' is overloaded (test)", retry_after=4.2, status_code=429)
+        return {"answer": f"Answer to {question}", "selected_chunks": []}
+
+    stub_answer_pipeline(answer_or_shed)
+
+    with TestClient(api_module.create_app()) as client:
+        partial = client.post("/v1/query/batch", json={"questions": ["How do I track time?", "Reports"]})
+        all_shed = client.post("/v1/query/batch", json={"questions": ["Reports", "Jira"]})
+
+    assert partial.status_code == 200 and "Retry-After" not in partial.headers
+    body = partial.json()
+    assert body["results"][0]["answer"] == "Answer to How do I track time?" and body["results"][1] is None
+    [error] = body["errors"]
+    assert (error["index"], error["status_code"], error["retry_after"]) == (1, 503, 2.0)
+    assert "overloaded" in error["detail"]
+    # Nothing admitted: the shed with the longest wait answers for the batch
+    assert all_shed.status_code == 429 and all_shed.headers["Retry-After"] == "5"
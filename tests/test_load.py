@@ -364,6 +364,190 @@ class TestConcurrencyStress:
         assert len(errors) == 0
 
 
+class TestRequestCoalescingLoad:
+    """Bursts of the same question should produce a single backend call."""
+
+    async def test_api_identical_burst_makes_one_backend_call(self, monkeypatch, stub_answer_pipeline):
+        """Concurrent identical /v1/query requests share one answer_once run."""
+        import asyncio
+
+        import httpx
+        from asgi_lifespan import LifespanManager
+
+        import clockify_rag.api as api_module
+        import clockify_rag.config as config
+        from clockify_rag.metrics import MetricNames, MetricsCollector
+
+        collector = MetricsCollector()
+        monkeypatch.setattr(api_module, "get_metrics", lambda: collector)
+        monkeypatch.setattr("clockify_rag.singleflight.get_metrics", lambda: collector)
+        monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+        monkeypatch.setattr(config, "COALESCE_REQUESTS", True)
+        monkeypatch.setattr(api_module, "ensure_index_ready", lambda retries=2: ([], [], {}, None))
+
+        backend_calls = []
+
+        def slow_answer(question, *_args, **_kwargs):
+            backend_calls.append(question)
+            time.sleep(0.3)
+            return {"answer": "Re-login to resync the timer.", "selected_chunk_ids": ["doc-1"], "metadata": {}}
+
+        stub_answer_pipeline(slow_answer)
+
+        burst = 50
+        app = api_module.create_app()
+        async with LifespanManager(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+                responses = await asyncio.gather(
+                    *[
+                        client.post("/v1/query", json={"question": "Why is the timer not syncing?"})
+                        for _ in range(burst)
+                    ]
+                )
+
+        assert all(r.status_code == 200 for r in responses)
+        payloads = [r.json() for r in responses]
+        assert len(backend_calls) == 1
+        assert {p["answer"] for p in payloads} == {"Re-login to resync the timer."}
+        assert sum(p["metadata"]["coalesced"] for p in payloads) == burst - 1
+        assert collector.get_counter(MetricNames.COALESCED_REQUESTS, labels={"path": "api_query"}) == burst - 1
+
+    async def test_async_answer_once_burst_makes_one_llm_call(self, monkeypatch):
+        """Concurrent identical async_answer_once calls share one LLM request."""
+        import asyncio
+
+        import clockify_rag.async_support as async_support
+        import clockify_rag.config as config
+        import clockify_rag.retrieval as retrieval
+
+        monkeypatch.setattr(config, "COALESCE_REQUESTS", True)
+        chunks = [{"id": f"c{i}", "text": f"Timer sync help {i}", "title": "Timer"} for i in range(4)]
+        vecs_n = np.eye(4, dtype=np.float32)
+        bm = {}
+        scores = {"dense": np.array([0.9, 0.8, 0.1, 0.1], dtype=np.float32)}
+        monkeypatch.setattr(retrieval, "retrieve", lambda *_a, **_k: ([0, 1], scores))
+        monkeypatch.setattr(retrieval, "coverage_ok", lambda *_a, **_k: True)
+        monkeypatch.setattr(retrieval, "pack_snippets", lambda *_a, **_k: ("context", ["c0", "c1"], 10, []))
+
+        llm_calls = []
+
+        async def slow_llm(question, *_args, **_kwargs):
+            llm_calls.append(question)
+            await asyncio.sleep(0.2)
+            return "Re-login to resync the timer.", 0.2, 80, None, ["c0"], {}
+
+        monkeypatch.setattr(async_support, "async_generate_llm_answer", slow_llm)
+
+        results = await asyncio.gather(
+            *[
+                async_support.async_answer_once("why is the timer NOT syncing", chunks, vecs_n, bm, top_k=4)
+                for _ in range(25)
+            ]
+        )
+
+        assert len(llm_calls) == 1
+        assert {r["answer"] for r in results} == {"Re-login to resync the timer."}
+
+
+class TestHotSwapLoad:
+    """Query latency while the index is rebuilt and swapped underneath the API."""
+
+    async def test_p99_query_latency_during_rebuild(self, tmp_path, monkeypatch, stub_answer_pipeline):
+        """p99 /v1/query latency during back-to-back rebuilds stays close to the idle p99."""
+        import asyncio
+        import hashlib
+
+        import httpx
+        from asgi_lifespan import LifespanManager
+
+        import clockify_rag.api as api_module
+        import clockify_rag.config as config
+        from clockify_rag.indexing import build
+        from clockify_rag.retrieval import retrieve
+
+        def fake_embed(texts, normalize=False):
+            rows = [
+                np.random.default_rng(int(hashlib.sha256(t.encode()).hexdigest()[:8], 16)).standard_normal(384)
+                for t in texts
+            ]
+            return np.asarray(rows, dtype=np.float32)
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(config, "EMB_BACKEND", "local")
+        monkeypatch.setattr(config, "USE_ANN", "none")
+        monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+        monkeypatch.setattr(config, "COALESCE_REQUESTS", False)
+        monkeypatch.setattr("clockify_rag.indexing.embed_local_batch", fake_embed)
+        monkeypatch.setattr("clockify_rag.retrieval._embedding_embed_query", lambda q, **_k: fake_embed([q])[0])
+
+        kb = tmp_path / "knowledge_helpcenter.md"
+
+        def write_corpus(revision):
+            kb.write_text(
+                "".join(
+                    f"# [ARTICLE] Article {i}\nhttps://clockify.me/help/article-{i}\n\n## Overview\n"
+                    f"Track time, reports and projects, topic {i} revision {revision if i % 20 == 0 else 0}.\n\n"
+                    for i in range(400)
+                ),
+                encoding="utf-8",
+            )
+
+        write_corpus(0)
+        build(str(kb))
+
+        def answer_with_retrieval(question, chunks, vecs_n, bm, *_args, **_kwargs):
+            selected, _scores = retrieve(question, chunks, vecs_n, bm, top_k=10)
+            return {"answer": "ok", "selected_chunk_ids": [chunks[i]["id"] for i in selected[:3]], "metadata": {}}
+
+        stub_answer_pipeline(answer_with_retrieval)
+
+        async def run_queries(client, n):
+            latencies, statuses = [], []
+            for i in range(n):
+                start = time.perf_counter()
+                resp = await client.post("/v1/query", json={"question": f"track time reports {i}"})
+                latencies.append(time.perf_counter() - start)
+                statuses.append(resp.status_code)
+            return latencies, statuses
+
+        app = api_module.create_app()
+        async with LifespanManager(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=30.0) as client:
+                idle, idle_statuses = await run_queries(client, 200)
+
+                rebuilding = True
+                rebuilds = []
+
+                async def rebuild_loop():
+                    while rebuilding:
+                        rebuilds.append(len(rebuilds) + 1)
+                        write_corpus(rebuilds[-1])
+                        resp = await client.post(
+                            "/v1/ingest", json={"input_file": str(kb), "mode": "incremental", "force": True}
+                        )
+                        assert resp.status_code == 200
+
+                rebuilder = asyncio.create_task(rebuild_loop())
+                busy, busy_statuses = await run_queries(client, 200)
+                rebuilding = False
+                await rebuilder
+
+        idle_p99 = float(np.percentile(idle, 99))
+        busy_p99 = float(np.percentile(busy, 99))
+        print(
+            f"\n/v1/query p99 idle={idle_p99 * 1000:.1f}ms "
+            f"during-rebuild={busy_p99 * 1000:.1f}ms ({len(rebuilds)} swaps)"
+        )
+
+        # No query is rejected or fails while generations are swapped
+        assert set(idle_statuses) == {200}
+        assert set(busy_statuses) == {200}
+        assert len(rebuilds) > 1
+        assert busy_p99 < max(3 * idle_p99, idle_p99 + 0.25), "p99 latency regressed during rebuild"
+
+
 class TestResourceCleanup:
     """Tests for proper resource cleanup."""
 
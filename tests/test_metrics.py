@@ -177,12 +177,12 @@ class TestMetricsExport:
         assert 'http_requests_total{status="200"} 42' in prom_output
         assert "# TYPE active_connections gauge" in prom_output
         assert "active_connections 15" in prom_output
-        assert "# TYPE request_duration_ms summary" in prom_output
-        assert "request_duration_ms_count" in prom_output
-        assert "request_duration_ms_sum" in prom_output
-        assert 'quantile="0.5"' in prom_output
-        assert 'quantile="0.95"' in prom_output
-        assert 'quantile="0.99"' in prom_output
+        assert "# TYPE request_duration_ms histogram" in prom_output
+        assert "request_duration_ms_count 2" in prom_output
+        assert "request_duration_ms_sum 300.0" in prom_output
+        assert 'request_duration_ms_bucket{le="128.0"} 1' in prom_output
+        assert 'request_duration_ms_bucket{le="256.0"} 2' in prom_output
+        assert 'request_duration_ms_bucket{le="+Inf"} 2' in prom_output
 
     def test_export_csv(self):
         """Test CSV export format."""
@@ -368,22 +368,22 @@ class TestMetricNames:
 
 
 class TestHistogramMaxHistory:
-    """Test histogram max history limit."""
+    """Test histogram memory stays bounded."""
 
-    def test_histogram_respects_max_history(self):
-        """Test histogram doesn't grow unbounded."""
+    def test_histogram_memory_is_bounded_by_buckets(self):
+        """Histograms are cumulative, but store bucket counts rather than samples."""
         collector = MetricsCollector(max_history=100)
 
-        # Add 200 observations
-        for i in range(200):
-            collector.observe_histogram("limited_hist", float(i))
+        # Add 20000 observations
+        for i in range(20000):
+            collector.observe_histogram("limited_hist", float(i % 1000))
 
         stats = collector.get_histogram_stats("limited_hist")
-        # Should only keep last 100
-        assert stats.count == 100
-        # Values should be 100-199
-        assert stats.min == 100.0
-        assert stats.max == 199.0
+        assert stats.count == 20000
+        assert stats.min == 0.0
+        assert stats.max == 999.0
+        # ~64 buckets per power of two over 1..999
+        assert len(collector.get_histogram("limited_hist").buckets()) < 700
 
 
 class TestLabeledMetricsExport:
@@ -408,7 +408,7 @@ class TestLabeledMetricsExport:
         prom_output = collector.export_prometheus()
 
         # Should have TYPE declaration exactly once
-        assert prom_output.count("# TYPE request_duration summary") == 1
+        assert prom_output.count("# TYPE request_duration histogram") == 1
 
         # Should have all three labeled series
         assert 'request_duration_count{endpoint="chat"}' in prom_output
@@ -420,10 +420,10 @@ class TestLabeledMetricsExport:
         assert 'request_duration_count{endpoint="search"} 2' in prom_output
         assert 'request_duration_count{endpoint="admin"} 1' in prom_output
 
-        # Verify quantiles exist for all label sets
-        assert 'request_duration{quantile="0.5",endpoint="chat"}' in prom_output
-        assert 'request_duration{quantile="0.5",endpoint="search"}' in prom_output
-        assert 'request_duration{quantile="0.5",endpoint="admin"}' in prom_output
+        # Verify buckets exist for all label sets
+        assert 'request_duration_bucket{endpoint="chat",le="+Inf"} 2' in prom_output
+        assert 'request_duration_bucket{endpoint="search",le="+Inf"} 2' in prom_output
+        assert 'request_duration_bucket{endpoint="admin",le="+Inf"} 1' in prom_output
 
     def test_get_summary_aggregates_labeled_counters(self):
         """Test that get_summary aggregates counters across all label variants.
@@ -496,7 +496,7 @@ class TestLabeledMetricsExport:
         prom_output = collector.export_prometheus()
 
         # Should have TYPE declaration exactly once
-        assert prom_output.count("# TYPE latency summary") == 1
+        assert prom_output.count("# TYPE latency histogram") == 1
 
         # Should have all three series (unlabeled + 2 labeled)
         assert "latency_count 2" in prom_output  # Unlabeled
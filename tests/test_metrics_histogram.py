@@ -0,0 +1,83 @@
+"""Tests for the log-bucket histogram backend and per-thread metric shards."""
+
+import re
+import threading
+
+import numpy as np
+import pytest
+
+from clockify_rag.metrics import LogHistogram, MetricsCollector
+
+
+def _nearest_rank(values, p):
+    data = sorted(values)
+    return data[int(round(p * (len(data) - 1)))]
+
+
+def test_log_histogram_stats_are_exact_or_within_bucket_error():
+    values = np.random.default_rng(0).lognormal(mean=4.0, sigma=1.5, size=5000).tolist()
+    hist = LogHistogram()
+    for v in values:
+        hist.observe(v)
+
+    stats = hist.stats()
+    assert stats.count == len(values)
+    assert stats.min == min(values) and stats.max == max(values)
+    assert stats.mean == pytest.approx(sum(values) / len(values))
+    for p, got in ((0.5, stats.p50), (0.95, stats.p95), (0.99, stats.p99)):
+        assert got == pytest.approx(_nearest_rank(values, p), rel=0.006)
+
+
+def test_cumulative_buckets_count_values_at_or_below_each_bound():
+    values = [-3.0, 0.0, 0.5, 1.0, 1.5, 2.0, 7.0, 8.0, 100.0]
+    hist = LogHistogram()
+    for v in values:
+        hist.observe(v)
+
+    buckets = hist.cumulative_buckets()
+    assert buckets[0] == (0.0, 2)
+    assert [le for le, _ in buckets[1:]] == [2.0**k for k in range(-2, 8)]
+    for le, cumulative in buckets:
+        assert cumulative == sum(v <= le for v in values)
+
+
+def test_sharded_updates_merge_exactly_across_threads():
+    collector = MetricsCollector()
+    barrier = threading.Barrier(16)
+
+    def work(t):
+        barrier.wait()
+        for i in range(500):
+            collector.increment_counter("requests", labels={"worker": str(t % 2)})
+            collector.observe_histogram("latency_ms", float(t * 500 + i + 1))
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert collector.get_counter("requests", {"worker": "0"}) == 4000
+    assert collector.get_counter("requests", {"worker": "1"}) == 4000
+    stats = collector.get_histogram_stats("latency_ms")
+    assert (stats.count, stats.min, stats.max, stats.mean) == (8000, 1.0, 8000.0, 4000.5)
+    assert not collector._shards  # finished threads were folded into the retired shard
+
+    collector.reset()
+    assert collector.get_counter("requests", {"worker": "0"}) == 0.0
+    assert collector.get_histogram_stats("latency_ms") is None
+
+
+def test_prometheus_buckets_are_cumulative_and_end_at_count():
+    collector = MetricsCollector()
+    for v in range(1, 301):
+        collector.observe_histogram("query_latency_ms", float(v), {"route": "query"})
+
+    text = collector.export_prometheus()
+    buckets = re.findall(r'query_latency_ms_bucket\{le="([^"]+)",route="query"\} (\d+)', text)
+    counts = [int(c) for _, c in buckets]
+
+    assert "# TYPE query_latency_ms histogram" in text
+    assert buckets[-1] == ("+Inf", "300") and counts == sorted(counts)
+    assert ("64.0", "64") in buckets
+    assert 'query_latency_ms_sum{route="query"} 45150.0' in text
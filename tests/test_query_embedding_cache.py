@@ -0,0 +1,135 @@
+"""Tests for the query-embedding LRU cache and its use in retrieval."""
+
+import threading
+
+import numpy as np
+import pytest
+
+import clockify_rag.config as config
+import clockify_rag.embedding as embedding
+import clockify_rag.retrieval as retrieval
+from clockify_rag.caching import QueryEmbeddingCache, get_query_embedding_cache
+from clockify_rag.metrics import MetricNames, get_metrics
+
+
+def _vec(seed, dim=None):
+    v = np.random.default_rng(seed).standard_normal(dim or config.EMB_DIM).astype("float32")
+    return v / np.linalg.norm(v)
+
+
+def test_normalised_keys_lru_bound_and_metrics():
+    cache = QueryEmbeddingCache(maxsize=2)
+    metrics = get_metrics()
+    hits0 = metrics.get_counter(MetricNames.QUERY_EMBED_CACHE_HITS)
+    misses0 = metrics.get_counter(MetricNames.QUERY_EMBED_CACHE_MISSES)
+
+    assert cache.get("How do I start a timer?") is None
+    cache.put("How do I start a timer?", _vec(1))
+    hit = cache.get("  how do I   START a timer? ")
+    np.testing.assert_array_equal(hit, _vec(1))
+    hit[:] = 0  # callers get a copy
+    np.testing.assert_array_equal(cache.get("how do i start a timer?"), _vec(1))
+
+    cache.put("second question", _vec(2))
+    cache.get("How do I start a timer?")  # most recently used
+    cache.put("third question", _vec(3))  # evicts "second question"
+    assert "second question" not in cache
+    assert "how do i start a timer?" in cache and len(cache) == 2
+
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+    assert metrics.get_counter(MetricNames.QUERY_EMBED_CACHE_HITS) - hits0 == 3
+    assert metrics.get_counter(MetricNames.QUERY_EMBED_CACHE_MISSES) - misses0 == 1
+    assert metrics.get_gauge(MetricNames.QUERY_EMBED_CACHE_SIZE) == 2
+
+
+def test_entries_are_scoped_to_backend_model_and_dim(monkeypatch):
+    cache = QueryEmbeddingCache(maxsize=10)
+    cache.put("export a report", _vec(1))
+
+    monkeypatch.setattr(config, "EMB_BACKEND", "ollama")
+    assert cache.get("export a report") is None
+    monkeypatch.setattr(config, "EMB_BACKEND", "local")
+    assert cache.get("export a report") is not None
+
+
+def test_save_and_load_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path / "query_embeddings.npz")
+    cache = QueryEmbeddingCache(maxsize=10)
+    for i in range(3):
+        cache.put(f"question {i}", _vec(i))
+    assert cache.save(path) == 3
+
+    restored = QueryEmbeddingCache(maxsize=10)
+    assert restored.load(path) == 3
+    np.testing.assert_array_equal(restored.get("QUESTION 1"), _vec(1))
+
+    # A cache saved for another embedding space is ignored
+    monkeypatch.setattr(config, "RAG_EMBED_MODEL", "other-model")
+    monkeypatch.setattr(config, "EMB_BACKEND", "ollama")
+    assert QueryEmbeddingCache(maxsize=10).load(path) == 0
+    assert QueryEmbeddingCache(maxsize=10).load(str(tmp_path / "missing.npz")) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = QueryEmbeddingCache(maxsize=0)
+    cache.put("question", _vec(1))
+    assert cache.get("question") is None and len(cache) == 0
+
+
+def test_concurrent_access_keeps_the_bound():
+    cache = QueryEmbeddingCache(maxsize=50)
+    vec = _vec(1)
+
+    def worker(n):
+        for i in range(200):
+            cache.put(f"q{n}-{i % 80}", vec)
+            cache.get(f"q{(n + 1) % 8}-{i % 80}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(cache) == 50
+
+
+def test_retrieve_embeds_a_repeated_question_once(monkeypatch, sample_chunks, sample_embeddings, sample_bm25):
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    calls = []
+
+    def fake_embed(question, retries=0):
+        calls.append(question)
+        return sample_embeddings[0]
+
+    monkeypatch.setattr(retrieval, "_embedding_embed_query", fake_embed)
+
+    first, _ = retrieval.retrieve("How do I track time?", sample_chunks, sample_embeddings, sample_bm25, top_k=3)
+    second, _ = retrieval.retrieve("how do I  track time?", sample_chunks, sample_embeddings, sample_bm25, top_k=3)
+
+    assert calls == ["How do I track time?"]
+    assert first == second
+
+
+def test_warm_query_embeddings_batches_missing_questions(monkeypatch, tmp_path):
+    batches = []
+
+    def fake_embed_local_batch(texts, normalize=True):
+        batches.append(list(texts))
+        return np.stack([_vec(len(t)) for t in texts])
+
+    monkeypatch.setattr(embedding, "embed_local_batch", fake_embed_local_batch)
+    monkeypatch.setattr(
+        retrieval, "_embedding_embed_query", lambda *_a, **_k: pytest.fail("warmed question was embedded again")
+    )
+    faq = tmp_path / "faq.txt"
+    faq.write_text("# comment\nHow do I start a timer?\n\nHow do I add a project?\nHow do I start a timer?\n")
+
+    from clockify_rag.precomputed_cache import load_faq_list
+
+    assert retrieval.warm_query_embeddings(load_faq_list(str(faq))) == 2
+    assert retrieval.warm_query_embeddings(load_faq_list(str(faq))) == 0
+    assert batches == [["How do I start a timer?", "How do I add a project?"]]
+
+    vec = retrieval.embed_query("how do i add a project?")
+    np.testing.assert_array_equal(vec, _vec(len("How do I add a project?")))
+    assert get_query_embedding_cache().stats()["hits"] == 1
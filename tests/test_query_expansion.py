@@ -2,6 +2,7 @@
 
 import json
 import os
+import re
 import sys
 
 import pytest
@@ -9,9 +10,12 @@ import pytest
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from clockify_rag import retrieval
 from clockify_rag.retrieval import (
     QUERY_EXPANSIONS_ENV_VAR,
+    QueryExpansionMatcher,
     expand_query,
+    get_query_expansion_matcher,
     load_query_expansion_dict,
     reset_query_expansion_cache,
     set_query_expansion_path,
@@ -155,5 +159,65 @@ class TestQueryExpansion:
             load_query_expansion_dict(force_reload=True, suppress_errors=False)
 
 
+class TestQueryExpansionMatcher:
+    """The compiled matcher agrees with a per-term word-boundary regex."""
+
+    EXPANSIONS = {
+        "time": ["hours"],
+        "time entry": ["timesheet"],
+        "entry": ["record"],
+        "api key": ["token"],
+        "c++": ["cpp"],
+        ".net": ["dotnet"],
+        "2fa": ["two-factor"],
+        "re-run": ["retry"],
+        "time off": ["pto", "hours"],
+    }
+    QUERIES = [
+        "how do i edit a time entry?",
+        "time off request for next week",
+        "where is my api key, and my api  key?",
+        "sdk for c++ and .net apps",
+        "enable 2fa / 2fas",
+        "re-run the time-entry export",
+        "timeentry sometime entries",
+        "",
+    ]
+
+    @staticmethod
+    def _regex_expansion(expansions, text):
+        terms = []
+        for term, synonyms in expansions.items():
+            if re.search(r"\b" + re.escape(term) + r"\b", text):
+                terms.extend(syn for syn in synonyms if syn not in terms)
+        return terms
+
+    def test_matches_per_term_regex(self):
+        matcher = QueryExpansionMatcher(self.EXPANSIONS)
+        for query in self.QUERIES:
+            assert matcher.expansion_terms(query) == self._regex_expansion(self.EXPANSIONS, query), query
+
+    def test_matcher_is_compiled_once_and_reset_with_the_cache(self, tmp_path, monkeypatch):
+        path = tmp_path / "expansions.json"
+        path.write_text(json.dumps({"timer": ["stopwatch"]}))
+        set_query_expansion_path(str(path))
+        compiled = []
+        monkeypatch.setattr(
+            retrieval,
+            "QueryExpansionMatcher",
+            lambda expansions: compiled.append(dict(expansions)) or QueryExpansionMatcher(expansions),
+        )
+
+        assert "stopwatch" in expand_query("start the timer")
+        expand_query("stop the timer")
+        assert get_query_expansion_matcher() is get_query_expansion_matcher()
+        assert len(compiled) == 1
+
+        path.write_text(json.dumps({"timer": ["chronometer"]}))
+        reset_query_expansion_cache()
+        assert "chronometer" in expand_query("start the timer")
+        assert compiled == [{"timer": ["stopwatch"]}, {"timer": ["chronometer"]}]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,7 +4,7 @@ import clockify_rag.api as api_module
 from clockify_rag import config
 
 
-def test_api_privacy_mode_disables_logging(tmp_path, monkeypatch):
+def test_api_privacy_mode_disables_logging(tmp_path, monkeypatch, stub_answer_pipeline):
     log_path = tmp_path / "queries.jsonl"
     log_path.write_text("seed")
     monkeypatch.setattr(config, "QUERY_LOG_FILE", str(log_path))
@@ -16,7 +16,7 @@ def test_api_privacy_mode_disables_logging(tmp_path, monkeypatch):
         "metadata": {},
         "timing": {"total_ms": 9},
     }
-    monkeypatch.setattr(api_module, "answer_once", lambda *_, **__: result_payload)
+    stub_answer_pipeline(lambda *_, **__: result_payload)
 
     app = api_module.create_app()
     with TestClient(app) as client:
@@ -0,0 +1,234 @@
+"""Tests for streamed answers: Ollama NDJSON client, answer filter and /v1/query/stream."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import pytest
+from asgi_lifespan import LifespanManager
+
+import clockify_rag.api as api_module
+import clockify_rag.config as config
+from clockify_rag.answer import AnswerStreamFilter
+from clockify_rag.api_client import OllamaAPIClient, set_llm_client
+from clockify_rag.exceptions import LLMError
+from clockify_rag.metrics import MetricNames, MetricsCollector
+
+ANSWER = {
+    "answer": "Click the timer button to start tracking.\nStop it when you are done.",
+    "confidence": 88,
+    "intent": "feature_howto",
+    "sources_used": ["https://clockify.me/help/time-tracking"],
+}
+
+
+def _pieces(text, size=12):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+class _FakeOllama(ThreadingHTTPServer):
+    """Local /api/chat that streams NDJSON deltas like Ollama."""
+
+    daemon_threads = True
+
+    def __init__(self, pieces, delay=0.0, status=200, error_after=None):
+        super().__init__(("127.0.0.1", 0), _FakeOllamaHandler)
+        self.pieces = pieces
+        self.delay = delay
+        self.status = status
+        self.error_after = error_after
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not body.get("stream"):
+            # Non-streamed calls (e.g. rerank) get the whole reply at once
+            message = {"role": "assistant", "content": "".join(self.server.pieces)}
+            payload = json.dumps({"model": body["model"], "message": message, "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, piece in enumerate(self.server.pieces):
+            if self.server.error_after == i:
+                self._write({"error": "model runner crashed"})
+                break
+            time.sleep(self.server.delay)
+            self._write({"model": body["model"], "message": {"role": "assistant", "content": piece}, "done": False})
+        else:
+            self._write({"model": body["model"], "message": {"role": "assistant", "content": ""}, "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write(self, obj):
+        line = (json.dumps(obj) + "\n").encode()
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def fake_ollama():
+    servers = []
+
+    def start(pieces, **kwargs):
+        server = _FakeOllama(pieces, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        set_llm_client(OllamaAPIClient(base_url=server.url, retries=1))
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_yields_ndjson_pieces_in_order(fake_ollama):
+    pieces = _pieces("Start the timer from the tracker page.")
+    server = fake_ollama(pieces)
+    client = OllamaAPIClient(base_url=server.url, retries=1)
+
+    streamed = list(client.chat_completion_stream([{"role": "user", "content": "How?"}], model="qwen"))
+
+    assert streamed == pieces
+    assert server.requests[0]["stream"] is True
+
+
+def test_client_raises_on_error_line(fake_ollama):
+    server = fake_ollama(_pieces("partial answer text"), error_after=1)
+    client = OllamaAPIClient(base_url=server.url, retries=1)
+
+    with pytest.raises(LLMError):
+        list(client.chat_completion_stream([{"role": "user", "content": "How?"}]))
+
+
+def test_answer_filter_extracts_answer_across_any_split():
+    raw = "```json\n" + json.dumps({"intent": "other", **ANSWER, "reasoning": 'quote " and \\ and é'}) + "\n```"
+    for size in (1, 2, 5, 13):
+        stream_filter = AnswerStreamFilter()
+        assert "".join(stream_filter.feed(p) for p in _pieces(raw, size)) == ANSWER["answer"]
+
+    plain = AnswerStreamFilter()
+    assert "".join(plain.feed(p) for p in ["Plain ", "text ", "reply"]) == "Plain text reply"
+
+
+def _sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def stream_app(monkeypatch, sample_chunks, sample_embeddings, sample_bm25):
+    collector = MetricsCollector()
+    monkeypatch.setattr(api_module, "get_metrics", lambda: collector)
+    monkeypatch.setattr(config, "COALESCE_REQUESTS", False)
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+    scores = {
+        "dense": np.array([0.9, 0.2, 0.8, 0.3, 0.1], dtype=np.float32),
+        "bm25": np.array([0.9, 0.1, 0.7, 0.2, 0.1], dtype=np.float32),
+        "hybrid": np.array([0.9, 0.15, 0.75, 0.25, 0.1], dtype=np.float32),
+    }
+    monkeypatch.setattr("clockify_rag.answer.retrieve", lambda *a, **k: ([0, 2], scores))
+    app = api_module.create_app()
+    app.state.metrics_collector = collector
+    return app
+
+
+async def _stream(app, *questions):
+    """POST each question to /v1/query/stream; return ``(events, elapsed_ms)`` per question."""
+    results = []
+    async with LifespanManager(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=10.0) as client:
+            for question in questions:
+                start = time.perf_counter()
+                async with client.stream("POST", "/v1/query/stream", json={"question": question}) as resp:
+                    assert resp.status_code == 200
+                    assert resp.headers["content-type"].startswith("text/event-stream")
+                    body = "".join([text async for text in resp.aiter_text()])
+                results.append((_sse(body), (time.perf_counter() - start) * 1000))
+    return results
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_sends_retrieval_tokens_then_done(fake_ollama, stream_app):
+    raw_pieces = _pieces(json.dumps(ANSWER), 8)
+    fake_ollama(raw_pieces, delay=0.02)
+
+    [(events, elapsed_ms)] = await _stream(stream_app, "How do I start the timer in the tracker?")
+
+    names = [name for name, _ in events]
+    assert names[0] == "retrieval"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    retrieval = events[0][1]
+    assert retrieval["selected_chunk_ids"] and retrieval["citations"]
+    assert "retrieve_ms" in retrieval["timing"]
+    # Tokens carry only the answer text, not the JSON envelope
+    assert "".join(data["text"] for name, data in events if name == "token") == ANSWER["answer"]
+    done = events[-1][1]
+    assert done["answer"] == ANSWER["answer"]
+    assert done["confidence"] == 88
+    assert done["metadata"]["cache_hit"] is False
+    # The first token was sent well before generation finished
+    ttft = stream_app.state.metrics_collector.get_histogram_stats(
+        MetricNames.TIME_TO_FIRST_TOKEN, labels={"source": "llm"}
+    )
+    assert ttft.count == 1
+    assert ttft.max < elapsed_ms - 100
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_replays_cached_answer(fake_ollama, stream_app):
+    server = fake_ollama(_pieces(json.dumps(ANSWER), 8))
+    question = "How do I stop the timer after tracking?"
+
+    _, (events, _) = await _stream(stream_app, question, question)
+
+    # Only the first request reached the model (rerank + one streamed answer)
+    assert sum(1 for r in server.requests if r["stream"]) == 1
+    assert [name for name, _ in events] == ["retrieval", "token", "done"]
+    assert events[0][1]["cache_type"] == "query_cache"
+    assert events[1][1]["text"] == ANSWER["answer"]
+    assert events[2][1]["metadata"]["cache_hit"] is True
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_reports_llm_failure_as_refusal(fake_ollama, stream_app):
+    fake_ollama([], status=500)
+
+    [(events, _)] = await _stream(stream_app, "Why does the timer fail when the model is down?")
+
+    assert [name for name, _ in events] == ["retrieval", "done"]
+    assert events[-1][1]["refused"] is True
+    assert events[-1][1]["metadata"]["llm_error"] == "llm_error"
@@ -0,0 +1,145 @@
+"""Tests for the configurable rerank backend (none / llm / cross_encoder) and the cross-encoder score cache."""
+
+import numpy as np
+import pytest
+
+import clockify_rag.answer as answer_module
+import clockify_rag.async_support as async_support
+import clockify_rag.config as config
+from clockify_rag import embedding
+from clockify_rag.answer import apply_reranking
+from clockify_rag.api import QueryRequest, _query_params
+from clockify_rag.async_support import async_answer_once
+from clockify_rag.embedding import cross_encoder_scores
+from clockify_rag.retrieval import rerank_with_cross_encoder
+from clockify_rag.utils import tokenize
+
+
+class _TinyCrossEncoder:
+    """CrossEncoder stand-in: scores a pair by how many query terms the passage contains."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=True):
+        assert not show_progress_bar
+        self.calls.append((len(pairs), batch_size))
+        return np.array([sum(t in tokenize(text) for t in set(tokenize(q))) for q, text in pairs], dtype=np.float32)
+
+
+@pytest.fixture
+def tiny_model(monkeypatch):
+    model = _TinyCrossEncoder()
+    monkeypatch.setattr(embedding, "_CROSS_ENCODER", model)
+    monkeypatch.setattr(config, "RERANK_CE_BATCH_SIZE", 8)
+    embedding.clear_cross_encoder_cache()
+    yield model
+    embedding.clear_cross_encoder_cache()
+
+
+def _no_llm_rerank(*_args, **_kwargs):
+    raise AssertionError("the LLM reranker must not be called")
+
+
+def test_scores_are_predicted_in_one_batch_and_cached_per_query_and_chunk(tiny_model, sample_chunks):
+    scores = cross_encoder_scores("How do I track time with the timer?", sample_chunks[:3])
+
+    assert scores.dtype == np.float32 and scores.shape == (3,)
+    assert scores[0] == max(scores)  # "Track time by clicking the timer button ..."
+    assert tiny_model.calls == [(3, 8)]
+
+    # Same pairs (query normalised) come from the cache; only the new chunk is predicted
+    again = cross_encoder_scores("  how do i TRACK time with the timer? ", sample_chunks[:4])
+    np.testing.assert_array_equal(again[:3], scores)
+    assert tiny_model.calls == [(3, 8), (1, 8)]
+
+
+def test_score_cache_is_bounded_and_can_be_disabled(tiny_model, monkeypatch, sample_chunks):
+    monkeypatch.setattr(config, "RERANK_CE_CACHE_SIZE", 2)
+    cross_encoder_scores("timer", sample_chunks[:4])
+    assert len(embedding._CE_SCORE_CACHE) == 2
+    cross_encoder_scores("timer", sample_chunks[2:4])
+    assert tiny_model.calls == [(4, 8)]  # the two most recent pairs were kept
+
+    monkeypatch.setattr(config, "RERANK_CE_CACHE_SIZE", 0)
+    cross_encoder_scores("timer", sample_chunks[2:4])
+    assert tiny_model.calls == [(4, 8), (2, 8)]
+
+
+def test_cross_encoder_rerank_scores_only_the_capped_head(tiny_model, monkeypatch, sample_chunks):
+    monkeypatch.setattr(config, "RERANK_CE_MAX_CANDIDATES", 3)
+    selected = [1, 2, 0, 3, 4]
+
+    order, scores, applied, reason = rerank_with_cross_encoder("track time with the timer", sample_chunks, selected)
+
+    assert applied and reason == ""
+    assert order[0] == 0 and sorted(order[:3]) == [0, 1, 2]
+    assert order[3:] == [3, 4]  # the tail keeps its MMR order
+    assert set(scores) == {0, 1, 2}
+    assert tiny_model.calls == [(3, 8)]
+
+
+def test_cross_encoder_rerank_keeps_mmr_order_without_sentence_transformers(monkeypatch, sample_chunks):
+    def missing():
+        raise ImportError("No module named 'sentence_transformers'")
+
+    monkeypatch.setattr(embedding, "_load_cross_encoder", missing)
+
+    assert rerank_with_cross_encoder("timer", sample_chunks, [2, 0, 1]) == ([2, 0, 1], {}, False, "unavailable")
+
+
+def test_apply_reranking_dispatches_on_backend(tiny_model, monkeypatch, sample_chunks):
+    calls = []
+
+    def fake_llm(question, chunks, selected, scores, **kwargs):
+        calls.append(kwargs)
+        return list(reversed(selected)), {}, True, ""
+
+    monkeypatch.setattr(answer_module, "rerank_with_llm", fake_llm)
+    selected = [1, 2, 0]
+
+    assert apply_reranking("timer", sample_chunks, selected, {}, True, backend="none")[2:4] == (False, "disabled")
+    assert apply_reranking("timer", sample_chunks, selected, {}, True, backend="llm")[0] == [0, 2, 1]
+    assert len(calls) == 1 and not tiny_model.calls
+
+    monkeypatch.setattr(config, "RERANK_BACKEND", "cross_encoder")
+    order, scores, applied, reason, _timing = apply_reranking(
+        "track time with the timer", sample_chunks, selected, {}, True
+    )
+    assert order[0] == 0 and applied and reason == ""
+    assert len(calls) == 1 and tiny_model.calls == [(3, 8)]
+
+
+@pytest.mark.asyncio
+async def test_async_pipeline_reranks_with_cross_encoder_on_the_executor(
+    tiny_model, monkeypatch, sample_chunks, sample_embeddings
+):
+    monkeypatch.setattr(config, "RERANK_BACKEND", "cross_encoder")
+    monkeypatch.setattr(async_support, "async_rerank_with_llm", _no_llm_rerank)
+    n = len(sample_chunks)
+    scores = {"dense": np.ones(n, dtype=np.float32), "bm25": np.ones(n, dtype=np.float32)}
+    scores["hybrid"] = np.linspace(1.0, 0.5, n, dtype=np.float32)
+
+    result = await async_answer_once(
+        "track time with the timer",
+        sample_chunks,
+        sample_embeddings,
+        {},
+        pack_top=3,
+        threshold=0.0,
+        use_rerank=True,
+        retrieved=(list(range(n)), scores),
+    )
+
+    assert result["metadata"]["rerank_applied"] is True
+    assert len(tiny_model.calls) == 1
+
+
+@pytest.mark.parametrize("backend, use_rerank", [("none", False), ("llm", True), ("cross_encoder", True)])
+def test_api_query_params_follow_rerank_backend(monkeypatch, backend, use_rerank):
+    monkeypatch.setattr(config, "RERANK_BACKEND", backend)
+
+    params = _query_params(QueryRequest(question="How do I track time?"), "sig")
+
+    assert params["use_rerank"] is use_rerank
+    assert params["rerank_backend"] == backend  # part of the answer cache key
@@ -0,0 +1,201 @@
+"""Tests for batched retrieval (retrieve_batch, batched BM25) and /v1/query/batch."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+import clockify_rag.config as config
+from clockify_rag import retrieval
+from clockify_rag.indexing import build_bm25, bm25_sparse_scores, bm25_sparse_scores_batch
+
+WORDS = ["timer", "project", "invoice", "report", "export", "client", "tag", "rate", "pricing", "approval"]
+QUESTIONS = [
+    "How do I export the invoice report?",
+    "timer rate for a client project",
+    "pricing of approval",
+    "tag the timer",
+    "nothing matches zzz",
+    "How do I export the invoice report?",
+]
+
+
+class _FakeHNSW:
+    """Returns the same candidates for every query row (single vector or matrix)."""
+
+    def __init__(self, candidates):
+        self.candidates = np.asarray(candidates)
+
+    def knn_query(self, qv, k):
+        rows = 1 if np.ndim(qv) == 1 else len(qv)
+        return None, np.tile(self.candidates[:k], (rows, 1))
+
+
+def _corpus(n=300, dim=16):
+    rng = np.random.default_rng(0)
+    chunks = [
+        {
+            "id": f"c{i}",
+            "title": f"Article {i // 3}",
+            "section": f"Section {i % 3}",
+            "url": f"#a{i // 3}",
+            "text": " ".join(rng.choice(WORDS, size=int(rng.integers(3, 12)))) + f" settings {i}",
+        }
+        for i in range(n)
+    ]
+    vecs_n = rng.standard_normal((n, dim)).astype(np.float32)
+    vecs_n /= np.linalg.norm(vecs_n, axis=1, keepdims=True)
+    return chunks, vecs_n, build_bm25(chunks)
+
+
+def _query_vector(text, dim=16):
+    rng = np.random.default_rng(sum(map(ord, text)))
+    vec = rng.standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+@pytest.fixture
+def embed_calls(monkeypatch):
+    calls = []
+
+    def embed_batch(texts, retries=0):
+        calls.append(list(texts))
+        return np.stack([_query_vector(text) for text in texts])
+
+    monkeypatch.setattr(retrieval, "_embed_texts_batch", embed_batch)
+    monkeypatch.setattr(retrieval, "_embedding_embed_query", lambda text, retries=0: _query_vector(text))
+    return calls
+
+
+@pytest.mark.parametrize("top_k", [None, 5])
+def test_bm25_batch_is_identical_to_single_query_scoring(top_k):
+    _chunks, _vecs, bm = _corpus()
+    queries = QUESTIONS + ["", "report report export"]
+
+    batch = bm25_sparse_scores_batch(queries, bm, top_k=top_k)
+
+    assert len(batch) == len(queries)
+    for query, (ids, scores) in zip(queries, batch):
+        expected_ids, expected_scores = bm25_sparse_scores(query, bm, top_k=top_k)
+        assert ids.dtype == expected_ids.dtype and scores.dtype == expected_scores.dtype
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_array_equal(scores, expected_scores)
+
+
+@pytest.mark.parametrize("ann", ["none", "hnsw"])
+@pytest.mark.parametrize("intent", [False, True])
+def test_retrieve_batch_matches_retrieve_per_question(monkeypatch, embed_calls, ann, intent):
+    monkeypatch.setattr(config, "USE_ANN", ann)
+    monkeypatch.setattr(config, "USE_INTENT_CLASSIFICATION", intent)
+    monkeypatch.setattr(config, "QUERY_EMBED_CACHE_SIZE", 0)
+    chunks, vecs_n, bm = _corpus()
+    hnsw = _FakeHNSW(np.random.default_rng(1).permutation(len(chunks))) if ann == "hnsw" else None
+
+    batch = retrieval.retrieve_batch(QUESTIONS, chunks, vecs_n, bm, top_k=8, hnsw=hnsw)
+    singles = [retrieval.retrieve(q, chunks, vecs_n, bm, top_k=8, hnsw=hnsw) for q in QUESTIONS]
+
+    assert embed_calls[0] == [retrieval.normalize_query(q) for q in dict.fromkeys(QUESTIONS)]  # one batched call
+    assert len(batch) == len(QUESTIONS)
+    for (selected, scores), (expected, expected_scores) in zip(batch, singles):
+        assert selected == expected
+        assert scores["intent_metadata"] == expected_scores["intent_metadata"]
+        np.testing.assert_array_equal(np.asarray(scores["bm25"]), np.asarray(expected_scores["bm25"]))
+        np.testing.assert_allclose(
+            np.asarray(scores["hybrid"]), np.asarray(expected_scores["hybrid"]), rtol=1e-5, atol=1e-6
+        )
+        np.testing.assert_allclose(
+            scores["dense"].take(selected), expected_scores["dense"].take(selected), rtol=1e-5, atol=1e-6
+        )
+
+
+def test_retrieve_batch_embeds_only_cache_misses(monkeypatch, embed_calls):
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    chunks, vecs_n, bm = _corpus(n=30)
+    retrieval.retrieve(QUESTIONS[0], chunks, vecs_n, bm)  # caches the first question's vector
+
+    retrieval.retrieve_batch(QUESTIONS[:3], chunks, vecs_n, bm)
+    retrieval.retrieve_batch(QUESTIONS[:3], chunks, vecs_n, bm)
+
+    assert embed_calls == [[retrieval.normalize_query(q) for q in QUESTIONS[1:3]]]
+    assert retrieval.retrieve_batch([], chunks, vecs_n, bm) == []
+
+
+@pytest.mark.parametrize("pipeline", ["thread", "async"])
+def test_batch_endpoint_retrieves_once_and_limits_llm_concurrency(
+    monkeypatch, stub_answer_pipeline, embed_calls, pipeline, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(config, "API_PIPELINE", pipeline)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "API_BATCH_LLM_CONCURRENCY", 2)
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(retrieval, "_embed_texts_batch", lambda texts, retries=0: sample_embeddings[: len(texts)])
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+    state = {"active": 0, "peak": 0, "calls": []}
+    lock = threading.Lock()
+
+    def fake_answer(question, chunks, vecs_n, bm, **kwargs):
+        selected, _scores = kwargs["retrieved"]
+        with lock:
+            state["calls"].append(question)
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        return {"answer": f"Answer to {question}", "selected_chunks": [chunks[i]["id"] for i in selected]}
+
+    stub_answer_pipeline(fake_answer)
+    questions = ["How do I track time?", "What does the free plan include?", "Reports", "Jira", "Reports"]
+
+    with TestClient(api_module.create_app()) as client:
+        response = client.post("/v1/query/batch", json={"questions": questions, "top_k": 3})
+        too_many = client.post("/v1/query/batch", json={"questions": ["q"] * (config.API_BATCH_MAX_QUESTIONS + 1)})
+        unsafe = client.post("/v1/query/batch", json={"questions": ["ok", "<script>alert(1)</script>"]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["question"] for r in results] == questions
+    assert [r["answer"] for r in results] == [f"Answer to {q}" for q in questions]
+    assert all(0 < len(r["sources"]) <= 3 for r in results)
+    assert sorted(state["calls"]) == sorted(set(questions))  # duplicate question answered once
+    assert state["peak"] <= 2
+    assert too_many.status_code == 422 and unsafe.status_code == 422
+
+
+@pytest.mark.parametrize("pipeline", ["thread", "async"])
+def test_batch_endpoint_reports_failed_questions_per_item(
+    monkeypatch, stub_answer_pipeline, embed_calls, pipeline, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(config, "API_PIPELINE", pipeline)
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(retrieval, "_embed_texts_batch", lambda texts, retries=0: sample_embeddings[: len(texts)])
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+
+    def fake_answer(question, chunks, vecs_n, bm, **kwargs):
+        if question in ("Reports", "Jira"):
+            raise RuntimeError(f"pipeline failed for {question}")
+        return {"answer": f"Answer to {question}", "selected_chunks": []}
+
+    stub_answer_pipeline(fake_answer)
+
+    with TestClient(api_module.create_app()) as client:
+        partial = client.post("/v1/query/batch", json={"questions": ["How do I track time?", "Reports", "Jira"]})
+        failed = client.post("/v1/query/batch", json={"questions": ["Reports", "Jira"]})
+
+    assert partial.status_code == 200
+    body = partial.json()
+    assert body["results"][0]["answer"] == "Answer to How do I track time?"
+    assert body["results"][1:] == [None, None]
+    assert body["errors"] == [
+        {"index": 1, "question": "Reports", "status_code": 500, "detail": "Internal server error", "retry_after": None},
+        {"index": 2, "question": "Jira", "status_code": 500, "detail": "Internal server error", "retry_after": None},
+    ]
+    assert failed.status_code == 500
@@ -0,0 +1,188 @@
+"""Tests for the semantic answer cache and its /v1/query tier."""
+
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.api as api_module
+import clockify_rag.caching as caching
+import clockify_rag.config as config
+from clockify_rag.caching import SemanticAnswerCache
+
+PARAMS = {"top_k": 15, "pack_top": 8, "threshold": 0.25, "use_rerank": True, "index": "sig-1"}
+
+
+def _vec(seed, dim=64):
+    v = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return v / np.linalg.norm(v)
+
+
+def _near(v, seed, eps):
+    """A vector at cosine similarity ~(1 - eps**2 / 2) to ``v``."""
+    noise = _vec(seed, v.shape[0])
+    noise -= noise.dot(v) * v
+    out = v + eps * noise / np.linalg.norm(noise)
+    return out / np.linalg.norm(out)
+
+
+def test_similar_query_hits_and_distinct_query_misses():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.9)
+    timer, export = _vec(1), _vec(2)
+    cache.put("how do i add a timer", timer, "Click the timer.", {"confidence": 80}, params=PARAMS)
+    cache.put("how do i export csv", export, "Use Reports.", {"confidence": 70}, params=PARAMS)
+
+    answer, metadata, similarity, question = cache.get(_near(timer, 3, 0.2), params=PARAMS)
+    assert (answer, question) == ("Click the timer.", "how do i add a timer")
+    assert 0.9 <= similarity < 1.0
+    metadata["confidence"] = 0  # callers get a copy
+    assert cache.get(timer, params=PARAMS)[1]["confidence"] == 80
+
+    assert cache.get(_near(timer, 4, 1.0), params=PARAMS) is None  # ~0.5 similar
+    assert cache.get(_vec(5), params=PARAMS) is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_entries_are_scoped_by_params_and_index_signature():
+    cache = SemanticAnswerCache(maxsize=8, threshold=0.9)
+    cache.put("q", _vec(1), "answer", {}, params=PARAMS)
+
+    assert cache.get(_vec(1), params={**PARAMS, "top_k": 5}) is None
+    assert cache.get(_vec(1), params={**PARAMS, "index": "sig-2"}) is None
+
+    # Storing for a rebuilt index drops everything cached for the old one
+    cache.put("other", _vec(2), "answer", {}, params={**PARAMS, "index": "sig-2"})
+    assert len(cache) == 1
+    assert cache.get(_vec(1), params=PARAMS) is None
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(caching.time, "time", lambda: clock[0])
+    cache = SemanticAnswerCache(maxsize=2, ttl_seconds=60, threshold=0.9)
+    cache.put("a", _vec(1), "A", {}, params=PARAMS)
+    cache.put("b", _vec(2), "B", {}, params=PARAMS)
+    assert cache.get(_vec(1), params=PARAMS)[0] == "A"  # "a" is now most recently used
+    cache.put("c", _vec(3), "C", {}, params=PARAMS)  # evicts "b"
+
+    assert cache.get(_vec(2), params=PARAMS) is None
+    assert len(cache) == 2
+
+    clock[0] += 61
+    assert cache.get(_vec(1), params=PARAMS) is None
+    assert len(cache) == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticAnswerCache(maxsize=0)
+    assert not cache.enabled
+    cache.put("q", _vec(1), "answer", {}, params=PARAMS)
+    assert cache.get(_vec(1), params=PARAMS) is None and len(cache) == 0
+
+
+@pytest.fixture
+def semantic_client(monkeypatch, stub_answer_pipeline):
+    """/v1/query with a semantic cache and a fake embedder mapping paraphrases to nearby vectors."""
+    monkeypatch.setattr(caching, "_SEMANTIC_ANSWER_CACHE", SemanticAnswerCache(maxsize=16, threshold=0.9))
+    monkeypatch.setattr(config, "API_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "COALESCE_REQUESTS", False)
+    monkeypatch.setattr(api_module, "get_query_cache", lambda: caching.QueryCache(maxsize=10))
+    timer = _vec(1, config.EMB_DIM)
+    vectors = {
+        "how do i add a timer": timer,
+        "how to add timer": _near(timer, 2, 0.2),
+        "how do i delete a project": _vec(3, config.EMB_DIM),
+    }
+    monkeypatch.setattr(api_module, "embed_query", lambda text, retries=0: vectors[text.lower()])
+
+    pipeline = stub_answer_pipeline(
+        MagicMock(
+            side_effect=lambda question, *a, **k: {
+                "answer": f"Answer to {question}",
+                "confidence": 80,
+                "refused": False,
+                "selected_chunks": [0],
+                "metadata": {},
+            }
+        )
+    )
+    app = api_module.create_app()
+    app.state.index_ready = True
+    app.state.chunks = [{"id": "c1", "text": "timer"}]
+    app.state.vecs_n = MagicMock()
+    app.state.bm = MagicMock()
+    app.state.hnsw = None
+    return TestClient(app), pipeline
+
+
+def test_api_serves_paraphrase_from_semantic_cache(semantic_client):
+    client, pipeline = semantic_client
+
+    first = client.post("/v1/query", json={"question": "How do I add a timer"}).json()
+    paraphrase = client.post("/v1/query", json={"question": "how to add timer"}).json()
+    other = client.post("/v1/query", json={"question": "How do I delete a project"}).json()
+
+    assert pipeline.call_count == 2
+    assert first["metadata"]["cache_hit"] is False
+    assert paraphrase["answer"] == first["answer"] == "Answer to How do I add a timer"
+    assert paraphrase["metadata"]["cache_type"] == "semantic_cache"
+    assert paraphrase["metadata"]["semantic_match"] == "How do I add a timer"
+    assert paraphrase["metadata"]["semantic_similarity"] >= 0.9
+    assert other["metadata"]["cache_hit"] is False
+
+
+def test_api_checks_exact_cache_tiers_before_embedding_for_semantic_tier(semantic_client, monkeypatch):
+    client, pipeline = semantic_client
+    query_cache = caching.QueryCache(maxsize=10)
+    monkeypatch.setattr(api_module, "get_query_cache", lambda: query_cache)
+    embedded = []
+    embed = api_module._semantic_query_vector
+
+    async def counting_embed(question, executor=None):
+        embedded.append(question)
+        return await embed(question, executor)
+
+    monkeypatch.setattr(api_module, "_semantic_query_vector", counting_embed)
+
+    first = client.post("/v1/query", json={"question": "How do I add a timer"}).json()
+    repeat = client.post("/v1/query", json={"question": "How do I add a timer"}).json()
+    paraphrase = client.post("/v1/query", json={"question": "how to add timer"}).json()
+
+    assert pipeline.call_count == 1
+    assert first["metadata"]["cache_hit"] is False
+    assert repeat["metadata"]["cache_type"] == "query_cache"
+    assert paraphrase["metadata"]["cache_type"] == "semantic_cache"
+    assert embedded == ["How do I add a timer", "how to add timer"]  # no embedding for the exact hit
+
+
+def test_batch_embeds_exact_cache_misses_once_for_semantic_tier_and_retrieval(semantic_client, monkeypatch):
+    client, pipeline = semantic_client
+    query_cache = caching.QueryCache(maxsize=10)
+    monkeypatch.setattr(api_module, "get_query_cache", lambda: query_cache)
+    embedded, retrieved = [], []
+
+    def fake_embed_queries(texts, retries=0):
+        embedded.append(list(texts))
+        return np.stack([api_module.embed_query(text) for text in texts])
+
+    def fake_retrieve_batch(questions, *args, query_vectors=None, **kwargs):
+        retrieved.append((list(questions), query_vectors))
+        return [([0], {}) for _ in questions]
+
+    monkeypatch.setattr(api_module, "embed_queries", fake_embed_queries)
+    monkeypatch.setattr(api_module, "retrieve_batch", fake_retrieve_batch)
+
+    client.post("/v1/query", json={"question": "How do I add a timer"})
+    questions = ["how to add timer", "How do I delete a project", "How do I add a timer"]
+    results = client.post("/v1/query/batch", json={"questions": questions}).json()["results"]
+
+    assert [r["metadata"]["cache_type"] for r in results[::2]] == ["semantic_cache", "query_cache"]
+    assert results[1]["metadata"]["cache_hit"] is False
+    assert pipeline.call_count == 2
+    assert len(embedded) == 1 and len(embedded[0]) == 2  # the query-cache hit is not embedded
+    [(pending, vectors)] = retrieved
+    assert pending == ["How do I delete a project"] and len(vectors) == 1
@@ -0,0 +1,122 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from clockify_rag.metrics import MetricNames, MetricsCollector
+from clockify_rag.singleflight import SingleFlight, request_key
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    import clockify_rag.singleflight as singleflight
+
+    fresh = MetricsCollector()
+    monkeypatch.setattr(singleflight, "get_metrics", lambda: fresh)
+    return fresh
+
+
+def test_request_key_normalises_question():
+    assert request_key("  Why is the TIMER not   syncing ", top_k=12) == request_key(
+        "why is the timer not syncing", top_k=12
+    )
+    assert request_key("why", top_k=12) != request_key("why", top_k=5)
+
+
+def test_threads_share_one_execution(collector):
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": "ok"}
+
+    results = []
+
+    def caller():
+        results.append(flight.do("key", work))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while collector.get_counter(MetricNames.COALESCED_REQUESTS, labels={"path": "test"}) < 7:
+        assert time.time() < deadline, "followers never joined the flight"
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert all(result == {"answer": "ok"} for result, _ in results)
+    assert len({id(result) for result, _ in results}) == 8  # each follower has its own copy
+    assert flight.in_flight() == 0
+
+
+def test_exception_reaches_every_caller():
+    flight = SingleFlight("test")
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def run():
+        return await asyncio.gather(*[flight.do_async("key", boom) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(err, RuntimeError) for err in errors)
+    assert flight.in_flight() == 0
+
+
+async def test_async_callers_share_one_task(collector):
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    results = await asyncio.gather(*[flight.do_async("key", work) for _ in range(5)])
+    again = await flight.do_async("key", work)
+
+    assert len(calls) == 2  # the later call starts a new flight
+    assert [shared for _, shared in results].count(False) == 1
+    assert again == ("answer", False)
+    assert collector.get_counter(MetricNames.COALESCED_REQUESTS, labels={"path": "test"}) == 4
+
+
+async def test_followers_get_a_shallow_copy_of_the_result():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return {"answer": "ok", "metadata": {"intent": "howto"}}
+
+    results = [result for result, _ in await asyncio.gather(*[flight.do_async("key", work) for _ in range(3)])]
+    results[1]["metadata"] = {"coalesced": True}
+
+    assert results[0] == results[2] == {"answer": "ok", "metadata": {"intent": "howto"}}
+    assert results[0]["metadata"] is results[2]["metadata"]  # shallow: nested values are shared
+
+
+async def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do_async("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do_async("key", work))
+    await asyncio.sleep(0)
+    follower.cancel()
+
+    assert await leader == ("done", False)
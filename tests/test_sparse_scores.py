@@ -0,0 +1,93 @@
+"""Tests for sparse retrieval scores on the ANN path."""
+
+import numpy as np
+import pytest
+
+import clockify_rag.config as config
+from clockify_rag import retrieval
+from clockify_rag.indexing import build_bm25
+from clockify_rag.retrieval import SparseScores, _sparse_zscore_at, compute_confidence_from_scores
+
+
+class _FakeHNSW:
+    def __init__(self, candidates):
+        self.candidates = np.asarray(candidates)
+
+    def knn_query(self, qv, k):
+        return None, self.candidates[None, :k]
+
+
+def _corpus(n=40, dim=8):
+    words = ["timer", "project", "invoice", "report", "export", "client", "tag", "rate"]
+    chunks = [
+        {
+            "id": f"c{i}",
+            "title": f"Article {i}",
+            "section": "Main",
+            "url": f"#a{i}",
+            "text": f"{words[i % 8]} {words[(i * 3) % 8]} settings {i}",
+        }
+        for i in range(n)
+    ]
+    rng = np.random.default_rng(0)
+    vecs_n = rng.standard_normal((n, dim)).astype(np.float32)
+    vecs_n /= np.linalg.norm(vecs_n, axis=1, keepdims=True)
+    return chunks, vecs_n, build_bm25(chunks)
+
+
+def test_sparse_scores_index_like_their_dense_array():
+    scores = SparseScores(6, np.array([4, 1]), np.array([0.5, -2.0]))
+
+    assert len(scores) == 6 and scores.shape == (6,)
+    assert scores[1] == pytest.approx(-2.0) and scores[0] == 0.0
+    np.testing.assert_allclose(scores.take([4, 3, 1]), [0.5, 0.0, -2.0])
+    np.testing.assert_allclose(np.asarray(scores), [0, -2.0, 0, 0, 0.5, 0])
+    assert scores.get(9, default=-1.0) == -1.0
+    with pytest.raises(IndexError):
+        scores[6]
+
+
+def test_sparse_zscore_matches_dense_normalization():
+    dense = np.zeros(50, dtype=np.float32)
+    ids = np.array([3, 7, 20, 41])
+    dense[ids] = [2.5, 0.3, 7.0, 1.1]
+    positions = np.array([7, 0, 41, 20])
+
+    expected = retrieval.normalize_scores_zscore(dense)[positions]
+    np.testing.assert_allclose(_sparse_zscore_at(SparseScores(50, ids, dense[ids]), positions), expected, rtol=1e-5)
+    assert not _sparse_zscore_at(SparseScores(50, ids[:0], dense[:0]), positions).any()
+
+
+def test_ann_retrieval_returns_sparse_scores_matching_linear_scan(monkeypatch):
+    monkeypatch.setattr(config, "USE_ANN", "hnsw")
+    monkeypatch.setattr(config, "USE_INTENT_CLASSIFICATION", False)
+    monkeypatch.setattr(config, "HUB_PAGE_SCORE_MULTIPLIER", 1.0)
+    chunks, vecs_n, bm = _corpus()
+    monkeypatch.setattr(retrieval, "embed_query", lambda question, retries=0: vecs_n[5])
+    every_chunk = _FakeHNSW(np.random.default_rng(1).permutation(len(chunks)))
+
+    linear, linear_scores = retrieval.retrieve("export the invoice report", chunks, vecs_n, bm, top_k=10)
+    selected, scores = retrieval.retrieve("export the invoice report", chunks, vecs_n, bm, top_k=10, hnsw=every_chunk)
+
+    assert isinstance(scores["hybrid"], SparseScores) and isinstance(scores["bm25"], SparseScores)
+    assert selected == linear
+    np.testing.assert_allclose(np.asarray(scores["hybrid"]), linear_scores["hybrid"], rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(np.asarray(scores["bm25"]), linear_scores["bm25"])
+    assert compute_confidence_from_scores(scores, selected) == compute_confidence_from_scores(linear_scores, selected)
+
+
+def test_ann_retrieval_stores_only_candidate_scores(monkeypatch):
+    monkeypatch.setattr(config, "USE_ANN", "hnsw")
+    monkeypatch.setattr(config, "HUB_PAGE_SCORE_MULTIPLIER", 0.5)
+    chunks, vecs_n, bm = _corpus(n=400)
+    monkeypatch.setattr(retrieval, "embed_query", lambda question, retries=0: vecs_n[5])
+    candidates = np.arange(0, 400, 8)[: config.ANN_CANDIDATE_MIN]
+
+    selected, scores = retrieval.retrieve("timer rate", chunks, vecs_n, bm, top_k=5, hnsw=_FakeHNSW(candidates))
+
+    hybrid = scores["hybrid"]
+    assert len(hybrid) == len(chunks)
+    assert hybrid.ids.size == candidates.size and set(hybrid.ids.tolist()) == set(candidates.tolist())
+    assert scores["bm25"].ids.size < len(chunks)
+    assert set(selected) <= set(candidates.tolist())
+    assert 0 <= compute_confidence_from_scores(scores, selected) <= 100
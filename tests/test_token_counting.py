@@ -0,0 +1,99 @@
+"""Tests for additive token accounting and prefix-sum truncation."""
+
+import math
+import re
+
+import pytest
+
+import clockify_rag.config as config
+from clockify_rag import token_counting
+from clockify_rag.retrieval import count_tokens, pack_snippets
+from clockify_rag.token_counting import (
+    QwenHeuristicCounter,
+    TokenCounter,
+    annotate_token_counts,
+    get_token_counter,
+)
+
+MIXED = "Track time 计时器 with the タイマー button. 타이머 works offline too! " * 7
+
+
+def _legacy_qwen_count(text):
+    cjk = len(re.findall(r"[\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uac00-\ud7af]", text))
+    return math.ceil(cjk / 1.5 + (len(text) - cjk) / 3.5)
+
+
+def _legacy_truncate(text, budget, count):
+    """Binary search with a full recount per step (the previous implementation)."""
+    if count(text) <= budget:
+        return text
+    target, suffix = (budget, "") if budget < count("...") else (budget - count("..."), "...")
+    left, right = 0, len(text)
+    while left < right:
+        mid = (left + right + 1) // 2
+        if count(text[:mid]) <= target:
+            left = mid
+        else:
+            right = mid - 1
+    return text[:left] + suffix
+
+
+@pytest.mark.parametrize("counter", [QwenHeuristicCounter(), TokenCounter()], ids=lambda c: c.key)
+def test_units_are_additive_and_truncation_matches_binary_search(counter):
+    parts = [MIXED[:37], "\n\n", MIXED[37:120], MIXED[120:]]
+    assert counter.units("".join(parts)) == sum(counter.units(p) for p in parts)
+
+    for budget in (0, 1, 2, 5, 17, 60, 500):
+        assert counter.truncate(MIXED, budget) == _legacy_truncate(MIXED, budget, counter.count)
+
+
+def test_qwen_heuristic_matches_previous_formula():
+    counter = QwenHeuristicCounter()
+    for text in ("", "a", MIXED, MIXED[:50], "日本語のテキスト", "x" * 35):
+        assert counter.count(text) == _legacy_qwen_count(text)
+    assert count_tokens(MIXED, model="qwen2.5:32b") == _legacy_qwen_count(MIXED)
+    assert count_tokens("abcdefgh", model="llama3") == 2
+
+
+def test_chunk_units_come_from_build_annotation():
+    counter = QwenHeuristicCounter()
+    chunk = {"id": "c1", "text": MIXED}
+    annotate_token_counts([chunk], counter)
+
+    assert chunk["tokens"] == {"counter": "heuristic:qwen", "units": counter.units(MIXED)}
+    chunk["text"] = "changed"  # the stored units win for the same counter...
+    assert counter.chunk_units(chunk) == counter.units(MIXED)
+    assert TokenCounter().chunk_units(chunk) == len("changed")  # ...and are ignored by another one
+
+
+def test_pack_snippets_uses_precomputed_units(monkeypatch):
+    monkeypatch.setattr(config, "RAG_CHAT_MODEL", "qwen2.5:32b")
+    chunks = [
+        {"id": f"c{i}", "title": f"Article {i % 3}", "url": f"#a{i % 3}", "text": f"{MIXED} part {i}."}
+        for i in range(12)
+    ]
+    plain, annotated = [dict(c) for c in chunks], [dict(c) for c in chunks]
+    annotate_token_counts(annotated)
+    order = list(range(12))
+    expected = pack_snippets(plain, order, pack_top=3, budget_tokens=900, num_ctx=32768)
+
+    measured = []
+    counter = get_token_counter()
+    original_units = QwenHeuristicCounter.units
+    monkeypatch.setattr(counter, "units", lambda text: measured.append(text) or original_units(counter, text))
+    packed = pack_snippets(annotated, order, pack_top=3, budget_tokens=900, num_ctx=32768)
+
+    assert packed == expected
+    assert packed[2] == _legacy_qwen_count(packed[0]) <= 900
+    full_texts = {c["text"] for c in chunks}
+    assert sum(text in full_texts for text in measured) <= 3  # only the chunk truncated per article
+
+
+def test_unusable_tokenizer_path_falls_back_to_heuristic(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(config, "TOKENIZER_PATH", str(tmp_path / "missing-tokenizer.json"))
+    monkeypatch.setattr(token_counting, "_COUNTERS", {})
+
+    counter = get_token_counter("qwen2.5:32b")
+
+    assert counter.key == "heuristic:qwen"
+    assert "TOKENIZER_PATH" in caplog.text
@@ -0,0 +1,148 @@
+"""Tests for per-request tracing spans and the trace debug endpoint."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+from fastapi.testclient import TestClient
+
+import clockify_rag.answer as answer_module
+import clockify_rag.api as api_module
+import clockify_rag.config as config
+import clockify_rag.retrieval as retrieval
+from clockify_rag import tracing
+from clockify_rag.correlation import clear_correlation_id, set_correlation_id
+from clockify_rag.tracing import get_trace, propagate_context, span
+
+
+@pytest.fixture(autouse=True)
+def fresh_buffer(monkeypatch):
+    monkeypatch.setattr(config, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "_BUFFER", None)
+    yield
+    clear_correlation_id()
+
+
+@pytest.fixture
+def traced_pipeline(monkeypatch, sample_embeddings):
+    """Real answer pipeline: linear retrieval, coverage forced, embedding stubbed below ``embed_query``."""
+    monkeypatch.setattr(config, "USE_ANN", "none")
+    monkeypatch.setattr(answer_module, "coverage_ok", lambda *_args: True)
+    monkeypatch.setattr(retrieval, "_embedding_embed_query", lambda question, retries=0: sample_embeddings[0])
+
+
+def _names(nodes):
+    return [node["name"] for node in nodes]
+
+
+def _find(nodes, name):
+    for node in nodes:
+        if node["name"] == name:
+            return node
+        found = _find(node["children"], name)
+        if found:
+            return found
+    return None
+
+
+def test_answer_pipeline_records_nested_stage_spans(traced_pipeline, sample_chunks, sample_embeddings, sample_bm25):
+    set_correlation_id("trace-answer-1")
+    answer_module.answer_once("How do I track time?", sample_chunks, sample_embeddings, sample_bm25)
+
+    (root,) = get_trace("trace-answer-1")
+    assert root["name"] == "answer" and root["parent_id"] is None
+    assert {"retrieve", "mmr", "pack_snippets", "prompt_build", "llm_http", "json_parse"} <= set(
+        _names(root["children"])
+    )
+    assert _names(_find([root], "llm_http")["children"]) == ["llm_queue"]  # waiting for an LLM gateway slot
+    retrieve_span = _find([root], "retrieve")
+    stages = _names(retrieve_span["children"])
+    assert stages[0] == "embed_query" and stages[-1] == "dedup"
+    assert {"dense_scores", "bm25_scores", "zscore"} <= set(stages)
+    assert retrieve_span["attributes"]["candidates"] == len(sample_chunks)
+    assert all(child["parent_id"] == retrieve_span["span_id"] for child in retrieve_span["children"])
+    assert retrieve_span["duration_ms"] >= sum(child["duration_ms"] for child in retrieve_span["children"])
+
+
+def test_spans_are_noops_without_correlation_id_or_when_disabled(monkeypatch):
+    with span("orphan") as s:
+        s.set(ignored=True)
+    assert tracing.get_trace_buffer().get("orphan") is None
+
+    monkeypatch.setattr(config, "TRACING_ENABLED", False)
+    set_correlation_id("trace-disabled")
+    with span("stage"):
+        pass
+    assert get_trace("trace-disabled") is None
+
+
+def _stage(name):
+    with span(name):
+        pass
+
+
+def test_executor_work_keeps_parent_span():
+    set_correlation_id("trace-executor")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with span("request"):
+            pool.submit(propagate_context(partial(_stage, "worker"))).result()
+            pool.submit(_stage, "lost").result()  # no context: not part of the trace
+
+    (root,) = get_trace("trace-executor")
+    assert _names(root["children"]) == ["worker"]
+
+
+def test_buffer_evicts_oldest_and_exports_each_trace_once(monkeypatch, tmp_path):
+    export = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(config, "TRACE_BUFFER_SIZE", 2)
+    monkeypatch.setattr(config, "TRACE_EXPORT_PATH", str(export))
+
+    for cid in ("first", "0123456789abcdef0123456789abcdef", "third"):
+        set_correlation_id(cid)
+        with span("root", n=1):
+            with span("child", ok=True):
+                pass
+            assert not export.exists() or cid not in export.read_text()  # exported when the last span ends
+
+    assert get_trace("first") is None and get_trace("third") is not None
+    lines = [json.loads(line) for line in export.read_text().splitlines()]
+    assert len(lines) == 3
+    spans = lines[1]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    child, root = spans
+    assert root["traceId"] == child["traceId"] == "0123456789abcdef0123456789abcdef"
+    assert child["parentSpanId"] == root["spanId"] and root["parentSpanId"] == ""
+    assert {"key": "ok", "value": {"boolValue": True}} in child["attributes"]
+    assert len(lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"]) == 32
+
+
+@pytest.mark.parametrize("pipeline", ["thread", "async"])
+def test_debug_trace_endpoint_returns_span_tree(
+    monkeypatch, traced_pipeline, pipeline, sample_chunks, sample_embeddings, sample_bm25
+):
+    monkeypatch.setattr(api_module.config, "API_PIPELINE", pipeline)
+    monkeypatch.setattr(api_module.config, "API_CACHE_ENABLED", False)
+    monkeypatch.setattr(
+        api_module, "ensure_index_ready", lambda retries=2: (sample_chunks, sample_embeddings, sample_bm25, None)
+    )
+    app = api_module.create_app()
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/v1/query", json={"question": "How do I track time?"}, headers={"x-correlation-id": "req-trace-42"}
+        )
+        assert response.status_code == 200
+        trace = client.get("/v1/debug/trace/req-trace-42")
+        missing = client.get("/v1/debug/trace/never-seen")
+        invalid = client.get("/v1/debug/trace/bad.id")
+
+    assert trace.status_code == 200
+    (root,) = trace.json()["spans"]
+    assert root["name"] == "POST /v1/query" and root["attributes"]["status_code"] == 200
+    answer = _find([root], "answer")
+    assert answer["parent_id"] == root["span_id"]
+    assert {"retrieve", "mmr", "pack_snippets", "llm_http", "json_parse"} <= set(_names(answer["children"]))
+    assert _find([root], "embed_query") is not None
+    assert _find(_find([root], "llm_http")["children"], "llm_queue")["attributes"]["priority"] == "interactive"
+    assert missing.status_code == 404
+    assert invalid.status_code == 400
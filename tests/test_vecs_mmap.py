@@ -0,0 +1,113 @@
+"""Tests for memory-mapped loading of the embedding matrix (vecs_n.npy)."""
+
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clockify_rag.answer import apply_mmr_diversification
+from clockify_rag.indexing import load_embeddings
+from clockify_rag.retrieval import DenseScoreStore, retrieve
+from clockify_rag.utils import atomic_save_npy
+
+
+def _smaps_for(path):
+    """Sum /proc/self/smaps counters (kB) over every mapping of ``path``."""
+    target = os.path.realpath(path)
+    totals = {"Rss": 0, "Shared_Clean": 0, "Private_Clean": 0, "Private_Dirty": 0, "Anonymous": 0}
+    in_target = False
+    with open("/proc/self/smaps", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if not fields[0].endswith(":"):
+                # Mapping header: "start-end perms offset dev inode [path]"
+                in_target = fields[-1] == target
+            elif in_target and fields[0][:-1] in totals:
+                totals[fields[0][:-1]] += int(fields[1])
+    return totals
+
+
+def _map_and_report(path, barrier, queue):
+    vecs = load_embeddings(path, mmap=True)
+    float(np.asarray(vecs).sum())  # fault every page in
+    barrier.wait()  # every worker now holds the mapping
+    queue.put(_smaps_for(path))
+    barrier.wait()  # keep the mapping alive until all workers have reported
+
+
+def test_mmap_load_is_read_only_view(tmp_path, sample_embeddings):
+    path = str(tmp_path / "vecs_n.npy")
+    atomic_save_npy(sample_embeddings, path)
+
+    mapped = load_embeddings(path, mmap=True)
+    copied = load_embeddings(path, mmap=False)
+
+    assert isinstance(mapped, np.memmap)
+    assert not mapped.flags.writeable
+    assert not isinstance(copied, np.memmap)
+    np.testing.assert_array_equal(mapped, copied)
+
+
+def test_consumers_accept_read_only_view(
+    monkeypatch, tmp_path, sample_chunks, sample_embeddings, sample_bm25, sample_query_embedding
+):
+    """retrieve, DenseScoreStore and MMR give identical results on the memmap."""
+    import clockify_rag.config as config
+    import clockify_rag.retrieval as retrieval
+
+    monkeypatch.setattr(config, "USE_ANN", "none", raising=False)
+    monkeypatch.setattr(retrieval, "_embedding_embed_query", lambda *_a, **_k: sample_query_embedding)
+
+    path = str(tmp_path / "vecs_n.npy")
+    atomic_save_npy(sample_embeddings, path)
+    mapped = load_embeddings(path, mmap=True)
+    in_memory = load_embeddings(path, mmap=False)
+
+    sel_mapped, scores_mapped = retrieve("How do I track time?", sample_chunks, mapped, sample_bm25, top_k=5)
+    sel_memory, scores_memory = retrieve("How do I track time?", sample_chunks, in_memory, sample_bm25, top_k=5)
+    assert sel_mapped == sel_memory
+    np.testing.assert_allclose(scores_mapped["hybrid"], scores_memory["hybrid"])
+
+    store = DenseScoreStore(len(sample_chunks), vecs=mapped, qv=sample_query_embedding, initial=[])
+    assert store[1] == pytest.approx(float(in_memory[1].dot(sample_query_embedding)))
+    np.testing.assert_allclose(store.to_array(), in_memory.dot(sample_query_embedding), rtol=1e-6)
+
+    assert apply_mmr_diversification(sel_mapped, scores_mapped, mapped, pack_top=3) == apply_mmr_diversification(
+        sel_memory, scores_memory, in_memory, pack_top=3
+    )
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux") or not os.path.exists("/proc/self/smaps"),
+    reason="needs /proc/self/smaps and fork",
+)
+def test_worker_processes_share_mapping(tmp_path):
+    """Each worker maps the file itself; the pages are shared, not private copies."""
+    rows, dim = 2048, 384
+    vecs = np.random.default_rng(0).standard_normal((rows, dim)).astype("float32")
+    path = str(tmp_path / "vecs_n.npy")
+    atomic_save_npy(vecs, path)
+    data_kb = vecs.nbytes // 1024
+
+    workers = 3
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_map_and_report, args=(path, barrier, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    reports = [queue.get(timeout=60) for _ in procs]
+    for proc in procs:
+        proc.join(timeout=60)
+        assert proc.exitcode == 0
+
+    for report in reports:
+        assert report["Shared_Clean"] >= 0.9 * data_kb
+        assert report["Private_Dirty"] == 0
+        assert report["Anonymous"] == 0